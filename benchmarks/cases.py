@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The benchmark cases of the hot paths of lpot, each built at a given scale, the number
+   of quantizable ops, layers or tensors it works on.
+"""
+
+import itertools
+import os
+from collections import OrderedDict
+import numpy as np
+import yaml
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, scales=(10, 100, 1000)):
+    """Register a benchmark case, a function taking the scale and returning the function
+       to time, its setup isn't timed.
+
+    Args:
+        name (string): The benchmark name.
+        scales (tuple, optional): The scales the case runs at by default.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, scales)
+        return setup
+    return decorator
+
+
+def build_tf_graph(num_ops, seed=0):
+    """A frozen graph of num_ops MatMul + BiasAdd + Relu blocks of width 16. The blocks
+       are chained in branches of at most 100 summed by AddN, the graph sorting of
+       GraphConverter recursing once per node of the deepest path.
+    """
+    import tensorflow as tf
+    rng = np.random.RandomState(seed)
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.compat.v1.placeholder(tf.float32, shape=(None, 16), name='x')
+        branches = []
+        for start in range(0, num_ops, 100):
+            y = x
+            for _ in range(min(100, num_ops - start)):
+                weight = tf.constant(rng.rand(16, 16).astype(np.float32) - 0.5)
+                bias = tf.constant(rng.rand(16).astype(np.float32))
+                y = tf.nn.relu(tf.nn.bias_add(tf.matmul(y, weight), bias))
+            branches.append(y)
+        tf.identity(tf.add_n(branches) if len(branches) > 1 else branches[0], name='output')
+    return graph.as_graph_def()
+
+
+def build_torch_module(num_ops):
+    """A module of num_ops Linear layers followed by ReLU."""
+    import torch
+    layers = []
+    for _ in range(num_ops):
+        layers += [torch.nn.Linear(8, 8), torch.nn.ReLU()]
+    return torch.nn.Sequential(torch.quantization.QuantStub(), *layers,
+                               torch.quantization.DeQuantStub())
+
+
+def build_conf(framework, strategy='basic'):
+    """The Conf of a minimal yaml config, written to the current directory."""
+    from lpot.conf.config import Conf
+    config = {'model': {'name': 'benchmark', 'framework': framework},
+              'evaluation': {'accuracy': {'metric': {'topk': 1}}},
+              'tuning': {'strategy': {'name': strategy},
+                         'accuracy_criterion': {'relative': 0.01},
+                         'workspace': {'path': 'saved'}}}
+    if framework == 'tensorflow':
+        config['model'].update({'inputs': 'x', 'outputs': 'output'})
+    with open('benchmark.yaml', 'w') as f:
+        yaml.dump(config, f)
+    return Conf('benchmark.yaml')
+
+
+def _tf_adaptor():
+    from lpot.adaptor import FRAMEWORKS
+    return FRAMEWORKS['tensorflow']({'device': 'cpu',
+                                     'approach': 'post_training_static_quant',
+                                     'random_seed': 1978,
+                                     'inputs': ['x'],
+                                     'outputs': ['output']})
+
+
+@benchmark('tf_pre_optimization')
+def tf_pre_optimization(scale):
+    from lpot.adaptor.tf_utils.graph_rewriter.generic.pre_optimize import PreOptimization
+    graph_def = build_tf_graph(scale)
+    return lambda: PreOptimization(graph_def, ['x'], ['output']).get_optimized_graphdef()
+
+
+@benchmark('tf_graph_converter', scales=(10, 100))
+def tf_graph_converter(scale):
+    """GraphConverter.convert quantizing every MatMul with one calibration batch. It
+       takes more than 10 minutes at 1000 MatMuls, so it doesn't run at 1000 by default.
+    """
+    from lpot.adaptor.tf_utils.graph_converter import GraphConverter
+    from lpot.data import DATASETS, DataLoader
+    graph_def = build_tf_graph(scale)
+    adaptor = _tf_adaptor()
+    capability = adaptor.query_fw_capability(graph_def)
+    conf = build_conf('tensorflow')
+    conf.modelwise_tune_space(capability['modelwise'])
+    tune_cfg = {'calib_iteration': 1, 'op': OrderedDict()}
+    for op, op_space in conf.opwise_tune_space(capability['opwise']).items():
+        tune_cfg['op'][op] = conf.expand_tune_cfgs(op_space)[0]
+    adaptor.tuning_cfg_to_fw(tune_cfg)
+    dataset = DATASETS('tensorflow')['dummy'](shape=(4, 16), label=True)
+    dataloader = DataLoader('tensorflow', dataset, batch_size=4)
+
+    def run():
+        GraphConverter(adaptor.pre_optimized_graph, os.path.abspath('quantized.pb'),
+                       inputs=['x'], outputs=['output'], qt_config=adaptor.quantize_config,
+                       fp32_ops=adaptor.fp32_ops, bf16_ops=adaptor.bf16_ops,
+                       data_loader=dataloader).convert()
+    return run
+
+
+@benchmark('kl_get_threshold', scales=(10, 100))
+def kl_get_threshold(scale):
+    """The KL threshold search of scale 256 bins histograms, a pure python loop of about
+       20ms per tensor, so it doesn't run at 1000 tensors by default.
+    """
+    from lpot.utils.kl_divergence import KL_Divergence
+    rng = np.random.RandomState(0)
+    histograms = []
+    for _ in range(scale):
+        values = np.abs(rng.randn(10000))
+        hist, hist_edges = np.histogram(values, bins=256)
+        histograms.append((hist, hist_edges, values.max()))
+
+    def run():
+        kl = KL_Divergence()
+        for hist, hist_edges, max_val in histograms:
+            kl.get_threshold(hist, hist_edges, 0., max_val, num_bins=256,
+                             quantized_type='uint8')
+    return run
+
+
+@benchmark('layer_histogram_collector')
+def layer_histogram_collector(scale):
+    """The histograms of two batches of scale layer outputs."""
+    from lpot.utils.collect_layer_histogram import LayerHistogramCollector
+    rng = np.random.RandomState(0)
+    layer_tensor = {'layer{}'.format(i): [rng.randn(4, 256), 2 * rng.randn(4, 256)]
+                    for i in range(scale)}
+
+    def run():
+        LayerHistogramCollector(layer_tensor=layer_tensor,
+                                include_layer=list(layer_tensor)).collect()
+    return run
+
+
+@benchmark('expand_tune_cfgs')
+def expand_tune_cfgs(scale):
+    """The model-wise and op-wise tune spaces and configs of scale MatMuls, like the
+       strategy builds them from the framework capability.
+    """
+    adaptor = _tf_adaptor()
+    capability = adaptor.query_fw_capability(build_tf_graph(scale))
+    conf = build_conf('tensorflow')
+
+    def run():
+        conf.expand_tune_cfgs(conf.modelwise_tune_space(capability['modelwise']))
+        for op_space in conf.opwise_tune_space(capability['opwise']).values():
+            conf.expand_tune_cfgs(op_space)
+    return run
+
+
+@benchmark('strategy_tune_cfgs')
+def strategy_tune_cfgs(scale):
+    """Creating the strategy of a pytorch module of scale Linear layers, which queries
+       the capability and expands the tune space, and generating 20 tuning configs.
+    """
+    from lpot.strategy import STRATEGIES
+    from lpot.data import DATASETS, DataLoader
+    model = build_torch_module(scale)
+    conf = build_conf('pytorch', 'random')
+    dataset = DATASETS('pytorch')['dummy'](shape=(4, 8), label=True)
+    dataloader = DataLoader('pytorch', dataset, batch_size=4)
+
+    def run():
+        strategy = STRATEGIES['random'](model, conf, dataloader)
+        list(itertools.islice(strategy.next_tune_cfg(), 20))
+    return run
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Time the hot paths of lpot at several scales and compare them with a stored baseline.
+
+   python benchmarks/run_benchmarks.py --output results.json
+   python benchmarks/run_benchmarks.py --save-baseline
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('LOGLEVEL', 'WARNING')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cases import BENCHMARKS  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def machine_info():
+    """The machine and package versions the results were measured with."""
+    info = {'platform': platform.platform(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count()}
+    for package in ('lpot', 'numpy', 'tensorflow', 'torch'):
+        try:
+            info[package] = __import__(package).__version__
+        except (ImportError, AttributeError):
+            info[package] = None
+    return info
+
+
+def time_case(run, repeat, warmup):
+    """Time run repeat times after warmup untimed runs, without garbage collection.
+
+    Returns:
+        dict: The min, median, mean and stdev of the run times in seconds.
+    """
+    for _ in range(warmup):
+        run()
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return {'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.mean(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.,
+            'runs': times}
+
+
+def run_benchmarks(names, scales, repeat, warmup):
+    """Run the benchmarks in a temporary directory, the cases write their yaml and models
+       to the current directory.
+
+    Returns:
+        dict: The results keyed by '<benchmark>/<scale>'.
+    """
+    results = {}
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='lpot_benchmarks_')
+    os.chdir(workdir)
+    try:
+        for name in names:
+            setup, default_scales = BENCHMARKS[name]
+            for scale in (scales or default_scales):
+                run = setup(scale)
+                result = time_case(run, repeat, warmup)
+                results['{}/{}'.format(name, scale)] = result
+                print('{:<40} median {:10.4f}s  min {:10.4f}s  stdev {:8.4f}s'.format(
+                    '{}/{}'.format(name, scale), result['median'], result['min'],
+                    result['stdev']), flush=True)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, thresholds, default_threshold, min_delta, statistic='min'):
+    """Compare the times with the baseline ones.
+
+    Args:
+        results (dict): The current results.
+        baseline (dict): The baseline results.
+        thresholds (dict): The relative slowdown allowed per benchmark name.
+        default_threshold (float): The relative slowdown allowed for the other benchmarks.
+        min_delta (float): The slowdown in seconds under which a case never regresses, the
+                           timer noise of the fastest cases.
+        statistic (string, optional): The statistic compared, the min is the least
+                                      sensitive to the other loads of the machine.
+
+    Returns:
+        list: The (case, baseline time, time, relative change) of the regressions.
+    """
+    regressions = []
+    for case, result in sorted(results.items()):
+        if case not in baseline:
+            print('{:<40} not in the baseline'.format(case))
+            continue
+        reference, current = baseline[case][statistic], result[statistic]
+        change = (current - reference) / reference
+        threshold = thresholds.get(case.split('/')[0], default_threshold)
+        regressed = change > threshold and current - reference > min_delta
+        print('{:<40} {:10.4f}s -> {:10.4f}s {:+8.1%}{}'.format(
+            case, reference, current, change,
+            '  REGRESSION (> {:.0%})'.format(threshold) if regressed else ''))
+        if regressed:
+            regressions.append((case, reference, current, change))
+    return regressions
+
+
+def parse_thresholds(values):
+    thresholds = {}
+    for value in values or []:
+        name, _, threshold = value.partition('=')
+        assert name in BENCHMARKS, 'Unknown benchmark {}'.format(name)
+        thresholds[name] = float(threshold)
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS),
+                        default=list(BENCHMARKS), help='the benchmarks to run')
+    parser.add_argument('--scales', nargs='+', type=int,
+                        help='the scales to run, defaults to the scales of each benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='the timed runs of each case')
+    parser.add_argument('--warmup', type=int, default=1, help='the untimed runs of each case')
+    parser.add_argument('--output', help='the json file to write the results to')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='the json results to compare with')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline instead of comparing')
+    parser.add_argument('--statistic', choices=['min', 'median', 'mean'], default='min',
+                        help='the statistic of the run times compared with the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='the relative slowdown reported as a regression')
+    parser.add_argument('--benchmark-threshold', nargs='+', metavar='NAME=THRESHOLD',
+                        help='the relative slowdown allowed for the given benchmarks')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='the slowdown in seconds never reported as a regression')
+    args = parser.parse_args(argv)
+    assert args.repeat > 0 and args.warmup >= 0, 'repeat should be positive'
+    thresholds = parse_thresholds(args.benchmark_threshold)
+
+    report = {'machine': machine_info(),
+              'repeat': args.repeat,
+              'warmup': args.warmup,
+              'results': run_benchmarks(args.benchmarks, args.scales, args.repeat,
+                                        args.warmup)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('Baseline saved to {}'.format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print('No baseline {} to compare with'.format(args.baseline))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != report['machine']:
+        print('Warning: the baseline was measured on another machine or package versions, '
+              'the comparison may not be meaningful.')
+    regressions = compare(report['results'], baseline['results'], thresholds,
+                          args.threshold, args.min_delta, args.statistic)
+    if regressions:
+        print('{} regressions found'.format(len(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,6 +16,7 @@
 # limitations under the License.
 
 from abc import abstractmethod
+from ..utils.utility import LazyRegistry
 
 '''The framework backends supported by lpot, including tensorflow, mxnet and pytorch.
 
@@ -24,8 +25,9 @@ from abc import abstractmethod
    could choose this framework backend by setting "abc" string in framework field of yaml.
 
    FRAMEWORKS variable is used to store all implemented Adaptor subclasses of framework backends.
+   The adaptor module is imported only when its framework is looked up.
 '''
-FRAMEWORKS = {}
+FRAMEWORKS = LazyRegistry('lpot.adaptor')
 
 
 def adaptor_registry(cls):
@@ -36,7 +38,7 @@ def adaptor_registry(cls):
     '''
     assert cls.__name__.endswith(
         'Adaptor'), "The name of subclass of Adaptor should end with \'Adaptor\' substring."
-    if cls.__name__[:-len('Adaptor')].lower() in FRAMEWORKS:
+    if FRAMEWORKS.is_registered(cls.__name__[:-len('Adaptor')].lower()):
         raise ValueError('Cannot have two frameworks with the same name.')
     FRAMEWORKS[cls.__name__[:-len('Adaptor')].lower()] = cls
     return cls
@@ -48,7 +50,8 @@ class Adaptor(object):
     '''
 
     def __init__(self, framework_specific_info):
-        pass
+        # kept to create the same adaptor in the sharded evaluation worker processes
+        self.framework_specific_info = framework_specific_info
 
     @abstractmethod
     def quantize(self, tune_cfg, model, dataloader, q_func=None):
@@ -64,7 +67,8 @@ class Adaptor(object):
 
     @abstractmethod
     def evaluate(self, model, dataloader, postprocess=None,
-                 metric=None, measurer=None, iteration=-1, tensorboard=False):
+                 metric=None, measurer=None, iteration=-1, tensorboard=False,
+                 sequential_eval=None):
         '''The function is used to run evaluation on validation dataset.
 
            Args:
@@ -75,6 +79,9 @@ class Adaptor(object):
                measurer (object, optional): for precise benchmark measurement.
                iteration(int, optional): control steps of mini-batch
                tensorboard (boolean, optional): for tensorboard inspect tensor.
+               sequential_eval (object, optional): updated with metric after each batch,
+                                                   it raises EvaluationRejected to stop
+                                                   evaluating a hopeless model.
         '''
         raise NotImplementedError
 
@@ -111,6 +118,34 @@ class Adaptor(object):
         '''
         raise NotImplementedError
 
+    def profile(self, model, dataloader, iteration=-1):
+        '''The function is used by tune strategy class to measure the latency of each op.
+
+           Args:
+               model (object): The fp32 or quantized model to profile, query_fw_capability
+                               should have been called on the fp32 model.
+               dataloader (object): generate the data and labels.
+               iteration (int, optional): The number of batches to profile, -1 for all.
+
+           Return:
+               OpProfile: the latency of each tuning op, including the quantization nodes
+                          inserted around it.
+        '''
+        raise NotImplementedError
+
+    def query_op_weights(self, model):
+        '''The function is used by tune strategy class to predict the model size.
+
+           Args:
+               model (object): The fp32 model, query_fw_capability should have been called
+                               on it.
+
+           Return:
+               Dict
+               {'op1': number of weight elements of op1}
+        '''
+        raise NotImplementedError
+
     @abstractmethod
     def mapping(self, src_model, dst_model):
         '''The function is used to create a dict to map tensor name
@@ -19,6 +19,10 @@ from .adaptor import adaptor_registry, Adaptor
 from ..utils.utility import LazyImport
 from ..utils.kl_divergence import KL_Divergence
 from ..utils.collect_layer_histogram import LayerHistogramCollector
+from ..utils.calibration import create_calibration_monitor
+from ..utils.pipeline import MetricPipeline
+from ..utils.op_profile import OpProfile
+from ..utils import trace
 from collections import OrderedDict
 import numpy as np
 
@@ -56,6 +60,31 @@ def _check_version(v1, v2):
     return False
 
 
+# the profiler can only be configured once in a process, each profile appends its events
+# to this trace file
+_profiler_file = None
+
+
+def _profiler_events(path, start_us):
+    """The operator events written to the profiler trace file since start_us. The file
+       isn't a complete json document until the profiler is finished.
+    """
+    with open(path) as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    separator = re.compile(r'[\s,]*')
+    index = text.find('[') + 1
+    events = []
+    while index > 0:
+        index = separator.match(text, index).end()
+        if index >= len(text) or text[index] != '{':
+            break
+        event, index = decoder.raw_decode(text, index)
+        if event.get('cat') == 'operator' and event.get('ts', 0) >= start_us:
+            events.append(event)
+    return events
+
+
 @adaptor_registry
 class MxNetAdaptor(Adaptor):
     """The MXNet adaptor layer, do MXNet quantization, calibration, inspect layer tensors.
@@ -70,6 +99,9 @@ class MxNetAdaptor(Adaptor):
         self.quantizable_ops = []
         self.logger = logger
         self.qdataloader = framework_specific_info["q_dataloader"]
+        # early stop of calibration once the collected ranges converge
+        self.calib_convergence = framework_specific_info.get('calib_convergence', None)
+        self.calib_samples = None
 
         # MXNet version check
         if not _check_version(mx.__version__, '1.6.0'):
@@ -81,6 +113,7 @@ class MxNetAdaptor(Adaptor):
         else:
             pass
 
+    @trace.traced('adaptor.quantize')
     def quantize(self, tune_cfg, model, dataloader, q_func=None):
         """The function is used to do MXNet calibration and quanitization in post-training
            quantization.
@@ -143,8 +176,9 @@ class MxNetAdaptor(Adaptor):
         # 3. set th_dict to quantized symbol
         qsym = mx.contrib.quantization._calibrate_quantized_sym(qsym, th_dict)
         # 4. quantize params
-        qarg_params = mx.contrib.quantization._quantize_params(
-            qsym, arg_params, th_dict)
+        with trace.span('adaptor.quantize_weights'):
+            qarg_params = mx.contrib.quantization._quantize_params(
+                qsym, arg_params, th_dict)
         qsym = self._get_backedn_graph(qsym, qconfig['ctx'])
 
         if isinstance(model, mx.gluon.HybridBlock):
@@ -177,8 +211,10 @@ class MxNetAdaptor(Adaptor):
         """
         raise NotImplementedError
 
+    @trace.traced('adaptor.evaluate')
     def evaluate(self, model, dataloader, postprocess=None, \
-                 metric=None, measurer=None, iteration=-1, tensorboard=False):
+                 metric=None, measurer=None, iteration=-1, tensorboard=False,
+                 sequential_eval=None):
         """The function is used to run evaluation on validation dataset.
 
         Args:
@@ -186,20 +222,21 @@ class MxNetAdaptor(Adaptor):
             dataloader (object): dataset to do evaluate.
             metric (metric object): evaluate metric.
             measurer (object, optional): for precise benchmark measurement.
+            sequential_eval (object, optional): check to reject the model during evaluation.
 
         Returns:
             acc: evaluate result.
         """
         if isinstance(model, mx.gluon.HybridBlock):
             acc = self._mxnet_gluon_forward(model, dataloader, postprocess, \
-                                            metric, measurer, iteration)
+                                            metric, measurer, iteration, sequential_eval)
 
         elif isinstance(model[0], mx.symbol.symbol.Symbol):
             assert isinstance(dataloader, mx.io.DataIter), \
                 'need mx.io.DataIter. but recived %s' % str(type(dataloader))
             dataloader.reset()
             acc = self._mxnet_symbol_forward(model, dataloader, postprocess, \
-                                             metric, measurer, iteration)
+                                             metric, measurer, iteration, sequential_eval)
 
         else:
             raise ValueError("Unknow graph tyep: %s" % (str(type(model))))
@@ -207,7 +244,7 @@ class MxNetAdaptor(Adaptor):
         return acc
 
     def _mxnet_symbol_forward(self, symbol_file, dataIter, \
-                              postprocess, metric, measurer, iteration):
+                              postprocess, metric, measurer, iteration, sequential_eval=None):
         """MXNet symbol model evaluation process.
         Args:
             symbol_file (object): the symbole model need to do evaluate.
@@ -231,30 +268,163 @@ class MxNetAdaptor(Adaptor):
                  )
         mod.set_params(arg_params, aux_params)
 
-        batch_num = 0
-        for idx, batch in enumerate(dataIter):
-            if measurer is not None:
-                measurer.start()
-                mod.forward(batch, is_train=False)
-                measurer.end()
-            else:
-                mod.forward(batch, is_train=False)
-
-            output = mod.get_outputs()
-            output = output[0].asnumpy()
-            label = batch.label[0].asnumpy()
+        def update_metric(output, label):
             if postprocess is not None:
                 output, label = postprocess((output, label))
             if metric is not None:
                 metric.update(output, label)
-            batch_num += dataIter.batch_size
-            if idx + 1 == iteration:
-                break
+            if sequential_eval is not None:
+                sequential_eval.update(metric)
+
+        batch_num = 0
+        # the outputs are copied to numpy arrays before the worker thread gets them, the
+        # postprocess and metric don't overlap with the inference being measured
+        with MetricPipeline(update_metric, overlap=measurer is None) as pipeline:
+            for idx, batch in enumerate(dataIter):
+                if measurer is not None:
+                    measurer.start()
+                    mod.forward(batch, is_train=False)
+                    measurer.end()
+                else:
+                    mod.forward(batch, is_train=False)
+
+                output = mod.get_outputs()
+                output = output[0].asnumpy()
+                label = batch.label[0].asnumpy()
+                pipeline.put(output, label)
+                batch_num += dataIter.batch_size
+                if idx + 1 == iteration:
+                    break
         acc = metric.result() if metric is not None else 0
         return acc
 
+    def _profiled_node(self, node_name, op_type):
+        """The tuning op a profiled node belongs to, None if it belongs to none, and
+           whether it is a quantization node inserted around the op.
+        """
+        # the quantized nodes are named quantized_<op>, quantized_<op>_requantize...
+        name = re.sub('_(re|de)?quantize$', '', re.sub('^quantized_', '', node_name))
+        op = name if name in set(op['name'] for op in self.quantizable_ops) else None
+        boundary = op_type in ('_contrib_quantize', '_contrib_quantize_v2',
+                               '_contrib_dequantize', '_contrib_requantize')
+        return op, boundary
+
+    @trace.traced('adaptor.profile')
+    def profile(self, model, dataloader, iteration=-1):
+        """Measure the latency of each op with the MXNet profiler. The bulk execution is
+           disabled when binding the model, so each operator is recorded. The events are
+           named after the operator type, the k-th event of a type in a forward being the
+           k-th node of this type in the graph order.
+
+        Args:
+            model (object): The fp32 or quantized symbol model.
+            dataloader (object): dataset to run the model on.
+            iteration (int, optional): The number of batches to profile, -1 for all.
+
+        Returns:
+            OpProfile: the latency of each tuning op and its quantization nodes.
+        """
+        global _profiler_file
+        if isinstance(model, mx.gluon.HybridBlock):
+            raise NotImplementedError
+        assert isinstance(dataloader, mx.io.DataIter), \
+            'need mx.io.DataIter. but recived %s' % str(type(dataloader))
+        sym, arg_params, aux_params = model
+        sym = sym.get_backend_symbol('MKLDNN_QUANTIZE')
+        type_nodes = {}
+        for node in json.loads(sym.tojson())['nodes']:
+            if node['op'] != 'null':
+                type_nodes.setdefault(node['op'], []).append(node['name'])
+
+        bulk_exec = os.environ.get('MXNET_EXEC_BULK_EXEC_INFERENCE')
+        os.environ['MXNET_EXEC_BULK_EXEC_INFERENCE'] = '0'
+        try:
+            mod = mx.mod.Module(symbol=sym, context=mx.cpu(),
+                                data_names=(dataloader.provide_data[0].name,),
+                                label_names=(dataloader.provide_label[0].name,))
+            mod.bind(for_training=False,
+                     data_shapes=dataloader.provide_data,
+                     label_shapes=dataloader.provide_label)
+        finally:
+            if bulk_exec is None:
+                del os.environ['MXNET_EXEC_BULK_EXEC_INFERENCE']
+            else:
+                os.environ['MXNET_EXEC_BULK_EXEC_INFERENCE'] = bulk_exec
+        mod.set_params(arg_params, aux_params)
+
+        if _profiler_file is None:
+            _profiler_file = os.path.join(tempfile.mkdtemp(), 'profile.json')
+            mx.profiler.set_config(profile_symbolic=True, profile_imperative=False,
+                                   profile_memory=False, profile_api=False,
+                                   filename=_profiler_file)
+        profile = OpProfile()
+        dataloader.reset()
+        try:
+            for idx, batch in enumerate(dataloader):
+                if idx == 0:
+                    # the first forward initializes the operators, it isn't profiled
+                    mod.forward(batch, is_train=False)
+                    mx.nd.waitall()
+                    start_us = time.time() * 1e6
+                    mx.profiler.set_state('run')
+                mod.forward(batch, is_train=False)
+                mod.get_outputs()[0].wait_to_read()
+                profile.iterations += 1
+                if idx + 1 == iteration:
+                    break
+            mx.nd.waitall()
+        finally:
+            mx.profiler.set_state('stop')
+        if profile.iterations == 0:
+            return profile
+        mx.profiler.dump(finished=False)
+
+        # pair the begin and end events of each thread, then assign them in order
+        spans = []
+        begins = {}
+        for event in sorted(_profiler_events(_profiler_file, start_us), key=lambda e: e['ts']):
+            key = (event.get('tid'), event['name'])
+            if event['ph'] in ('B', 'b'):
+                begins.setdefault(key, []).append(event['ts'])
+            elif event['ph'] in ('E', 'e') and begins.get(key):
+                begin = begins[key].pop()
+                spans.append((begin, event['name'], event['ts'] - begin))
+        type_counts = {}
+        for _, op_type, duration in sorted(spans):
+            nodes = type_nodes.get(op_type)
+            if not nodes:
+                profile.add(op_type, duration / 1e6, attributed=False)
+                continue
+            count = type_counts.get(op_type, 0)
+            type_counts[op_type] = count + 1
+            node_name = nodes[count % len(nodes)]
+            op, boundary = self._profiled_node(node_name, op_type)
+            profile.add(op or node_name, duration / 1e6, boundary=boundary,
+                        attributed=op is not None)
+        return profile
+
+    def query_op_weights(self, model):
+        """The number of weight elements of each tuning op, its <op>_weight and <op>_bias
+           parameters.
+
+        Args:
+            model (object): The fp32 symbol model of the capability query.
+
+        Returns:
+            OrderedDict: op name -> number of weight elements.
+        """
+        if isinstance(model, mx.gluon.HybridBlock):
+            raise NotImplementedError
+        _, arg_params, _ = model
+        op_weights = OrderedDict()
+        for op in self.quantizable_ops:
+            op_weights[op['name']] = sum(
+                int(np.prod(arg_params[key].shape))
+                for key in (op['name'] + '_weight', op['name'] + '_bias') if key in arg_params)
+        return op_weights
+
     def _mxnet_gluon_forward(self, gluon_model, dataloader, 
-                             postprocess, metric, measurer, iteration):
+                             postprocess, metric, measurer, iteration, sequential_eval=None):
         """MXNet gluon model evaluation process.
 
         Args:
@@ -343,6 +513,7 @@ class MxNetAdaptor(Adaptor):
         """
         raise NotImplementedError
 
+    @trace.traced('adaptor.query_fw_capability')
     def query_fw_capability(self, model):
         """Query MXNet quantization capability on the model/op level with the specific model.
 
@@ -416,7 +587,8 @@ class MxNetAdaptor(Adaptor):
             model,
             dataloader,
             op_list=[],
-            iteration_list=[]):
+            iteration_list=[],
+            callback=None):
         """The function is used by tune strategy class for dumping tensor info.
 
         Args:
@@ -424,6 +596,10 @@ class MxNetAdaptor(Adaptor):
             dataloader (object): The data to do forword.
             op_list (list): list of inspect tensors.
             iteration_list (list): list of inspect iterations.
+            callback (callable, optional): called with the tensors of each batch, which are
+                                           then released, the inspection stops early when
+                                           it returns True. Only used if iteration_list is
+                                           empty.
 
         Returns:
             Numpy Array Dict
@@ -456,6 +632,8 @@ class MxNetAdaptor(Adaptor):
 
                 handle = ctypes.cast(arr, NDArrayHandle)
                 arr = mx.ndarray.NDArray(handle, writable=False)  # pylint: disable=no-member
+                # the executor reuses the buffer, e.g. for an in-place relu or the next batch
+                arr = arr.copy()
                 if name in self.tensor_dict.keys():
                     self.tensor_dict[name].append(arr)
                 else:
@@ -487,6 +665,11 @@ class MxNetAdaptor(Adaptor):
             for _, batch in enumerate(data):
                 mod.forward(data_batch=batch, is_train=False)
                 num_batches += 1
+                if callback is not None:
+                    stop = callback(collector.tensor_dict)
+                    collector.reset()
+                    if stop:
+                        break
                 if calib_iter is not None and num_batches >= calib_iter:
                     break
             if logger is not None:
@@ -769,6 +952,7 @@ class MxNetAdaptor(Adaptor):
                              % (name, min_val, max_val, th))
         return th_dict
 
+    @trace.traced('adaptor.calibration')
     def _get_calibration_th(
             self,
             sym,
@@ -830,15 +1014,38 @@ class MxNetAdaptor(Adaptor):
             if data_name in calib_layer:
                 self.__config_dict["calib_minmax_layers"].append(data_name)
 
+        self.calib_samples = 0
         if len(self.__config_dict["calib_kl_layers"]) != 0:
             # inspect each quantized layer activate tensor for calibration
-            layer_tensor = self._inspect_tensor((sym, arg_params, aux_params), 
-                                                 dataloader=calib_data, 
-                                                 op_list=calib_layer)
             _histogram = LayerHistogramCollector(
-                layer_tensor=layer_tensor,
                 include_layer=self.__config_dict["calib_kl_layers"])
-            _histogram.collect()
+            monitor = create_calibration_monitor(self.calib_convergence)
+            if monitor is None:
+                layer_tensor = self._inspect_tensor((sym, arg_params, aux_params), 
+                                                     dataloader=calib_data, 
+                                                     op_list=calib_layer)
+                _histogram.layer_tensor = layer_tensor
+                _histogram.collect()
+                num_batches = len(next(iter(layer_tensor.values()), []))
+            else:
+                # the histograms are combined batch by batch, the same as at once
+                def _collect_batch(layer_tensor):
+                    # the histogram collector works on numpy arrays
+                    _histogram.layer_tensor = {name: [arr.asnumpy() for arr in arrs]
+                                               for name, arrs in layer_tensor.items()}
+                    _histogram.collect()
+                    ranges = {name: hist[2:4] for name, hist in _histogram.hist_dict.items()}
+                    return monitor.update(ranges, lambda: self._get_optimal_thresholds(
+                        dict(_histogram.hist_dict), quantized_dtype))
+
+                self._inspect_tensor((sym, arg_params, aux_params),
+                                     dataloader=calib_data,
+                                     op_list=calib_layer,
+                                     callback=_collect_batch)
+                num_batches = monitor.iterations
+                if monitor.converged and logger:
+                    logger.info('Calibration converged after %d batches.' % num_batches)
+            self.calib_samples = num_batches * calib_data.batch_size
             hist_dict = _histogram.hist_dict
             if logger:
                 logger.info('Calculating optimal thresholds for quantization')
@@ -850,10 +1057,17 @@ class MxNetAdaptor(Adaptor):
 
         calib_data.reset()
         if len(self.__config_dict["calib_minmax_layers"]) != 0:
-            th_dict_minmax, num_examples = mx.contrib.quantization._collect_layer_output_min_max(
-                mod, calib_data, quantized_dtype, include_layer=self.__config_dict[
-                    "calib_minmax_layers"], max_num_examples=num_calib_examples,
-                logger=logger)
+            monitor = create_calibration_monitor(self.calib_convergence)
+            if monitor is None:
+                th_dict_minmax, num_examples = \
+                    mx.contrib.quantization._collect_layer_output_min_max(
+                        mod, calib_data, quantized_dtype, include_layer=self.__config_dict[
+                            "calib_minmax_layers"], max_num_examples=num_calib_examples,
+                        logger=logger)
+            else:
+                th_dict_minmax, num_examples = self._collect_layer_output_min_max(
+                    mod, calib_data, quantized_dtype, monitor, num_calib_examples)
+            self.calib_samples = max(self.calib_samples, num_examples)
             self._merge_dicts(th_dict_minmax, th_dict)
             if logger:
                 logger.info(
@@ -862,6 +1076,36 @@ class MxNetAdaptor(Adaptor):
 
         return th_dict
 
+    def _collect_layer_output_min_max(self, mod, calib_data, quantized_dtype, monitor,
+                                      max_num_examples):
+        """Collect the min/max of the layer outputs until they converge.
+
+        Args:
+            mod (object): bound module of the fp32 model.
+            calib_data (DataIter): calibration dataset.
+            quantized_dtype (str): quantized data type.
+            monitor (CalibrationMonitor): the convergence monitor.
+            max_num_examples (int): the upper bound of the examples to collect.
+
+        Returns:
+            (tuple): dict of each layer min/max, the number of examples collected.
+        """
+        collector = mx.contrib.quantization._LayerOutputMinMaxCollector(
+            quantized_dtype=quantized_dtype,
+            include_layer=self.__config_dict["calib_minmax_layers"])
+        mod._exec_group.execs[0].set_monitor_callback(collector.collect, monitor_all=True)
+        num_examples = 0
+        for batch in calib_data:
+            mod.forward(data_batch=batch, is_train=False)
+            num_examples += calib_data.batch_size
+            if max_num_examples is not None and num_examples >= max_num_examples:
+                break
+            if monitor.update(collector.min_max_dict):
+                self.logger.info('Calibration converged after %d batches.' %
+                                 monitor.iterations)
+                break
+        return collector.min_max_dict, num_examples
+
     def _merge_dicts(self, src, dst):
         """Merge src dict to dst dict
 
@@ -15,22 +15,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import pandas as pd
 from .adaptor import adaptor_registry, Adaptor
 from ..utils.utility import LazyImport, AverageMeter, compute_sparsity, CpuInfo
+from ..utils.kl_divergence import KL_Divergence
+from ..utils.calibration import create_calibration_monitor
+from ..utils.pipeline import MetricPipeline
+from ..utils.op_profile import OpProfile
 import copy
 from collections import OrderedDict
-from ..utils import logger
+from ..utils import logger, trace
 import random
 import numpy as np
 import os
+import json
 import yaml
 
 torch = LazyImport('torch')
+pd = LazyImport('pandas')
 
-REDUCE_RANGE = False if CpuInfo().vnni else True
-logger.debug("reduce range:")
-logger.debug(REDUCE_RANGE)
+
+def _reduce_range():
+    """Whether to reduce the activation range to 7 bits, needed on CPUs without VNNI."""
+    return not CpuInfo().vnni
 
 
 def _cfg_to_qconfig(tune_cfg, is_insert_fakequant=False):
@@ -150,20 +156,13 @@ def _observer(algorithm, scheme, granularity, dtype):
                 qscheme = torch.per_tensor_affine
     else:
         assert algorithm == 'kl'
-        observer = torch.quantization.HistogramObserver
-        if granularity == 'per_channel':
-            if scheme == 'sym':
-                qscheme = torch.per_channel_symmetric
-            else:
-                assert scheme == 'asym'
-                qscheme = torch.per_channel_affine
+        observer = _histogram_observer()
+        assert granularity == 'per_tensor'
+        if scheme == 'sym':
+            qscheme = torch.per_tensor_symmetric
         else:
-            assert granularity == 'per_tensor'
-            if scheme == 'sym':
-                qscheme = torch.per_tensor_symmetric
-            else:
-                assert scheme == 'asym'
-                qscheme = torch.per_tensor_affine
+            assert scheme == 'asym'
+            qscheme = torch.per_tensor_affine
 
     if dtype == 'int8':
         dtype = torch.qint8
@@ -172,7 +171,7 @@ def _observer(algorithm, scheme, granularity, dtype):
         dtype = torch.quint8
 
     return observer.with_args(qscheme=qscheme, dtype=dtype,
-                              reduce_range=(REDUCE_RANGE and scheme == 'asym'))
+                              reduce_range=(scheme == 'asym' and _reduce_range()))
 
 
 def _fake_quantize(algorithm, scheme, granularity, dtype):
@@ -237,7 +236,7 @@ def _fake_quantize(algorithm, scheme, granularity, dtype):
 
     return fake_quant.with_args(observer=observer, quant_min=qmin, quant_max=qmax,
                                 dtype=dtype, qscheme=qscheme,
-                                reduce_range=(REDUCE_RANGE and scheme == 'asym'))
+                                reduce_range=(scheme == 'asym' and _reduce_range()))
 
 
 def _propagate_qconfig(model, op_qcfgs):
@@ -431,6 +430,324 @@ def _fallback_quantizable_ops_recursively(model, prefix, fallback_ops):
                 child, op_name + '.', fallback_ops)
 
 
+def _shallow_clone(module, memo=None):
+    """Clone the module hierarchy while sharing parameters and buffers by reference.
+
+       Each submodule is copied with its own children, parameters, buffers and hooks
+       dictionaries, so qconfig propagation, observer insertion and module swapping
+       on the clone leave the original model untouched, while the weights are not
+       duplicated.
+
+    Args:
+        module (object): input module
+        memo (dict, optional): already cloned modules, keeps shared submodules shared
+
+    Returns:
+        cloned module (object)
+    """
+    if memo is None:
+        memo = {}
+    if id(module) in memo:
+        return memo[id(module)]
+    # quantized modules refuse to be pickled, copy.copy doesn't work on them
+    clone = module.__class__.__new__(module.__class__)
+    clone.__dict__.update(module.__dict__)
+    memo[id(module)] = clone
+    for attr in ('_parameters', '_buffers', '_forward_hooks', '_forward_pre_hooks',
+                 '_backward_hooks', '_state_dict_hooks', '_load_state_dict_pre_hooks'):
+        if attr in module.__dict__:
+            clone.__dict__[attr] = OrderedDict(module.__dict__[attr])
+    clone._modules = OrderedDict(
+        (name, _shallow_clone(child, memo) if child is not None else None)
+        for name, child in module._modules.items())
+    return clone
+
+
+def _find_fusible_modules(model, example_inputs):
+    """Find the chains of child modules which torch.quantization.fuse_modules can fuse:
+       Conv2d + BatchNorm2d + ReLU, Conv2d + BatchNorm2d, Conv2d + ReLU and Linear + ReLU.
+
+       The model is traced to get the data flow between child modules. A module is fused
+       with the next one only if its output is used by nothing else, and each module of
+       a chain is called once.
+
+    Args:
+        model (object): fp32 model in eval mode.
+        example_inputs (tuple): an input batch of the model.
+
+    Returns:
+        (list): list of module name lists to fuse.
+    """
+    patterns = [(torch.nn.Conv2d, torch.nn.BatchNorm2d, torch.nn.ReLU),
+                (torch.nn.Conv2d, torch.nn.BatchNorm2d),
+                (torch.nn.Conv2d, torch.nn.ReLU),
+                (torch.nn.Linear, torch.nn.ReLU)]
+    with torch.no_grad():
+        traced_model = torch.jit.trace(model, example_inputs, check_trace=False)
+    fused_groups = []
+
+    def _find(traced, module, prefix):
+        attrs = {}
+        callees = {}
+        outputs = OrderedDict()
+        call_count = {}
+        for node in traced.graph.nodes():
+            if node.kind() == 'prim::GetAttr':
+                attrs[node.output().unique()] = node.s('name')
+            elif node.kind() == 'prim::CallMethod':
+                name = attrs.get(list(node.inputs())[0].unique())
+                if name is None or node.outputsSize() != 1:
+                    continue
+                call_count[name] = call_count.get(name, 0) + 1
+                callees[node.output().unique()] = name
+                outputs[name] = node.output()
+
+        fused = set()
+        for name, output in outputs.items():
+            if call_count[name] != 1 or name in fused:
+                continue
+            chain = [name]
+            while len(chain) < 3:
+                uses = output.uses()
+                if len(uses) != 1 or uses[0].user.kind() != 'prim::CallMethod' or \
+                        uses[0].offset != 1 or uses[0].user.outputsSize() != 1:
+                    break
+                output = uses[0].user.output()
+                next_name = callees.get(output.unique())
+                if next_name is None or call_count[next_name] != 1 or next_name in fused:
+                    break
+                chain.append(next_name)
+
+            types = tuple(type(module._modules.get(op_name)) for op_name in chain)
+            for pattern in patterns:
+                if types[:len(pattern)] == pattern:
+                    fused.update(chain[:len(pattern)])
+                    fused_groups.append([prefix + op_name for op_name in chain[:len(pattern)]])
+                    break
+
+        for name, child in module.named_children():
+            if name not in fused and call_count.get(name) and len(child._modules):
+                _find(getattr(traced, name), child, prefix + name + '.')
+
+    _find(traced_model, model, '')
+    return fused_groups
+
+
+def _get_module(model, op_name):
+    """Get the submodule by its dotted name, None if it doesn't exist."""
+    module = model
+    for name in op_name.split('.'):
+        module = module._modules.get(name) if module is not None else None
+    return module
+
+
+def _set_module(model, op_name, new_module):
+    """Replace the submodule by its dotted name."""
+    parent_name, _, name = op_name.rpartition('.')
+    parent = _get_module(model, parent_name) if parent_name else model
+    parent._modules[name] = new_module
+
+
+class _TensorStatistics(object):
+    """Running statistics of the tensors flowing through one op.
+
+       Each batch is reduced to min/max, the first two moments and a fixed-bin
+       histogram, so the memory cost doesn't depend on the number of batches.
+       The histogram covers a symmetric power-of-two range which is doubled when
+       a batch goes beyond it by merging adjacent bins, the statistics of models
+       with similar ranges, e.g. fp32 and dequantized int8, stay comparable bin
+       by bin. A fixed bound aligns the histogram to the one of another tensor,
+       the values beyond it are counted in the edge bins.
+
+    Args:
+        bins (int, optional): number of histogram bins, must be a power of two.
+        moments (bool, optional): whether to accumulate the first two moments.
+        bound (float, optional): the fixed histogram range [-bound, bound], defaults
+                                 to the growing power-of-two range.
+    """
+    def __init__(self, bins=2048, moments=True, bound=None):
+        assert bins > 1 and bins & (bins - 1) == 0, "bins must be a power of two"
+        assert bound is None or bound > 0, "bound must be positive"
+        self.bins = bins
+        self.moments = moments
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.sum = 0.
+        self.sum_sq = 0.
+        self.fixed = bound is not None
+        self.bound = bound if self.fixed else 0.
+        self.hist = np.zeros(bins, dtype=np.float64)
+
+    def _expand(self, bound):
+        """Double the histogram range until it covers [-bound, bound]."""
+        new_bound = 2. ** np.ceil(np.log2(bound)) if bound > 0 else 1.
+        if self.bound == 0.:
+            self.bound = new_bound
+            return
+        while self.bound < new_bound:
+            factor = min(int(round(new_bound / self.bound)), self.bins)
+            merged = self.hist.reshape(-1, factor).sum(axis=1)
+            start = (self.bins - merged.size) // 2
+            self.hist = np.zeros(self.bins, dtype=np.float64)
+            self.hist[start:start + merged.size] = merged
+            self.bound = self.bound * factor
+
+    def update(self, tensor):
+        """Accumulate the statistics of one output tensor.
+
+        Args:
+            tensor (torch.Tensor): fp32 or quantized tensor.
+        """
+        tensor = tensor.detach()
+        if tensor.is_quantized:
+            tensor = tensor.dequantize()
+        tensor = tensor.to('cpu').float()
+        if tensor.numel() == 0:
+            return
+        t_min, t_max = tensor.min().item(), tensor.max().item()
+        self.count += tensor.numel()
+        self.min = min(self.min, t_min)
+        self.max = max(self.max, t_max)
+        if self.moments:
+            self.sum += tensor.sum(dtype=torch.float64).item()
+            self.sum_sq += (tensor * tensor).sum(dtype=torch.float64).item()
+        bound = max(abs(t_min), abs(t_max))
+        if bound > self.bound:
+            if self.fixed:
+                tensor = tensor.clamp(-self.bound, self.bound)
+            else:
+                self._expand(bound)
+        self.hist += torch.histc(tensor, self.bins, -self.bound, self.bound).numpy()
+
+    @property
+    def mean(self):
+        return self.sum / self.count
+
+    @property
+    def std(self):
+        return np.sqrt(max(self.sum_sq / self.count - self.mean ** 2, 0.))
+
+    def histogram(self):
+        """The normalized histogram over [-bound, bound]."""
+        return self.hist / max(self.count, 1)
+
+    def kl_threshold(self, quantized_type):
+        """Search the threshold of the absolute values minimizing the KL divergence.
+
+        Args:
+            quantized_type (string): 'int8' or 'uint8'.
+
+        Returns:
+            threshold (float)
+        """
+        half = self.bins // 2
+        # fold the symmetric histogram to the one of absolute values starting from 0,
+        # and trim the empty tail so the search covers the observed range only.
+        hist = self.hist[half:] + self.hist[:half][::-1]
+        hist = hist[:np.nonzero(hist)[0][-1] + 1]
+        abs_max = max(abs(self.min), abs(self.max))
+        if hist.size < 2:
+            return abs_max
+        bin_width = self.bound / half
+        hist_edges = np.arange(hist.size + 1) * bin_width
+        threshold = KL_Divergence().get_threshold(hist, hist_edges, 0., abs_max,
+                                                  num_bins=hist.size,
+                                                  quantized_type=quantized_type)
+        return min(threshold, abs_max)
+
+
+_HistogramObserver = None
+
+
+def _histogram_observer():
+    """The observer collecting histograms for KL calibration, the class is created
+       on first use to keep torch lazily imported.
+
+    Returns:
+        observer class (object)
+    """
+    global _HistogramObserver
+    if _HistogramObserver is not None:
+        return _HistogramObserver
+
+    class HistogramObserver(torch.quantization.observer._ObserverBase):
+        """Per tensor observer collecting a fixed-bin histogram of the tensor values.
+
+           Unlike torch.quantization.HistogramObserver, the histogram is only rebinned
+           when its power-of-two range has to be widened, and the threshold is searched
+           once in `calculate_qparams` by the KL divergence routine shared with the
+           other frameworks.
+
+        Args:
+            bins (int, optional): number of histogram bins, must be a power of two.
+            dtype (object, optional): quantized data type.
+            qscheme (object, optional): quantization scheme, per tensor only.
+            reduce_range (bool, optional): reduces the range of the quantized data type
+                                           by 1 bit.
+        """
+        def __init__(self, bins=4096, dtype=torch.quint8, qscheme=torch.per_tensor_affine,
+                     reduce_range=False):
+            super(HistogramObserver, self).__init__(dtype=dtype, qscheme=qscheme,
+                                                    reduce_range=reduce_range)
+            assert qscheme in (torch.per_tensor_affine, torch.per_tensor_symmetric), \
+                "KL calibration only supports per tensor quantization"
+            self.statistics = _TensorStatistics(bins, moments=False)
+
+        def forward(self, x):
+            self.statistics.update(x)
+            return x
+
+        def calculate_qparams(self):
+            if not self.statistics.count:
+                return self._calculate_qparams(torch.tensor([]), torch.tensor([]))
+            threshold = self.statistics.kl_threshold(
+                'int8' if self.dtype == torch.qint8 else 'uint8')
+            return self._calculate_qparams(
+                torch.tensor(max(self.statistics.min, -threshold)),
+                torch.tensor(min(self.statistics.max, threshold)))
+
+    _HistogramObserver = HistogramObserver
+    return _HistogramObserver
+
+
+def _observer_statistics(model):
+    """Collect the ranges observed so far by the activation observers of a model.
+
+    Args:
+        model (object): model with observers inserted.
+
+    Returns:
+        (tuple): dict of module name to its observed range, and a function returning
+                 the KL thresholds of the histogram observers, None if there is none.
+    """
+    ranges = {}
+    histograms = {}
+    for name, module in model.named_modules():
+        observer = getattr(module, 'activation_post_process', None)
+        if observer is None:
+            continue
+        if hasattr(observer, 'statistics'):
+            if observer.statistics.count:
+                ranges[name] = (observer.statistics.min, observer.statistics.max)
+                histograms[name] = observer
+            continue
+        for min_attr, max_attr in (('min_vals', 'max_vals'), ('min_val', 'max_val')):
+            min_val = getattr(observer, min_attr, None)
+            max_val = getattr(observer, max_attr, None)
+            if isinstance(min_val, torch.Tensor) and min_val.numel():
+                ranges[name] = np.concatenate([min_val.reshape(-1).cpu().numpy(),
+                                               max_val.reshape(-1).cpu().numpy()])
+                break
+
+    def thresholds():
+        return {name: observer.statistics.kl_threshold(
+                    'int8' if observer.dtype == torch.qint8 else 'uint8')
+                for name, observer in histograms.items()}
+
+    return ranges, thresholds if histograms else None
+
+
 @adaptor_registry
 class PyTorchAdaptor(Adaptor):
     """Adaptor of PyTorch framework, all PyTorch API is in this class.
@@ -474,8 +791,24 @@ class PyTorchAdaptor(Adaptor):
 
         self.approach = framework_specific_info['approach']
         self.device = framework_specific_info['device']
+        self.execution = {'mode': 'eager', 'warmup': 2, 'export': False}
+        self.execution.update(framework_specific_info.get('execution', {}))
+        # an input batch of the model, used to trace the model with TorchScript
+        self.example_inputs = None
         self.is_baseline = True
         self.tune_cfg = None
+        # quantized modules of the last trials, reused when the op config is unchanged
+        self.q_workspace = {'model': None, 'dataloader': None, 'ops': {}}
+        self.q_dataloader = framework_specific_info.get('q_dataloader', None)
+        # fp32 model with the fusible modules fused, built once for each model
+        self.fused = {'model': None, 'fused_model': None, 'fused_groups': []}
+        # the statistics of the last fp32 inspect_tensor, keyed by module name
+        self.fp32_statistics = OrderedDict()
+        # the names of the tuning ops of the last capability query
+        self.op_names = []
+        # early stop of calibration once the observed ranges converge
+        self.calib_convergence = framework_specific_info.get('calib_convergence', None)
+        self.calib_samples = None
 
         self.white_list = \
             torch.quantization.default_mappings.DEFAULT_QCONFIG_PROPAGATE_WHITE_LIST \
@@ -541,6 +874,7 @@ class PyTorchAdaptor(Adaptor):
         else:
             assert False, "Unsupport this device {}".format(self.device)
 
+    @trace.traced('adaptor.quantize')
     def quantize(self, tune_cfg, model, dataloader, q_func=None):
         """Execute the quantize process on the specified model.
 
@@ -556,7 +890,16 @@ class PyTorchAdaptor(Adaptor):
         assert isinstance(
             model, torch.nn.Module), "The model passed in is not the instance of torch.nn.Module"
 
-        q_model = copy.deepcopy(model.eval())
+        if self.approach == 'post_training_static_quant':
+            model = self._fuse(model)
+
+        # post training quantization on cpu never writes the fp32 weights, so the
+        # model hierarchy is cloned with the weights shared instead of deep copied.
+        share_weights = self.approach == 'post_training_static_quant' and self.device == 'cpu'
+        if share_weights:
+            q_model = _shallow_clone(model.eval())
+        else:
+            q_model = copy.deepcopy(model.eval())
         if self.approach == 'quant_aware_training':
             q_model.train()
         elif self.approach == 'post_training_static_quant':
@@ -572,13 +915,28 @@ class PyTorchAdaptor(Adaptor):
             logger.warn("None of the submodule got qconfig applied. Make sure you "
                         "passed correct configuration through `qconfig_dict` or "
                         "by assigning the `.qconfig` attribute directly on submodules")
+
+        reused_ops = {}
+        if share_weights:
+            reused_ops = self._reusable_quantized_ops(model, dataloader, tune_cfg, q_model)
+            # neither observed nor converted, the quantized module of last trial is put back
+            for op_name in reused_ops:
+                _get_module(q_model, op_name).qconfig = None
+
         torch.quantization.add_observer_(q_model)
 
-        if self.approach == 'post_training_static_quant':
+        self.calib_samples = 0 if self.approach == 'post_training_static_quant' else None
+        if self.approach == 'post_training_static_quant' and \
+                any(hasattr(m, 'activation_post_process') for m in q_model.modules()):
             iterations = tune_cfg.get('calib_iteration', 1)
             assert iterations >= 1
-            with torch.no_grad():
+            # sampling size is an upper bound when the convergence is monitored
+            monitor = create_calibration_monitor(self.calib_convergence)
+            batches = 0
+            with torch.no_grad(), trace.span('adaptor.calibration'):
                 for _, (input, label) in enumerate(dataloader):
+                    if self.example_inputs is None:
+                        self.example_inputs = input
                     if isinstance(input, dict):
                         if self.device == "gpu":
                             for inp in input.keys():
@@ -593,9 +951,14 @@ class PyTorchAdaptor(Adaptor):
                             input = input.to("dpcpp")
                         output = q_model(input)
 
+                    batches += 1
                     iterations -= 1
                     if iterations == 0:
                         break
+                    if monitor is not None and monitor.update(*_observer_statistics(q_model)):
+                        logger.info('Calibration converged after {} batches.'.format(batches))
+                        break
+            self.calib_samples = batches * getattr(dataloader, 'batch_size', 1)
         elif self.approach == 'quant_aware_training':
             torch.quantization.convert(q_model, self.q_mapping, inplace=True)
             if q_func is None:
@@ -604,18 +967,73 @@ class PyTorchAdaptor(Adaptor):
                 q_func(q_model)
             q_model.eval()
 
-        q_model = torch.quantization.convert(q_model, inplace=True)
+        with trace.span('adaptor.convert'):
+            q_model = torch.quantization.convert(q_model, inplace=True)
+
+        if share_weights:
+            for op_name, module in reused_ops.items():
+                _set_module(q_model, op_name, _shallow_clone(module))
+            self._update_quantized_ops(tune_cfg, op_cfgs, q_model)
 
         return q_model
 
+    def _quantized_op_key(self, tune_cfg, op):
+        """The key identifying the quantized module of an op, its observers only see
+           the fp32 outputs, so it only depends on the op config and calibration.
+        """
+        return (json.dumps(tune_cfg['op'][op], sort_keys=True),
+                tune_cfg.get('calib_iteration', 1))
+
+    def _reusable_quantized_ops(self, model, dataloader, tune_cfg, q_model):
+        """Find the ops whose config is unchanged since they were last quantized.
+
+        Args:
+            model (object): fp32 model to quantize.
+            dataloader (object): calibration dataset.
+            tune_cfg (dict): quantization config.
+            q_model (object): fp32 model clone with qconfig propagated.
+
+        Returns:
+            (dict): op name to the quantized module to reuse.
+        """
+        if self.q_workspace['model'] is not model or \
+                self.q_workspace['dataloader'] is not dataloader:
+            self.q_workspace = {'model': model, 'dataloader': dataloader, 'ops': {}}
+
+        reused_ops = {}
+        for op in tune_cfg['op']:
+            if op not in self.q_workspace['ops']:
+                continue
+            key, q_module = self.q_workspace['ops'][op]
+            module = _get_module(q_model, op[0])
+            # the module may be wrapped or replaced by fallback of other ops
+            if key == self._quantized_op_key(tune_cfg, op) and module is not None and \
+                    str(type(module)) == op[1] and getattr(module, 'qconfig', None):
+                reused_ops[op[0]] = q_module
+        return reused_ops
+
+    def _update_quantized_ops(self, tune_cfg, op_cfgs, q_model):
+        """Keep the quantized module of each int8 op for the following trials."""
+        quantized_types = tuple(set(self.q_mapping.values()))
+        for op in tune_cfg['op']:
+            if op_cfgs[op] is None:
+                continue
+            q_module = _get_module(q_model, op[0])
+            if isinstance(q_module, quantized_types):
+                self.q_workspace['ops'][op] = (self._quantized_op_key(tune_cfg, op),
+                                               _shallow_clone(q_module))
+
+    @trace.traced('adaptor.evaluate')
     def evaluate(self, model, dataloader, postprocess=None,
-                 metric=None, measurer=None, iteration=-1, tensorboard=False):
+                 metric=None, measurer=None, iteration=-1, tensorboard=False,
+                 sequential_eval=None):
         """Execute the evaluate process on the specified model.
 
         Args:
             model (object): model to run evaluation.
             dataloader (object): calibration dataset.
             q_func (object, optional): training function for quantization aware training mode.
+            sequential_eval (object, optional): check to reject the model during evaluation.
 
         Returns:
             (dict): quantized model
@@ -635,8 +1053,22 @@ class PyTorchAdaptor(Adaptor):
         if self.is_baseline:
             self.is_baseline = False
 
-        with torch.no_grad():
+        def update_metric(output, label):
+            if postprocess is not None:
+                output, label = postprocess((output, label))
+            if metric is not None:
+                metric.update(output, label)
+            if sequential_eval is not None:
+                sequential_eval.update(metric)
+
+        # the postprocess and metric don't overlap with the inference being measured
+        with torch.no_grad(), MetricPipeline(update_metric, overlap=measurer is None) as pipeline:
             for idx, (input, label) in enumerate(dataloader):
+                if idx == 0:
+                    self.example_inputs = input
+                    if self.execution['mode'] == 'torchscript' and not tensorboard:
+                        model = self._trace(model, input)
+
                 if measurer is not None:
                     measurer.start()
 
@@ -657,10 +1089,7 @@ class PyTorchAdaptor(Adaptor):
                     output = output.to("cpu")
                 if measurer is not None:
                     measurer.end()
-                if postprocess is not None:
-                    output, label = postprocess((output, label))
-                if metric is not None:
-                    metric.update(output, label)
+                pipeline.put(output, label)
                 if idx + 1 == iteration:
                     break
         acc = metric.result() if metric is not None else 0
@@ -684,6 +1113,46 @@ class PyTorchAdaptor(Adaptor):
                 break
         return acc
 
+    def _trace(self, model, example_inputs):
+        """Trace the model with TorchScript, freeze it and run warmup iterations.
+
+           The model which can't be traced, e.g. taking dict inputs, keeps running
+           in eager mode.
+
+        Args:
+            model (object): fp32 or quantized model.
+            example_inputs (object): an input batch of the model.
+
+        Returns:
+            (object): frozen TorchScript module or the eager model.
+        """
+        if isinstance(model, torch.jit.ScriptModule):
+            return model
+        if isinstance(example_inputs, dict) or self.device != 'cpu':
+            logger.warning("TorchScript execution only supports tensor inputs on cpu, "
+                           "fall back to eager mode.")
+            return model
+        if not isinstance(example_inputs, (list, tuple)):
+            example_inputs = (example_inputs, )
+        example_inputs = tuple(example_inputs)
+
+        try:
+            with torch.no_grad():
+                traced_model = torch.jit.trace(model.eval(), example_inputs,
+                                               check_trace=False)
+                if hasattr(torch.jit, 'freeze'):
+                    traced_model = torch.jit.freeze(traced_model)
+                else:
+                    traced_model = torch.jit.RecursiveScriptModule._construct(
+                        torch._C._freeze_module(traced_model._c), lambda module: None)
+                for _ in range(self.execution['warmup']):
+                    traced_model(*example_inputs)
+        except Exception as e:
+            logger.warning("Fail to trace the model with TorchScript due to {}, "
+                           "fall back to eager mode.".format(e))
+            return model
+        return traced_model
+
     def _get_quantizable_ops_recursively(self, model, prefix, quantizable_ops):
         """This is a helper function for `query_fw_capability`,
            and it will get all quantizable ops from model.
@@ -705,16 +1174,53 @@ class PyTorchAdaptor(Adaptor):
                     child, op_name + '.', quantizable_ops)
 
     def query_fused_patterns(self, model):
-        """This is a helper function.
+        """Find the fusible Conv2d/Linear + BatchNorm2d + ReLU module chains by tracing
+           the model with an input batch of the calibration dataloader.
 
         Args:
             model (object): input model
 
         Returns:
-            None
+            (list): fused module names, e.g. [['conv1', 'bn1', 'relu'], ['fc', 'relu1']]
         """
-        pass
+        example_inputs = self.example_inputs
+        if example_inputs is None and self.q_dataloader is not None:
+            for example_inputs, _ in self.q_dataloader:
+                break
+        if example_inputs is None or isinstance(example_inputs, dict):
+            logger.debug("Skip module fusion as the model can't be traced.")
+            return []
+        if not isinstance(example_inputs, (list, tuple)):
+            example_inputs = (example_inputs, )
+
+        try:
+            return _find_fusible_modules(model.eval(), tuple(example_inputs))
+        except Exception as e:
+            logger.warning("Fail to find fusible modules due to {}.".format(e))
+            return []
+
+    def _fuse(self, model):
+        """Fuse the fusible modules of the fp32 model, the fused model is built once
+           and shares the unfused weights with the fp32 model.
 
+        Args:
+            model (object): fp32 model
+
+        Returns:
+            (object): fused model
+        """
+        if self.fused['model'] is not model:
+            fused_groups = self.query_fused_patterns(model)
+            fused_model = model
+            if fused_groups:
+                fused_model = _shallow_clone(model.eval())
+                torch.quantization.fuse_modules(fused_model, fused_groups, inplace=True)
+                logger.debug("Fuse modules {}.".format(fused_groups))
+            self.fused = {'model': model, 'fused_model': fused_model,
+                          'fused_groups': fused_groups}
+        return self.fused['fused_model']
+
+    @trace.traced('adaptor.query_fw_capability')
     def query_fw_capability(self, model):
         """This is a helper function to get all quantizable ops from model.
 
@@ -724,8 +1230,12 @@ class PyTorchAdaptor(Adaptor):
         Returns:
             q_capability (dictionary): tuning capability for each op from model.
         """
+        if self.approach == 'post_training_static_quant':
+            # each fused module chain is tuned as a single op
+            model = self._fuse(model)
         quantizable_ops = []
         self._get_quantizable_ops_recursively(model, '', quantizable_ops)
+        self.op_names = [op_name for op_name, _ in quantizable_ops]
 
         q_capability = {}
         q_capability['modelwise'] = self.capability
@@ -736,8 +1246,184 @@ class PyTorchAdaptor(Adaptor):
 
         return q_capability
 
+    def _profiled_module(self, name, fused_ops):
+        """The tuning op a leaf module belongs to, None if it belongs to none. The modules
+           added by the fallback, like fc.quant and fc.dequant, belong to their parent op.
+        """
+        op_names = set(self.op_names)
+        while name:
+            if name in op_names:
+                return name
+            if name in fused_ops:
+                return fused_ops[name]
+            name = name.rpartition('.')[0]
+        return None
+
+    @trace.traced('adaptor.profile')
+    def profile(self, model, dataloader, iteration=-1):
+        """Measure the latency of each op with the autograd profiler, the forward of each
+           leaf module being recorded as a function named after the module.
+
+        Args:
+            model (object): The fp32 or quantized model.
+            dataloader (object): generate the data and labels.
+            iteration (int, optional): The number of batches to profile, -1 for all.
+
+        Returns:
+            OpProfile: the latency of each tuning op, the modules fused into it, and its
+                       Quantize and DeQuantize modules being attributed to it.
+        """
+        assert isinstance(
+            model, torch.nn.Module), "The model passed in is not the instance of torch.nn.Module"
+        model.eval()
+        # the fused modules are attributed to the first module of their group
+        fused_ops = {name: group[0] for group in self.fused['fused_groups'] for name in group}
+        boundary_types = (torch.quantization.QuantStub, torch.quantization.DeQuantStub,
+                          torch.nn.quantized.Quantize, torch.nn.quantized.DeQuantize)
+
+        # the record function name of each leaf module and the ones being recorded
+        records = {}
+        modules = {}
+        handles = []
+
+        def _enter(module, input):
+            record = torch.autograd.profiler.record_function(records[module][0])
+            record.__enter__()
+            records[module][1].append(record)
+
+        def _exit(module, input, output):
+            records[module][1].pop().__exit__(None, None, None)
+
+        for name, module in model.named_modules():
+            if name and len(module._modules) == 0:
+                modules['module::' + name] = (name, isinstance(module, boundary_types))
+                records[module] = ('module::' + name, [])
+                handles.append(module.register_forward_pre_hook(_enter))
+                handles.append(module.register_forward_hook(_exit))
+
+        def _forward(input):
+            if isinstance(input, dict):
+                return model(**input)
+            elif isinstance(input, list) or isinstance(input, tuple):
+                return model(*input)
+            return model(input)
+
+        profile = OpProfile()
+        try:
+            with torch.no_grad():
+                for idx, (input, _) in enumerate(dataloader):
+                    if idx == 0:
+                        # the first forward allocates the buffers, it isn't profiled
+                        _forward(input)
+                    with torch.autograd.profiler.profile() as prof:
+                        _forward(input)
+                    for event in prof.function_events:
+                        if event.name in modules:
+                            name, boundary = modules[event.name]
+                            op = self._profiled_module(name, fused_ops)
+                            profile.add(op or name, event.cpu_interval.elapsed_us() / 1e6,
+                                        boundary=boundary, attributed=op is not None)
+                    profile.iterations += 1
+                    if idx + 1 == iteration:
+                        break
+        finally:
+            for handle in handles:
+                handle.remove()
+        return profile
+
+    def query_op_weights(self, model):
+        """The number of weight elements of each tuning op, the parameters of its module
+           and of the modules fused into it.
+
+        Args:
+            model (object): The fp32 model of the capability query.
+
+        Returns:
+            OrderedDict: op name -> number of weight elements.
+        """
+        fused_ops = {name: group[0] for group in self.fused['fused_groups'] for name in group}
+        op_weights = OrderedDict((name, 0) for name in self.op_names)
+        for name, module in model.named_modules():
+            op = name if name in op_weights else fused_ops.get(name)
+            if op in op_weights:
+                op_weights[op] += sum(param.numel() for param in module.parameters())
+        return op_weights
+
     def inspect_tensor(self, model, dataloader, op_list=[], iteration_list=[]):
-        pass
+        """Collect the specified ops' output statistics on specified iterations.
+
+           Forward hooks reduce each output to running statistics as batches stream
+           through, the raw tensors are never kept. The full statistics (count, min,
+           max, mean, std and histogram) of the last call are kept in
+           `self.inspected_statistics`. The histograms of a quantized model cover the
+           ranges of the last fp32 inspection, so they are comparable bin by bin.
+
+        Args:
+            model (object): fp32 or quantized model.
+            dataloader (object): generate the data and labels.
+            op_list (list, optional): the specified op names or (name, type) tuples.
+                                      Defaults to [], all quantizable ops.
+            iteration_list (list, optional): the specified iterations, starting from 1.
+                                             Defaults to [], all iterations.
+
+        Returns:
+            [dict]: the key is op from op_list while the value is the normalized output
+                    histogram in ndarray.
+        """
+        assert isinstance(
+            model, torch.nn.Module), "The model passed in is not the instance of torch.nn.Module"
+        if self.fused['model'] is model:
+            # fp32 outputs of the fused ops to compare with the quantized ones
+            model = self.fused['fused_model']
+        if not op_list:
+            op_list = []
+            self._get_quantizable_ops_recursively(model, '', op_list)
+        ops = OrderedDict((op[0] if isinstance(op, tuple) else op, op) for op in op_list)
+
+        # the histograms of a quantized model use the ranges of the fp32 ones
+        quantized = any('.quantized' in type(module).__module__ for module in model.modules())
+        fp32_bounds = {name: stats.bound for name, stats in self.fp32_statistics.items()} \
+            if quantized else {}
+        statistics = OrderedDict()
+
+        def _statistics_hook(name):
+            def hook(module, input, output):
+                if isinstance(output, (list, tuple)):
+                    output = output[0]
+                statistics[name].update(output)
+            return hook
+
+        handles = []
+        for name, module in model.named_modules():
+            if name in ops:
+                statistics[name] = _TensorStatistics(bound=fp32_bounds.get(name) or None)
+                handles.append(module.register_forward_hook(_statistics_hook(name)))
+
+        last_iteration = max(iteration_list) if iteration_list else -1
+        model.eval()
+        try:
+            with torch.no_grad():
+                for idx, (input, label) in enumerate(dataloader):
+                    if iteration_list and idx + 1 not in iteration_list:
+                        continue
+                    if isinstance(input, dict):
+                        model(**input)
+                    elif isinstance(input, list) or isinstance(input, tuple):
+                        model(*input)
+                    else:
+                        model(input)
+                    if idx + 1 == last_iteration:
+                        break
+        finally:
+            for handle in handles:
+                handle.remove()
+
+        if not quantized:
+            self.fp32_statistics = statistics
+        self.inspected_statistics = OrderedDict(
+            (ops[name], stats) for name, stats in statistics.items() if stats.count)
+        return OrderedDict(
+            (op, stats.histogram()) for op, stats in self.inspected_statistics.items())
 
     def _pre_eval_hook(self, model):
         """The function is used to do some preprocession before evaluation phase.
@@ -1196,10 +1882,20 @@ class PyTorchAdaptor(Adaptor):
 
         path = os.path.expanduser(path)
         os.makedirs(path, exist_ok=True)
+        # the weights are the ones of the fused modules, load() fuses them again
+        tune_cfg = dict(self.tune_cfg, fused_groups=self.fused['fused_groups'])
         try:
             with open(os.path.join(path, "best_configure.yaml"), 'w') as f:
-                yaml.dump(self.tune_cfg, f, default_flow_style=False)
+                yaml.dump(tune_cfg, f, default_flow_style=False)
         except IOError as e:
             logger.error("Unable to save configure file. %s" % e)
 
         torch.save(model.state_dict(), os.path.join(path, "best_model_weights.pt"))
+
+        if self.execution['export']:
+            traced_model = self._trace(model, self.example_inputs) \
+                if self.example_inputs is not None else model
+            if isinstance(traced_model, torch.jit.ScriptModule):
+                torch.jit.save(traced_model, os.path.join(path, "best_model.pt"))
+            else:
+                logger.warning("Unable to export the TorchScript model.")
@@ -18,11 +18,14 @@
 import os
 import subprocess
 import copy
+import itertools
 import numpy as np
 from collections import OrderedDict
 from .adaptor import adaptor_registry, Adaptor
 from ..utils.utility import LazyImport, CpuInfo
-from ..utils import logger
+from ..utils import logger, trace
+from ..utils.pipeline import MetricPipeline
+from ..utils.op_profile import OpProfile
 tensorflow = LazyImport('tensorflow')
 
 
@@ -51,6 +54,17 @@ class TensorFlowAdaptor(Adaptor):
         self.bf16_ops = []
         self.fp32_ops = []
         self.dump_times = 0   # for tensorboard
+        # early stop of calibration once the logged ranges converge
+        self.quantize_config['calib_convergence'] = \
+            self.framework_specific_info.get('calib_convergence', None)
+        self.calib_samples = None
+        # feed_dict or input_map, how the evaluation batches get into the model
+        self.input_pipeline = (self.framework_specific_info.get('execution') or {}).get(
+            'input_pipeline', 'feed_dict')
+        # the evaluation dataset spliced last and its serialized graph
+        self._serialized_dataset = (None, None)
+        # the node names of the fused pattern of each tuning op -> the op name
+        self.op_pattern_nodes = {}
 
     def get_tensor_by_name_with_import(self, graph, name, try_cnt=3):
         """Get the tensor by name considering the 'import' scope when model
@@ -105,8 +119,10 @@ class TensorFlowAdaptor(Adaptor):
         max_value = 255 if scale_info[0].find("Relu") != -1 else 127
         return np.array([float(i / max_value) for i in new_data]).reshape(original_shape)
 
+    @trace.traced('adaptor.evaluate')
     def evaluate(self, input_graph, dataloader, postprocess=None,
-                 metric=None, measurer=None, iteration=-1, tensorboard=False):
+                 metric=None, measurer=None, iteration=-1, tensorboard=False,
+                 sequential_eval=None):
         """Evaluate the model for specified metric on validation dataset.
 
         Args:
@@ -118,6 +134,7 @@ class TensorFlowAdaptor(Adaptor):
             measurer (object, optional): for precise benchmark measurement.
             iteration(int, optional): control steps of mini-batch
             tensorboard (boolean, optional): for tensorboard inspect tensor.
+            sequential_eval (object, optional): check to reject the model during evaluation.
 
         Returns:
             [float]: evaluation result, the larger is better.
@@ -126,12 +143,18 @@ class TensorFlowAdaptor(Adaptor):
         import tensorflow as tf
         from .tf_utils.graph_rewriter.generic.pre_optimize import PreOptimization
 
-        graph = tf.Graph()
         graph_def = PreOptimization(input_graph, self.inputs, \
                                     self.outputs).get_optimized_graphdef()
         assert graph_def
-        with graph.as_default():
-            tf.import_graph_def(graph_def, name='')
+        spliced = None
+        if self.input_pipeline == 'input_map' and not tensorboard:
+            spliced = self._splice_input_pipeline(graph_def, dataloader)
+        if spliced is None:
+            graph = tf.Graph()
+            with graph.as_default():
+                tf.import_graph_def(graph_def, name='')
+        else:
+            graph, iterator_initializer, initializer_feed, label_tensors = spliced
 
         outputs = copy.deepcopy(self.outputs)
         if tensorboard:
@@ -196,36 +219,68 @@ class TensorFlowAdaptor(Adaptor):
         config.inter_op_parallelism_threads = 1
         sess_graph = tf.compat.v1.Session(graph=graph, config=config)
 
-        logger.info("Start to evaluate model via tensorflow...")
-        for idx, (inputs, labels) in enumerate(dataloader):
-            # dataloader should keep the order and len of inputs same with input_tensor
-            if len(input_tensor) == 1:
-                feed_dict = {input_tensor[0]: inputs} # get raw tensor using index [0]
-            else:
-                assert len(input_tensor) == len(inputs), \
-                    'inputs len must equal with input_tensor'
-                feed_dict = dict(zip(input_tensor, inputs))
-
-            if measurer is not None:
-                measurer.start()
-                predictions = sess_graph.run(output_tensor, feed_dict) 
-                measurer.end()
-            else:
-                predictions = sess_graph.run(output_tensor, feed_dict)
-            # Inspect node output, just get 1st iteration output tensors for now
-            if idx == 0 and tensorboard:
-                for index, node_name in enumerate(outputs):
-                    tensor = predictions[index]
-                    if node_name in int8_inspect_node_name:
-                        tensor = self._dequantize(predictions[index], q_node_scale[node_name])
-                    self.log_histogram(writer, node_name + output_postfix, tensor, idx)
-                writer.close()
+        def update_metric(predictions, labels):
             if postprocess is not None:
                 predictions, labels = postprocess((predictions, labels))
             if metric is not None:
                 metric.update(predictions[0], labels)
-            if idx + 1 == iteration:
-                break
+            if sequential_eval is not None:
+                sequential_eval.update(metric)
+
+        def feed_batches():
+            for inputs, labels in dataloader:
+                # dataloader should keep the order and len of inputs same with input_tensor
+                if len(input_tensor) == 1:
+                    feed_dict = {input_tensor[0]: inputs} # get raw tensor using index [0]
+                else:
+                    assert len(input_tensor) == len(inputs), \
+                        'inputs len must equal with input_tensor'
+                    feed_dict = dict(zip(input_tensor, inputs))
+                yield feed_dict, labels
+
+        if spliced is None:
+            batches = feed_batches()
+            fetches = output_tensor
+        else:
+            # the iterator yields the batches in the session until it is exhausted
+            sess_graph.run(iterator_initializer, initializer_feed)
+            batches = itertools.repeat((None, None))
+            fetches = [output_tensor, label_tensors]
+
+        # the postprocess and metric don't overlap with the inference being measured
+        pipeline = MetricPipeline(update_metric, overlap=measurer is None)
+        logger.info("Start to evaluate model via tensorflow...")
+        try:
+            with pipeline:
+                for idx, (feed_dict, labels) in enumerate(batches):
+                    try:
+                        if measurer is not None:
+                            measurer.start()
+                            predictions = sess_graph.run(fetches, feed_dict)
+                            measurer.end()
+                        else:
+                            predictions = sess_graph.run(fetches, feed_dict)
+                    except tf.errors.OutOfRangeError:
+                        if spliced is None:
+                            raise
+                        break
+                    if spliced is not None:
+                        predictions, labels = predictions
+                    # Inspect node output, just get 1st iteration output tensors for now
+                    if idx == 0 and tensorboard:
+                        for index, node_name in enumerate(outputs):
+                            tensor = predictions[index]
+                            if node_name in int8_inspect_node_name:
+                                tensor = self._dequantize(predictions[index],
+                                                          q_node_scale[node_name])
+                            self.log_histogram(writer, node_name + output_postfix, tensor, idx)
+                        writer.close()
+                    pipeline.put(predictions, labels)
+                    if idx + 1 == iteration:
+                        break
+        except Exception:
+            sess_graph.close()
+            raise
         acc = metric.result() if metric is not None else 0
         if tensorboard:
             new_dir = temp_dir + "_acc_" + str(acc)
@@ -238,6 +293,72 @@ class TensorFlowAdaptor(Adaptor):
         sess_graph.close()
         return acc
 
+    def _splice_input_pipeline(self, graph_def, dataloader):
+        """Import the model into a graph that reads its inputs from the tf.data pipeline
+           of the dataloader. The input_map of the import replaces the input placeholders
+           by the iterator outputs, so the batches are prefetched in the session instead of
+           being copied to numpy and fed back with feed_dict.
+
+        Args:
+            graph_def (tf.compat.v1.GraphDef): The model to evaluate.
+            dataloader (object): The evaluation dataloader.
+
+        Returns:
+            tuple: The graph, the iterator initializer and its feed_dict, and the label
+                   tensors of a batch. None if the dataloader isn't a tf.data pipeline of
+                   (input, label) elements that can be spliced into the model.
+        """
+        import tensorflow as tf
+        from tensorflow.python.data.ops import dataset_ops
+        from tensorflow.python.ops import gen_experimental_dataset_ops
+        from ..data.dataloaders.tensorflow_dataloader import TFDataDataLoader
+
+        loader = getattr(dataloader, 'dataloader', None)
+        if not isinstance(loader, TFDataDataLoader):
+            logger.warning('The evaluation dataloader is not a tf.data pipeline, '
+                           'evaluate with feed_dict.')
+            return None
+        try:
+            structure = dataset_ops.get_structure(loader.dataset)
+            assert isinstance(structure, tuple) and len(structure) == 2, \
+                'the dataset elements should be (input, label)'
+            # the dataset is rebuilt from its graph, it may live in another graph or eagerly
+            dataset, serialized = self._serialized_dataset
+            if dataset is not loader.dataset:
+                variant = loader.dataset._variant_tensor
+                if hasattr(variant, 'numpy'):
+                    serialized = loader.dataset._as_serialized_graph().numpy()
+                else:
+                    with variant.graph.as_default(), \
+                            tf.compat.v1.Session(graph=variant.graph) as sess:
+                        serialized = sess.run(loader.dataset._as_serialized_graph())
+                self._serialized_dataset = (loader.dataset, serialized)
+
+            graph = tf.Graph()
+            with graph.as_default():
+                with tf.compat.v1.name_scope('lpot_input_pipeline'):
+                    # fed to the initializer, grappler can't fold a constant dataset graph
+                    serialized_dataset = tf.compat.v1.placeholder(tf.string, ())
+                    dataset = dataset_ops._VariantDataset(
+                        gen_experimental_dataset_ops.dataset_from_graph(serialized_dataset),
+                        structure)
+                    dataset = dataset.batch(loader.batch_size, loader.last_batch != 'rollover')
+                    dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
+                    iterator = tf.compat.v1.data.make_initializable_iterator(dataset)
+                    inputs, labels = iterator.get_next()
+                if isinstance(inputs, dict):
+                    inputs = [inputs[name] for name in self.inputs]
+                elif len(self.inputs) == 1:
+                    inputs = [inputs]
+                assert len(inputs) == len(self.inputs), 'inputs len must equal with input_tensor'
+                tf.import_graph_def(graph_def, name='', input_map={
+                    name + ':0': tensor for name, tensor in zip(self.inputs, inputs)})
+            return graph, iterator.initializer, {serialized_dataset: serialized}, labels
+        except Exception as e:
+            logger.warning('The tf.data pipeline can not be spliced into the model, '
+                           'evaluate with feed_dict: {}'.format(e))
+            return None
+
     def tuning_cfg_to_fw(self, tuning_cfg):
         """Parse the lpot wrapped configuration to Tensorflow.
 
@@ -308,6 +429,7 @@ class TensorFlowAdaptor(Adaptor):
                   "|")
         print('|', '*' * log_length, "|")
 
+    @trace.traced('adaptor.quantize')
     def quantize(self, tune_cfg, model, data_loader, q_func=None):
         """Execute the quantize process on the specified model.
 
@@ -336,7 +458,9 @@ class TensorFlowAdaptor(Adaptor):
                                    fp32_ops=self.fp32_ops,
                                    bf16_ops=self.bf16_ops,
                                    data_loader=data_loader)
-        return converter.convert()
+        converted_model = converter.convert()
+        self.calib_samples = converter.calib_samples or None
+        return converted_model
 
     def _query_quantizable_ops(self, matched_nodes, activation_dtype, weight_dtype):
         """Collect the op-wise configuration for quantization.
@@ -385,6 +509,7 @@ class TensorFlowAdaptor(Adaptor):
         }
 
         self.quantizable_op_details = OrderedDict()
+        self.op_pattern_nodes = {}
 
         self._init_op_stat = {i: [] for i in tf_quantizable_op_type}
         for details in matched_nodes:
@@ -398,6 +523,8 @@ class TensorFlowAdaptor(Adaptor):
             }
             if node_op in tf_quantizable_op_type and node_name not in self.exclude_node_names:
                 self._init_op_stat[node_op].append(node_name)
+                for pattern_node_name in details[:-1]:
+                    self.op_pattern_nodes[pattern_node_name] = node_name
                 if self.unify_op_type_mapping[node_op].find("conv2d") != -1:
                     conv2d_int8_config = copy.deepcopy(conv_config)
                     conv2d_int8_config['pattern'] = pattern_info
@@ -423,6 +550,21 @@ class TensorFlowAdaptor(Adaptor):
                 self.quantize_config['op_wise_config'][node_name] = (False, "minmax", False)
         return self.quantizable_op_details
 
+    def _add_fused_activations(self, matched_nodes):
+        """Add the Relu following the pattern of a tuning op to its pattern nodes, the
+           graph converter fuses it into the quantized op.
+        """
+        consumers = {}
+        for node in self.pre_optimized_graph.node:
+            for input_name in node.input:
+                consumers.setdefault(input_name.lstrip('^').split(':')[0], []).append(node)
+        for details in matched_nodes:
+            if details[0] not in self.op_pattern_nodes:
+                continue
+            outputs = consumers.get(details[-2], [])
+            if len(outputs) == 1 and outputs[0].op in ('Relu', 'Relu6'):
+                self.op_pattern_nodes[outputs[0].name] = details[0]
+
     def _support_bf16(self):
         """Query Software and Hardware BF16 support cabability
 
@@ -442,6 +584,7 @@ class TensorFlowAdaptor(Adaptor):
             return True
         return False
 
+    @trace.traced('adaptor.query_fw_capability')
     def query_fw_capability(self, model):
         """Collect the model-wise and op-wise configuration for quantization.
 
@@ -486,12 +629,104 @@ class TensorFlowAdaptor(Adaptor):
             }
         }
         self._query_quantizable_ops(matched_nodes, activation_dtype, weight_dtype)
+        self._add_fused_activations(matched_nodes)
         capability['opwise'] = self.quantizable_op_details
         logger.debug('Dump framework quantization capability:')
         logger.debug(capability)
 
         return capability
 
+    def _profiled_node(self, node_name, node_op):
+        """The tuning op a profiled node belongs to, None if it belongs to none, and
+           whether it is a quantization node inserted around the op.
+        """
+        # the nodes inserted by the quantization are named <op>_eightbit_<suffix>
+        op = self.op_pattern_nodes.get(node_name.split('_eightbit_')[0])
+        boundary = node_op in ('QuantizeV2', 'Dequantize', 'Requantize',
+                               'RequantizationRange') or \
+            ('_eightbit_' in node_name and not node_op.startswith('Quantized'))
+        return op, boundary
+
+    @trace.traced('adaptor.profile')
+    def profile(self, model, dataloader, iteration=-1):
+        """Measure the latency of each op from the step stats of traced session runs.
+
+        Args:
+            model ([Graph, GraphDef or Path String]): The fp32 or quantized model.
+            dataloader (generator): generate the data and labels.
+            iteration (int, optional): The number of batches to profile, -1 for all.
+
+        Returns:
+            OpProfile: the latency of each tuning op, the nodes of its fused pattern and
+                       its quantization nodes being attributed to it.
+        """
+        import tensorflow as tf
+        from .tf_utils.graph_rewriter.generic.pre_optimize import PreOptimization
+
+        graph_def = PreOptimization(model, self.inputs, self.outputs).get_optimized_graphdef()
+        node_ops = {node.name: node.op for node in graph_def.node}
+        graph = tf.Graph()
+        with graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        input_tensor = [
+            self.get_tensor_by_name_with_import(graph, x + ":0") for x in self.inputs
+        ]
+        output_tensor = [
+            self.get_tensor_by_name_with_import(graph, x + ":0") for x in self.outputs
+        ]
+
+        config = tf.compat.v1.ConfigProto()
+        config.use_per_session_threads = 1
+        config.inter_op_parallelism_threads = 1
+        options = tf.compat.v1.RunOptions(trace_level=tf.compat.v1.RunOptions.FULL_TRACE)
+        profile = OpProfile()
+        with tf.compat.v1.Session(graph=graph, config=config) as sess:
+            for idx, (inputs, _) in enumerate(dataloader):
+                if len(input_tensor) == 1:
+                    feed_dict = {input_tensor[0]: inputs}
+                else:
+                    feed_dict = dict(zip(input_tensor, inputs))
+                if idx == 0:
+                    # the first run initializes the kernels, it isn't profiled
+                    sess.run(output_tensor, feed_dict)
+                run_metadata = tf.compat.v1.RunMetadata()
+                sess.run(output_tensor, feed_dict, options=options, run_metadata=run_metadata)
+                for device_stats in run_metadata.step_stats.dev_stats:
+                    # the host tracer events duplicate the kernel ones
+                    if device_stats.device.endswith('/host:CPU'):
+                        continue
+                    for node_stats in device_stats.node_stats:
+                        op, boundary = self._profiled_node(
+                            node_stats.node_name, node_ops.get(node_stats.node_name, ''))
+                        profile.add(op or node_stats.node_name,
+                                    node_stats.all_end_rel_micros / 1e6,
+                                    boundary=boundary, attributed=op is not None)
+                profile.iterations += 1
+                if idx + 1 == iteration:
+                    break
+        return profile
+
+    def query_op_weights(self, model):
+        """The number of weight elements of each tuning op, the constant inputs of the
+           nodes of its pattern in the pre-optimized graph.
+
+        Args:
+            model (tf.compat.v1.GraphDef): The fp32 model of the capability query.
+
+        Returns:
+            OrderedDict: op name -> number of weight elements.
+        """
+        nodes = {node.name: node for node in self.pre_optimized_graph.node}
+        op_weights = OrderedDict()
+        for node_name, op in self.op_pattern_nodes.items():
+            op_weights.setdefault(op, 0)
+            for input_name in nodes[node_name].input:
+                input_node = nodes.get(input_name.lstrip('^').split(':')[0])
+                if input_node is not None and input_node.op == 'Const':
+                    shape = input_node.attr['value'].tensor.tensor_shape
+                    op_weights[op] += int(np.prod([dim.size for dim in shape.dim]))
+        return op_weights
+
     def inspect_tensor(self, model, dataloader, op_list=[], iteration_list=[]):
         """Collect the specified tensor's output on specified iteration.
 
@@ -33,7 +33,7 @@ from tensorflow.python.framework.ops import Graph
 # from tensorflow.python.tools.optimize_for_inference_lib import optimize_for_inference
 from .transform_graph.insert_logging import InsertLogging
 from .transform_graph.freeze_max_min import get_all_fp32_data, get_tensor_histogram
-from .transform_graph.freeze_max_min import combine_histogram
+from .transform_graph.freeze_max_min import combine_histogram, get_optimal_scaling_factor
 from .transform_graph.rerange_quantized_concat import RerangeQuantizedConcat
 from .util import write_graph
 from .util import get_graph_def
@@ -56,6 +56,8 @@ from .graph_rewriter.int8.fuse_matmul_requantize import FuseMatMulRequantizeTran
 from .graph_rewriter.int8.insert_logging import InsertLoggingTransformer
 from .graph_rewriter.int8.scale_propagation import ScaleProPagationTransformer
 from .graph_rewriter.bf16.bf16_convert import BF16Convert
+from ...utils import trace
+from ...utils.calibration import create_calibration_monitor
 
 TF_SUPPORTED_MAX_VERSION = '2.3.0'
 TF_SUPPORTED_MIN_VERSION = '1.14.0'
@@ -171,6 +173,8 @@ class GraphConverter:
 
         # quantize specific config
         self.calib_iteration = qt_config['calib_iteration']
+        self.calib_convergence = qt_config.get('calib_convergence', None)
+        self.calib_samples = 0
         self.op_wise_config = qt_config['op_wise_config']
         self.device = qt_config['device'] if 'device' in qt_config else 'cpu'
         self.fp32_ops = fp32_ops
@@ -189,11 +193,44 @@ class GraphConverter:
             k for k in self.op_wise_config if self.op_wise_config[k][1] == 'kl'
         ]
 
-    def _inference(self, input_graph):
+    def _calibration_ranges(self, graph, enable_kl_algo):
+        """Tensors of the ranges collected by the logged graph, evaluated at every batch
+           to detect the convergence of calibration.
+
+        Args:
+            graph (tf.Graph): the logged graph.
+            enable_kl_algo (bool): whether it is the fp32 graph logging the kl tensors.
+
+        Returns:
+            dict: node name to the list of its range tensors and the percentiles of the
+                  values over batches that the logs are reduced to.
+        """
+        fetches = {}
+        for op in graph.get_operations():
+            if enable_kl_algo:
+                if op.type == 'Print':
+                    tensor = op.inputs[0]
+                    fetches[op.name] = ([tf.reduce_min(tensor), tf.reduce_max(tensor)],
+                                        [0., 1.])
+            elif op.type in ('RequantizationRange', 'RequantizationRangePerChannel'):
+                fetches[op.name] = (op.outputs[:2], [0.05, 0.95])
+            elif op.type in ('Min', 'Max') and 'eightbit' in op.name:
+                fetches[op.name] = ([op.outputs[0]], [0.95])
+        return fetches
+
+    def _inference(self, input_graph, enable_kl_algo=False, monitor=None):
         """Run the calibration on the input graph
 
         Args:
             input_graph (tf.compat.v1.GraphDef): input graph
+            enable_kl_algo (bool, optional): whether it is the fp32 graph logging the
+                                             tensors of kl calibration.
+            monitor (CalibrationMonitor, optional): stop once the logged ranges and the kl
+                                                    thresholds converge, the calibration
+                                                    iteration is then an upper bound.
+
+        Returns:
+            int: the number of batches run.
         """
         import tensorflow as tf
 
@@ -206,12 +243,30 @@ class GraphConverter:
         input_tensor = [graph.get_tensor_by_name(x + ":0") for x in self.inputs]
         output_tensor = [graph.get_tensor_by_name(x + ":0") for x in self.outputs]
 
+        range_fetches = {}
+        if monitor is not None:
+            with graph.as_default():
+                range_fetches = self._calibration_ranges(graph, enable_kl_algo)
+        range_history = {name: [[] for _ in tensors]
+                         for name, (tensors, _) in range_fetches.items()}
+        # the histograms of the logged kl tensors, to check the kl thresholds converge
+        kl_fetches = {}
+        if monitor is not None and enable_kl_algo:
+            kl_fetches = {op.name: op.inputs[0] for op in graph.get_operations()
+                          if op.type == 'Print'}
+        histograms = {}
+
+        def _kl_thresholds():
+            return {name: get_optimal_scaling_factor(histogram)
+                    for name, histogram in histograms.items()}
+
         config = tf.compat.v1.ConfigProto()
         # config.use_per_session_threads = 1
         config.inter_op_parallelism_threads = 1
         sess_graph = tf.compat.v1.Session(graph=graph, config=config)
 
         self.logger.info("Sampling data...")
+        batches = 0
         for idx, (inputs, labels) in enumerate(self.data_loader):
             if len(input_tensor) == 1:
                 feed_dict = {input_tensor[0]: inputs} # get raw tensor using index [0]
@@ -220,11 +275,32 @@ class GraphConverter:
                     'inputs len must equal with input_tensor'
                 feed_dict = dict(zip(input_tensor, inputs))
 
-            _ = sess_graph.run(output_tensor, feed_dict)
+            _, range_values, kl_values = sess_graph.run(
+                [output_tensor, {name: tensors for name, (tensors, _) in range_fetches.items()},
+                 kl_fetches],
+                feed_dict)
+            batches += 1
             if idx + 1 == self.calib_iteration: 
                 break
+            if monitor is not None:
+                ranges = {}
+                for name, values in range_values.items():
+                    percentiles = range_fetches[name][1]
+                    for history, value in zip(range_history[name], values):
+                        history.append(float(np.max(value)))
+                    # reduced over the batches like the logged values are frozen
+                    ranges[name] = [sorted(history)[min(int(round(len(history) * q)),
+                                                        len(history) - 1)]
+                                    for history, q in zip(range_history[name], percentiles)]
+                for name, value in kl_values.items():
+                    histograms[name] = combine_histogram(histograms[name], value) \
+                        if name in histograms else get_tensor_histogram(value)
+                if monitor.update(ranges, _kl_thresholds if histograms else None):
+                    self.logger.info("Calibration converged after {} batches.".format(batches))
+                    break
 
         sess_graph.close()
+        return batches
 
     def _check_tf_version(self):
         is_supported_version = False
@@ -295,6 +371,7 @@ class GraphConverter:
         else:
             return self.dump_tensor(op_list, op_iteration_list)
 
+    @trace.traced('graph_converter.convert')
     def convert(self):
         """Do convert, including:
             1) optimize fp32_frozen_graph,
@@ -526,6 +603,7 @@ class GraphConverter:
                 self._post_clean()
             return graph
 
+    @trace.traced('graph_converter.bf16_convert')
     def bf16_convert(self):
         """Convert fp32 nodes in bf16_node to bf16 dtype based on
            FP32 + INT8 mixed precision graph.
@@ -544,6 +622,7 @@ class GraphConverter:
                 write_graph(self._tmp_graph_def, self._bf16_mixed_precision_graph)
             return graph
 
+    @trace.traced('graph_converter.optimize_fp32_graph')
     def _optimize_frozen_fp32_graph(self):
         """Optimize fp32 frozen graph."""
         self._tmp_graph_def = RemoveTrainingNodesOptimizer(
@@ -564,6 +643,7 @@ class GraphConverter:
         self._fp32_origin_graph = self._tmp_graph_def
         self._exclude_node_names = exclude_node_names
 
+    @trace.traced('graph_converter.quantize_graph')
     def _quantize_graph(self):
         """quantize graph."""
 
@@ -581,6 +661,7 @@ class GraphConverter:
         if self.debug:
             write_graph(self._tmp_graph_def, self._int8_dynamic_range_graph)
 
+    @trace.traced('graph_converter.insert_logging')
     def _insert_logging(self):
         int8_dynamic_range_graph_def = graph_pb2.GraphDef()
         int8_dynamic_range_graph_def.CopyFrom(self._tmp_graph_def)
@@ -612,9 +693,13 @@ class GraphConverter:
         else:
             self.logger.warning("No quantizable op, will return FP32 graph!")
 
+    @trace.traced('graph_converter.calibration')
     def _generate_calibration_data(self, graph, output_data, enable_kl_algo=False):
         with OutputGrabber(sys.stderr, True) as out:
-            self._inference(graph)
+            batches = self._inference(graph, enable_kl_algo,
+                                      create_calibration_monitor(self.calib_convergence))
+        self.calib_samples = max(self.calib_samples,
+                                 batches * getattr(self.data_loader, 'batch_size', 1))
 
         sys.stdout = sys.__stdout__  # reset
         # sys.stderr = sys.__stderr__
@@ -629,6 +714,7 @@ class GraphConverter:
                 else:
                     self._kl_op_dict[key] = combine_histogram(self._kl_op_dict[key], fp32_data)
 
+    @trace.traced('graph_converter.freeze_ranges')
     def _freeze_requantization_ranges(self, additional_data=None, _print_node_mapping=None):
         self._tmp_graph_def = FreezeValueTransformer(self._tmp_graph_def, self._calibration_data,
                                                      '__max:').do_transformation()
@@ -644,6 +730,7 @@ class GraphConverter:
         if self.debug:
             write_graph(self._tmp_graph_def, self._int8_frozen_range_graph)
 
+    @trace.traced('graph_converter.fuse_requantize')
     def _fuse_requantize_with_fused_quantized_node(self):
         self._tmp_graph_def = FuseConvRequantizeTransformer(self._tmp_graph_def,
                                                             self.device).do_transformation()
@@ -19,6 +19,7 @@
 import logging
 from lpot.adaptor.tf_utils.util import get_graph_def
 from lpot.adaptor.tf_utils.graph_rewriter.graph_util import GraphAnalyzer
+from lpot.utils import trace
 
 from .fuse_column_wise_mul import FuseColumnWiseMulOptimizer
 from .remove_training_nodes import RemoveTrainingNodesOptimizer
@@ -54,6 +55,7 @@ class PreOptimization(object):
         """
         return self._excluded_node_names
 
+    @trace.traced('graph_rewriter.pre_optimization')
     def get_optimized_graphdef(self):
         """Executed the non-precision dependant graph optimization.
         The input graph will be optimized with following passes:
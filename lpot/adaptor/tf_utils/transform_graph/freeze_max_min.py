@@ -30,6 +30,7 @@ import numpy as np
 import math
 import functools
 import logging
+from ....utils import trace
 
 logger = logging.getLogger()
 
@@ -178,6 +179,7 @@ def get_tensor_histogram(tensor_data, bins=2048):
     return (hist, hist_edeges, max_val, min_val, th)
 
 
+@trace.traced('kl.search')
 def get_optimal_scaling_factor(tensor_details, num_quantized_bins=255):
     hist = tensor_details[0]
     hist_edeges = tensor_details[1]
@@ -45,9 +45,12 @@ class Benchmark(object):
         framework = cfg.model.framework.lower()
         if framework == 'tensorflow':
             framework_specific_info.update({"inputs": cfg.model.inputs, \
-                                            "outputs": cfg.model.outputs})
+                                            "outputs": cfg.model.outputs, \
+                                            "execution": cfg.model.execution})
         if framework == 'mxnet':
             framework_specific_info.update({"b_dataloader": b_dataloader})
+        if framework == 'pytorch':
+            framework_specific_info.update({"execution": cfg.model.execution})
 
         adaptor = FRAMEWORKS[framework](framework_specific_info)
 
@@ -184,6 +184,10 @@ dataloader_schema = Schema({
     Optional('batch_size', default=1): And(int, lambda s: s > 0),
     'dataset': dataset_schema,
     Optional('transform'): transform_schema,
+    Optional('cache'): {
+        'path': str,
+        Optional('size_budget'): And(int, lambda s: s > 0),
+    },
 })
 
 configs_schema = Schema({
@@ -200,7 +204,17 @@ schema = Schema({
         Hook('framework', handler=_valid_framework_field): object,
         'framework': And(str, lambda s: s in FRAMEWORKS),
         Optional('inputs', default=None): And(Or(str, list), Use(input_to_list)),
-        Optional('outputs', default=None): And(Or(str, list), Use(input_to_list))
+        Optional('outputs', default=None): And(Or(str, list), Use(input_to_list)),
+        # how the pytorch model runs and the tensorflow model gets its inputs in evaluation
+        # and benchmark
+        Optional('execution', default={'mode': 'eager', 'warmup': 2, 'export': False,
+                                       'input_pipeline': 'feed_dict'}): {
+            Optional('mode', default='eager'): And(str, lambda s: s in ['eager', 'torchscript']),
+            Optional('warmup', default=2): And(int, lambda s: s >= 0),
+            Optional('export', default=False): bool,
+            Optional('input_pipeline', default='feed_dict'): And(
+                str, lambda s: s in ['feed_dict', 'input_map'])
+        }
     },
     Optional('device', default='cpu'): And(str, lambda s: s in ['cpu', 'gpu']),
     Optional('quantization', default={'approach': 'post_training_static_quant', \
@@ -211,6 +225,10 @@ schema = Schema({
             lambda s: s in ['post_training_static_quant', 'quant_aware_training']),
         Optional('calibration', default={'sampling_size': [100]}): {
             Optional('sampling_size', default=[100]): And(Or(str, int, list), Use(input_to_list)),
+            Optional('convergence', default=None): {
+                Optional('tolerance', default=0.01): And(float, lambda s: s >= 0),
+                Optional('patience', default=5): And(int, lambda s: s > 0),
+            },
             Optional('dataloader', default=None): dataloader_schema
         },
         Optional('model_wise', default={'weight': {}, 'activation': {}}): {
@@ -260,12 +278,24 @@ schema = Schema({
         'accuracy_criterion': {'relative': 0.01},
         'objective': 'performance',
         'exit_policy': {'timeout': 0, 'max_trials': 100},
-        'random_seed': 1978, 'tensorboard': False,
+        'random_seed': 1978, 'tensorboard': False, 'trace': False,
         'workspace': {'path': None}}): {
         Optional('strategy', default={'name': 'basic'}): {
             'name': And(str, lambda s: s in STRATEGIES),
             Optional('accuracy_weight', default=1.0): float,
-            Optional('latency_weight', default=1.0): float
+            Optional('latency_weight', default=1.0): float,
+            Optional('search_space', default='continuous'): And(
+                str, lambda s: s in ['continuous', 'discrete']),
+            # how the basic strategy ranks the ops to fall back
+            Optional('fallback_search', default='group'): And(
+                str, lambda s: s in ['group', 'per_op']),
+            # successive halving strategy on growing evaluation subsets
+            Optional('halving'): {
+                Optional('candidates', default=9): And(int, lambda s: s > 0),
+                Optional('eta', default=3): And(int, lambda s: s > 1),
+                Optional('min_samples', default=100): And(int, lambda s: s > 0),
+                Optional('confidence', default=0.95): And(float, lambda s: 0.5 <= s < 1),
+            }
         } ,
         Hook('accuracy_criterion', handler=_valid_accuracy_field): object,
         Optional('accuracy_criterion', default={'relative': 0.01}): {
@@ -279,6 +309,22 @@ schema = Schema({
         },
         Optional('random_seed', default=1978): int,
         Optional('tensorboard', default=False): And(bool, lambda s: s in [True, False]),
+        # record the timing spans of the run to trace.json in the workspace
+        Optional('trace', default=False): bool,
+        # profile the op latencies of the fp32 model and of each trial to the workspace
+        Optional('profile'): {
+            Optional('iteration', default=10): And(int, lambda s: s > 0),
+        },
+        # predict the objective value of the tuning configs from the op profiles
+        Optional('cost_model'): {
+            Optional('prune_margin', default=0.1): And(float, lambda s: s >= 0),
+        },
+        # stop evaluating a tuning config once its accuracy goal is out of reach
+        Optional('sequential_evaluation'): {
+            Optional('interval', default=10): And(int, lambda s: s > 0),
+            Optional('confidence', default=0.99): And(float, lambda s: 0.5 <= s < 1),
+            Optional('min_samples', default=500): int,
+        },
         # workspace default value is ./lpot_workspace/$framework/$module_name/, set by code
         Optional('workspace', default={'path': None}): {
             Optional('path', default=None): str,
@@ -289,12 +335,20 @@ schema = Schema({
         Optional('accuracy'): {
             Optional('metric', default=None): {
                 Optional('topk'): And(int, lambda s: s in [1, 5]),
+                Optional('mAP'): Or(None, {
+                    Optional('iou_thresholds'): And(list, lambda s: all(0 <= i <= 1 for i in s)),
+                    Optional('area_range'): Or('all', 'small', 'medium', 'large'),
+                    Optional('max_detections'): And(int, lambda s: s > 0)}),
             },
             Optional('configs'): configs_schema,
             Optional('dataloader'): dataloader_schema,
             Optional('postprocess'): {
                 Optional('transform'): postprocess_schema
             },
+            # evaluate the dataset shards in parallel pinned worker processes
+            Optional('sharding'): {
+                Optional('num_shards', default=2): And(int, lambda s: s > 0),
+            },
         },
         Optional('performance'): {
             Optional('warmup', default=10): int,
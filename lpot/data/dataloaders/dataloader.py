@@ -19,6 +19,7 @@ from .base_dataloader import BaseDataLoader
 from .tensorflow_dataloader import TensorflowDataLoader
 from .mxnet_dataloader import MXNetDataLoader
 from .pytorch_dataloader import PyTorchDataLoader
+from ...utils import trace
 
 DATALOADERS = {"tensorflow": TensorflowDataLoader,
                "mxnet": MXNetDataLoader,
@@ -60,3 +61,20 @@ class DataLoader(BaseDataLoader):
             last_batch=last_batch,
             num_workers=num_workers,
             pin_memory=pin_memory).dataloader
+
+    def __iter__(self):
+        if not trace.is_enabled():
+            return iter(self.dataloader)
+        return self._traced_iter()
+
+    def _traced_iter(self):
+        """Iterate the batches, timing the loading of all of them as one aggregate span."""
+        iterator = iter(self.dataloader)
+        with trace.aggregate('dataloader.next') as batches:
+            while True:
+                with batches.item():
+                    try:
+                        batch = next(iterator)
+                    except StopIteration:
+                        return
+                yield batch
@@ -71,6 +71,33 @@ class SequentialSampler(Sampler):
         return len(self.dataset)
 
 
+class ShardSampler(Sampler):
+    """Sequentially samples the shard_id-th of num_shards contiguous shards of a dataset
+       retrieved element by index. The shard boundaries fall on multiples of batch_size, so
+       batching the shards one after another gives the same batches as batching the whole
+       dataset.
+
+    Args:
+        dataset (Dataset): index dataset(implement method __len__) for sampling
+        num_shards (int): The number of shards the dataset is split into.
+        shard_id (int): The shard to sample, from 0 to num_shards - 1.
+        batch_size (int, optional): The batch size the shards are aligned to.
+    """
+
+    def __init__(self, dataset, num_shards, shard_id, batch_size=1):
+        assert 0 <= shard_id < num_shards, 'shard_id should be in [0, num_shards)'
+        self.dataset = dataset
+        num_batches = (len(dataset) + batch_size - 1) // batch_size
+        self.start = min(shard_id * num_batches // num_shards * batch_size, len(dataset))
+        self.end = min((shard_id + 1) * num_batches // num_shards * batch_size, len(dataset))
+
+    def __iter__(self):
+        return iter(range(self.start, self.end))
+
+    def __len__(self):
+        return self.end - self.start
+
+
 class BatchSampler(Sampler):
     """yield a mini-batch of indices for SquentialSampler and batch size length of None list for
        IterableSampler.
@@ -45,6 +45,10 @@ class TFDataDataLoader(BaseDataLoader):
        method to do session run, this dataloader is designed to satisfy the usage of feed dict
        in tf1.x. Although it's a general dataloader and can be used in MXNet and PyTorch.
 
+       The batched dataset, its initializable iterator and the session are created once at
+       the first iteration and reused, each new iteration only reinitializes the iterator,
+       so iterating the dataloader for every trial doesn't grow the graph.
+
     """
 
     def __init__(self, dataset, batch_size=1, last_batch='rollover'):
@@ -52,12 +56,18 @@ class TFDataDataLoader(BaseDataLoader):
         self.dataset = dataset
         self.last_batch = last_batch
         self._batch_size = batch_size
-        dataset = dataset.batch(batch_size)
-        
+        self._iterator = None
+        self._iter_tensors = None
+        self._sess = None
+
     def batch(self, batch_size, last_batch='rollover'):
-        drop_last = False if last_batch == 'rollover' else True
         self._batch_size = batch_size
-        self.dataset = self.dataset.batch(batch_size, drop_last)
+        self.last_batch = last_batch
+        self._close()
+
+    @property
+    def dataloader(self):
+        return self
 
     def __iter__(self):
         return self._generate_dataloader(
@@ -65,28 +75,43 @@ class TFDataDataLoader(BaseDataLoader):
             batch_size=self.batch_size,
             last_batch=self.last_batch,)
 
-    def _generate_dataloader(self, dataset, batch_size=1, last_batch='rollover', \
-                             collate_fn=None, sampler=None, batch_sampler=None, \
-                             num_workers=None, pin_memory=None):
+    def _close(self):
+        if self._sess is not None:
+            self._sess.close()
+        self._iterator = None
+        self._iter_tensors = None
+        self._sess = None
 
+    def _build(self, dataset, batch_size, last_batch):
         drop_last = False if last_batch == 'rollover' else True
-        dataset = dataset.batch(batch_size, drop_last)
-        ds_iterator = tf.compat.v1.data.make_one_shot_iterator(dataset)
-        iter_tensors = ds_iterator.get_next()
-        data_config = tf.compat.v1.ConfigProto() 
+        graph = tf.compat.v1.get_default_graph()
+        with graph.as_default():
+            dataset = dataset.batch(batch_size, drop_last)
+            self._iterator = tf.compat.v1.data.make_initializable_iterator(dataset)
+            self._iter_tensors = self._iterator.get_next()
+        data_config = tf.compat.v1.ConfigProto()
         data_config.use_per_session_threads = 1
         data_config.intra_op_parallelism_threads = 1
         data_config.inter_op_parallelism_threads = 16
-        data_sess = tf.compat.v1.Session(config=data_config)
+        self._sess = tf.compat.v1.Session(graph=graph, config=data_config)
+
+    def _generate_dataloader(self, dataset, batch_size=1, last_batch='rollover', \
+                             collate_fn=None, sampler=None, batch_sampler=None, \
+                             num_workers=None, pin_memory=None):
+
+        if self._sess is None:
+            self._build(dataset, batch_size, last_batch)
+        iter_tensors = self._iter_tensors
+        data_sess = self._sess
+        data_sess.run(self._iterator.initializer)
         from tensorflow.python.framework.errors_impl import OutOfRangeError
         while True:
             try:
                 outputs = data_sess.run(iter_tensors)
                 yield outputs
             except OutOfRangeError:
-                data_sess.close()
                 return
-        
+
 def default_collate(batch):
     """Puts each data field into a pd frame with outer dimension batch size"""
     elem = batch[0]
@@ -196,7 +221,9 @@ class DefaultDataLoader(BaseDataLoader):
                              sampler, batch_sampler, num_workers, pin_memory):
 
         drop_last = False if last_batch == 'rollover' else True
-        sampler = self._generate_sampler(dataset)
+        default_sampler = self._generate_sampler(dataset)
+        if sampler is None:
+            sampler = default_sampler
         self.batch_sampler = BatchSampler(sampler, batch_size, drop_last)
         self.fetcher = FETCHERS[self.dataset_type](dataset, collate_fn, drop_last)
 
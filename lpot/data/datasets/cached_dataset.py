@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""On-disk cache of preprocessed samples.
+
+   The samples produced by a dataset and its deterministic transforms are written once
+   into a directory per cache key:
+
+       <path>/<key>/meta.json
+       <path>/<key>/shard_00000/field_0.npy
+       <path>/<key>/shard_00000/field_1.npy
+       ...
+
+   Each shard stacks shard_size consecutive samples, one .npy file per sample field.
+   Later iterations, and later runs with the same key, memory-map the shards so
+   samples are read straight from the page cache. The shards of all keys share a
+   size budget, the least recently used shards are evicted first, except the shards
+   of the entries whose datasets are open in this process. A shard evicted by another
+   process is generated again when it is read.
+"""
+
+import os
+import sys
+import weakref
+import json
+import shutil
+import hashlib
+import numpy as np
+from lpot.utils.utility import fault_tolerant_file
+from lpot.utils import logger
+from .dataset import Dataset
+
+CACHE_VERSION = 1
+
+# the cached datasets alive in this process, their shards are not evicted
+_open_datasets = weakref.WeakSet()
+
+
+def is_random_transform(transform_cfg):
+    """Check whether a transform config contains a random transform, whose output
+       must not be cached.
+
+       Args:
+           transform_cfg (dict): The transform field of the dataloader config.
+
+       Returns:
+           bool: True if any transform is random.
+    """
+    for name, params in (transform_cfg or {}).items():
+        if name.lower().startswith('random'):
+            return True
+        if isinstance(params, dict) and \
+           any(key.startswith('random') and value for key, value in params.items()):
+            return True
+    return False
+
+
+def _file_stats(value, stats):
+    if isinstance(value, dict):
+        for key in sorted(value):
+            _file_stats(value[key], stats)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _file_stats(item, stats)
+    elif isinstance(value, str) and os.path.exists(value):
+        if os.path.isdir(value):
+            for root, dirs, files in os.walk(value):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    stats.append([path, stat.st_mtime_ns, stat.st_size])
+        else:
+            stat = os.stat(value)
+            stats.append([value, stat.st_mtime_ns, stat.st_size])
+
+
+def cache_key(framework, dataset_cfg, transform_cfg):
+    """Build the cache key from the dataset and transform configs and the modification
+       time of the files the dataset config refers to.
+
+       Args:
+           framework (string): The framework name.
+           dataset_cfg (dict): The dataset field of the dataloader config.
+           transform_cfg (dict): The transform field of the dataloader config, the
+                                 transform order is part of the key.
+
+       Returns:
+           string: The cache key.
+    """
+    files = []
+    _file_stats(dataset_cfg, files)
+    desc = json.dumps({'version': CACHE_VERSION,
+                       'framework': framework,
+                       'dataset': dataset_cfg,
+                       'transform': list((transform_cfg or {}).items()),
+                       'files': files}, sort_keys=True, default=str)
+    return hashlib.sha1(desc.encode()).hexdigest()
+
+
+def _to_numpy(value):
+    if hasattr(value, 'asnumpy'):
+        value = value.asnumpy()
+    elif hasattr(value, 'numpy'):
+        value = value.numpy()
+    value = np.asarray(value)
+    if value.dtype.hasobject:
+        raise ValueError('sample of dtype object can not be cached')
+    return value
+
+
+def _flatten(sample):
+    if isinstance(sample, (tuple, list)):
+        return [_to_numpy(field) for field in sample], type(sample).__name__
+    return [_to_numpy(sample)], 'single'
+
+
+def _iterate_samples(dataset, indices=None):
+    """Yield (index, sample), only the samples in indices if the dataset is indexable."""
+    if 'tensorflow' in sys.modules and \
+       isinstance(dataset, sys.modules['tensorflow'].data.Dataset):
+        from ..dataloaders.tensorflow_dataloader import TFDataDataLoader
+        for index, batch in enumerate(TFDataDataLoader(dataset)):
+            # batch of one sample, strip the batch dimension
+            if isinstance(batch, (tuple, list)):
+                yield index, type(batch)(field[0] for field in batch)
+            else:
+                yield index, batch[0]
+    elif hasattr(dataset, '__getitem__') and hasattr(dataset, '__len__'):
+        for index in (range(len(dataset)) if indices is None else indices):
+            yield index, dataset[index]
+    else:
+        for index, sample in enumerate(dataset):
+            yield index, sample
+
+
+class CachedDataset(Dataset):
+    """Indexable dataset reading the samples from the memory-mapped shards of a cache entry.
+
+       Args:
+           path (string): The directory of the cache entry.
+           meta (dict): The entry description saved in meta.json.
+           cache (optional, DatasetCache): The cache generating the evicted shards again.
+           source (optional, object): The source dataset of the entry.
+    """
+
+    def __init__(self, path, meta, cache=None, source=None):
+        self.path = path
+        self.meta = meta
+        self.shard_size = meta['shard_size']
+        self._cache = cache
+        self._source = source
+        self._shards = {}
+        _open_datasets.add(self)
+
+    def __getstate__(self):
+        # the memory maps are opened again, and the source may not be picklable
+        state = dict(self.__dict__)
+        state.update({'_source': None, '_shards': {}})
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        _open_datasets.add(self)
+
+    def __len__(self):
+        return self.meta['num_samples']
+
+    def _shard(self, shard_id):
+        if shard_id not in self._shards:
+            shard_dir = os.path.join(self.path, self.meta['shards'][shard_id])
+            if not os.path.isdir(shard_dir) and self._source is not None:
+                # evicted by another process
+                self._cache._fill(self.path, self._source, self.meta, [shard_id])
+            self._shards[shard_id] = [
+                np.load(os.path.join(shard_dir, 'field_{}.npy'.format(i)), mmap_mode='r')
+                for i in range(self.meta['num_fields'])]
+        return self._shards[shard_id]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('index {} out of range'.format(index))
+        shard_id, row = divmod(index, self.shard_size)
+        fields = [field[row] for field in self._shard(shard_id)]
+        if self.meta['structure'] == 'single':
+            return fields[0]
+        return list(fields) if self.meta['structure'] == 'list' else tuple(fields)
+
+
+class DatasetCache(object):
+    """Directory of cache entries sharing a size budget.
+
+       Args:
+           path (string): The cache root directory.
+           size_budget (optional, integer): The maximum size in bytes of all shards,
+                                            unlimited if None.
+           shard_size (optional, integer): The number of samples per shard.
+    """
+
+    def __init__(self, path, size_budget=None, shard_size=256):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.size_budget = size_budget
+        self.shard_size = shard_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def get(self, key, dataset):
+        """Return the cached dataset of key, the missing samples are generated from
+           dataset and written into the cache first.
+
+           Args:
+               key (string): The cache key, see cache_key.
+               dataset (object): The source dataset with its transforms.
+
+           Returns:
+               object: A CachedDataset, or dataset itself if its samples can not be
+                       cached, e.g. shapes differ inside a shard or the budget is too small.
+        """
+        entry = os.path.join(self.path, key)
+        meta = self._load_meta(entry)
+        missing = [] if meta is None else [
+            shard_id for shard_id, shard in enumerate(meta['shards'])
+            if not os.path.isdir(os.path.join(entry, shard))]
+
+        if meta is None or missing:
+            try:
+                meta = self._fill(entry, dataset, meta, missing)
+            except (ValueError, TypeError) as e:
+                logger.warning('Dataset is not cached: {}'.format(e))
+                shutil.rmtree(entry, ignore_errors=True)
+                return dataset
+            if meta is None:
+                shutil.rmtree(entry, ignore_errors=True)
+                return dataset
+            logger.info('Cached {} samples into {}'.format(meta['num_samples'], entry))
+
+        for shard in meta['shards']:
+            # the modification time of a shard is its last use for the LRU eviction
+            os.utime(os.path.join(entry, shard))
+        return CachedDataset(entry, meta, self, dataset)
+
+    def _load_meta(self, entry):
+        meta_file = os.path.join(entry, 'meta.json')
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file) as f:
+            return json.load(f)
+
+    def _fill(self, entry, dataset, meta, missing):
+        """Write all shards if meta is None, else only the missing shards."""
+        os.makedirs(entry, exist_ok=True)
+        shard_size = self.shard_size if meta is None else meta['shard_size']
+        indices = None
+        if meta is not None:
+            indices = [index for shard_id in missing
+                       for index in range(shard_id * shard_size,
+                                          min((shard_id + 1) * shard_size,
+                                              meta['num_samples']))]
+            missing = set(missing)
+
+        structure = None
+        num_fields = 0
+        buffer = []
+        num_samples = 0
+        for index, sample in _iterate_samples(dataset, indices):
+            num_samples = index + 1
+            shard_id = index // shard_size
+            if meta is not None and shard_id not in missing:
+                continue
+            fields, structure = _flatten(sample)
+            num_fields = len(fields)
+            buffer.append(fields)
+            if len(buffer) == shard_size:
+                if not self._write_shard(entry, shard_id, buffer):
+                    return None
+                buffer = []
+        if buffer:
+            if not self._write_shard(entry, (num_samples - 1) // shard_size, buffer):
+                return None
+
+        if meta is None:
+            if num_samples == 0:
+                raise ValueError('dataset is empty')
+            meta = {'version': CACHE_VERSION,
+                    'num_samples': num_samples,
+                    'num_fields': num_fields,
+                    'structure': structure,
+                    'shard_size': shard_size,
+                    'shards': ['shard_{:05d}'.format(i)
+                               for i in range((num_samples + shard_size - 1) // shard_size)]}
+            with fault_tolerant_file(os.path.join(entry, 'meta.json')) as f:
+                f.write(json.dumps(meta).encode())
+        return meta
+
+    def _write_shard(self, entry, shard_id, samples):
+        fields = [np.stack([sample[i] for sample in samples])
+                  for i in range(len(samples[0]))]
+        size = sum(field.nbytes for field in fields)
+        if not self._reserve(size, entry):
+            logger.warning('Dataset cache budget of {} bytes is too small'.format(
+                self.size_budget))
+            return False
+
+        shard = os.path.join(entry, 'shard_{:05d}'.format(shard_id))
+        tmp = '{}.tmp{}'.format(shard, os.getpid())
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for i, field in enumerate(fields):
+            np.save(os.path.join(tmp, 'field_{}.npy'.format(i)), field)
+        shutil.rmtree(shard, ignore_errors=True)
+        os.rename(tmp, shard)
+        return True
+
+    def _shards(self):
+        shards = []
+        for key in os.listdir(self.path):
+            entry = os.path.join(self.path, key)
+            if not os.path.isdir(entry):
+                continue
+            for name in os.listdir(entry):
+                shard = os.path.join(entry, name)
+                if name.startswith('shard_') and os.path.isdir(shard):
+                    size = sum(os.path.getsize(os.path.join(shard, f))
+                               for f in os.listdir(shard))
+                    shards.append((os.path.getmtime(shard), size, shard))
+        return shards
+
+    def _reserve(self, size, entry):
+        """Evict the least recently used shards of the entries not open in this process
+           until size fits the budget.
+
+           Returns:
+               bool: False if the budget can't hold size besides the shards of entry and of
+                     the open entries.
+        """
+        if self.size_budget is None:
+            return True
+        protected = set(dataset.path for dataset in list(_open_datasets))
+        protected.add(entry)
+        shards = self._shards()
+        total = sum(shard[1] for shard in shards) + size
+        for _, shard_size, shard in sorted(shards, key=lambda shard: (shard[0], shard[2])):
+            if total <= self.size_budget:
+                break
+            if os.path.dirname(shard) in protected:
+                continue
+            shutil.rmtree(shard, ignore_errors=True)
+            total -= shard_size
+        return total <= self.size_budget
@@ -18,7 +18,7 @@
 from abc import abstractmethod
 import functools
 
-from lpot.utils.utility import LazyImport, singleton
+from lpot.utils.utility import LazyImport, LazyRegistry, singleton
 torchvision = LazyImport('torchvision')
 tf = LazyImport('tensorflow')
 mx = LazyImport('mxnet')
@@ -128,9 +128,9 @@ class DATASETS(object):
 
 
 # user/model specific datasets will be registered here
-TENSORFLOWDATASETS = {}
-MXNETDATASETS = {}
-PYTORCHDATASETS = {}
+TENSORFLOWDATASETS = LazyRegistry('lpot.data.datasets')
+MXNETDATASETS = LazyRegistry('lpot.data.datasets')
+PYTORCHDATASETS = LazyRegistry('lpot.data.datasets')
 
 registry_datasets = {"tensorflow": TENSORFLOWDATASETS,
                      "mxnet": MXNETDATASETS,
@@ -158,7 +158,7 @@ def dataset_registry(dataset_type, framework, dataset_format=''):
                 "pytorch"
             ], "The framework support tensorflow mxnet pytorch"
             dataset_name = dataset_type + dataset_format
-            if dataset_name in registry_datasets[single_framework].keys():
+            if registry_datasets[single_framework].is_registered(dataset_name):
                 raise ValueError('Cannot have two datasets with the same name')
             registry_datasets[single_framework][dataset_name] = cls
         return cls
@@ -36,7 +36,15 @@ tf = LazyImport('tensorflow')
 
 @dataset_registry(dataset_type="Imagenet", framework="tensorflow", dataset_format='')
 class ImagenetDataset(IterableDataset):
-    """Configuration for Imagenet dataset."""
+    """Configuration for Imagenet dataset.
+
+       Args:
+           root (string): The directory of the TFRecord files.
+           subset (string): validation or train.
+           num_cores (optional, integer): Cycle length of the file interleave, it also
+                                          decides the record order.
+           transform (optional, callable): Transform applied to each record.
+    """
 
     def __new__(cls, root, subset='validation', num_cores=28, transform=None):
 
@@ -53,26 +61,12 @@ class ImagenetDataset(IterableDataset):
         ds = tf.data.TFRecordDataset.list_files(file_names, shuffle=False)
         ds = ds.apply(
           parallel_interleave(
-            tf.data.TFRecordDataset, cycle_length=num_cores))
+            tf.data.TFRecordDataset, cycle_length=num_cores, sloppy=False))
 
-        ds = ds.map(transform, num_parallel_calls=None)
+        # parallel map keeps the element order, the output is the same as a serial map
+        num_parallel_calls = os.cpu_count() or 1
+        if transform is not None:
+            ds = ds.map(transform, num_parallel_calls=num_parallel_calls)
 
-        ds = ds.prefetch(buffer_size=tf.data.experimental.AUTOTUNE)  # this number can be tuned
+        ds = ds.prefetch(buffer_size=num_parallel_calls)
         return ds
-
-    def __iter__(self):
-        ds_iterator = tf.compat.v1.data.make_one_shot_iterator(self)
-        iter_tensors = ds_iterator.get_next()
-        from tensorflow.python.framework.errors_impl import OutOfRangeError
-        data_config = tf.compat.v1.ConfigProto() 
-        data_config.use_per_session_threads = 1
-        data_config.intra_op_parallelism_threads = 1
-        data_config.inter_op_parallelism_threads = 16
-        with tf.compat.v1.Session(config=data_config) as sess:
-            while True:
-                try:
-                    outputs = sess.run(iter_tensors)
-                    yield outputs
-                except OutOfRangeError:
-                    return
-
@@ -38,7 +38,8 @@ tf = LazyImport('tensorflow')
 @transform_registry(transform_type="ParseDecodeImagenet", \
                     process="preprocess", framework="tensorflow")
 class ParseDecodeImagenetTransform(Transform):
-               
+  traceable = True
+
   def __call__(self, sample):
     # Dense features in Example proto.
     feature_map = {
@@ -122,6 +123,8 @@ class ResizeCropImagenetTransform(Transform):
 @transform_registry(transform_type="QuantizedInput", \
                     process="preprocess", framework="tensorflow")
 class QuantizedInput(Transform):
+  traceable = True
+
   def __init__(self, dtype, scale=None):
     self.dtype_map = {'uint8': tf.uint8, 'int8': tf.int8}
     assert dtype in self.dtype_map.keys(), \
@@ -155,6 +158,8 @@ class LabelShift(Transform):
 @transform_registry(transform_type="BilinearImagenet", \
                     process="preprocess", framework="tensorflow")
 class BilinearImagenetTransform(Transform):
+  traceable = True
+
   def __init__(self, height, width, central_fraction=0.875,
                mean_value=[0.0,0.0,0.0], scale=1.0):
 
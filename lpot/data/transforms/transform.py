@@ -16,7 +16,9 @@
 # limitations under the License.
 
 from abc import abstractmethod
+import numpy as np
 from lpot.utils.utility import LazyImport, singleton
+from lpot.utils import logger
 
 torchvision = LazyImport('torchvision')
 torch = LazyImport('torch')
@@ -265,6 +267,9 @@ class Transform(object):
     """The base class for transform. __call__ method is needed when write user specific transform
 
     """
+    # whether the transform only runs tensorflow ops, so it can be traced into a graph
+    traceable = False
+
     @abstractmethod
     def __call__(self, *args, **kwargs):
         raise NotImplementedError
@@ -275,6 +280,10 @@ class WrapTransform(Transform):
         self.kwargs = kwargs
         self.transform_func = transform_func
 
+    @property
+    def traceable(self):
+        return getattr(self.transform_func, '__module__', '').startswith('tensorflow')
+
     def __call__(self, sample):
         return self.transform_func(sample, **self.kwargs)
 
@@ -287,12 +296,112 @@ class WrapFunction(object):
         return WrapTransform(self.transform_func, **kwargs)
 
 
+def _placeholder_dtype(value):
+    # same dtype as the tensor the transforms would have converted the value to
+    if isinstance(value, bool):
+        return tf.bool
+    if isinstance(value, int):
+        return tf.int32
+    if isinstance(value, float):
+        return tf.float32
+    if isinstance(value, (bytes, str)):
+        return tf.string
+    return tf.as_dtype(np.asarray(value).dtype)
+
+
 @transform_registry(transform_type="Compose", process="general", framework="tensorflow")
 class ComposeTFTransform(Transform):
+    """Apply the transforms in order.
+
+       Symbolic tensors, e.g. in tf.data.Dataset.map, and eager samples are transformed
+       in place. In graph mode, concrete samples run a graph traced once per input
+       signature, with placeholders of unknown dimensions, so the transforms don't add
+       nodes to the default graph at every call and the results are numpy arrays. Only
+       the chains of traceable transforms are traced, the others, e.g. with numpy
+       postprocess, are applied in place.
+
+       Args:
+           transform_list (list): The transforms to compose.
+    """
     def __init__(self, transform_list):
         self.transform_list = transform_list
+        self.traceable = all(getattr(transform, 'traceable', False)
+                             for transform in transform_list)
+        self._compiled = {}
 
-    def __call__(self, sample):
+    def _apply(self, sample):
         for transform in self.transform_list:
             sample = transform(sample)
         return sample
+
+    def _compile(self, sample, batch):
+        """Trace the transforms into a graph fed by placeholders.
+
+           Returns:
+               tuple: The session, the flattened placeholders and the output tensors,
+                      None if the transforms can't be traced.
+        """
+        graph = tf.Graph()
+        try:
+            with graph.as_default():
+                placeholders = [tf.compat.v1.placeholder(
+                    _placeholder_dtype(value), shape=[None] * np.ndim(value))
+                    for value in tf.nest.flatten(sample)]
+                inputs = tf.nest.pack_sequence_as(sample, placeholders)
+                if batch:
+                    # the transforms apply to each sample of the batch
+                    structure = tf.nest.map_structure(
+                        lambda x: tf.compat.v1.placeholder(x.dtype, x.shape[1:]), inputs)
+                    out_structure = self._apply(structure)
+                    outputs = tf.map_fn(self._apply, inputs,
+                                        dtype=tf.nest.map_structure(lambda x: x.dtype,
+                                                                    out_structure))
+                else:
+                    outputs = self._apply(inputs)
+        except Exception as e:
+            logger.debug('Fail to trace the transforms due to {}, '
+                         'apply them in place.'.format(e))
+            return None
+        graph.finalize()
+        return tf.compat.v1.Session(graph=graph), placeholders, outputs
+
+    def _run(self, sample, batch):
+        if tf.executing_eagerly():
+            sample = tf.nest.map_structure(
+                lambda x: x.numpy() if tf.is_tensor(x) else x, sample)
+        flat = tf.nest.flatten(sample)
+        key = (batch, str(tf.nest.map_structure(lambda x: None, sample)),
+               tuple((_placeholder_dtype(x), np.ndim(x)) for x in flat))
+        if key not in self._compiled:
+            self._compiled[key] = self._compile(sample, batch)
+        if self._compiled[key] is None:
+            return None
+        sess, placeholders, outputs = self._compiled[key]
+        return sess.run(outputs, feed_dict=dict(zip(placeholders, flat)))
+
+    def __call__(self, sample):
+        if self.traceable and not tf.executing_eagerly() and \
+           not any(tf.is_tensor(x) for x in tf.nest.flatten(sample)):
+            result = self._run(sample, batch=False)
+            if result is not None:
+                return result
+        return self._apply(sample)
+
+    def batch(self, samples):
+        """Transform a whole batch with one session run.
+
+           Args:
+               samples (object): Sample structure whose arrays have the batch size as
+                                 the first dimension.
+
+           Returns:
+               object: The transformed samples stacked in the first dimension, the
+                       transforms must produce the same shape for all samples.
+        """
+        result = self._run(samples, batch=True) if self.traceable else None
+        if result is None:
+            size = len(tf.nest.flatten(samples)[0])
+            results = [self._apply(tf.nest.map_structure(lambda x: x[i], samples))
+                       for i in range(size)]
+            result = tf.nest.map_structure(lambda *x: np.stack(x), *results)
+        return result
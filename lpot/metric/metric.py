@@ -16,172 +16,119 @@
 # limitations under the License.
 
 from abc import abstractmethod
-from lpot.utils.utility import LazyImport, singleton
+import copy
+import math
+from lpot.utils.utility import LazyImport, LazyRegistry, singleton
 from ..utils import logger
-from sklearn.metrics import accuracy_score, f1_score
 import numpy as np
 
 torch_ignite = LazyImport('ignite')
 torch = LazyImport('torch')
 tf = LazyImport('tensorflow')
 mx = LazyImport('mxnet')
+sklearn_metrics = LazyImport('sklearn.metrics')
 
 
 @singleton
 class TensorflowMetrics(object):
     def __init__(self):
-        self.metrics = {
-            "Accuracy": WrapTensorflowMetric(
-                tf.keras.metrics.Accuracy),
-            "Sum": WrapTensorflowMetric(
-                tf.keras.metrics.Sum,
-                True),
-            "Mean": WrapTensorflowMetric(
-                tf.keras.metrics.Mean,
-                True),
-            "MeanRelativeError": WrapTensorflowMetric(
-                tf.keras.metrics.MeanRelativeError),
-            "BinaryAccuracy": WrapTensorflowMetric(
-                tf.keras.metrics.BinaryAccuracy),
-            "CategoricalAccuracy": WrapTensorflowMetric(
-                tf.keras.metrics.CategoricalAccuracy),
-            "SparseCategoricalAccuracy": WrapTensorflowMetric(
-                tf.keras.metrics.SparseCategoricalAccuracy),
-            "TopKCategoricalAccuracy": WrapTensorflowMetric(
-                tf.keras.metrics.TopKCategoricalAccuracy),
-            "SparseTopKCategoricalAccuracy": WrapTensorflowMetric(
-                tf.keras.metrics.SparseTopKCategoricalAccuracy),
-            "FalsePositives": WrapTensorflowMetric(
-                tf.keras.metrics.FalsePositives),
-            "FalseNegatives": WrapTensorflowMetric(
-                tf.keras.metrics.FalseNegatives),
-            "TrueNegatives": WrapTensorflowMetric(
-                tf.keras.metrics.TrueNegatives),
-            "TruePositives": WrapTensorflowMetric(
-                tf.keras.metrics.TruePositives),
-            "Precision": WrapTensorflowMetric(
-                tf.keras.metrics.Precision),
-            "Recall": WrapTensorflowMetric(
-                tf.keras.metrics.Recall),
-            "SensitivityAtSpecificity": WrapTensorflowMetric(
-                tf.keras.metrics.SensitivityAtSpecificity),
-            "SpecificityAtSensitivity": WrapTensorflowMetric(
-                tf.keras.metrics.SpecificityAtSensitivity),
-            "AUC": WrapTensorflowMetric(
-                tf.keras.metrics.AUC),
-            "CosineSimilarity": WrapTensorflowMetric(
-                tf.keras.metrics.CosineSimilarity),
-            "MeanAbsoluteError": WrapTensorflowMetric(
-                tf.keras.metrics.MeanAbsoluteError),
-            "MeanAbsolutePercentageError": WrapTensorflowMetric(
-                tf.keras.metrics.MeanAbsolutePercentageError),
-            "MeanSquaredError": WrapTensorflowMetric(
-                tf.keras.metrics.MeanSquaredError),
-            "MeanSquaredLogarithmicError": WrapTensorflowMetric(
-                tf.keras.metrics.MeanSquaredLogarithmicError),
-            "Hinge": WrapTensorflowMetric(
-                tf.keras.metrics.Hinge),
-            "SquaredHinge": WrapTensorflowMetric(
-                tf.keras.metrics.SquaredHinge),
-            "CategoricalHinge": WrapTensorflowMetric(
-                tf.keras.metrics.CategoricalHinge),
-            "RootMeanSquaredError": WrapTensorflowMetric(
-                tf.keras.metrics.RootMeanSquaredError),
-            "LogCoshError": WrapTensorflowMetric(
-                tf.keras.metrics.LogCoshError),
-            "Poisson": WrapTensorflowMetric(
-                tf.keras.metrics.Poisson),
-            "KLDivergence": WrapTensorflowMetric(
-                tf.keras.metrics.KLDivergence),
-            "SparseCategoricalCrossentropy": WrapTensorflowMetric(
-                tf.keras.metrics.SparseCategoricalCrossentropy),
-            "CategoricalCrossentropy": WrapTensorflowMetric(
-                tf.keras.metrics.CategoricalCrossentropy),
-            "BinaryCrossentropy": WrapTensorflowMetric(
-                tf.keras.metrics.BinaryCrossentropy),
-            "MeanTensor": WrapTensorflowMetric(
-                tf.keras.metrics.MeanTensor,
-                True),
+        self.native_metrics = {
+            "Accuracy": WrapTensorflowMetric("Accuracy"),
+            "Sum": WrapTensorflowMetric("Sum", True),
+            "Mean": WrapTensorflowMetric("Mean", True),
+            "MeanRelativeError": WrapTensorflowMetric("MeanRelativeError"),
+            "BinaryAccuracy": WrapTensorflowMetric("BinaryAccuracy"),
+            "CategoricalAccuracy": WrapTensorflowMetric("CategoricalAccuracy"),
+            "SparseCategoricalAccuracy": WrapTensorflowMetric("SparseCategoricalAccuracy"),
+            "TopKCategoricalAccuracy": WrapTensorflowMetric("TopKCategoricalAccuracy"),
+            "SparseTopKCategoricalAccuracy": WrapTensorflowMetric("SparseTopKCategoricalAccuracy"),
+            "FalsePositives": WrapTensorflowMetric("FalsePositives"),
+            "FalseNegatives": WrapTensorflowMetric("FalseNegatives"),
+            "TrueNegatives": WrapTensorflowMetric("TrueNegatives"),
+            "TruePositives": WrapTensorflowMetric("TruePositives"),
+            "Precision": WrapTensorflowMetric("Precision"),
+            "Recall": WrapTensorflowMetric("Recall"),
+            "SensitivityAtSpecificity": WrapTensorflowMetric("SensitivityAtSpecificity"),
+            "SpecificityAtSensitivity": WrapTensorflowMetric("SpecificityAtSensitivity"),
+            "AUC": WrapTensorflowMetric("AUC"),
+            "CosineSimilarity": WrapTensorflowMetric("CosineSimilarity"),
+            "MeanAbsoluteError": WrapTensorflowMetric("MeanAbsoluteError"),
+            "MeanAbsolutePercentageError": WrapTensorflowMetric("MeanAbsolutePercentageError"),
+            "MeanSquaredError": WrapTensorflowMetric("MeanSquaredError"),
+            "MeanSquaredLogarithmicError": WrapTensorflowMetric("MeanSquaredLogarithmicError"),
+            "Hinge": WrapTensorflowMetric("Hinge"),
+            "SquaredHinge": WrapTensorflowMetric("SquaredHinge"),
+            "CategoricalHinge": WrapTensorflowMetric("CategoricalHinge"),
+            "RootMeanSquaredError": WrapTensorflowMetric("RootMeanSquaredError"),
+            "LogCoshError": WrapTensorflowMetric("LogCoshError"),
+            "Poisson": WrapTensorflowMetric("Poisson"),
+            "KLDivergence": WrapTensorflowMetric("KLDivergence"),
+            "SparseCategoricalCrossentropy": WrapTensorflowMetric("SparseCategoricalCrossentropy"),
+            "CategoricalCrossentropy": WrapTensorflowMetric("CategoricalCrossentropy"),
+            "BinaryCrossentropy": WrapTensorflowMetric("BinaryCrossentropy"),
+            "MeanTensor": WrapTensorflowMetric("MeanTensor", True),
         }
+        self.metrics = dict(self.native_metrics)
         self.metrics.update(TENSORFLOWMETRICS)
 
 
 @singleton
 class PyTorchMetrics(object):
     def __init__(self):
-        self.metrics = {
-            "Accuracy": WrapPyTorchMetric(
-                torch_ignite.metrics.Accuracy),
-            "Loss": WrapPyTorchMetric(
-                torch_ignite.metrics.Loss),
-            "MeanAbsoluteError": WrapPyTorchMetric(
-                torch_ignite.metrics.MeanAbsoluteError),
-            "MeanPairwiseDistance": WrapPyTorchMetric(
-                torch_ignite.metrics.MeanPairwiseDistance),
-            "MeanSquaredError": WrapPyTorchMetric(
-                torch_ignite.metrics.MeanSquaredError),
+        self.native_metrics = {
+            "Accuracy": WrapPyTorchMetric("Accuracy"),
+            "Loss": WrapPyTorchMetric("Loss"),
+            "MeanAbsoluteError": WrapPyTorchMetric("MeanAbsoluteError"),
+            "MeanPairwiseDistance": WrapPyTorchMetric("MeanPairwiseDistance"),
+            "MeanSquaredError": WrapPyTorchMetric("MeanSquaredError"),
             # "TopKCategoricalAccuracy":WrapPyTorchMetric(
             #     torch_ignite.metrics.TopKCategoricalAccuracy),
-            "topk": WrapPyTorchMetric(
-                torch_ignite.metrics.TopKCategoricalAccuracy),
-            "Average": WrapPyTorchMetric(
-                torch_ignite.metrics.Average, True),
-            "GeometricAverage": WrapPyTorchMetric(
-                torch_ignite.metrics.GeometricAverage, True),
-            "ConfusionMatrix": WrapPyTorchMetric(
-                torch_ignite.metrics.ConfusionMatrix),
+            "topk": WrapPyTorchMetric("TopKCategoricalAccuracy"),
+            "Average": WrapPyTorchMetric("Average", True),
+            "GeometricAverage": WrapPyTorchMetric("GeometricAverage", True),
+            "ConfusionMatrix": WrapPyTorchMetric("ConfusionMatrix"),
             # IoU and mIoU are funtions, while call the function it return a MetricsLambda class
-            "IoU": WrapPyTorchMetric(
-                torch_ignite.metrics.IoU),
-            "mIoU": WrapPyTorchMetric(
-                torch_ignite.metrics.mIoU),
-            "DiceCoefficient": WrapPyTorchMetric(
-                torch_ignite.metrics.DiceCoefficient),
-
-            "MetricsLambda": WrapPyTorchMetric(
-                torch_ignite.metrics.MetricsLambda),
-            "EpochMetric": WrapPyTorchMetric(
-                torch_ignite.metrics.EpochMetric),
-            "Fbeta": WrapPyTorchMetric(
-                torch_ignite.metrics.Fbeta),
-            "Precision": WrapPyTorchMetric(
-                torch_ignite.metrics.Precision),
-            "Recall": WrapPyTorchMetric(
-                torch_ignite.metrics.Recall),
-            "RootMeanSquaredError": WrapPyTorchMetric(
-                torch_ignite.metrics.RootMeanSquaredError),
-            "RunningAverage": WrapPyTorchMetric(
-                torch_ignite.metrics.RunningAverage),
-            "VariableAccumulation": WrapPyTorchMetric(
-                torch_ignite.metrics.VariableAccumulation),
-            "Frequency": WrapPyTorchMetric(
-                torch_ignite.metrics.Frequency, True),
+            "IoU": WrapPyTorchMetric("IoU"),
+            "mIoU": WrapPyTorchMetric("mIoU"),
+            "DiceCoefficient": WrapPyTorchMetric("DiceCoefficient"),
+
+            "MetricsLambda": WrapPyTorchMetric("MetricsLambda"),
+            "EpochMetric": WrapPyTorchMetric("EpochMetric"),
+            "Fbeta": WrapPyTorchMetric("Fbeta"),
+            "Precision": WrapPyTorchMetric("Precision"),
+            "Recall": WrapPyTorchMetric("Recall"),
+            "RootMeanSquaredError": WrapPyTorchMetric("RootMeanSquaredError"),
+            "RunningAverage": WrapPyTorchMetric("RunningAverage"),
+            "VariableAccumulation": WrapPyTorchMetric("VariableAccumulation"),
+            "Frequency": WrapPyTorchMetric("Frequency", True),
         }
+        self.metrics = dict(self.native_metrics)
         self.metrics.update(PYTORCHMETRICS)
 
 
 @singleton
 class MXNetMetrics(object):
     def __init__(self):
-        self.metrics = {
-            "Accuracy": WrapMXNetMetric(mx.metric.Accuracy),
-            "TopKAccuracy": WrapMXNetMetric(mx.metric.TopKAccuracy),
-            "F1": WrapMXNetMetric(mx.metric.F1),
-            # "Fbeta":WrapMXNetMetric(mx.metric.Fbeta),
-            # "BinaryAccuracy":WrapMXNetMetric(mx.metric.BinaryAccuracy),
-            "MCC": WrapMXNetMetric(mx.metric.MCC),
-            "MAE": WrapMXNetMetric(mx.metric.MAE),
-            "MSE": WrapMXNetMetric(mx.metric.MSE),
-            "RMSE": WrapMXNetMetric(mx.metric.RMSE),
-            # "MeanPairwiseDistance":WrapMXNetMetric(mx.metric.MeanPairwiseDistance),
-            # "MeanCosineSimilarity":WrapMXNetMetric(mx.metric.MeanCosineSimilarity),
-            "CrossEntropy": WrapMXNetMetric(mx.metric.CrossEntropy),
-            "Perplexity": WrapMXNetMetric(mx.metric.Perplexity),
-            "NegativeLogLikelihood": WrapMXNetMetric(mx.metric.NegativeLogLikelihood),
-            "PearsonCorrelation": WrapMXNetMetric(mx.metric.PearsonCorrelation),
-            "PCC": WrapMXNetMetric(mx.metric.PCC),
-            "Loss": WrapMXNetMetric(mx.metric.Loss),
+        self.native_metrics = {
+            "Accuracy": WrapMXNetMetric("Accuracy"),
+            "TopKAccuracy": WrapMXNetMetric("TopKAccuracy"),
+            "F1": WrapMXNetMetric("F1"),
+            # "Fbeta":WrapMXNetMetric("Fbeta"),
+            # "BinaryAccuracy":WrapMXNetMetric("BinaryAccuracy"),
+            "MCC": WrapMXNetMetric("MCC"),
+            "MAE": WrapMXNetMetric("MAE"),
+            "MSE": WrapMXNetMetric("MSE"),
+            "RMSE": WrapMXNetMetric("RMSE"),
+            # "MeanPairwiseDistance":WrapMXNetMetric("MeanPairwiseDistance"),
+            # "MeanCosineSimilarity":WrapMXNetMetric("MeanCosineSimilarity"),
+            "CrossEntropy": WrapMXNetMetric("CrossEntropy"),
+            "Perplexity": WrapMXNetMetric("Perplexity"),
+            "NegativeLogLikelihood": WrapMXNetMetric("NegativeLogLikelihood"),
+            "PearsonCorrelation": WrapMXNetMetric("PearsonCorrelation"),
+            "PCC": WrapMXNetMetric("PCC"),
+            "Loss": WrapMXNetMetric("Loss"),
         }
+        self.metrics = dict(self.native_metrics)
         self.metrics.update(MXNETMETRICS)
 
 
@@ -191,10 +138,19 @@ framework_metrics = {"tensorflow": TensorflowMetrics,
 
 
 class METRICS(object):
-    def __init__(self, framework):
+    """The metrics of a framework, the NumPy metrics registered for the framework replace
+       the framework metrics of the same name unless native is True.
+
+    Args:
+        framework (string): The framework name.
+        native (bool, optional): Only provide the metrics wrapping the framework metrics.
+    """
+
+    def __init__(self, framework, native=False):
         assert framework in ("tensorflow", "pytorch",
                              "mxnet"), "framework support tensorflow pytorch mxnet"
-        self.metrics = framework_metrics[framework]().metrics
+        metrics = framework_metrics[framework]()
+        self.metrics = metrics.native_metrics if native else metrics.metrics
 
     def __getitem__(self, metric_type):
         assert metric_type in self.metrics.keys(), "only support metrics in {}".\
@@ -204,9 +160,9 @@ class METRICS(object):
 
 
 # user/model specific metrics will be registered here
-TENSORFLOWMETRICS = {}
-MXNETMETRICS = {}
-PYTORCHMETRICS = {}
+TENSORFLOWMETRICS = LazyRegistry('lpot.metric')
+MXNETMETRICS = LazyRegistry('lpot.metric')
+PYTORCHMETRICS = LazyRegistry('lpot.metric')
 
 registry_metrics = {"tensorflow": TENSORFLOWMETRICS,
                     "mxnet": MXNETMETRICS,
@@ -230,7 +186,7 @@ def metric_registry(metric_type, framework):
                 "mxnet",
                 "pytorch"], "The framework support tensorflow mxnet pytorch"
 
-            if metric_type in registry_metrics[single_framework].keys():
+            if registry_metrics[single_framework].is_registered(metric_type):
                 raise ValueError('Cannot have two metrics with the same name')
             registry_metrics[single_framework][metric_type] = cls
         return cls
@@ -243,8 +199,18 @@ class Metric(object):
         self._single_output = single_output
 
     def __call__(self, *args, **kwargs):
-        self._metric = self._metric_cls(*args, **kwargs)
-        return self
+        metric_cls = self._metric_cls
+        if isinstance(metric_cls, str):
+            # the framework is only imported when one of its metrics is created
+            metric_cls = getattr(self._metric_module(), metric_cls)
+        # each call creates a new metric, the wrapper is shared by the metrics table
+        metric = copy.copy(self)
+        metric._metric = metric_cls(*args, **kwargs)
+        return metric
+
+    def _metric_module(self):
+        """The framework module holding the wrapped metric classes."""
+        raise NotImplementedError
 
     @abstractmethod
     def update(self, preds, labels=None, sample_weight=None):
@@ -258,6 +224,23 @@ class Metric(object):
     def result(self):
         raise NotImplementedError
 
+    def state(self):
+        """The state accumulated by update, picklable to be merged in another process.
+
+        Returns:
+            object: The state, NotImplementedError is raised if the metric can't be merged.
+        """
+        raise NotImplementedError
+
+    def merge(self, state):
+        """Merge the state of the same metric updated with the batches following the ones
+           this metric was updated with, e.g. the next shard of the evaluation dataset.
+
+        Args:
+            state (object): The state returned by the other metric.
+        """
+        raise NotImplementedError
+
     @property
     def metric(self):
         return self._metric
@@ -265,6 +248,9 @@ class Metric(object):
 
 class WrapTensorflowMetric(Metric):
 
+    def _metric_module(self):
+        return tf.keras.metrics
+
     def update(self, preds, labels=None, sample_weight=None):
         if self._single_output:
             _ = self._metric.update_state(values=preds,
@@ -280,9 +266,90 @@ class WrapTensorflowMetric(Metric):
     def result(self):
         return self._metric.result()
 
+    def state(self):
+        # the keras metrics accumulate sums of the batch values in their variables
+        return self._metric.get_weights()
+
+    def merge(self, state):
+        if not self._metric.weights and hasattr(self._metric, '_build'):
+            # MeanTensor creates its variables with the shape of the first update
+            self._metric._build(state[0].shape)
+        self._metric.set_weights([value + other for value, other in
+                                  zip(self._metric.get_weights(), state)])
+
+
+# the attributes ignite reduces with a sum across processes in distributed evaluation,
+# by the name of the metric class or of its closest base class
+_IGNITE_SUM_STATES = {
+    'Accuracy': ('_num_correct', '_num_examples'),
+    'TopKCategoricalAccuracy': ('_num_correct', '_num_examples'),
+    'Loss': ('_sum', '_num_examples'),
+    'MeanAbsoluteError': ('_sum_of_absolute_errors', '_num_examples'),
+    'MeanPairwiseDistance': ('_sum_of_distances', '_num_examples'),
+    'MeanSquaredError': ('_sum_of_squared_errors', '_num_examples'),
+    'Average': ('accumulator', 'num_examples'),
+    'GeometricAverage': ('accumulator', 'num_examples'),
+    'ConfusionMatrix': ('confusion_matrix', '_num_examples'),
+    'Precision': ('_true_positives', '_positives'),
+    'Recall': ('_true_positives', '_positives'),
+    'Frequency': ('_n', '_elapsed'),
+    # the lists of the batch outputs are concatenated
+    'EpochMetric': ('_predictions', '_targets'),
+}
+
+# the attributes set by the first update, kept if the merged metric wasn't updated
+_IGNITE_INFERRED_ATTRS = ('_type', '_num_classes')
+
+
+def _ignite_leaves(metric, leaves=None):
+    """The metrics a MetricsLambda is computed from, each one once and in the same order."""
+    leaves = [] if leaves is None else leaves
+    if isinstance(metric, torch_ignite.metrics.MetricsLambda):
+        for arg in metric.args:
+            if isinstance(arg, torch_ignite.metrics.Metric):
+                _ignite_leaves(arg, leaves)
+    elif not any(leaf is metric for leaf in leaves):
+        leaves.append(metric)
+    return leaves
+
+
+def _ignite_state(metric):
+    if isinstance(metric, torch_ignite.metrics.MetricsLambda):
+        return [_ignite_state(leaf) for leaf in _ignite_leaves(metric)]
+    names = None
+    for cls in type(metric).__mro__:
+        if cls.__name__ in _IGNITE_SUM_STATES:
+            names = _IGNITE_SUM_STATES[cls.__name__]
+            break
+    if names is None or (vars(metric).get('_is_multilabel') and
+                         not vars(metric).get('_average')):
+        # running averages, custom accumulations and the multilabel precision per sample
+        raise NotImplementedError('{} can not be merged'.format(type(metric).__name__))
+    state = {name: getattr(metric, name) for name in names}
+    # ignite metrics return a function for any missing attribute
+    state.update({name: vars(metric)[name] for name in _IGNITE_INFERRED_ATTRS
+                  if vars(metric).get(name) is not None})
+    return state
+
+
+def _ignite_merge(metric, state):
+    if isinstance(metric, torch_ignite.metrics.MetricsLambda):
+        for leaf, leaf_state in zip(_ignite_leaves(metric), state):
+            _ignite_merge(leaf, leaf_state)
+        return
+    for name, value in state.items():
+        if name in _IGNITE_INFERRED_ATTRS:
+            if vars(metric).get(name) is None:
+                setattr(metric, name, value)
+        else:
+            setattr(metric, name, getattr(metric, name) + value)
+
 
 class WrapPyTorchMetric(Metric):
 
+    def _metric_module(self):
+        return torch_ignite.metrics
+
     def update(self, preds, labels=None, sample_weight=None):
         if self._single_output:
             output = torch.as_tensor(preds)
@@ -296,9 +363,18 @@ class WrapPyTorchMetric(Metric):
     def result(self):
         return self._metric.compute()
 
+    def state(self):
+        return _ignite_state(self._metric)
+
+    def merge(self, state):
+        _ignite_merge(self._metric, state)
+
 
 class WrapMXNetMetric(Metric):
 
+    def _metric_module(self):
+        return mx.metric
+
     def update(self, preds, labels=None, sample_weight=None):
         preds = mx.nd.array(preds)
         labels = mx.nd.array(labels)
@@ -311,6 +387,48 @@ class WrapMXNetMetric(Metric):
         acc_name, acc = self._metric.get()
         return acc
 
+    def state(self):
+        metric = self._metric
+        if isinstance(metric, mx.metric.PearsonCorrelation) and metric.average == 'micro':
+            # the running moments of Welford's algorithm don't add up
+            raise NotImplementedError('PearsonCorrelation can not be merged with average micro')
+        state = {name: value for name, value in vars(metric).items() if name in
+                 ('sum_metric', 'num_inst', 'global_sum_metric', 'global_num_inst',
+                  'lcm', 'gcm', 'k')}
+        # the binary statistics of F1 and MCC
+        for name in ('metrics', '_metrics'):
+            if hasattr(metric, name):
+                state[name] = dict(vars(getattr(metric, name)))
+        return state
+
+    def merge(self, state):
+        metric = self._metric
+        if 'k' in state and state['k'] > metric.k:
+            # PCC confusion matrices grow with the largest class seen
+            metric._grow(state['k'] - metric.k)
+        for name, value in state.items():
+            if name == 'k':
+                continue
+            if name in ('metrics', '_metrics'):
+                stats = getattr(metric, name)
+                for stat, stat_value in value.items():
+                    setattr(stats, stat, getattr(stats, stat) + stat_value)
+            elif name in ('lcm', 'gcm'):
+                pad = metric.k - value.shape[0]
+                setattr(metric, name, getattr(metric, name) + np.pad(value, ((0, pad), (0, pad))))
+            else:
+                setattr(metric, name, getattr(metric, name) + value)
+
+        # the micro averages are computed from the binary statistics
+        if isinstance(metric, mx.metric.F1) and metric.average == 'micro':
+            metric.sum_metric = metric.metrics.fscore * metric.metrics.total_examples
+            metric.global_sum_metric = \
+                metric.metrics.global_fscore * metric.metrics.global_total_examples
+        elif isinstance(metric, mx.metric.MCC) and metric._average == 'micro':
+            metric.sum_metric = metric._metrics.matthewscc() * metric._metrics.total_examples
+            metric.global_sum_metric = metric._metrics.matthewscc(use_global=True) * \
+                metric._metrics.global_total_examples
+
 def _topk_shape_validate(preds, labels):
     # preds shape can be Nxclass_num or class_num(N=1 by default)
     # it's more suitable for 'Accuracy' with preds shape Nx1(or 1) output from argmax
@@ -360,7 +478,7 @@ class MxnetTopK(Metric):
         preds, labels = _topk_shape_validate(preds, labels)
         preds = preds.argsort()[..., -self.k:]
         if self.k == 1:
-            correct = accuracy_score(preds, labels, normalize=False)
+            correct = sklearn_metrics.accuracy_score(preds, labels, normalize=False)
             self.num_correct += correct
 
         else:
@@ -384,6 +502,13 @@ class MxnetTopK(Metric):
         else:
             return self.num_correct / self.num_sample
 
+    def state(self):
+        return {'num_correct': self.num_correct, 'num_sample': self.num_sample}
+
+    def merge(self, state):
+        self.num_correct += state['num_correct']
+        self.num_sample += state['num_sample']
+
 @metric_registry('topk', 'tensorflow')
 class TensorflowTopK(Metric):
     """The class of calculating topk metric, which usually is used in classification.
@@ -426,3 +551,607 @@ class TensorflowTopK(Metric):
         else:
             return self.num_correct / self.num_sample
 
+    def state(self):
+        return {'num_correct': self.num_correct, 'num_sample': self.num_sample}
+
+    def merge(self, state):
+        self.num_correct += state['num_correct']
+        self.num_sample += state['num_sample']
+
+
+def _to_numpy(array):
+    """Convert the framework tensors to numpy arrays without importing the framework."""
+    if hasattr(array, 'asnumpy'):
+        # mxnet NDArray
+        return array.asnumpy()
+    if hasattr(array, 'detach'):
+        # pytorch Tensor
+        return array.detach().cpu().numpy()
+    return np.asarray(array)
+
+
+def _add_exact(partials, value):
+    """Add value to the exact sum held by partials, the non-overlapping floats of
+       Shewchuk's algorithm used by math.fsum. The sum is exact whatever the order the
+       values are added in, so the metrics merged from shards give the same result.
+    """
+    value = float(value)
+    i = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[i] = low
+            i += 1
+        value = high
+    partials[i:] = [value]
+
+
+class _NumpyMetric(Metric):
+    """The base class of the metrics computed with numpy from the sufficient statistics
+       of the batches, listed in _state_names. The float sums are lists of partials added
+       with _add_exact, the counts are ints.
+    """
+
+    _state_names = ()
+    _exact_sums = ()
+    # the arguments of the framework metrics which don't change the result
+    _ignored_args = ('name', 'dtype', 'output_names', 'label_names', 'device')
+
+    def __init__(self, **kwargs):
+        unsupported = sorted(set(kwargs) - set(self._ignored_args))
+        assert not unsupported, '{} doesn\'t support the arguments {}, the framework ' \
+            'metric of METRICS(framework, native=True) may'.format(
+                type(self).__name__, unsupported)
+        self.reset()
+
+    def reset(self):
+        for name in self._state_names:
+            setattr(self, name, [] if name in self._exact_sums else 0)
+
+    def state(self):
+        return {name: copy.copy(getattr(self, name)) for name in self._state_names}
+
+    def merge(self, state):
+        for name in self._state_names:
+            if name in self._exact_sums:
+                for partial in state[name]:
+                    _add_exact(getattr(self, name), partial)
+            else:
+                setattr(self, name, getattr(self, name) + state[name])
+
+
+def _match_labels(preds, labels, axis=1):
+    """The class of highest score along axis if preds holds the score of each class, and
+       the labels in the shape of preds.
+    """
+    preds = _to_numpy(preds)
+    labels = _to_numpy(labels)
+    if preds.ndim == labels.ndim + 1 or (preds.ndim == 2 and labels.ndim == 2 and
+                                         labels.shape[1] == 1 and preds.shape[1] > 1):
+        preds = preds.argmax(axis=axis)
+    return preds.reshape(-1), labels.reshape(-1)
+
+
+@metric_registry('Accuracy', 'tensorflow, mxnet, pytorch')
+class Accuracy(_NumpyMetric):
+    """The fraction of the predictions equal to the labels. The predicted class is the
+       one of highest score if preds holds the score of each class.
+
+    Args:
+        axis (int, optional): The axis of the class scores in preds.
+
+    """
+
+    _state_names = ('num_correct', 'num_sample')
+
+    def __init__(self, axis=1, **kwargs):
+        self.axis = axis
+        super(Accuracy, self).__init__(**kwargs)
+
+    def update(self, preds, labels, sample_weight=None):
+        preds, labels = _match_labels(preds, labels, self.axis)
+        assert preds.shape == labels.shape, 'labels should have one value per prediction'
+        self.num_correct += int(np.sum(preds == labels))
+        self.num_sample += labels.size
+
+    def result(self):
+        if self.num_sample == 0:
+            logger.warning("sample num is 0 can't calculate accuracy")
+            return 0
+        return self.num_correct / self.num_sample
+
+
+@metric_registry('Loss', 'tensorflow, mxnet, pytorch')
+class Loss(_NumpyMetric):
+    """The mean of the loss values output by the model, the labels are ignored.
+
+    """
+
+    _state_names = ('sum', 'num_sample')
+    _exact_sums = ('sum',)
+
+    def update(self, preds, labels=None, sample_weight=None):
+        preds = _to_numpy(preds).astype(np.float64)
+        _add_exact(self.sum, np.sum(preds))
+        self.num_sample += preds.size
+
+    def result(self):
+        if self.num_sample == 0:
+            logger.warning("sample num is 0 can't calculate loss")
+            return 0
+        return math.fsum(self.sum) / self.num_sample
+
+
+class _MeanError(_NumpyMetric):
+    """The mean of the element wise errors between the predictions and the labels, or
+       the mean of the results of the batches if _batch_average is set.
+    """
+
+    _state_names = ('sum', 'num_sample', 'batch_sum', 'num_batch')
+    _exact_sums = ('sum', 'batch_sum')
+    _batch_average = False
+
+    @abstractmethod
+    def _errors(self, preds, labels):
+        raise NotImplementedError
+
+    def _reduce(self, mean_error):
+        """The result from the mean of the errors."""
+        return mean_error
+
+    def update(self, preds, labels, sample_weight=None):
+        preds = _to_numpy(preds).astype(np.float64)
+        labels = _to_numpy(labels).astype(np.float64)
+        assert preds.size == labels.size, 'labels should have one value per prediction'
+        error_sum = np.sum(self._errors(preds.reshape(-1), labels.reshape(-1)))
+        _add_exact(self.sum, error_sum)
+        self.num_sample += preds.size
+        if self._batch_average and preds.size > 0:
+            _add_exact(self.batch_sum, self._reduce(error_sum / preds.size))
+            self.num_batch += 1
+
+    def result(self):
+        if self.num_sample == 0:
+            logger.warning("sample num is 0 can't calculate {}".format(type(self).__name__))
+            return 0
+        if self._batch_average:
+            return math.fsum(self.batch_sum) / self.num_batch
+        return self._reduce(math.fsum(self.sum) / self.num_sample)
+
+
+@metric_registry('MAE', 'tensorflow, pytorch')
+class MAE(_MeanError):
+    """The mean absolute error.
+
+    """
+
+    def _errors(self, preds, labels):
+        return np.abs(preds - labels)
+
+
+@metric_registry('MSE', 'tensorflow, pytorch')
+class MSE(_MeanError):
+    """The mean squared error.
+
+    """
+
+    def _errors(self, preds, labels):
+        return np.square(preds - labels)
+
+
+@metric_registry('RMSE', 'tensorflow, pytorch')
+class RMSE(MSE):
+    """The root mean squared error.
+
+    """
+
+    def _reduce(self, mean_error):
+        return math.sqrt(mean_error)
+
+
+@metric_registry('MAE', 'mxnet')
+class MXNetMAE(MAE):
+    """The mean absolute error averaged over the batches like mxnet.metric.MAE.
+
+    """
+
+    _batch_average = True
+
+
+@metric_registry('MSE', 'mxnet')
+class MXNetMSE(MSE):
+    """The mean squared error averaged over the batches like mxnet.metric.MSE.
+
+    """
+
+    _batch_average = True
+
+
+@metric_registry('RMSE', 'mxnet')
+class MXNetRMSE(RMSE):
+    """The root mean squared error averaged over the batches like mxnet.metric.RMSE.
+
+    """
+
+    _batch_average = True
+
+
+def _f1_score(true_positives, false_positives, false_negatives):
+    denominator = 2 * true_positives + false_positives + false_negatives
+    if denominator == 0:
+        return 0.
+    return 2 * true_positives / denominator
+
+
+@metric_registry('F1', 'tensorflow, pytorch')
+class F1(_NumpyMetric):
+    """The F1 score of the binary classification. The predicted class is the one of
+       highest score if preds holds the score of each class, otherwise the predictions are
+       positive from 0.5.
+
+    Args:
+        average (string, optional): 'micro' for the F1 score over all the samples, 'macro'
+                                    for the mean of the F1 scores of the batches.
+
+    """
+
+    _state_names = ('true_positives', 'false_positives', 'false_negatives',
+                    'batch_sum', 'num_batch')
+    _exact_sums = ('batch_sum',)
+
+    def __init__(self, average='micro', **kwargs):
+        assert average in ('micro', 'macro'), 'average should be micro or macro'
+        self.average = average
+        super(F1, self).__init__(**kwargs)
+
+    def update(self, preds, labels, sample_weight=None):
+        preds, labels = _match_labels(preds, labels)
+        assert preds.shape == labels.shape, 'labels should have one value per prediction'
+        preds = preds >= 0.5
+        labels = labels.astype(bool)
+        true_positives = int(np.sum(preds & labels))
+        false_positives = int(np.sum(preds & ~labels))
+        false_negatives = int(np.sum(~preds & labels))
+        self.true_positives += true_positives
+        self.false_positives += false_positives
+        self.false_negatives += false_negatives
+        if self.average == 'macro':
+            _add_exact(self.batch_sum,
+                       _f1_score(true_positives, false_positives, false_negatives))
+            self.num_batch += 1
+
+    def result(self):
+        if self.average == 'macro':
+            if self.num_batch == 0:
+                return 0.
+            return math.fsum(self.batch_sum) / self.num_batch
+        return _f1_score(self.true_positives, self.false_positives, self.false_negatives)
+
+
+@metric_registry('F1', 'mxnet')
+class MXNetF1(F1):
+    """The F1 score of the binary classification, by default the mean of the F1 scores of
+       the batches like mxnet.metric.F1.
+
+    """
+
+    def __init__(self, average='macro', **kwargs):
+        super(MXNetF1, self).__init__(average, **kwargs)
+
+
+@metric_registry('AUC', 'tensorflow, mxnet, pytorch')
+class AUC(_NumpyMetric):
+    """The area under the ROC curve of the binary classification, approximated with the
+       true and false positive rates at num_thresholds thresholds evenly spaced over
+       [0, 1] like tf.keras.metrics.AUC. Only the histograms of the positive and negative
+       scores over the thresholds are accumulated.
+
+    Args:
+        num_thresholds (int, optional): The number of thresholds, more than 1.
+        curve (string, optional): Only 'ROC' is supported.
+        summation_method (string, optional): Only 'interpolation' is supported.
+
+    """
+
+    _state_names = ('positives', 'negatives')
+
+    def __init__(self, num_thresholds=200, curve='ROC', summation_method='interpolation',
+                 **kwargs):
+        assert num_thresholds > 1, 'num_thresholds should be more than 1'
+        assert curve == 'ROC' and summation_method == 'interpolation', \
+            'only the interpolated ROC AUC is supported, the framework metric of ' \
+            'METRICS(framework, native=True) supports the others'
+        epsilon = 1e-7
+        self.thresholds = np.array(
+            [0. - epsilon] +
+            [(i + 1) / (num_thresholds - 1) for i in range(num_thresholds - 2)] +
+            [1. + epsilon], dtype=np.float32)
+        super(AUC, self).__init__(**kwargs)
+
+    def reset(self):
+        self.positives = np.zeros(len(self.thresholds) + 1, dtype=np.int64)
+        self.negatives = np.zeros(len(self.thresholds) + 1, dtype=np.int64)
+
+    def update(self, preds, labels, sample_weight=None):
+        preds = _to_numpy(preds).astype(np.float32).reshape(-1)
+        labels = _to_numpy(labels).reshape(-1).astype(bool)
+        assert preds.shape == labels.shape, 'labels should have one value per prediction'
+        # the number of thresholds each score is above
+        bins = np.searchsorted(self.thresholds, preds, side='left')
+        self.positives += np.bincount(bins[labels], minlength=len(self.positives))
+        self.negatives += np.bincount(bins[~labels], minlength=len(self.negatives))
+
+    def result(self):
+        # the samples above each threshold
+        true_positives = np.cumsum(self.positives[::-1])[::-1][1:]
+        false_positives = np.cumsum(self.negatives[::-1])[::-1][1:]
+        num_positives, num_negatives = self.positives.sum(), self.negatives.sum()
+        if num_positives == 0 or num_negatives == 0:
+            logger.warning("AUC needs positive and negative samples")
+            return 0.
+        tpr = true_positives / num_positives
+        fpr = false_positives / num_negatives
+        return float(np.sum((fpr[:-1] - fpr[1:]) * (tpr[:-1] + tpr[1:]) / 2))
+
+
+class _RowBuffer(object):
+    """Rows of floats appended to a preallocated array, whose capacity doubles when full."""
+
+    def __init__(self, width, capacity=1024):
+        self._rows = np.empty((capacity, width), dtype=np.float64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self._rows.shape[1])
+        end = self._size + len(rows)
+        if end > len(self._rows):
+            grown = np.empty((max(end, 2 * len(self._rows)), self._rows.shape[1]))
+            grown[:self._size] = self._rows[:self._size]
+            self._rows = grown
+        self._rows[self._size:end] = rows
+        self._size = end
+
+    @property
+    def rows(self):
+        return self._rows[:self._size]
+
+
+def _box_ious(boxes, gt_boxes, iscrowd):
+    """The IoU of each pair of [ymin, xmin, ymax, xmax] boxes, the union being the
+       detection area for the crowd ground truth like in COCO.
+    """
+    height = np.minimum(boxes[:, 2], gt_boxes[:, 2]) - np.maximum(boxes[:, 0], gt_boxes[:, 0])
+    width = np.minimum(boxes[:, 3], gt_boxes[:, 3]) - np.maximum(boxes[:, 1], gt_boxes[:, 1])
+    intersection = np.where((height > 0) & (width > 0), height * width, 0.)
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    gt_area = (gt_boxes[:, 2] - gt_boxes[:, 0]) * (gt_boxes[:, 3] - gt_boxes[:, 1])
+    union = np.where(iscrowd, area, area + gt_area - intersection)
+    return np.divide(intersection, union, out=np.zeros_like(union), where=union > 0)
+
+
+_COCO_AREA_RANGES = {'all': (0, 1e5 ** 2),
+                     'small': (0, 32 ** 2),
+                     'medium': (32 ** 2, 96 ** 2),
+                     'large': (96 ** 2, 1e5 ** 2)}
+
+
+@metric_registry('mAP', 'tensorflow, mxnet, pytorch')
+class mAP(Metric):
+    """The mean average precision of the object detection over the classes and the IoU
+       thresholds, computed like the COCO protocol of pycocotools with the 101 point
+       interpolated precision. The areas are the box areas, the crowd ground truths and the
+       ground truths out of the area range are ignored.
+
+       preds is the tuple of the (num_detections, boxes, scores, classes) batches of the
+       object detection models, num_detections being optional. labels is the tuple of the
+       (boxes, classes) or (boxes, classes, iscrowd) of the ground truths of each image.
+       The boxes are [ymin, xmin, ymax, xmax].
+
+    Args:
+        iou_thresholds (list, optional): The IoU thresholds, defaults to 0.5:0.05:0.95.
+        area_range (string or tuple, optional): 'all', 'small', 'medium', 'large' or the
+                                                (min, max) area of the boxes evaluated.
+        max_detections (int, optional): The detections of highest score evaluated for each
+                                        image and class.
+
+    """
+
+    def __init__(self, iou_thresholds=None, area_range='all', max_detections=100):
+        if iou_thresholds is None:
+            iou_thresholds = np.linspace(.5, .95, 10)
+        self.iou_thresholds = np.asarray(iou_thresholds, dtype=np.float64).reshape(-1)
+        if isinstance(area_range, str):
+            assert area_range in _COCO_AREA_RANGES, \
+                'area_range should be one of {}'.format(list(_COCO_AREA_RANGES))
+            area_range = _COCO_AREA_RANGES[area_range]
+        self.area_range = tuple(area_range)
+        self.max_detections = max_detections
+        self.recall_thresholds = np.linspace(.0, 1., 101)
+        self.reset()
+
+    def reset(self):
+        # the rows are image, class, score or iscrowd, ymin, xmin, ymax, xmax
+        self.detections = _RowBuffer(7)
+        self.groundtruths = _RowBuffer(7)
+        self.num_images = 0
+
+    def update(self, preds, labels, sample_weight=None):
+        if len(preds) == 4:
+            num_detections = _to_numpy(preds[0]).reshape(-1)
+            preds = preds[1:]
+        else:
+            num_detections = None
+        boxes, scores, classes = [_to_numpy(pred) for pred in preds]
+        assert len(labels) in (2, 3), 'labels should be (boxes, classes[, iscrowd])'
+        assert len(labels[0]) == len(boxes), 'labels should have the ground truths of each image'
+
+        for i in range(len(boxes)):
+            image = self.num_images + i
+            num = len(scores[i]) if num_detections is None else int(num_detections[i])
+            self.detections.append(np.column_stack(
+                [np.full(num, image), classes[i][:num], scores[i][:num],
+                 boxes[i][:num].reshape(-1, 4)]))
+
+            gt_boxes = _to_numpy(labels[0][i]).reshape(-1, 4)
+            iscrowd = _to_numpy(labels[2][i]).reshape(-1) if len(labels) == 3 else 0
+            self.groundtruths.append(np.column_stack(
+                [np.full(len(gt_boxes), image), _to_numpy(labels[1][i]).reshape(-1),
+                 np.broadcast_to(iscrowd, len(gt_boxes)), gt_boxes]))
+        self.num_images += len(boxes)
+
+    def state(self):
+        return {'detections': self.detections.rows.copy(),
+                'groundtruths': self.groundtruths.rows.copy(),
+                'num_images': self.num_images}
+
+    def merge(self, state):
+        for name in ('detections', 'groundtruths'):
+            rows = state[name].copy()
+            rows[:, 0] += self.num_images
+            getattr(self, name).append(rows)
+        self.num_images += state['num_images']
+
+    def _match(self, ious, pair_dets, pair_gts, det_groups, det_ranks, gt_groups,
+               gt_ignored, gt_crowd, num_dets):
+        """Greedily match the detections of each image and class by decreasing score to
+           the free ground truth of highest IoU above each threshold, preferring the ground
+           truths not ignored. The ground truths with a match are free only if crowd.
+           The groups of the same number of ground truths rounded up to a power of 2 are
+           matched together, one detection rank at a time.
+
+        Returns:
+            tuple: The (thresholds, detections) matched and matched to an ignored ground
+                   truth masks.
+        """
+        num_thresholds = len(self.iou_thresholds)
+        thresholds = np.minimum(self.iou_thresholds, 1 - 1e-10)[:, None]
+        matched = np.zeros((num_thresholds, num_dets), dtype=bool)
+        matched_ignored = np.zeros((num_thresholds, num_dets), dtype=bool)
+        if len(ious) == 0:
+            return matched, matched_ignored
+
+        num_groups = max(det_groups.max(), gt_groups.max()) + 1
+        group_gts = np.bincount(gt_groups, minlength=num_groups)
+        group_dets = np.bincount(det_groups, minlength=num_groups)
+        gt_positions = np.arange(len(gt_groups)) - (np.cumsum(group_gts) - group_gts)[gt_groups]
+        pair_positions = gt_positions[pair_gts]
+        widths = 2 ** np.ceil(np.log2(np.maximum(group_gts, 1))).astype(np.int64)
+
+        for width in np.unique(widths[(group_gts > 0) & (group_dets > 0)]):
+            groups = np.nonzero((widths == width) & (group_gts > 0) & (group_dets > 0))[0]
+            # the groups with detections at a rank are the first ones
+            groups = groups[np.argsort(-group_dets[groups], kind='stable')]
+            active = len(groups) - np.searchsorted(group_dets[groups][::-1],
+                                                   np.arange(group_dets[groups[0]]),
+                                                   side='right')
+            local = np.full(num_groups, -1)
+            local[groups] = np.arange(len(groups))
+
+            group_ious = np.full((len(groups), group_dets[groups[0]], width), -1.)
+            pairs = local[det_groups[pair_dets]] >= 0
+            group_ious[local[det_groups[pair_dets[pairs]]], det_ranks[pair_dets[pairs]],
+                       pair_positions[pairs]] = ious[pairs]
+            dets = np.zeros(group_ious.shape[:2], dtype=np.int64)
+            in_groups = local[det_groups] >= 0
+            dets[local[det_groups[in_groups]], det_ranks[in_groups]] = \
+                np.nonzero(in_groups)[0]
+            ignored = np.zeros((len(groups), width), dtype=bool)
+            crowd = np.zeros((len(groups), width), dtype=bool)
+            in_groups = local[gt_groups] >= 0
+            ignored[local[gt_groups[in_groups]], gt_positions[in_groups]] = \
+                gt_ignored[in_groups]
+            crowd[local[gt_groups[in_groups]], gt_positions[in_groups]] = gt_crowd[in_groups]
+
+            taken = np.zeros((len(groups), num_thresholds, width), dtype=bool)
+            for rank, num in enumerate(active):
+                iou = group_ious[:num, rank, None, :]
+                valid = (iou >= thresholds) & ~(taken[:num] & ~crowd[:num, None, :])
+                preferred = valid & ~ignored[:num, None, :]
+                candidates = np.where(preferred.any(axis=-1, keepdims=True), preferred, valid)
+                # the last ground truth of highest IoU is matched like in pycocotools
+                best = width - 1 - np.argmax(np.where(candidates, iou, -1.)[..., ::-1],
+                                             axis=-1)
+                rows, lanes = np.nonzero(candidates.any(axis=-1))
+                gts = best[rows, lanes]
+                taken[rows, lanes, gts] = True
+                matched[lanes, dets[rows, rank]] = True
+                matched_ignored[lanes, dets[rows, rank]] = ignored[rows, gts]
+        return matched, matched_ignored
+
+    def result(self):
+        detections, groundtruths = self.detections.rows, self.groundtruths.rows
+        min_area, max_area = self.area_range
+
+        # group the boxes by image and class
+        _, groups = np.unique(np.concatenate([detections[:, :2], groundtruths[:, :2]]),
+                              axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+        det_groups, gt_groups = groups[:len(detections)], groups[len(detections):]
+
+        # the detections by group and decreasing score, up to max_detections per group
+        order = np.lexsort((np.arange(len(detections)), -detections[:, 2], det_groups))
+        det_groups = det_groups[order]
+        det_ranks = np.arange(len(order)) - np.searchsorted(det_groups, det_groups, 'left')
+        kept = det_ranks < self.max_detections
+        detections = detections[order][kept]
+        det_groups, det_ranks = det_groups[kept], det_ranks[kept]
+        order = np.argsort(gt_groups, kind='stable')
+        groundtruths, gt_groups = groundtruths[order], gt_groups[order]
+
+        def _out_of_range(boxes):
+            area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+            return (area < min_area) | (area > max_area)
+
+        gt_crowd = groundtruths[:, 2] != 0
+        gt_ignored = gt_crowd | _out_of_range(groundtruths[:, 3:])
+
+        # the IoU of each detection with the ground truths of its group
+        num_groups = groups.max() + 1 if len(groups) else 0
+        group_gts = np.bincount(gt_groups, minlength=num_groups)
+        pair_counts = group_gts[det_groups]
+        pair_dets = np.repeat(np.arange(len(detections)), pair_counts)
+        pair_gts = np.arange(len(pair_dets)) - np.repeat(np.cumsum(pair_counts) - pair_counts,
+                                                         pair_counts)
+        pair_gts += np.repeat((np.cumsum(group_gts) - group_gts)[det_groups], pair_counts)
+        ious = _box_ious(detections[pair_dets, 3:], groundtruths[pair_gts, 3:],
+                         gt_crowd[pair_gts])
+
+        matched, matched_ignored = self._match(ious, pair_dets, pair_gts, det_groups,
+                                               det_ranks, gt_groups, gt_ignored, gt_crowd,
+                                               len(detections))
+        det_ignored = matched_ignored | (~matched & _out_of_range(detections[:, 3:]))
+
+        # the detections of each class by decreasing score, then image and rank
+        order = np.lexsort((det_ranks, detections[:, 0], -detections[:, 2], detections[:, 1]))
+        det_classes = detections[order, 1]
+        true_positives = (matched & ~det_ignored)[:, order]
+        false_positives = (~matched & ~det_ignored)[:, order]
+
+        precisions = []
+        classes, num_positives = np.unique(groundtruths[~gt_ignored, 1], return_counts=True)
+        for cls, positives in zip(classes, num_positives):
+            start = np.searchsorted(det_classes, cls, side='left')
+            end = np.searchsorted(det_classes, cls, side='right')
+            tp = np.cumsum(true_positives[:, start:end], axis=1, dtype=np.float64)
+            fp = np.cumsum(false_positives[:, start:end], axis=1, dtype=np.float64)
+            recall = tp / positives
+            # the precision envelope, the highest precision at a higher recall
+            precision = np.maximum.accumulate(
+                (tp / (fp + tp + np.spacing(1)))[:, ::-1], axis=1)[:, ::-1]
+            for i in range(len(self.iou_thresholds)):
+                indices = np.searchsorted(recall[i], self.recall_thresholds, side='left')
+                interpolated = np.zeros(len(self.recall_thresholds))
+                valid = indices < end - start
+                interpolated[valid] = precision[i, indices[valid]]
+                precisions.append(interpolated)
+
+        if not precisions:
+            logger.warning("mAP needs ground truths not ignored")
+            return 0.
+        return float(np.mean(precisions))
@@ -16,6 +16,7 @@
 # limitations under the License.
 
 from abc import abstractmethod
+import math
 import time
 import numpy as np
 import tracemalloc
@@ -129,6 +130,103 @@ class ModelSizeMeasure(Measurer):
         self._result_list.append(model_size)
 
 
+def wilson_interval(accuracy, samples, z):
+    """The Wilson score interval of an accuracy measured on samples.
+
+    Args:
+        accuracy (float): The proportion of correct samples.
+        samples (int): The number of samples evaluated.
+        z (float): The standard normal quantile of the confidence level.
+
+    Returns:
+        tuple: (lower, upper) bound, None if accuracy is not a proportion.
+    """
+    if not np.isscalar(accuracy) or not 0 <= accuracy <= 1 or samples <= 0:
+        return None
+    center = accuracy + z * z / (2 * samples)
+    margin = z * math.sqrt(accuracy * (1 - accuracy) / samples + z * z / (4 * samples * samples))
+    denominator = 1 + z * z / samples
+    return max((center - margin) / denominator, 0.), min((center + margin) / denominator, 1.)
+
+
+class EvaluationRejected(Exception):
+    """Raised by SequentialEvaluation when the running accuracy shows the evaluated model
+       can't reach the accuracy target.
+
+    Args:
+        accuracy (float): The running accuracy when the evaluation is rejected.
+        samples (int): The number of samples evaluated.
+    """
+
+    def __init__(self, accuracy, samples):
+        super(EvaluationRejected, self).__init__(
+            'accuracy {:.4f} after {} samples can not reach the target'.format(accuracy, samples))
+        self.accuracy = accuracy
+        self.samples = samples
+
+
+class SequentialEvaluation(object):
+    """Check the running accuracy during evaluation and reject the model once the accuracy
+       target is out of reach with the given confidence.
+
+       The accuracy is taken as the proportion of correct samples. Once the Wilson score
+       upper bound of the accuracy of the remaining samples, combined with the accuracy of
+       the evaluated ones, is below the target, EvaluationRejected is raised.
+
+    Args:
+        target (float): The accuracy target.
+        batch_size (int): The number of samples per batch.
+        total (int, optional): The total number of samples to evaluate, None if unknown.
+        interval (int, optional): The number of batches between two checks.
+        confidence (float, optional): The one-sided confidence level of the bound.
+        min_samples (int, optional): The number of samples evaluated before the first check.
+    """
+
+    def __init__(self, target, batch_size, total=None, interval=10, confidence=0.99,
+                 min_samples=500):
+        from scipy.stats import norm
+        self.target = target
+        self.batch_size = batch_size
+        self.total = total
+        self.interval = interval
+        self.z = norm.ppf(confidence)
+        self.min_samples = min_samples
+        self.batches = 0
+
+    @property
+    def samples(self):
+        return self.batches * self.batch_size
+
+    def upper_bound(self, accuracy):
+        """The upper confidence bound of the final accuracy."""
+        n, z = self.samples, self.z
+        if self.total is not None and self.total <= n:
+            return accuracy
+        bound = wilson_interval(accuracy, n, z)[1]
+        if self.total is None:
+            return bound
+        return (n * accuracy + (self.total - n) * bound) / self.total
+
+    def update(self, metric):
+        """Called by the adaptor after each evaluated batch.
+
+        Args:
+            metric (object): The metric updated with the batch.
+
+        Raises:
+            EvaluationRejected: If the accuracy target can't be reached.
+        """
+        self.batches += 1
+        if metric is None or self.batches % self.interval != 0 or \
+           self.samples < self.min_samples:
+            return
+        accuracy = metric.result()
+        if not np.isscalar(accuracy) or not 0 <= accuracy <= 1:
+            return
+        if self.upper_bound(accuracy) < self.target:
+            raise EvaluationRejected(float(accuracy), self.samples)
+
+
 class Objective(object):
     """The base class of objectives supported by lpot.
 
@@ -151,6 +249,24 @@ class Objective(object):
         self.val = None
         self.is_measure = is_measure
         self.measurer = None
+        self.rejected = False
+
+    @property
+    def measures_eval_func(self):
+        """Whether the measured value covers the whole evaluation function, e.g. its time or
+           peak memory, instead of going through the measurer passed to it.
+        """
+        return not self.is_measure and not isinstance(self.measurer, ModelSizeMeasure)
+
+    def accuracy_target(self, baseline):
+        """The lowest accuracy meeting the accuracy criterion.
+
+        Args:
+            baseline (tuple): The tuple saving FP32 baseline.
+        """
+        base_acc, _ = baseline
+        return base_acc - float(self.acc_goal) if not self.relative \
+            else base_acc * (1 - float(self.acc_goal))
 
     def compare(self, last, baseline):
         """The interface of comparing if metric reaches 
@@ -168,10 +284,7 @@ class Objective(object):
         else:
             last_measure = 0
 
-        base_acc, _ = baseline
-
-        acc_target = base_acc - float(self.acc_goal) if not self.relative \
-            else base_acc * (1 - float(self.acc_goal))
+        acc_target = self.accuracy_target(baseline)
         if acc >= acc_target and (last_measure == 0 or perf < last_measure):
             return True
         else:
@@ -186,12 +299,20 @@ class Objective(object):
         """
 
         self.measurer.reset()
-        if self.is_measure:
-            acc = eval_func(model, self.measurer)
-        else:
-           self.measurer.start()
-           acc = eval_func(model)
-           self.measurer.end()
+        self.rejected = False
+        try:
+            if self.is_measure:
+                acc = eval_func(model, self.measurer)
+            else:
+                self.measurer.start()
+                acc = eval_func(model)
+                self.measurer.end()
+        except EvaluationRejected as e:
+            # the measured value only covers the evaluated part of the dataset
+            if not self.is_measure:
+                self.measurer.end()
+            acc = e.accuracy
+            self.rejected = True
 
         self.val = acc, self.measurer.result()
         return self.val
@@ -18,10 +18,10 @@
 import os
 from pathlib import Path
 from datetime import datetime
-import pickle
 from .conf.config import Conf
 from .strategy import STRATEGIES
-from .utils import logger
+from .strategy.strategy import load_tuning_state
+from .utils import logger, trace
 from .utils.create_obj_from_config import create_dataset, create_dataloader
 from .data import DataLoader as DATALOADER
 from .data import DATASETS, TRANSFORMS
@@ -201,24 +201,31 @@ class Quantization(object):
         _resume = None
         # check if interrupted tuning procedure exists. if yes, it will resume the
         # whole auto tune process.
-        self.resume_file = os.path.abspath(os.path.expanduser(cfg.tuning.resume.path)) \
-                           if cfg.tuning.resume and cfg.tuning.resume.path else None
+        self.resume_file = os.path.abspath(os.path.expanduser(cfg.tuning.workspace.resume)) \
+                           if cfg.tuning.workspace and cfg.tuning.workspace.resume else None
         if self.resume_file:
             assert os.path.exists(self.resume_file), \
                 "The specified resume file {} doesn't exist!".format(self.resume_file)
-            with open(self.resume_file, 'rb') as f:
-                _resume = pickle.load(f).__dict__
-
-        self.strategy = STRATEGIES[strategy](
-            model,
-            self.conf,
-            self.calib_dataloader,
-            self.q_func,
-            self.eval_dataloader,
-            self.eval_func,
-            _resume)
-
-        self.strategy.traverse()
+            _resume = load_tuning_state(self.resume_file)
+
+        if cfg.tuning.trace:
+            trace.enable('lpot')
+        try:
+            with trace.span('tuning.create_strategy'):
+                self.strategy = STRATEGIES[strategy](
+                    model,
+                    self.conf,
+                    self.calib_dataloader,
+                    self.q_func,
+                    self.eval_dataloader,
+                    self.eval_func,
+                    _resume)
+
+            with trace.span('tuning.traverse'):
+                self.strategy.traverse()
+        finally:
+            if cfg.tuning.trace:
+                self._save_trace()
 
         if self.strategy.best_qmodel:
             logger.info(
@@ -232,6 +239,17 @@ class Quantization(object):
 
         return self.strategy.best_qmodel
 
+    def _save_trace(self):
+        """Write the trace of the tuning run to the workspace and log its summary."""
+        trace.disable()
+        trace_path = os.path.join(os.path.abspath(os.path.expanduser(
+            self.conf.usr_cfg.tuning.workspace.path)), 'trace.json')
+        Path(os.path.dirname(trace_path)).mkdir(exist_ok=True, parents=True)
+        trace.save(trace_path)
+        logger.info('Save the trace of the tuning to {}, open it in chrome://tracing or '
+                    'Perfetto.'.format(trace_path))
+        logger.info('Time spent per span:\n' + trace.format_summary(trace.summary()))
+
     def dataset(self, dataset_type, *args, **kwargs):
         return DATASETS(self.framework)[dataset_type](*args, **kwargs)
 
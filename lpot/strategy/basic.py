@@ -26,9 +26,13 @@ class BasicTuneStrategy(TuneStrategy):
     """The basic tuning strategy which tunes the low precision model with below order.
 
     1. modelwise tuning for all quantizable ops.
-    2. fallback tuning from bottom to top to decide the priority of which op has biggest impact
-       on accuracy.
+    2. fallback tuning to decide the priority of which op has biggest impact on accuracy.
+       By default the ops are fallen back in groups and only the groups recovering accuracy
+       are split further, see _group_fallback. With tuning.strategy.fallback_search set to
+       per_op, each op is fallen back alone from bottom to top.
     3. incremental fallback tuning by fallbacking multiple ops with the order got from #2.
+       With tuning.profile set, the ops profiled slower in int8 than in fp32 come first
+       among the ops of equal accuracy, and stay fallen back if the accuracy doesn't drop.
 
     Args:
         model (object):                        The FP32 model specified for low precision tuning.
@@ -84,6 +88,83 @@ class BasicTuneStrategy(TuneStrategy):
             eval_dataloader,
             eval_func,
             dicts)
+        # set while a fallback config of a group of ops is evaluated
+        self._probe = False
+
+    def _fallback(self, op_cfgs, op, fallback_dtype):
+        """Set the config of op in op_cfgs to the fallback dtype."""
+        op_cfgs['op'][op]['activation'].clear()
+        op_cfgs['op'][op]['activation']['dtype'] = fallback_dtype
+        if 'weight' in op_cfgs['op'][op]:
+            op_cfgs['op'][op]['weight'].clear()
+            op_cfgs['op'][op]['weight']['dtype'] = fallback_dtype
+
+    def _split_group(self, group):
+        """Split a group of ops by op type, or into two topological halves if all the ops
+           have the same type.
+        """
+        op_types = OrderedDict()
+        for op in group:
+            op_types.setdefault(op[1], []).append(op)
+        if len(op_types) > 1:
+            return list(op_types.values())
+        return [group[:len(group) // 2], group[len(group) // 2:]]
+
+    def _group_fallback(self, best_cfg, best_acc, fallback_dtype, ops):
+        """Adaptive group testing of the ops whose fallback recovers accuracy.
+
+           A group of ops is fallen back together. If the accuracy does not get better than
+           best_acc, none of its ops is harmful and the group is dropped, otherwise it is
+           split and each part is tested again, until single ops are isolated. With k
+           harmful ops out of N, this takes about k * log(N) trials instead of N.
+
+        Args:
+            best_cfg (dict): The best model-wise tuning config.
+            best_acc (float): Its accuracy.
+            fallback_dtype (string): The dtype to fall back to.
+            ops (list): The ops supporting fallback_dtype, in topological order.
+
+        Yields:
+            dict: The tuning config with a group of ops fallen back.
+
+        Returns:
+            OrderedDict: The accuracy with each isolated harmful op fallen back alone.
+        """
+        ops_acc = OrderedDict()
+        if not ops:
+            return ops_acc
+        groups = [list(ops)]
+        while groups:
+            group = groups.pop(0)
+            op_cfgs = copy.deepcopy(best_cfg)
+            for op in group:
+                self._fallback(op_cfgs, op, fallback_dtype)
+            # the fallback of a group only ranks its ops, it is not a result to accept
+            self._probe = len(group) > 1
+            yield op_cfgs
+            self._probe = False
+            acc, _ = self.last_tune_result
+            if acc <= best_acc:
+                continue
+            if len(group) == 1:
+                ops_acc[group[0]] = acc
+            else:
+                groups.extend(self._split_group(group))
+        return ops_acc
+
+    def stop(self, timeout, trials_count):
+        """Check if need to stop traversing the tuning space. The result of a group fallback
+           is never taken as the best result.
+        """
+        if not self._probe:
+            return super(BasicTuneStrategy, self).stop(timeout, trials_count)
+
+        del self.last_qmodel
+        logger.info('Group fallback result is: ' +
+                    ('[{:.4f}, {:.4f}]'.format(
+                        *self.last_tune_result) if self.last_tune_result else 'None'))
+        return (timeout.seconds != 0 and timeout.timed_out) or \
+               trials_count >= self.cfg.tuning.exit_policy.max_trials
 
     def next_tune_cfg(self):
         """The generator of yielding next tuning config to traverse by concrete strategies
@@ -123,52 +204,63 @@ class BasicTuneStrategy(TuneStrategy):
             if data_type in self.modelwise_tune_space["activation"]["dtype"]:
                 fallback_dtypes.append(data_type)
 
+        fallback_search = self.cfg.tuning.strategy.get('fallback_search', 'group')
         for fallback_dtype in fallback_dtypes:
-            logger.debug(
-                'Continue basic strategy by sorting opwise %s fallback priority' %
-                (fallback_dtype))
-            ops_acc = OrderedDict()
-            for op, configs in reversed(self.opwise_tune_cfgs.items()):
-                op_cfgs = copy.deepcopy(best_cfg)
-                for cfg in configs:
-                    if fallback_dtype == cfg['activation']['dtype']:
-                        op_cfgs['op'][op]['activation'].clear()
-                        op_cfgs['op'][op]['activation']['dtype'] = fallback_dtype
-                        if 'weight' in cfg:
-                            assert cfg['weight']['dtype'] == fallback_dtype
-                            op_cfgs['op'][op]['weight'].clear()
-                            op_cfgs['op'][op]['weight']['dtype'] = fallback_dtype
-                yield op_cfgs
-                acc, _ = self.last_tune_result
-                ops_acc[op] = acc
+            if fallback_search == 'group':
+                logger.debug(
+                    'Continue basic strategy by group testing opwise %s fallback priority' %
+                    (fallback_dtype))
+                ops = [op for op, configs in self.opwise_tune_cfgs.items()
+                       if any(cfg['activation']['dtype'] == fallback_dtype for cfg in configs)]
+                harmful = yield from self._group_fallback(best_cfg, best_acc, fallback_dtype, ops)
+                # the harmful ops first, then the others from bottom to top
+                ops_acc = OrderedDict(harmful)
+                for op in reversed(ops):
+                    ops_acc.setdefault(op, best_acc)
+            else:
+                logger.debug(
+                    'Continue basic strategy by sorting opwise %s fallback priority' %
+                    (fallback_dtype))
+                ops_acc = OrderedDict()
+                for op, configs in reversed(self.opwise_tune_cfgs.items()):
+                    op_cfgs = copy.deepcopy(best_cfg)
+                    for cfg in configs:
+                        if fallback_dtype == cfg['activation']['dtype']:
+                            op_cfgs['op'][op]['activation'].clear()
+                            op_cfgs['op'][op]['activation']['dtype'] = fallback_dtype
+                            if 'weight' in cfg:
+                                assert cfg['weight']['dtype'] == fallback_dtype
+                                op_cfgs['op'][op]['weight'].clear()
+                                op_cfgs['op'][op]['weight']['dtype'] = fallback_dtype
+                    yield op_cfgs
+                    acc, _ = self.last_tune_result
+                    ops_acc[op] = acc
 
             logger.debug(
                 'Continue basic strategy by incremental opwise %s fallback with priority' %
                 (fallback_dtype))
             op_cfgs = copy.deepcopy(best_cfg)
             if ops_acc is not None:
-                ordered_ops = sorted(ops_acc.keys(), key=lambda key: ops_acc[key], reverse=True)
+                # on equal accuracy, the ops with the least int8 speedup fall back first
+                ordered_ops = sorted(ops_acc.keys(),
+                                     key=lambda key: (ops_acc[key],
+                                                      -self.op_speedups.get(key, 1.)),
+                                     reverse=True)
                 for op in ordered_ops:
                     old_cfg = copy.deepcopy(op_cfgs['op'][op])
-                    op_cfgs['op'][op]['activation'].clear()
-                    op_cfgs['op'][op]['activation']['dtype'] = fallback_dtype
-                    if 'weight' in op_cfgs['op'][op]:
-                        op_cfgs['op'][op]['weight'].clear()
-                        op_cfgs['op'][op]['weight']['dtype'] = fallback_dtype
+                    self._fallback(op_cfgs, op, fallback_dtype)
                     yield op_cfgs
                     acc, _ = self.last_tune_result
-                    if acc <= best_acc:
+                    # an op slower in int8 stays fallen back if the accuracy doesn't drop
+                    slower = self.op_speedups.get(op, 1.) < 1.
+                    if acc < best_acc or (acc == best_acc and not slower):
                         op_cfgs['op'][op] = copy.deepcopy(old_cfg)
                     else:
                         best_acc = acc
 
                 op_cfgs = copy.deepcopy(best_cfg)
                 for op in ordered_ops:
-                    op_cfgs['op'][op]['activation'].clear()
-                    op_cfgs['op'][op]['activation']['dtype'] = fallback_dtype
-                    if 'weight' in op_cfgs['op'][op]:
-                        op_cfgs['op'][op]['weight'].clear()
-                        op_cfgs['op'][op]['weight']['dtype'] = fallback_dtype
+                    self._fallback(op_cfgs, op, fallback_dtype)
                     yield op_cfgs
 
         return
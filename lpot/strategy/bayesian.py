@@ -21,6 +21,7 @@ import numpy as np
 import copy
 from scipy.stats import norm
 from scipy.optimize import minimize
+from scipy.linalg import solve_triangular
 from sklearn.gaussian_process.kernels import Matern
 from sklearn.gaussian_process import GaussianProcessRegressor
 from ..utils import logger
@@ -74,6 +75,9 @@ class BayesianTuneStrategy(TuneStrategy):
     def __init__(self, model, conf, q_dataloader, q_func=None,
                  eval_dataloader=None, eval_func=None, dicts=None):
         self.bayes_opt = None
+        # the params of the last yielded tune config, registered with its result when the
+        # trial is added to the tuning history
+        self.pending_params = None
         super(
             BayesianTuneStrategy,
             self).__init__(
@@ -85,12 +89,49 @@ class BayesianTuneStrategy(TuneStrategy):
             eval_func,
             dicts)
 
-    def __getstate__(self):
-        for history in self.tuning_history:
-            if self._same_yaml(history['cfg'], self.cfg):
-                history['bayes_opt'] = self.bayes_opt
-        save_dict = super(BayesianTuneStrategy, self).__getstate__()
-        return save_dict
+    def _record_state(self):
+        state = super(BayesianTuneStrategy, self)._record_state()
+        state['bayes_opt'] = self.bayes_opt
+        return state
+
+    def _record_delta(self, history):
+        if self.pending_params is None or not history['tune_result']:
+            return None
+        return {'params': self.pending_params, 'target': history['tune_result'][0]}
+
+    def _replay_delta(self, delta):
+        self._init_bayes_opt()
+        self._register(delta['params'], delta['target'])
+
+    def _add_tuning_history(self, tune_cfg=None, tune_result=None, **kwargs):
+        if self.pending_params is not None and tune_result:
+            self._register(self.pending_params, tune_result[0])
+        super(BayesianTuneStrategy, self)._add_tuning_history(tune_cfg, tune_result, **kwargs)
+        self.pending_params = None
+
+    def _register(self, params, target):
+        try:
+            self.bayes_opt.register(params, target)
+        except KeyError:
+            logger.debug("This params has been registered before, will skip it!")
+
+    def _pbounds(self):
+        pbounds = {}
+        for op, configs in self.opwise_quant_cfgs.items():
+            if len(configs) > 1:
+                pbounds[op[0]] = (0, len(configs))
+        if len(self.calib_iter) > 1:
+            pbounds['calib_iteration'] = (0, len(self.calib_iter))
+        return pbounds
+
+    def _init_bayes_opt(self):
+        if self.bayes_opt is None:
+            if self.cfg.tuning.strategy.get('search_space', 'continuous') == 'discrete':
+                self.bayes_opt = DiscreteBayesianOptimization(
+                    pbounds=self._pbounds(), random_seed=self.cfg.tuning.random_seed)
+            else:
+                self.bayes_opt = BayesianOptimization(
+                    pbounds=self._pbounds(), random_seed=self.cfg.tuning.random_seed)
 
     def params_to_tune_configs(self, params):
         op_cfgs = {}
@@ -120,27 +161,19 @@ class BayesianTuneStrategy(TuneStrategy):
 
         """
         params = None
-        pbounds = {}
-        for op, configs in self.opwise_quant_cfgs.items():
-            if len(configs) > 1:
-                pbounds[op[0]] = (0, len(configs))
-        if len(self.calib_iter) > 1:
-            pbounds['calib_iteration'] = (0, len(self.calib_iter))
-        if len(pbounds) == 0:
+        if len(self._pbounds()) == 0:
             yield self.params_to_tune_configs(params)
             return
-        if self.bayes_opt is None:
-            self.bayes_opt = BayesianOptimization(
-                pbounds=pbounds, random_seed=self.cfg.tuning.random_seed)
+        self._init_bayes_opt()
         while True:
             params = self.bayes_opt.gen_next_params()
             logger.debug("Current params are: %s" % params)
+            self.pending_params = params
             yield self.params_to_tune_configs(params)
-            try:
-                self.bayes_opt._space.register(params, self.last_tune_result[0])
-            except KeyError:
-                logger.debug("This params has been registered before, will skip it!")
-                pass
+            # a config evaluated before isn't added to the tuning history again
+            if self.pending_params is not None and self.last_tune_result:
+                self._register(self.pending_params, self.last_tune_result[0])
+            self.pending_params = None
 
 # Util part
 # Bayesian opt acq function
@@ -443,6 +476,164 @@ class BayesianOptimization():
         )
         return self._space.array_to_params(suggestion)
 
+    def register(self, params, target):
+        self._space.register(params, target)
+
     def gen_next_params(self):
         next_params = self.suggest()
         return next_params
+
+
+class DiscreteBayesianOptimization():
+    """Bayesian optimization working natively on the per-op choice space.
+
+    Each param takes an integer choice index in [0, upper) of its pbounds. The GP uses an
+    exponentiated Hamming kernel on the choice indices, which suits categorical inputs.
+    Its hyperparameters are fixed, so the Cholesky factor of the kernel matrix is extended
+    in O(n^2) per registered point instead of refitting in O(n^3). The acquisition function
+    is maximized by hill climbing over single-param changes, where all neighbors of a point
+    are scored at once from its one-hot encoded match counts against the observations.
+
+    Args:
+        pbounds (dict): The param name to its (0, number of choices) bounds.
+        random_seed (int, optional): The random seed.
+        lengthscale (float, optional): The kernel lengthscale on the normalized Hamming
+                                       distance.
+        noise (float, optional): The observation noise added to the kernel diagonal.
+        kappa (float, optional): The exploration weight of the UCB acquisition function.
+        n_starts (int, optional): The number of hill climbing start points.
+        max_steps (int, optional): The maximum hill climbing steps from one start point.
+    """
+
+    def __init__(self, pbounds, random_seed=9527, lengthscale=0.5, noise=1e-6,
+                 kappa=2.576, n_starts=5, max_steps=100):
+        self._keys = sorted(pbounds)
+        self._choices = np.array([int(pbounds[key][1]) for key in self._keys], dtype=np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(self._choices)[:-1]]).astype(np.int64)
+        # the one-hot column -> its param index
+        self._column_dim = np.repeat(np.arange(self.dim), self._choices)
+        self._random = np.random.RandomState(random_seed)
+        self.lengthscale = lengthscale
+        self.noise = noise
+        self.kappa = kappa
+        self.n_starts = n_starts
+        self.max_steps = max_steps
+
+        self._params = np.empty((0, self.dim), dtype=np.int64)
+        self._encoded = np.empty((0, int(self._choices.sum())))
+        self._target = np.empty(0)
+        self._chol = np.empty((0, 0))
+        self._cache = {}
+
+    @property
+    def dim(self):
+        return len(self._keys)
+
+    @property
+    def max(self):
+        if len(self._target) == 0:
+            return {}
+        return {'target': self._target.max(),
+                'params': self._array_to_params(self._params[self._target.argmax()])}
+
+    def _array_to_params(self, x):
+        return dict(zip(self._keys, (int(v) for v in x)))
+
+    def _params_to_array(self, params):
+        return np.asarray([int(params[key]) for key in self._keys], dtype=np.int64)
+
+    def _one_hot(self, x):
+        encoded = np.zeros(self._encoded.shape[1])
+        encoded[x + self._offsets] = 1.
+        return encoded
+
+    def _kernel_from_matches(self, matches):
+        """Exponentiated Hamming kernel computed from the count of equal params."""
+        return np.exp(-(1. - matches / max(self.dim, 1)) / self.lengthscale)
+
+    def register(self, params, target):
+        """Add an observation and extend the Cholesky factor of the kernel matrix.
+
+        Raises:
+            KeyError: if the point was registered before.
+        """
+        x = self._params_to_array(params)
+        if tuple(x) in self._cache:
+            raise KeyError('Params point {} is not unique'.format(x))
+        self._cache[tuple(x)] = target
+
+        encoded = self._one_hot(x)
+        n = len(self._target)
+        chol = np.zeros((n + 1, n + 1))
+        chol[:n, :n] = self._chol
+        if n > 0:
+            k = self._kernel_from_matches(self._encoded.dot(encoded))
+            row = solve_triangular(self._chol, k, lower=True)
+            chol[n, :n] = row
+            chol[n, n] = np.sqrt(max(1. + self.noise - row.dot(row), 1e-12))
+        else:
+            chol[0, 0] = np.sqrt(1. + self.noise)
+        self._chol = chol
+        self._params = np.vstack([self._params, x[None, :]])
+        self._encoded = np.vstack([self._encoded, encoded[None, :]])
+        self._target = np.append(self._target, target)
+
+    def _ucb(self, matches, alpha):
+        """UCB of candidates given their match counts against the observations."""
+        k = self._kernel_from_matches(matches)
+        mean = k.dot(alpha)
+        v = solve_triangular(self._chol, k.T, lower=True)
+        var = np.maximum(1. - (v * v).sum(axis=0), 1e-12)
+        return mean + self.kappa * np.sqrt(var)
+
+    def _climb(self, x, alpha):
+        """Hill climb from x, moving to the best unseen neighbor while the UCB improves."""
+        matches = self._encoded.dot(self._one_hot(x))
+        acq = -np.inf if tuple(x) in self._cache else self._ucb(matches[None, :], alpha)[0]
+        for _ in range(self.max_steps):
+            # neighbor of column c sets param _column_dim[c] to the choice of column c
+            current = (x + self._offsets)[self._column_dim]
+            neighbor_matches = matches[None, :] + self._encoded.T - self._encoded[:, current].T
+            acqs = self._ucb(neighbor_matches, alpha)
+            acqs[current == np.arange(len(current))] = -np.inf
+            acqs[(neighbor_matches >= self.dim).any(axis=1)] = -np.inf
+            column = acqs.argmax()
+            if acqs[column] <= acq:
+                break
+            dim = self._column_dim[column]
+            x = x.copy()
+            x[dim] = column - self._offsets[dim]
+            matches, acq = neighbor_matches[column], acqs[column]
+        return x, acq
+
+    def _random_unseen(self):
+        for _ in range(100):
+            x = self._random.randint(0, self._choices)
+            if tuple(x) not in self._cache:
+                break
+        return x
+
+    def suggest(self):
+        """Most promising unseen point to probe next."""
+        if len(set(self._target)) < 2:
+            return self._array_to_params(self._random_unseen())
+
+        y = (self._target - self._target.mean()) / self._target.std()
+        alpha = solve_triangular(self._chol.T,
+                                 solve_triangular(self._chol, y, lower=True),
+                                 lower=False)
+
+        starts = [self._params[i] for i in np.argsort(-self._target)[:self.n_starts]]
+        starts += [self._random.randint(0, self._choices) for _ in range(self.n_starts)]
+        best_x, best_acq = None, -np.inf
+        for x in starts:
+            x, acq = self._climb(x, alpha)
+            if acq > best_acq:
+                best_x, best_acq = x, acq
+
+        if best_x is None:
+            best_x = self._random_unseen()
+        return self._array_to_params(best_x)
+
+    def gen_next_params(self):
+        return self.suggest()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import math
+import numpy as np
+from collections import OrderedDict
+from .strategy import strategy_registry, TuneStrategy
+from ..data import DataLoader, Dataset
+from ..data.dataloaders.dataloader import DATALOADERS
+from ..utils.utility import Timeout
+from ..utils.create_obj_from_config import create_eval_func
+from ..utils import logger
+from ..conf.dotdict import deep_get
+from ..objective import wilson_interval
+
+
+def stratified_indices(total, size, seed):
+    """Deterministically sample size indices out of range(total), one from each of size
+       equal strata of the dataset order. Datasets stored class by class keep their class
+       proportions in the subset.
+
+    Args:
+        total (int): The dataset length.
+        size (int): The subset length, at most total.
+        seed (int): The random seed of the position inside each stratum.
+
+    Returns:
+        list: The sorted indices.
+    """
+    assert 0 < size <= total
+    edges = np.arange(size + 1) * total // size
+    offsets = np.random.RandomState(seed).rand(size) * (edges[1:] - edges[:-1])
+    return (edges[:-1] + offsets.astype(np.int64)).tolist()
+
+
+class _SubsetDataset(Dataset):
+    """The samples of an indexable dataset at the given indices."""
+
+    def __init__(self, dataset, indices):
+        self.dataset = dataset
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        return self.dataset[self.indices[index]]
+
+
+@strategy_registry
+class HalvingTuneStrategy(TuneStrategy):
+    """The tuning strategy using successive halving on growing evaluation subsets.
+
+    A bracket of candidate tuning configs is quantized and scored on a small stratified
+    subset of the evaluation dataset. Candidates whose accuracy confidence interval is
+    entirely below the accuracy target are dropped, only the best 1/eta of the others are
+    re-scored on a subset eta times larger, as long as that subset is at most 1/eta of the
+    dataset. The survivors are evaluated on the full dataset in the order of their subset
+    accuracy, the first one meeting the accuracy goal is accepted like in the other
+    strategies.
+
+    The candidates are the model-wise tuning configs first, then random op-wise ones. The
+    quantized models of a bracket are kept in memory until they are dropped.
+
+    Args:
+        model (object):                        The FP32 model specified for low precision tuning.
+        conf (Conf):                           The Conf class instance initialized from user yaml
+                                               config file.
+        q_dataloader (generator):              Data loader for calibration, mandatory for
+                                               post-training quantization.
+                                               It is iterable and should yield a tuple (input,
+                                               label) for calibration dataset containing label,
+                                               or yield (input, _) for label-free calibration
+                                               dataset. The input could be a object, list, tuple or
+                                               dict, depending on user implementation, as well as
+                                               it can be taken as model input.
+        q_func (function, optional):           Reserved for future use.
+        eval_dataloader (generator, optional): Data loader for evaluation. It is iterable
+                                               and should yield a tuple of (input, label).
+                                               The input could be a object, list, tuple or dict,
+                                               depending on user implementation, as well as it can
+                                               be taken as model input. The label should be able
+                                               to take as input of supported metrics. The subsets
+                                               are only built if its dataset is indexable,
+                                               otherwise every candidate is evaluated on the
+                                               full dataset.
+        eval_func (function, optional):        The evaluation function provided by user.
+                                               This function takes model as parameter, and
+                                               evaluation dataset and metrics should be
+                                               encapsulated in this function implementation and
+                                               outputs a higher-is-better accuracy scalar value.
+                                               The subsets can't be built with eval_func.
+        dicts (dict, optional):                The dict containing resume information.
+                                               Defaults to None.
+
+    """
+
+    def __init__(self, model, conf, q_dataloader, q_func=None,
+                 eval_dataloader=None, eval_func=None, dicts=None):
+        super(
+            HalvingTuneStrategy,
+            self).__init__(
+            model,
+            conf,
+            q_dataloader,
+            q_func,
+            eval_dataloader,
+            eval_func,
+            dicts)
+        halving_cfg = deep_get(self.cfg, 'tuning.strategy.halving') or {}
+        self.num_candidates = halving_cfg.get('candidates', 9)
+        self.eta = halving_cfg.get('eta', 3)
+        self.min_samples = halving_cfg.get('min_samples', 100)
+        self.confidence = halving_cfg.get('confidence', 0.95)
+        # samples evaluated by this run, and by evaluating every candidate on the full dataset
+        self.evaluated_samples = 0
+        self.full_evaluation_samples = 0
+
+    def _eval_dataset_len(self):
+        if self.eval_func is not None or self.eval_dataloader is None:
+            return None
+        dataset = getattr(self.eval_dataloader, 'dataset', None)
+        if not hasattr(dataset, '__getitem__'):
+            return None
+        try:
+            return len(dataset)
+        except (TypeError, ValueError):
+            return None
+
+    def _rung_sizes(self, total):
+        """The subset sizes to score the candidates on before the full dataset."""
+        if total is None or self.cfg.model.framework.lower() not in DATALOADERS:
+            return []
+        sizes = []
+        size = self.min_samples
+        # a larger subset would cost about as much as the full evaluation it saves
+        while size * self.eta <= total:
+            sizes.append(size)
+            size *= self.eta
+        return sizes
+
+    def _subset_eval_func(self, size, total):
+        indices = stratified_indices(total, size, self.cfg.tuning.random_seed + size)
+        dataloader = DataLoader(self.cfg.model.framework.lower(),
+                                _SubsetDataset(self.eval_dataloader.dataset, indices),
+                                batch_size=self.eval_dataloader.batch_size,
+                                collate_fn=getattr(self.eval_dataloader, 'collate_fn', None))
+        return create_eval_func(self.cfg.model.framework.lower(),
+                                dataloader,
+                                self.adaptor,
+                                self.cfg.evaluation.accuracy.metric,
+                                self.cfg.evaluation.accuracy.postprocess)
+
+    def _promote(self, accuracies, samples, target):
+        """Select the candidates scored on samples to re-score on the next rung.
+
+        Args:
+            accuracies (list): The subset accuracy of each candidate.
+            samples (int): The subset length.
+            target (float): The accuracy target.
+
+        Returns:
+            list: The indices of the promoted candidates, by decreasing accuracy.
+        """
+        from scipy.stats import norm
+        z = norm.ppf(self.confidence)
+        intervals = [wilson_interval(acc, samples, z) for acc in accuracies]
+        reachable = [i for i, interval in enumerate(intervals)
+                     if interval is None or interval[1] >= target]
+        reachable.sort(key=lambda i: accuracies[i], reverse=True)
+
+        keep = max(1, int(math.ceil(len(accuracies) / self.eta)))
+        return reachable[:keep]
+
+    def next_tune_cfg(self):
+        """The generator of the candidate tuning configs, the model-wise tuning configs
+           first and then random op-wise ones, without duplicates.
+
+        """
+        seen = []
+
+        def _unseen(op_cfgs):
+            if op_cfgs in seen:
+                return False
+            seen.append(copy.deepcopy(op_cfgs))
+            return True
+
+        for iterations in self.calib_iter:
+            for tune_cfg in self.modelwise_quant_cfgs:
+                op_cfgs = {'calib_iteration': int(iterations), 'op': OrderedDict()}
+                for op in self.opwise_quant_cfgs:
+                    op_cfg = self.opwise_quant_cfgs[op]
+                    if len(op_cfg) > 0:
+                        op_cfgs['op'][op] = copy.deepcopy(self._get_common_cfg(tune_cfg, op_cfg))
+                    else:
+                        op_cfgs['op'][op] = copy.deepcopy(self.opwise_tune_cfgs[op][0])
+                if _unseen(op_cfgs):
+                    yield op_cfgs
+
+        rng = np.random.RandomState(self.cfg.tuning.random_seed)
+        duplicates = 0
+        # stop once the random configs keep repeating the ones already yielded
+        while duplicates < 100:
+            op_cfgs = {'calib_iteration': int(rng.choice(self.calib_iter)), 'op': OrderedDict()}
+            for op, configs in self.opwise_quant_cfgs.items():
+                if len(configs) == 0:
+                    configs = self.opwise_tune_cfgs[op]
+                op_cfgs['op'][op] = copy.deepcopy(configs[rng.randint(len(configs))])
+            if _unseen(op_cfgs):
+                duplicates = 0
+                yield op_cfgs
+            else:
+                duplicates += 1
+
+    def traverse(self):
+        """Successive halving traverse logic.
+
+        """
+        logger.info('Start successive halving strategy')
+        total = self._eval_dataset_len()
+        rung_sizes = self._rung_sizes(total)
+        if not rung_sizes:
+            logger.warning('The evaluation subsets can not be built from the evaluation '
+                           'dataloader, every candidate is evaluated on the full dataset.')
+
+        with Timeout(self.cfg.tuning.exit_policy.timeout) as t:
+            if self.baseline is None:
+                logger.info('Getting FP32 model baseline...')
+                self.baseline = self._evaluate(self.model)
+                self._add_tuning_history()
+            logger.info('FP32 baseline is: ' +
+                        ('[{:.4f}, {:.4f}]'.format(*self.baseline) if self.baseline else 'None'))
+            target = self.objective.accuracy_target(self.baseline)
+            max_trials = self.cfg.tuning.exit_policy.max_trials
+
+            trials_count = 0
+            need_stop = False
+            candidates = self.next_tune_cfg()
+            while not need_stop and trials_count < max_trials:
+                bracket = []
+                for tune_cfg in candidates:
+                    if self._find_tuning_history(tune_cfg):
+                        logger.debug('This tuning config was evaluated, skip!')
+                        continue
+                    bracket.append(copy.deepcopy(tune_cfg))
+                    if len(bracket) >= min(self.num_candidates, max_trials - trials_count):
+                        break
+                if not bracket:
+                    break
+
+                models = []
+                for tune_cfg in bracket:
+                    logger.debug('Dump current tuning configuration:')
+                    logger.debug(tune_cfg)
+                    models.append(self.adaptor.quantize(
+                        tune_cfg, self.model, self.calib_dataloader, self.q_func))
+                if total is not None:
+                    self.full_evaluation_samples += len(bracket) * total
+
+                # score on growing subsets, drop the candidates not promoted. A trial
+                # completes when its candidate is dropped or evaluated on the full dataset.
+                survivors = list(range(len(bracket)))
+                for size in rung_sizes:
+                    if len(survivors) <= 1:
+                        break
+                    eval_func = self._subset_eval_func(size, total)
+                    accuracies = []
+                    for i in survivors:
+                        acc, _ = self.objective.evaluate(eval_func, models[i])
+                        accuracies.append(acc)
+                        self.evaluated_samples += size
+                    promoted = [survivors[i] for i in self._promote(accuracies, size, target)]
+                    logger.info('{} of {} candidates promoted after {} samples.'.format(
+                        len(promoted), len(survivors), size))
+                    for i, acc in zip(survivors, accuracies):
+                        if i in promoted:
+                            continue
+                        models[i] = None
+                        trials_count += 1
+                        # the dropped candidate has no full tune result, only its subset
+                        # accuracy
+                        self._add_tuning_history(copy.deepcopy(bracket[i]), None,
+                                                 subset_accuracy=acc, subset_samples=size)
+                    survivors = promoted
+                    need_stop = (t.seconds != 0 and t.timed_out) or trials_count >= max_trials
+                    if need_stop:
+                        break
+
+                if need_stop:
+                    break
+                for i in survivors:
+                    trials_count += 1
+                    self.last_qmodel = models[i]
+                    models[i] = None
+                    self.last_tune_result = self._evaluate(self.last_qmodel)
+                    if total is not None:
+                        self.evaluated_samples += total
+
+                    need_stop = self.stop(t, trials_count)
+                    self._add_tuning_history(copy.deepcopy(bracket[i]),
+                                             copy.deepcopy(self.last_tune_result),
+                                             rejected=self.objective.rejected)
+                    if need_stop:
+                        break
+
+        if total is not None:
+            logger.info('Successive halving evaluated {} samples, evaluating each candidate '
+                        'on the full dataset like the basic strategy takes {} samples.'.format(
+                            self.evaluated_samples, self.full_evaluation_samples))
+        # compact the journal, so the snapshot also holds the final strategy state
+        self._save()
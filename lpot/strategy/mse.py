@@ -86,12 +86,10 @@ class MSETuneStrategy(TuneStrategy):
             eval_func,
             dicts)
 
-    def __getstate__(self):
-        for history in self.tuning_history:
-            if self._same_yaml(history['cfg'], self.cfg):
-                history['ordered_ops'] = self.ordered_ops
-        save_dict = super(MSETuneStrategy, self).__getstate__()
-        return save_dict
+    def _record_state(self):
+        state = super(MSETuneStrategy, self)._record_state()
+        state['ordered_ops'] = self.ordered_ops
+        return state
 
     def mse_metric_gap(self, fp32_tensor, dequantize_tensor):
         """Calculate the euclidean distance between fp32 tensor and int8 dequantize tensor
@@ -157,9 +155,11 @@ class MSETuneStrategy(TuneStrategy):
                     fp32_tensor_dict[op],
                     dequantize_tensor_dict[op]) for op in fp32_tensor_dict}
             self.ordered_ops = sorted(ops_mse.keys(), key=lambda key: ops_mse[key], reverse=True)
+            # the records only append the trials, so snapshot the op order for resuming
+            self._save()
 
-        if ops_mse is not None:
-            ordered_ops = sorted(ops_mse.keys(), key=lambda key: ops_mse[key], reverse=True)
+        if self.ordered_ops is not None:
+            ordered_ops = self.ordered_ops
             op_cfgs = copy.deepcopy(best_cfg)
             for op in ordered_ops:
                 old_cfg = copy.deepcopy(op_cfgs['op'][op])
@@ -65,6 +65,9 @@ class RandomTuneStrategy(TuneStrategy):
 
     """
 
+    # the configs don't depend on the last tune result
+    prune_by_cost = True
+
     def __init__(self, model, conf, q_dataloader, q_func=None,
                  eval_dataloader=None, eval_func=None, dicts=None):
         super(
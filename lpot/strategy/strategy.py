@@ -20,14 +20,15 @@ import os
 import math
 import yaml
 import copy
-import pickle
 from collections import OrderedDict
 from pathlib import Path
 from ..adaptor import FRAMEWORKS
-from ..objective import OBJECTIVES
-from ..utils.utility import Timeout, fault_tolerant_file, equal_dicts
+from ..objective import OBJECTIVES, SequentialEvaluation
+from ..utils.utility import Timeout, equal_dicts, LazyRegistry
+from ..utils.journal import TuningJournal
+from ..utils.cost_model import CostModel, op_dtypes
 from ..utils.create_obj_from_config import create_eval_func
-from ..utils import logger
+from ..utils import logger, trace
 from ..version import __version__
 from ..conf.dotdict import DotDict, deep_get, deep_set
 
@@ -38,9 +39,9 @@ from ..conf.dotdict import DotDict, deep_get, deep_set
    could choose this strategy by setting "abc" string in tuning.strategy field of yaml.
 
    STRATEGIES variable is used to store all implelmented TuneStrategy subclasses to support
-   different tuning strategies.
+   different tuning strategies. The strategy module is imported only when its name is looked up.
 """
-STRATEGIES = {}
+STRATEGIES = LazyRegistry('lpot.strategy')
 
 
 def strategy_registry(cls):
@@ -55,7 +56,7 @@ def strategy_registry(cls):
     assert cls.__name__.endswith(
         'TuneStrategy'
     ), "The name of subclass of TuneStrategy should end with \'TuneStrategy\' substring."
-    if cls.__name__[:-len('TuneStrategy')].lower() in STRATEGIES:
+    if STRATEGIES.is_registered(cls.__name__[:-len('TuneStrategy')].lower()):
         raise ValueError('Cannot have two strategies with the same name')
     STRATEGIES[cls.__name__[:-len('TuneStrategy')].lower()] = cls
     return cls
@@ -105,6 +106,10 @@ class TuneStrategy(object):
                                                Defaults to None.
     """
 
+    # whether the configs the cost model predicts worse than the best result can be
+    # skipped, a strategy adapting to the last tune result needs its configs evaluated
+    prune_by_cost = False
+
     def __init__(self, model, conf, q_dataloader=None, q_func=None,
                  eval_dataloader=None, eval_func=None, resume=None):
         self.model = model
@@ -121,6 +126,7 @@ class TuneStrategy(object):
         path.mkdir(exist_ok=True, parents=True)
         path = Path(os.path.dirname(self.deploy_path))
         path.mkdir(exist_ok=True, parents=True)
+        self.profile_path = os.path.join(os.path.dirname(self.history_path), 'profile')
 
         logger.debug('Dump user yaml configuration:')
         logger.debug(self.cfg)
@@ -132,13 +138,19 @@ class TuneStrategy(object):
 
         framework_specific_info = {'device': self.cfg.device,
                                    'approach': self.cfg.quantization.approach,
-                                   'random_seed': self.cfg.tuning.random_seed}
+                                   'random_seed': self.cfg.tuning.random_seed,
+                                   'calib_convergence': deep_get(
+                                       self.cfg, 'quantization.calibration.convergence')}
         framework = self.cfg.model.framework.lower()
         if framework == 'tensorflow':
             framework_specific_info.update(
-                {"inputs": self.cfg.model.inputs, "outputs": self.cfg.model.outputs})
+                {"inputs": self.cfg.model.inputs, "outputs": self.cfg.model.outputs,
+                 "execution": self.cfg.model.execution})
         if framework == 'mxnet':
             framework_specific_info.update({"q_dataloader": q_dataloader})
+        if framework == 'pytorch':
+            framework_specific_info.update({"execution": self.cfg.model.execution,
+                                            "q_dataloader": q_dataloader})
 
         self.adaptor = FRAMEWORKS[framework](framework_specific_info)
 
@@ -148,17 +160,43 @@ class TuneStrategy(object):
         self.best_tune_result = None
         self.best_qmodel = None
 
+        # the op latencies of the fp32 model, and the int8 speedup of each op measured
+        # by the last trial quantizing it, when tuning.profile is set
+        self.profile_cfg = deep_get(self.cfg, 'tuning.profile')
+        self.fp32_profile = None
+        self.op_speedups = OrderedDict()
+        # predicts the objective value of the tuning configs, when tuning.cost_model is set
+        self.cost_model = None
+
         objective = self.cfg.tuning.objective.lower()
         self.objective = OBJECTIVES[objective](self.cfg.tuning.accuracy_criterion)
+        # the time and memory of the spawned workers would be measured with the evaluation
+        self.eval_sharding = deep_get(self.cfg, 'evaluation.accuracy.sharding')
+        if self.eval_sharding is not None and self.objective.measures_eval_func:
+            logger.warning('The {} objective measures the whole evaluation, '
+                           'evaluation.accuracy.sharding is ignored.'.format(objective))
+            self.eval_sharding = None
 
         self.capability = self.adaptor.query_fw_capability(model)
-        self.modelwise_tune_space = conf.modelwise_tune_space(self.capability['modelwise'])
-        self.opwise_tune_space = conf.opwise_tune_space(self.capability['opwise'])
-        self.modelwise_tune_cfgs = conf.expand_tune_cfgs(self.modelwise_tune_space)
-        self.opwise_tune_cfgs = OrderedDict()
-        for key in self.opwise_tune_space:
-            self.opwise_tune_cfgs[key] = conf.expand_tune_cfgs(
-                self.opwise_tune_space[key])
+        with trace.span('strategy.tune_space'):
+            self.modelwise_tune_space = conf.modelwise_tune_space(self.capability['modelwise'])
+            self.opwise_tune_space = conf.opwise_tune_space(self.capability['opwise'])
+            self.modelwise_tune_cfgs = conf.expand_tune_cfgs(self.modelwise_tune_space)
+            self.opwise_tune_cfgs = OrderedDict()
+            for key in self.opwise_tune_space:
+                self.opwise_tune_cfgs[key] = conf.expand_tune_cfgs(
+                    self.opwise_tune_space[key])
+
+        cost_model_cfg = deep_get(self.cfg, 'tuning.cost_model')
+        if cost_model_cfg is not None:
+            try:
+                op_weights = self.adaptor.query_op_weights(model)
+            except NotImplementedError:
+                op_weights = None
+            self.cost_model = CostModel(objective, op_weights)
+            self.prune_margin = cost_model_cfg.prune_margin
+        # profiled for the cost model or tuning.profile, until it is found unsupported
+        self.profiling = self.profile_cfg is not None or self.cost_model is not None
 
         if self.calib_dataloader:
             self.calib_iter = [math.ceil(int(x) / self.calib_dataloader.batch_size) \
@@ -200,13 +238,17 @@ class TuneStrategy(object):
         #   ...,
         # ]
         self.tuning_history = []
+        self.journal = None
 
         if resume is not None:
             self.__dict__.update(resume)
             for history in self.tuning_history:
                 if self._same_yaml(history['cfg'], self.cfg):
                     self.__dict__.update({k: v for k, v in history.items() \
-                                          if k not in ['version', 'history']})
+                                          if k not in ['version', 'history', 'deltas']})
+                    # the changes of the strategy state appended after the snapshot
+                    for delta in history.get('deltas', []):
+                        self._replay_delta(delta)
                     logger.info('Starting to resume tuning process...')
                     break
 
@@ -247,6 +289,12 @@ class TuneStrategy(object):
                 self._add_tuning_history()
             logger.info('FP32 baseline is: ' +
                         ('[{:.4f}, {:.4f}]'.format(*self.baseline) if self.baseline else 'None'))
+            if self.fp32_profile is None:
+                self.fp32_profile = self._profile(self.model, 'fp32')
+                if self.baseline:
+                    self._update_cost_model(
+                        OrderedDict((op[0], 'fp32') for op in self.opwise_tune_cfgs),
+                        self.fp32_profile, self.baseline[1])
 
             trials_count = 0
             for tune_cfg in self.next_tune_cfg():
@@ -258,24 +306,45 @@ class TuneStrategy(object):
                     logger.debug('This tuning config was evaluated, skip!')
                     continue
 
+                predicted = self._predict_cost(tune_cfg)
+                if self.prune_by_cost and self._cost_pruned(predicted):
+                    if trials_count >= self.cfg.tuning.exit_policy.max_trials or \
+                            (t.seconds != 0 and t.timed_out):
+                        break
+                    continue
+
                 logger.debug('Dump current tuning configuration:')
                 logger.debug(tune_cfg)
 
-                self.last_qmodel = self.adaptor.quantize(
-                    tune_cfg, self.model, self.calib_dataloader, self.q_func)
-                assert self.last_qmodel
-                self.last_tune_result = self._evaluate(self.last_qmodel)
-
-                need_stop = self.stop(t, trials_count)
-
-                # record the tuning history
-                saved_tune_cfg = copy.deepcopy(tune_cfg)
-                saved_last_tune_result = copy.deepcopy(self.last_tune_result)
-                self._add_tuning_history(saved_tune_cfg, saved_last_tune_result)
+                with trace.span('strategy.trial', trial=trials_count):
+                    self.last_qmodel = self.adaptor.quantize(
+                        tune_cfg, self.model, self.calib_dataloader, self.q_func)
+                    assert self.last_qmodel
+                    calib_samples = getattr(self.adaptor, 'calib_samples', None)
+                    if calib_samples is not None:
+                        logger.info('Calibration used {} samples.'.format(calib_samples))
+                    self.last_tune_result = self._evaluate(self.last_qmodel)
+                    profile = self._profile_trial(tune_cfg, trials_count)
+                    if self.last_tune_result:
+                        self._update_cost_model(op_dtypes(tune_cfg), profile,
+                                                self.last_tune_result[1], predicted)
+
+                    need_stop = self.stop(t, trials_count)
+
+                    # record the tuning history
+                    saved_tune_cfg = copy.deepcopy(tune_cfg)
+                    saved_last_tune_result = copy.deepcopy(self.last_tune_result)
+                    self._add_tuning_history(saved_tune_cfg, saved_last_tune_result,
+                                             rejected=self.objective.rejected,
+                                             calib_samples=calib_samples,
+                                             predicted=predicted)
 
                 if need_stop:
                     break
 
+        # compact the journal, so the snapshot also holds the final strategy state
+        self._save()
+
     def deploy_config(self):
         acc_dataloader_cfg = deep_get(self.cfg, 'evaluation.accuracy.dataloader')
         perf_dataloader_cfg = deep_get(self.cfg, 'evaluation.performance.dataloader')
@@ -338,6 +407,7 @@ class TuneStrategy(object):
 
         return result
 
+    @trace.traced('strategy.evaluate')
     def _evaluate(self, model):
         """The interface of evaluating model.
 
@@ -366,19 +436,182 @@ class TuneStrategy(object):
                                          self.adaptor, \
                                          self.cfg.evaluation.accuracy.metric, \
                                          postprocess_cfg, \
-                                         tensorboard = self.cfg.tuning.tensorboard)
+                                         tensorboard = self.cfg.tuning.tensorboard, \
+                                         sequential_eval = self._sequential_eval(), \
+                                         sharding = self.eval_sharding)
 
             val = self.objective.evaluate(eval_func, model)
+            if self.objective.rejected:
+                logger.info('Evaluation stopped early, the accuracy goal can not be reached.')
         return val
 
+    def _profile(self, model, name):
+        """Profile the op latencies of the model when tuning.profile or the cost model
+           is set, the profile is saved to profile/<name>.json in the workspace.
+
+        Args:
+            model (object): The model to profile.
+            name (string): The profile name.
+
+        Returns:
+            OpProfile: The profile, None if profiling is disabled or not supported.
+        """
+        if not self.profiling:
+            return None
+        dataloader = self.eval_dataloader if self.eval_dataloader is not None \
+            else self.calib_dataloader
+        iteration = self.profile_cfg.iteration if self.profile_cfg is not None else 10
+        try:
+            profile = self.adaptor.profile(model, dataloader, iteration)
+        except NotImplementedError:
+            logger.warning('The op latencies of the model can not be profiled, '
+                           'disable profiling.')
+            self.profiling = False
+            return None
+        Path(self.profile_path).mkdir(exist_ok=True, parents=True)
+        profile.save(os.path.join(self.profile_path, name + '.json'))
+        return profile
+
+    def _profile_trial(self, tune_cfg, trials_count):
+        """Profile the quantized model of a trial and update the int8 speedup of its
+           quantized ops over the fp32 model. Without tuning.profile, only the trials
+           with an op dtype the cost model never profiled are profiled.
+
+        Returns:
+            OpProfile: The profile of the trial, None if it isn't profiled.
+        """
+        if self.fp32_profile is None:
+            return None
+        if self.profile_cfg is None and \
+                not self.cost_model.needs_profile(op_dtypes(tune_cfg)):
+            return None
+        profile = self._profile(self.last_qmodel, 'trial_{}'.format(trials_count))
+        if profile is None:
+            return None
+        ops = {op[0]: op for op in tune_cfg['op']}
+        slow_ops = []
+        for name, (_, _, speedup) in profile.compare(self.fp32_profile).items():
+            op = ops.get(name)
+            if op is None or \
+                    tune_cfg['op'][op]['activation']['dtype'] in ['fp32', 'bf16']:
+                continue
+            self.op_speedups[op] = speedup
+            if speedup < 1.:
+                slow_ops.append(name)
+        logger.debug('Op latency of the trial against the fp32 model:\n' +
+                     profile.format(self.fp32_profile))
+        if slow_ops:
+            logger.info('The int8 ops {} are slower than fp32.'.format(slow_ops))
+        return profile
+
+    def _predict_cost(self, tune_cfg):
+        """The objective value of the tuning config predicted by the cost model, None
+           if it can't be predicted.
+        """
+        if self.cost_model is None:
+            return None
+        return self.cost_model.predict(op_dtypes(tune_cfg))
+
+    def _cost_pruned(self, predicted):
+        """Whether a tuning config predicted to be worse than the best result by more
+           than tuning.cost_model.prune_margin can be skipped.
+        """
+        if predicted is None or not self.best_tune_result:
+            return False
+        best = self.best_tune_result[1]
+        if predicted <= best * (1 + self.prune_margin):
+            return False
+        logger.info('Skip the tuning config predicted to {:.4f}, the best result is '
+                    '{:.4f}.'.format(predicted, best))
+        return True
+
+    def _update_cost_model(self, dtypes, profile, measured, predicted=None):
+        """Learn the op latencies of a profiled model and correct the cost model with
+           its measured objective value, logged against the value predicted before.
+        """
+        if self.cost_model is None:
+            return
+        if profile is not None:
+            self.cost_model.add_profile(dtypes, profile)
+        # the value measured on a part of the dataset isn't comparable
+        if self.objective.rejected:
+            return
+        self.cost_model.update(dtypes, measured, predicted)
+        if predicted is not None:
+            logger.info('Cost model predicted {:.4f}, measured {:.4f} ({:+.1%}), mean '
+                        'error {:.1%}.'.format(predicted, measured,
+                                               (predicted - measured) / measured
+                                               if measured else 0.,
+                                               self.cost_model.mean_error() or 0.))
+
+    def _sequential_eval(self):
+        """Create the check to stop evaluating a tuning config early once it can't reach the
+           accuracy goal, when sequential evaluation is enabled and the baseline is known.
+
+        Returns:
+            SequentialEvaluation or None
+        """
+        seq_cfg = self.cfg.tuning.sequential_evaluation
+        if seq_cfg is None or self.baseline is None:
+            return None
+
+        try:
+            total = len(self.eval_dataloader.dataset)
+        except (AttributeError, TypeError, ValueError):
+            total = None
+        return SequentialEvaluation(self.objective.accuracy_target(self.baseline),
+                                    getattr(self.eval_dataloader, 'batch_size', 1),
+                                    total,
+                                    seq_cfg.interval,
+                                    seq_cfg.confidence,
+                                    seq_cfg.min_samples)
+
     def __getstate__(self):
         """Magic method for pickle saving.
 
         Returns:
             dict: Saved dict for resuming
         """
+        for history in self.tuning_history:
+            if self._same_yaml(history['cfg'], self.cfg):
+                history.update(self._record_state())
+                # the snapshot holds the whole state, so the deltas are already applied
+                history.pop('deltas', None)
         return {'tuning_history': self.tuning_history}
 
+    def _record_state(self):
+        """The strategy specific state saved for resuming, with the tuning history under
+           the same yaml config. It is only written in the snapshots, subclasses with such
+           state extend it.
+
+        Returns:
+            dict: The fields restored as attributes when resuming.
+        """
+        return {}
+
+    def _record_delta(self, history):
+        """The change of the strategy specific state made by the trial just recorded. It is
+           appended to the journal with the trial instead of the whole _record_state, so
+           each append costs the same whatever the number of trials.
+
+        Args:
+            history (dict): The history of the trial just recorded.
+
+        Returns:
+            object: The change replayed by _replay_delta, None if the state is unchanged.
+        """
+        return None
+
+    def _replay_delta(self, delta):
+        """Apply a change returned by _record_delta to the state restored from the snapshot
+           when resuming. The deltas are replayed in order, and may repeat changes already
+           held by the snapshot.
+
+        Args:
+            delta (object): The change to apply.
+        """
+        pass
+
     def __setstate__(self, d):
         """Magic method for pickle loading.
 
@@ -427,14 +660,24 @@ class TuneStrategy(object):
 
         return need_stop
 
-    def _save(self):
+    @trace.traced('strategy.save_history')
+    def _save(self, record=None):
         """save current tuning state to snapshot for resuming.
+           The whole state is written as a snapshot on the first save and when the journal
+           needs compaction, otherwise only the record of the latest change is appended.
 
+        Args:
+            record (dict, optional): The tuning history record just applied.
         """
+        if record is not None and self.journal is not None and not self.journal.need_compact():
+            logger.debug('Append tuning history record to ' + self.history_path)
+            self.journal.append(record)
+            return
 
         logger.info('Save tuning history to ' + self.history_path)
-        with fault_tolerant_file(self.history_path) as f:
-            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.journal is None:
+            self.journal = TuningJournal(self.history_path)
+        self.journal.snapshot(self.__getstate__())
 
     def _find_tuning_history(self, tune_cfg):
         """check if the specified tune_cfg is evaluated or not on same yaml config.
@@ -489,30 +732,61 @@ class TuneStrategy(object):
            note this record is added under same yaml config.
 
         """
-        found = False
         d = {'tune_cfg': tune_cfg, 'tune_result': tune_result}
-        for tuning_history in self.tuning_history:
+        d.update(kwargs)
+        for index, tuning_history in enumerate(self.tuning_history):
             if self._same_yaml(tuning_history['cfg'], self.cfg):
-                d.update(kwargs)
-                tuning_history['history'].append(d)
-                tuning_history['last_tune_result'] = self.last_tune_result
-                tuning_history['best_tune_result'] = self.best_tune_result
-                tuning_history['cfg'] = self.cfg
-                found = True
+                record = {'type': 'history',
+                          'index': index,
+                          'history': d,
+                          'last_tune_result': self.last_tune_result,
+                          'best_tune_result': self.best_tune_result,
+                          'delta': self._record_delta(d)}
                 break
-            
-        if not found:
+        else:
             tuning_history = {}
             tuning_history['version']  = __version__
             tuning_history['cfg']     = self.cfg
             tuning_history['baseline'] = self.baseline
             tuning_history['last_tune_result'] = self.last_tune_result
             tuning_history['best_tune_result'] = self.best_tune_result
-            tuning_history['history']  = []
-            if tune_cfg and tune_result:
-                d.update(kwargs)
-                tuning_history['history'].append(d)
-            self.tuning_history.append(tuning_history)
+            tuning_history['history']  = [d] if tune_cfg and tune_result else []
+            tuning_history.update(self._record_state())
+            record = {'type': 'tuning_history', 'tuning_history': tuning_history}
+
+        apply_history_record(self.tuning_history, record)
+        self._save(record)
+
+
+def apply_history_record(tuning_history, record):
+    """Apply a record saved by TuneStrategy._add_tuning_history to the tuning history.
+
+    Args:
+        tuning_history (list): The tuning history to update.
+        record (dict): The record to apply.
+    """
+    if record['type'] == 'tuning_history':
+        tuning_history.append(record['tuning_history'])
+    else:
+        assert record['type'] == 'history', "unknown record type {}".format(record['type'])
+        history = tuning_history[record['index']]
+        history['history'].append(record['history'])
+        history['last_tune_result'] = record['last_tune_result']
+        history['best_tune_result'] = record['best_tune_result']
+        if record.get('delta') is not None:
+            history.setdefault('deltas', []).append(record['delta'])
 
-        self._save()
 
+def load_tuning_state(path):
+    """Replay the tuning history journal saved by TuneStrategy.
+
+    Args:
+        path (string): The path of the history snapshot.
+
+    Returns:
+        dict: The dict containing resume information.
+    """
+    state, records = TuningJournal(path).load()
+    for record in records:
+        apply_history_record(state['tuning_history'], record)
+    return state
@@ -19,18 +19,16 @@ from .strategy import strategy_registry, TuneStrategy
 import numpy as np
 import os
 import copy
+import csv
 from pathlib import Path
 from ..utils.utility import Timeout
 from ..utils import logger
 import hyperopt as hpo
-from hyperopt import fmin, hp, STATUS_OK, Trials
+from hyperopt import hp, STATUS_OK, Trials
 from functools import partial
 
-try:
-    import pandas as pd
-except ImportError:
-    pd = None
-    logger.info('Pandas package is required for best result and CSV files generation.')
+TRIALS_CSV_FIELDS = ['loss', 'acc', 'lat', 'acc_loss', 'lat_diff', 'quantization_ratio',
+                     'status', 'source']
 
 
 @strategy_registry
@@ -85,7 +83,10 @@ class TpeTuneStrategy(TuneStrategy):
         self.hpopt_search_space = None
         self.warm_start = False
         self.cfg_evaluated = False
+        self._trial_history = None
         self.hpopt_trials = Trials()
+        # the number of hyperopt trials already in the journal
+        self._journaled_trials = 0
         self.max_trials = conf.usr_cfg.tuning.exit_policy.get('max_trials', 200)
         self.loss_function_config = {
             'acc_th': conf.usr_cfg.tuning.accuracy_criterion.relative if \
@@ -106,6 +107,9 @@ class TpeTuneStrategy(TuneStrategy):
             'best_lat_diff': 0.0
         }
         self._algo = None
+        self._domain = None
+        self.best_trial_result = None
+        self._trials_logged = 0
 
         super(
             TpeTuneStrategy,
@@ -117,23 +121,42 @@ class TpeTuneStrategy(TuneStrategy):
             eval_dataloader,
             eval_func,
             dicts)
+        self.hpopt_trials.refresh()
+        self._journaled_trials = len(self.hpopt_trials._dynamic_trials)
+        self._rstate = np.random.RandomState(self.cfg.tuning.random_seed)
 
-    def __getstate__(self):
-        """Magic method for pickle saving.
+    def _record_state(self):
+        """The hyperopt state saved for resuming.
 
         Returns:
-            dict: Saved dict for resuming
+            dict: The fields restored as attributes when resuming.
         """
-        for history in self.tuning_history:
-            if self._same_yaml(history['cfg'], self.cfg):
-                history['warm_start'] = True
-                history['hpopt_trials'] = self.hpopt_trials
-                history['loss_function_config'] = self.loss_function_config
-                history['tpe_params'] = self.tpe_params
-                history['hpopt_search_space'] = self.hpopt_search_space
-                history['_algo'] = self._algo
-        save_dict = super(TpeTuneStrategy, self).__getstate__()
-        return save_dict
+        state = super(TpeTuneStrategy, self)._record_state()
+        state.update({'warm_start': True,
+                      'hpopt_trials': self.hpopt_trials,
+                      'loss_function_config': self.loss_function_config,
+                      'tpe_params': self.tpe_params,
+                      'hpopt_search_space': self.hpopt_search_space,
+                      '_algo': self._algo})
+        return state
+
+    def _record_delta(self, history):
+        """The hyperopt trials done since the last record, the evaluated configs found in
+           the tuning history also add a hyperopt trial but no record.
+        """
+        if history['tune_cfg'] is None:
+            return None
+        trials = self.hpopt_trials._dynamic_trials[self._journaled_trials:]
+        self._journaled_trials += len(trials)
+        return {'trials': trials} if trials else None
+
+    def _replay_delta(self, delta):
+        trials = self.hpopt_trials
+        for trial in delta['trials']:
+            # skip the trials the snapshot already holds
+            if trial['tid'] not in trials._ids:
+                trials._insert_trial_docs([trial])
+                trials._ids.add(trial['tid'])
 
     def _configure_hpopt_search_space_and_params(self, search_space):
         self.hpopt_search_space = {}
@@ -150,6 +173,44 @@ class TpeTuneStrategy(TuneStrategy):
                             gamma=self.tpe_params['gamma'],
                             n_EI_candidates=self.tpe_params['n_EI_candidates'],
                             prior_weight=self.tpe_params['prior_weight'])
+        self._domain = None
+
+    def _tpe_step(self):
+        """Ask hyperopt for one suggestion, evaluate it and tell the result back.
+           This is what one fmin call with max_evals bumped by one does, without rebuilding
+           the domain and restarting the optimization loop on every trial.
+
+        Returns:
+            dict: The trial result, None if hyperopt has no more suggestion.
+        """
+        if self._domain is None:
+            self._domain = hpo.base.Domain(partial(self.object_evaluation, model=self.model),
+                                           self.hpopt_search_space)
+        trials = self.hpopt_trials
+        new_ids = trials.new_trial_ids(1)
+        trials.refresh()
+        new_trials = self._algo(new_ids, self._domain, trials, self._rstate.randint(2 ** 31 - 1))
+        if not new_trials:
+            return None
+        trials.insert_trial_docs(new_trials)
+        trials.refresh()
+
+        trial = trials._dynamic_trials[-1]
+        trial['state'] = hpo.base.JOB_STATE_RUNNING
+        trial['book_time'] = trial['refresh_time'] = hpo.utils.coarse_utcnow()
+        spec = hpo.base.spec_from_misc(trial['misc'])
+        ctrl = hpo.base.Ctrl(trials, current_trial=trial)
+        result = self._domain.evaluate(spec, ctrl)
+        trial['state'] = hpo.base.JOB_STATE_DONE
+        trial['result'] = result
+        trial['refresh_time'] = hpo.utils.coarse_utcnow()
+        trials.refresh()
+        if self._trial_history is not None:
+            tune_cfg, tune_result, kwargs = self._trial_history
+            self._trial_history = None
+            self._add_tuning_history(tune_cfg, tune_result, **kwargs)
+        return result
+
     def traverse(self):
         """Tpe traverse logic.
 
@@ -162,12 +223,23 @@ class TpeTuneStrategy(TuneStrategy):
                     'best_result_file:{}'.format(best_result_file))
         if Path(trials_file).exists():
             os.remove(trials_file)
+        # log the trials resumed from history once, new trials are appended one by one
+        self._save_trials(trials_file, self.hpopt_trials.results)
+        best_result = None
+        for result in self.hpopt_trials.results:
+            if self._is_better_result(result, best_result):
+                best_result = result
+        if best_result is not None:
+            self._update_best_result(best_result_file, best_result)
         
         tuning_history = self._find_self_tuning_history()
-        if tuning_history and not self.warm_start:
+        # the candidates dropped by successive halving have no full tune result
+        evaluated = [history for history in tuning_history['history']
+                     if history['tune_result'] is not None] if tuning_history else []
+        if evaluated and not self.warm_start:
             # prepare loss function scaling (best result from basic can be used)
             best_lat, worse_acc_loss = 0, 0
-            for history in tuning_history['history']:
+            for history in evaluated:
                 acc_loss, lat_diff = self._calculate_acc_lat_diff(
                     history['tune_result'][0],
                     history['tune_result'][1])
@@ -179,26 +251,22 @@ class TpeTuneStrategy(TuneStrategy):
                 worse_acc_loss,
                 best_lat,
                 self.loss_function_config)
-            first_run_cfg = self.add_loss_to_tuned_history_and_find_best(tuning_history['history'])
+            first_run_cfg = self.add_loss_to_tuned_history_and_find_best(evaluated)
             # Prepare hpopt config with best cfg from history
             self._configure_hpopt_search_space_and_params(first_run_cfg)
             # Run first iteration with best result from history
-            trials_count = len(self.hpopt_trials.trials) + 1
             logger.info('First iteration start.')
-            fmin(partial(self.object_evaluation, model=self.model),
-                space=self.hpopt_search_space,
-                algo=self._algo,
-                max_evals=trials_count,
-                trials=self.hpopt_trials,
-                show_progressbar=False)
-            if pd is not None:
-                self._save_trials(trials_file)
-                self._update_best_result(best_result_file)
+            result = self._tpe_step()
+            if result is not None:
+                self._save_trials(trials_file, [result])
+                self._update_best_result(best_result_file, result)
             # Prepare full hpopt search space
             new_tune_cfgs = self._prepare_final_searchspace(
                 first_run_cfg,
                 self.opwise_tune_cfgs)
             self._configure_hpopt_search_space_and_params(new_tune_cfgs)
+            # the records only append the trials, so snapshot the new search space
+            self._save()
         elif not self.warm_start:
             self._calculate_loss_function_scaling_components(0.01, 2, self.loss_function_config)
             self._configure_hpopt_search_space_and_params(self.opwise_tune_cfgs)
@@ -220,20 +288,19 @@ class TpeTuneStrategy(TuneStrategy):
             while not exit:
                 self.cfg_evaluated = False
                 logger.info('Trial iteration start: {} / {}'.format(trials_count, self.max_trials))
-                fmin(partial(self.object_evaluation, model=self.model),
-                    space=self.hpopt_search_space,
-                    algo=self._algo,
-                    max_evals=trials_count,
-                    trials=self.hpopt_trials,
-                    show_progressbar=False)
+                result = self._tpe_step()
+                if result is None:
+                    logger.info('TPE has no more tuning config to suggest.')
+                    break
                 trials_count += 1
-                if pd is not None:
-                    self._save_trials(trials_file)
-                    self._update_best_result(best_result_file)
-                self._save()
+                self._save_trials(trials_file, [result])
+                self._update_best_result(best_result_file, result)
                 if self.stop(t, trials_count):
                     exit = True
 
+        # compact the journal, so the snapshot also holds the hyperopt trials
+        self._save()
+
     def _prepare_final_searchspace(self, first, second):
         for key, cfgs in second.items():
             new_cfg = []
@@ -273,7 +340,7 @@ class TpeTuneStrategy(TuneStrategy):
         for param, configs in tune_cfg.items():
             op_cfgs['op'][(param)] = configs
         history = self._find_history(op_cfgs)
-        if history:
+        if history and history['tune_result'] is not None:
             self.last_tune_result = history['tune_result']
             self.last_qmodel = None
             self.cfg_evaluated = True
@@ -293,7 +360,10 @@ class TpeTuneStrategy(TuneStrategy):
             self.last_tune_result[0],
             self.last_tune_result[1])
         result['source'] = 'tpe'
-        self._add_tuning_history(saved_tune_cfg, saved_last_tune_result, result=result)
+        # added to the tuning history by _tpe_step once the hyperopt trial is done, so the
+        # saved hyperopt trials hold its result
+        self._trial_history = (saved_tune_cfg, saved_last_tune_result,
+                               {'result': result, 'rejected': self.objective.rejected})
         logger.info('Current iteration loss: {} acc_loss: {} lat_diff: {} quantization_ratio: {}'
                     .format(result['loss'],
                             result['acc_loss'],
@@ -358,49 +428,45 @@ class TpeTuneStrategy(TuneStrategy):
         config['lat_min'] = lat_min
         config['lat_scale'] = 10 / np.abs(lat_max - lat_min)
 
-    def _save_trials(self, trials_log):
-        """ save trial result to log file"""
-        tpe_trials_results = pd.DataFrame(self.hpopt_trials.results)
-        csv_file = trials_log
-        tpe_trials_results.to_csv(csv_file)
-
-    def _update_best_result(self, best_result_file):
-        if not self.hpopt_trials:
-            raise Exception(
-                'No trials loaded to get best result')
-        trials_results = pd.DataFrame(self.hpopt_trials.results)
-
-        if not trials_results[trials_results.acc_loss <=
-                              self.loss_function_config['acc_th']].empty:
-            # If accuracy threshold reached, choose best latency
-            best_result = trials_results[trials_results.acc_loss <=
-                                         self.loss_function_config['acc_th']] \
-                .reset_index(drop=True).sort_values(by=['lat_diff', 'acc_loss'],
-                                                    ascending=[False, True]) \
-                .reset_index(drop=True).loc[0]
-        else:
-            # If accuracy threshold is not reached, choose based on loss function
-            best_result = \
-                trials_results.sort_values('loss', ascending=True).reset_index(drop=True).loc[0]
-
-        update_best_result = False
-        if not self.best_result['best_loss']:
-            update_best_result = True
-        elif self.best_result['best_acc_loss'] <= self.loss_function_config['acc_th']:
-            if best_result['acc_loss'] <= self.loss_function_config['acc_th'] \
-                    and best_result['lat_diff'] > self.best_result['best_lat_diff']:
-                update_best_result = True
-        else:
-            if best_result['acc_loss'] <= self.loss_function_config['acc_th'] or \
-                    best_result['loss'] < self.best_result['best_loss']:
-                update_best_result = True
-
-        if update_best_result:
-            best_result.to_csv(best_result_file, header=False)
-            self.best_result['best_loss'] = best_result['loss']
-            self.best_result['best_acc_loss'] = best_result['acc_loss']
-            self.best_result['best_lat_diff'] = best_result['lat_diff']
-            self.best_result['quantization_ratio'] = best_result['quantization_ratio']
+    def _save_trials(self, trials_log, results):
+        """ append trial results to log file"""
+        new_file = not os.path.exists(trials_log)
+        with open(trials_log, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow([''] + TRIALS_CSV_FIELDS)
+                self._trials_logged = 0
+            for result in results:
+                writer.writerow([self._trials_logged] +
+                                [result.get(field, '') for field in TRIALS_CSV_FIELDS])
+                self._trials_logged += 1
+
+    def _is_better_result(self, result, best):
+        """If accuracy threshold reached, the better result has higher latency improvement
+           then lower accuracy loss. Otherwise, the better result has lower loss.
+        """
+        if best is None:
+            return True
+        acc_th = self.loss_function_config['acc_th']
+        reached, best_reached = result['acc_loss'] <= acc_th, best['acc_loss'] <= acc_th
+        if reached != best_reached:
+            return reached
+        if reached:
+            return (result['lat_diff'], -result['acc_loss']) > \
+                   (best['lat_diff'], -best['acc_loss'])
+        return result['loss'] < best['loss']
+
+    def _update_best_result(self, best_result_file, result):
+        if self._is_better_result(result, self.best_trial_result):
+            self.best_trial_result = result
+            with open(best_result_file, 'w', newline='') as f:
+                writer = csv.writer(f)
+                for field in TRIALS_CSV_FIELDS:
+                    writer.writerow([field, result.get(field, '')])
+            self.best_result['best_loss'] = result['loss']
+            self.best_result['best_acc_loss'] = result['acc_loss']
+            self.best_result['best_lat_diff'] = result['lat_diff']
+            self.best_result['quantization_ratio'] = result['quantization_ratio']
 
         logger.info('Trial iteration end: {} / {} best loss: {} acc_loss: {} lat_diff: {} '
                     'quantization_ratio: {}'.format(len(self.hpopt_trials.trials), self.max_trials,
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+class CalibrationMonitor(object):
+    """Detect the convergence of the calibration statistics to stop calibration early.
+
+       After every batch the adaptor reports the range collected so far for each tensor.
+       The ranges are stable when none of them moved by more than tolerance, relative to
+       the tensor magnitude, since the previous batch. Once they stayed stable for patience
+       consecutive batches, the KL thresholds of the histogram collectors, if any, are
+       compared with the ones computed at the previous check in the same way. The
+       calibration has converged when both are stable.
+
+       Args:
+           tolerance (float, optional): The maximum relative change of a stable statistic.
+           patience (int, optional): The number of consecutive stable batches required.
+    """
+
+    def __init__(self, tolerance=0.01, patience=5):
+        assert tolerance >= 0 and patience >= 1
+        self.tolerance = tolerance
+        self.patience = patience
+        self.iterations = 0
+        self.converged = False
+        self._ranges = None
+        self._thresholds = None
+        self._stable = 0
+
+    def _is_stable(self, old, new):
+        if old is None or set(old) != set(new):
+            return False
+        for name, value in new.items():
+            if value.size != old[name].size or not np.all(np.isfinite(value)):
+                return False
+            scale = max(np.max(np.abs(old[name]), initial=0.), np.finfo(np.float32).tiny)
+            if np.max(np.abs(value - old[name]), initial=0.) > self.tolerance * scale:
+                return False
+        return True
+
+    @staticmethod
+    def _as_arrays(stats):
+        return {name: np.array(value, dtype=np.float64).reshape(-1)
+                for name, value in stats.items()}
+
+    def update(self, ranges, thresholds=None):
+        """Update the monitor with the statistics collected up to the current batch.
+
+           Args:
+               ranges (dict): tensor name to its collected range, e.g. (min, max), or any
+                              array of statistics.
+               thresholds (callable, optional): returns a dict of tensor name to its KL
+                                                threshold, only called once the ranges are
+                                                stable.
+
+           Returns:
+               bool: True if the calibration has converged and can stop.
+        """
+        self.iterations += 1
+        ranges = self._as_arrays(ranges)
+        if self._is_stable(self._ranges, ranges):
+            self._stable += 1
+        else:
+            self._stable = 0
+        self._ranges = ranges
+
+        if self._stable < self.patience:
+            return False
+
+        if thresholds is not None:
+            new_thresholds = self._as_arrays(thresholds())
+            stable = self._is_stable(self._thresholds, new_thresholds)
+            self._thresholds = new_thresholds
+            if not stable:
+                # checked again after another patience stable batches
+                self._stable = 0
+                return False
+
+        self.converged = True
+        return True
+
+
+def create_calibration_monitor(convergence):
+    """Create the monitor from the quantization.calibration.convergence config.
+
+       Args:
+           convergence (dict): The config with tolerance and patience, None if disabled.
+
+       Returns:
+           CalibrationMonitor: The monitor, or None if convergence detection is disabled.
+    """
+    if not convergence:
+        return None
+    return CalibrationMonitor(convergence.get('tolerance', 0.01),
+                              convergence.get('patience', 5))
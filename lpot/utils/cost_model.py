@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The cost model predicting the latency and the weight size of a model quantized with a
+   tuning config, without quantizing and measuring it.
+
+   The latency of each op is learned for each dtype from the op profiles of the fp32 model
+   and of the trials, and the quantization nodes of an int8 op from whether it is at the
+   edge of an int8 island. The predictions are mapped to the measured objective values by
+   a linear fit updated with each measurement.
+"""
+
+from collections import OrderedDict
+
+DTYPE_BYTES = {'fp32': 4, 'bf16': 2, 'int8': 1}
+
+
+def op_dtypes(tune_cfg):
+    """The dtype of each op of a tuning config, int8 for the quantized ops.
+
+    Returns:
+        OrderedDict: op name -> fp32, bf16 or int8, in the tuning config order.
+    """
+    dtypes = OrderedDict()
+    for op, op_cfg in tune_cfg['op'].items():
+        dtype = op_cfg['activation']['dtype']
+        dtypes[op[0]] = dtype if dtype in ('fp32', 'bf16') else 'int8'
+    return dtypes
+
+
+def _mean(stats):
+    return stats[0] / stats[1] if stats and stats[1] > 0 else None
+
+
+def _add(table, key, value):
+    stats = table.setdefault(key, [0., 0])
+    stats[0] += value
+    stats[1] += 1
+
+
+class CostModel(object):
+    """Predict the objective value of the tuning configs.
+
+    The raw latency of a config is the sum of the latency of each op for its dtype, of the
+    quantization nodes of its int8 ops and of the nodes outside the tuning ops, per
+    iteration. The int8 ops are taken in the tuning config order, an op is at the edge of
+    an int8 island if the op before or after it, or the model input or output, is not int8.
+    The int8 latency of an op never profiled in int8 is its fp32 latency scaled by the mean
+    int8 to fp32 ratio of the profiled ops.
+
+    The raw size of a config is the weight bytes of the ops for their dtypes.
+
+    Args:
+        objective (string, optional): The tuning objective, performance predicts the
+                                      latency, modelsize and footprint the size.
+        op_weights (dict, optional): The number of weight elements of each op.
+    """
+
+    def __init__(self, objective='performance', op_weights=None):
+        self.objective = objective
+        self.op_weights = op_weights or {}
+        # (op name, dtype) -> [sum, count] of the op seconds per iteration
+        self.latencies = {}
+        # (op name, edge) -> [sum, count] of the quantization seconds of the int8 op
+        self.boundaries = {}
+        # any int8 op -> [sum, count] of the seconds of the nodes outside the ops
+        self.others = {}
+        # the (raw prediction, measured value) pairs of the linear fit
+        self.points = []
+        # the (prediction, measured value) pairs of the configs measured
+        self.history = []
+
+    @staticmethod
+    def _edges(dtypes):
+        dtypes = ['fp32'] + list(dtypes) + ['fp32']
+        return [dtypes[i] != 'int8' or dtypes[i + 2] != 'int8'
+                for i in range(len(dtypes) - 2)]
+
+    def add_profile(self, dtypes, profile):
+        """Learn the op latencies from the profile of a model.
+
+        Args:
+            dtypes (OrderedDict): The dtype of each op of the profiled model, see op_dtypes.
+            profile (OpProfile): Its op profile.
+        """
+        iterations = max(profile.iterations, 1)
+        for (op, dtype), edge in zip(dtypes.items(), self._edges(dtypes.values())):
+            if op not in profile.ops:
+                continue
+            compute, boundary = profile.ops[op]
+            _add(self.latencies, (op, dtype), compute / iterations)
+            if dtype == 'int8':
+                _add(self.boundaries, (op, edge), boundary / iterations)
+        _add(self.others, 'int8' in dtypes.values(),
+             sum(sum(times) for times in profile.unattributed.values()) / iterations)
+
+    def needs_profile(self, dtypes):
+        """Whether the latency of an op of the config was never profiled for its dtype."""
+        return any((op, dtype) not in self.latencies for op, dtype in dtypes.items())
+
+    def _latency(self, op, dtype):
+        latency = _mean(self.latencies.get((op, dtype)))
+        if latency is not None or dtype == 'fp32':
+            return latency
+        fp32_latency = _mean(self.latencies.get((op, 'fp32')))
+        ratios = [_mean(stats) / _mean(self.latencies[(name, 'fp32')])
+                  for (name, op_dtype), stats in self.latencies.items()
+                  if op_dtype == dtype and _mean(self.latencies.get((name, 'fp32')))]
+        if fp32_latency is None or not ratios:
+            return None
+        return fp32_latency * sum(ratios) / len(ratios)
+
+    def _boundary(self, op, edge):
+        boundary = _mean(self.boundaries.get((op, edge)))
+        if boundary is not None:
+            return boundary
+        known = [_mean(stats) for (_, op_edge), stats in self.boundaries.items()
+                 if op_edge == edge]
+        return sum(known) / len(known) if known else 0.
+
+    def raw_latency(self, dtypes):
+        """The predicted seconds per iteration of the profiled nodes, None if unknown."""
+        total = _mean(self.others.get('int8' in dtypes.values())) or 0.
+        for (op, dtype), edge in zip(dtypes.items(), self._edges(dtypes.values())):
+            latency = self._latency(op, dtype)
+            if latency is None:
+                return None
+            total += latency
+            if dtype == 'int8':
+                total += self._boundary(op, edge)
+        return total
+
+    def raw_size(self, dtypes):
+        """The predicted weight bytes of the ops, None if the op weights are unknown."""
+        if not self.op_weights:
+            return None
+        return sum(self.op_weights.get(op, 0) * DTYPE_BYTES[dtype]
+                   for op, dtype in dtypes.items())
+
+    def _raw(self, dtypes):
+        if self.objective == 'performance':
+            return self.raw_latency(dtypes)
+        return self.raw_size(dtypes)
+
+    def _fit(self):
+        """The (slope, intercept) mapping the raw predictions to the measured values, the
+           least squares line once two raw predictions differ, the ratio before.
+        """
+        n = len(self.points)
+        sum_x = sum(x for x, _ in self.points)
+        sum_y = sum(y for _, y in self.points)
+        sum_xx = sum(x * x for x, _ in self.points)
+        sum_xy = sum(x * y for x, y in self.points)
+        variance = n * sum_xx - sum_x * sum_x
+        if n > 1 and variance > 1e-12 * sum_xx * n:
+            slope = (n * sum_xy - sum_x * sum_y) / variance
+            if slope > 0:
+                return slope, (sum_y - slope * sum_x) / n
+        return (sum_xy / sum_xx if sum_xx > 0 else 1.), 0.
+
+    def predict(self, dtypes):
+        """Predict the objective value of a config.
+
+        Args:
+            dtypes (OrderedDict): The dtype of each op, see op_dtypes.
+
+        Returns:
+            float: The predicted measured value, None if it can't be predicted yet.
+        """
+        raw = self._raw(dtypes)
+        if raw is None or not self.points:
+            return None
+        slope, intercept = self._fit()
+        return slope * raw + intercept
+
+    def update(self, dtypes, measured, predicted=None):
+        """Correct the model with the measured objective value of a config, its profile
+           having been added first if it was profiled.
+
+        Args:
+            dtypes (OrderedDict): The dtype of each op, see op_dtypes.
+            measured (float): The measured objective value.
+            predicted (float, optional): The value predicted before measuring it.
+        """
+        raw = self._raw(dtypes)
+        if raw is not None:
+            self.points.append((raw, measured))
+        if predicted is not None:
+            self.history.append((predicted, measured))
+
+    def mean_error(self):
+        """The mean absolute relative error of the predictions made before measuring."""
+        errors = [abs(predicted - measured) / abs(measured)
+                  for predicted, measured in self.history if measured]
+        return sum(errors) / len(errors) if errors else None
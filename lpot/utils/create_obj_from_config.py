@@ -17,6 +17,7 @@
 
 from ..metric import METRICS
 from ..data import DATASETS, TRANSFORMS, DataLoader
+from . import logger
 from collections import OrderedDict
 import copy
 
@@ -61,6 +62,28 @@ def create_dataset(framework, data_source, cfg_preprocess):
     dataset = datasets[dataset_type](**data_source[dataset_type], transform=preprocess)
     return dataset
 
+def create_cached_dataset(framework, dataset, dataloader_cfg):
+    """Serve the dataset samples from the on-disk cache configured in dataloader.cache.
+
+    Args:
+        framework (string): The framework name.
+        dataset (object): The dataset created from the dataloader config.
+        dataloader_cfg (dict): The dataloader config.
+
+    Returns:
+        object: The cached dataset, or dataset itself if it can't be cached.
+    """
+    from ..data.datasets.cached_dataset import DatasetCache, cache_key, is_random_transform
+    cache_cfg = dataloader_cfg['cache']
+    if is_random_transform(dataloader_cfg.get('transform')):
+        logger.warning('Random transforms are not cached, dataloader.cache is ignored.')
+        return dataset
+    size_budget = cache_cfg.get('size_budget')
+    cache = DatasetCache(cache_cfg['path'],
+                         size_budget * 1024 * 1024 if size_budget is not None else None)
+    key = cache_key(framework, dataloader_cfg['dataset'], dataloader_cfg.get('transform'))
+    return cache.get(key, dataset)
+
 def create_dataloader(framework, dataloader_cfg):
 
     batch_size = int(dataloader_cfg['batch_size']) \
@@ -69,16 +92,38 @@ def create_dataloader(framework, dataloader_cfg):
     eval_dataset = create_dataset(framework,
                                   copy.deepcopy(dataloader_cfg['dataset']),
                                   copy.deepcopy(dataloader_cfg['transform']))
+    if dataloader_cfg.get('cache') is not None:
+        eval_dataset = create_cached_dataset(framework, eval_dataset, dataloader_cfg)
 
     return DataLoader(dataset=eval_dataset, framework=framework, batch_size=batch_size)
 
+def create_postprocess(framework, postprocess_cfg):
+    """Create the postprocess from the postprocess config, None if not configured."""
+    if postprocess_cfg is None:
+        return None
+    postprocesses = TRANSFORMS(framework, "postprocess")
+    return get_postprocess(postprocesses, postprocess_cfg.transform)
+
+def create_metric(framework, metric_cfg):
+    """Create the metric from the metric config, None if not configured."""
+    if metric_cfg is None:
+        return None
+    assert len(metric_cfg) == 1, "Only one metric should be specified!"
+    metrics = METRICS(framework)
+    # if not do compose will only return the first metric
+    return get_metrics(metrics, metric_cfg, compose=False)
+
 def create_eval_func(framework, dataloader, adaptor, \
                      metric_cfg, postprocess_cfg=None, \
-                     iteration=-1, tensorboard=False):
+                     iteration=-1, tensorboard=False, sequential_eval=None, sharding=None):
     """The interface to create evaluate function from config.
 
     Args:
         model (object): The model to be evaluated.
+        sequential_eval (SequentialEvaluation, optional): Check to reject the model
+                                                          during evaluation.
+        sharding (dict, optional): The evaluation.accuracy.sharding config to evaluate
+                                   the dataset shards in parallel worker processes.
 
     Returns:
         Objective: The objective value evaluated
@@ -87,22 +132,26 @@ def create_eval_func(framework, dataloader, adaptor, \
     # eval_func being None means user will provide dataloader and metric info
     # in config yaml file
     assert dataloader, "dataloader should NOT be empty when eval_func is None"
-    postprocess = None
-    if postprocess_cfg is not None:
-        postprocesses = TRANSFORMS(framework, "postprocess")
-        postprocess = get_postprocess(postprocesses, postprocess_cfg.transform)
-
-    if metric_cfg is not None:
-        assert len(metric_cfg) == 1, "Only one metric should be specified!"
-        metrics = METRICS(framework)
-        # if not do compose will only return the first metric
-        metric = get_metrics(metrics, metric_cfg, compose=False)
-    else:
-        metric = None
-    
+    postprocess = create_postprocess(framework, postprocess_cfg)
+    metric = create_metric(framework, metric_cfg)
+
+    sharded_eval = None
+    if sharding is not None and iteration == -1 and not tensorboard and \
+            sequential_eval is None and metric is not None:
+        from .sharding import ShardedEvaluation
+        sharded_eval = ShardedEvaluation(framework, adaptor, dataloader, metric_cfg,
+                                         postprocess_cfg, sharding.get('num_shards', 2))
+
     def eval_func(model, measurer=None):
+        if sharded_eval is not None and measurer is None:
+            acc = sharded_eval(model, metric)
+            if acc is not None:
+                return acc
+        if sequential_eval is None:
+            return adaptor.evaluate(model, dataloader, postprocess, \
+                                    metric, measurer, iteration, tensorboard)
         return adaptor.evaluate(model, dataloader, postprocess, \
-                                metric, measurer, iteration, tensorboard)
+                                metric, measurer, iteration, tensorboard, \
+                                sequential_eval=sequential_eval)
 
     return eval_func
-
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import struct
+import pickle
+import zlib
+from .utility import fault_tolerant_file
+from . import logger
+
+"""Append-only journal used to persist the tuning state.
+
+   The file starts with a magic string, followed by length-prefixed records:
+
+       | length (uint32) | crc32 (uint32) | pickled payload |
+
+   The first record is a snapshot of the whole state, the following records are
+   small incremental updates appended one per trial. Compaction rewrites the file
+   with a single snapshot record. A torn record at the tail, e.g. left by a killed
+   process, is dropped on load.
+"""
+
+MAGIC = b'LPOTJNL1'
+HEADER = struct.Struct('<II')
+
+
+class TuningJournal(object):
+    """Append-only journal of a snapshot state followed by incremental records.
+
+       Args:
+           path (string): The journal file path.
+           compact_min_bytes (optional, integer): Appended records are not compacted
+                                                  before reaching this size.
+    """
+
+    def __init__(self, path, compact_min_bytes=64 * 1024):
+        self.path = path
+        self.compact_min_bytes = compact_min_bytes
+        self.snapshot_size = 0
+        self.tail_size = 0
+
+    @staticmethod
+    def _pack(obj):
+        payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def snapshot(self, state):
+        """Compact the journal by rewriting it with the whole state as the only record.
+
+           Args:
+               state (object): The picklable state.
+        """
+        record = self._pack(state)
+        with fault_tolerant_file(self.path) as f:
+            f.write(MAGIC)
+            f.write(record)
+        self.snapshot_size = len(record)
+        self.tail_size = 0
+
+    def append(self, record):
+        """Append one incremental record, the cost doesn't depend on the journal size.
+
+           Args:
+               record (object): The picklable record.
+        """
+        assert self.snapshot_size, "journal must start with a snapshot"
+        data = self._pack(record)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.tail_size += len(data)
+
+    def need_compact(self):
+        """Whether the appended records outgrow the snapshot. Compacting only then
+           keeps the amortized persistence cost per record constant.
+        """
+        return self.tail_size > max(self.snapshot_size, self.compact_min_bytes)
+
+    def load(self):
+        """Load the journal.
+
+           Returns:
+               tuple: The snapshot state and the list of records appended after it.
+        """
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        if not data.startswith(MAGIC):
+            # snapshot written by previous versions, a pickled strategy object
+            return pickle.loads(data).__dict__, []
+
+        records = []
+        offset = len(MAGIC)
+        while offset + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, offset)
+            payload = data[offset + HEADER.size: offset + HEADER.size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            records.append(pickle.loads(payload))
+            offset += HEADER.size + length
+
+        if offset != len(data):
+            logger.warning('Drop torn record at the tail of {}'.format(self.path))
+
+        assert records, "{} has no snapshot record".format(self.path)
+        return records[0], records[1:]
@@ -16,6 +16,7 @@
 # limitations under the License.
 
 import math
+from . import trace
 
 
 class KL_Divergence(object):
@@ -70,6 +71,7 @@ class KL_Divergence(object):
                 tmp_sum2 += p_idx * (math.log(P_sum * q_idx))
         return (tmp_sum1 - tmp_sum2) / P_sum
 
+    @trace.traced('kl.search')
     def get_threshold(self,
                       hist,
                       hist_edges,
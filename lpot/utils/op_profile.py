@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The latency of each op of a model, as measured by the framework profilers and
+   attributed to the op names of the tuning space.
+
+   The nodes a quantized model runs for an op, like the fused BiasAdd and Relu or the
+   inserted Quantize, Dequantize and Requantize nodes, are attributed to the op, the
+   quantization nodes being accounted as its boundary time. The profiles of the fp32 and
+   quantized models are compared op by op to find the ops without int8 speedup.
+"""
+
+import json
+from collections import OrderedDict
+
+
+class OpProfile(object):
+    """The time spent in each op of a model over the profiled iterations.
+
+    Args:
+        iterations (int, optional): The number of profiled batches.
+    """
+
+    def __init__(self, iterations=0):
+        self.iterations = iterations
+        # op name -> [compute seconds, boundary seconds] summed over the iterations
+        self.ops = OrderedDict()
+        # the same for the nodes not belonging to a tuning op, by node name
+        self.unattributed = OrderedDict()
+
+    def add(self, name, seconds, boundary=False, attributed=True):
+        """Add the time of a node run to its op.
+
+        Args:
+            name (string): The op name, or the node name if the node isn't attributed.
+            seconds (float): The node time.
+            boundary (bool, optional): Whether it is a quantization node inserted around
+                                       the op.
+            attributed (bool, optional): Whether name is a tuning op.
+        """
+        times = (self.ops if attributed else self.unattributed).setdefault(name, [0., 0.])
+        times[1 if boundary else 0] += seconds
+
+    def latency(self, op):
+        """The seconds per iteration of an op, None if it wasn't profiled."""
+        if op not in self.ops:
+            return None
+        return sum(self.ops[op]) / max(self.iterations, 1)
+
+    def boundary_latency(self, op):
+        """The seconds per iteration of the quantization nodes of an op."""
+        if op not in self.ops:
+            return None
+        return self.ops[op][1] / max(self.iterations, 1)
+
+    def total(self):
+        """The seconds per iteration of all the profiled nodes. The nodes running in
+           parallel are summed, so it can exceed the wall time of an iteration.
+        """
+        seconds = sum(sum(times) for times in self.ops.values()) + \
+            sum(sum(times) for times in self.unattributed.values())
+        return seconds / max(self.iterations, 1)
+
+    def compare(self, baseline):
+        """Compare the ops profiled in both this and the baseline profile.
+
+        Args:
+            baseline (OpProfile): The profile of the reference model, usually the fp32 one.
+
+        Returns:
+            OrderedDict: op name -> (baseline latency, latency, speedup) in seconds per
+                         iteration, the speedup being the baseline latency over the latency.
+        """
+        result = OrderedDict()
+        for op in self.ops:
+            if op not in baseline.ops:
+                continue
+            base, latency = baseline.latency(op), self.latency(op)
+            result[op] = (base, latency, base / latency if latency > 0 else float('inf'))
+        return result
+
+    def format(self, baseline=None):
+        """The profile as a table of milliseconds per iteration, with the baseline latency
+           and the speedup of each op if a baseline profile is given.
+        """
+        width = max([len(op) for op in self.ops] + [2])
+        if baseline is None:
+            lines = ['{:<{}} {:>12} {:>14}'.format('Op', width, 'Latency (ms)', 'Boundary (ms)')]
+            for op in self.ops:
+                lines.append('{:<{}} {:>12.4f} {:>14.4f}'.format(
+                    op, width, self.latency(op) * 1e3, self.boundary_latency(op) * 1e3))
+            lines.append('{:<{}} {:>12.4f}'.format('Total', width, self.total() * 1e3))
+        else:
+            lines = ['{:<{}} {:>13} {:>12} {:>8}'.format('Op', width, 'Baseline (ms)',
+                                                          'Latency (ms)', 'Speedup')]
+            for op, (base, latency, speedup) in self.compare(baseline).items():
+                lines.append('{:<{}} {:>13.4f} {:>12.4f} {:>7.2f}x'.format(
+                    op, width, base * 1e3, latency * 1e3, speedup))
+            base, latency = baseline.total(), self.total()
+            lines.append('{:<{}} {:>13.4f} {:>12.4f} {:>7.2f}x'.format(
+                'Total', width, base * 1e3, latency * 1e3,
+                base / latency if latency > 0 else float('inf')))
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {'iterations': self.iterations,
+                'ops': [[op, compute, boundary]
+                        for op, (compute, boundary) in self.ops.items()],
+                'unattributed': [[name, compute, boundary]
+                                 for name, (compute, boundary) in self.unattributed.items()]}
+
+    @classmethod
+    def from_dict(cls, state):
+        profile = cls(state['iterations'])
+        for op, compute, boundary in state['ops']:
+            profile.ops[op] = [compute, boundary]
+        for name, compute, boundary in state['unattributed']:
+            profile.unattributed[name] = [compute, boundary]
+        return profile
+
+    def save(self, path):
+        """Save the profile to a json file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Load a profile saved to a json file."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
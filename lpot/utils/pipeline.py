@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+import queue
+import threading
+from . import logger, trace
+
+_STOP = object()
+
+
+class MetricPipeline(object):
+    """Apply the postprocess and metric update to the model outputs in a worker thread,
+       so they overlap with the inference of the next batches.
+
+       The outputs are processed in order by a single worker, so the metric sees the same
+       batches in the same order as when updated in the inference loop. At most
+       max_pending outputs wait in the queue, put blocks once it is full. An exception
+       raised by the update function, e.g. EvaluationRejected of the sequential
+       evaluation, is raised again by the next put or when leaving the with block, the
+       pending outputs are then dropped.
+
+       The wall time of the evaluation and the time spent in the postprocess and metric
+       are logged when leaving the with block, so the evaluation with and without the
+       overlap can be compared.
+
+    Args:
+        update (function): Called with (predictions, labels) of each batch, it applies
+                           the postprocess and updates the metric.
+        overlap (bool, optional): Run update in the worker thread, otherwise in put.
+        max_pending (int, optional): The maximum number of outputs waiting in the queue.
+    """
+
+    def __init__(self, update, overlap=True, max_pending=4):
+        assert max_pending > 0, 'max_pending should be positive'
+        self.update = update
+        self.overlap = overlap
+        self.max_pending = max_pending
+        self._queue = None
+        self._worker = None
+        self._error = None
+        self._update_time = 0.
+        self._put_wait_time = 0.
+
+    def __enter__(self):
+        self._error = None
+        self._update_time = 0.
+        self._put_wait_time = 0.
+        self._start = time.time()
+        # the updates of all the batches are recorded as one span
+        self._updates = trace.aggregate('metric.update')
+        if self.overlap:
+            self._queue = queue.Queue(self.max_pending)
+            self._worker = threading.Thread(target=self._run, name='MetricPipeline')
+            self._worker.daemon = True
+            self._worker.start()
+        return self
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                # drain the queue so that put doesn't block after an error
+                continue
+            try:
+                start = time.time()
+                with self._updates.item():
+                    self.update(*item)
+                self._update_time += time.time() - start
+            except BaseException:
+                self._error = sys.exc_info()
+
+    def _raise_error(self):
+        if self._error is not None:
+            _, error, traceback = self._error
+            raise error.with_traceback(traceback)
+
+    def put(self, predictions, labels):
+        """Process the outputs of a batch, blocking while max_pending outputs wait.
+
+        Args:
+            predictions (object): The model outputs.
+            labels (object): The labels of the batch.
+        """
+        if not self.overlap:
+            start = time.time()
+            with self._updates.item():
+                self.update(predictions, labels)
+            self._update_time += time.time() - start
+            return
+        self._raise_error()
+        start = time.time()
+        self._queue.put((predictions, labels))
+        self._put_wait_time += time.time() - start
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed_time = time.time() - self._start
+        if self.overlap:
+            if exc_type is not None and self._error is None:
+                self._error = (exc_type, exc_value, traceback)
+            self._queue.put(_STOP)
+            self._worker.join()
+            self._worker = None
+            self._queue = None
+        self._updates.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        if self.overlap:
+            self._raise_error()
+            logger.info('Evaluation took {:.3f}s, the postprocess and metric took {:.3f}s in a '
+                        'worker thread overlapped with the inference, which waited {:.3f}s '
+                        'for them.'.format(time.time() - self._start, self._update_time,
+                                           self._put_wait_time))
+        else:
+            logger.info('Evaluation took {:.3f}s, including {:.3f}s of postprocess and '
+                        'metric.'.format(elapsed_time, self._update_time))
+        return False
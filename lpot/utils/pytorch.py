@@ -28,6 +28,7 @@ def load(tune_cfg_file, weights_file, model):
 
     Args:
         tune_cfg_file (file): the tune configure file.
+        weights_file (file): the weights file of the quantized model.
         model (object): fp32 model need to do quantization.
 
     Returns:
@@ -44,6 +45,11 @@ def load(tune_cfg_file, weights_file, model):
     with open(os.path.expanduser(tune_cfg_file), 'r') as f:
         tune_cfg = yaml.load(f, Loader=yaml.UnsafeLoader)
 
+    # the saved weights are the ones of the fused modules
+    fused_groups = tune_cfg.get('fused_groups', [])
+    if fused_groups:
+        torch.quantization.fuse_modules(q_model, fused_groups, inplace=True)
+
     op_cfgs = _cfg_to_qconfig(tune_cfg)
     _propagate_qconfig(q_model, op_cfgs)
     # sanity check common API misusage
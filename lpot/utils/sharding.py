@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import traceback
+import multiprocessing
+from .utility import LazyImport
+from . import logger, trace
+
+tf = LazyImport('tensorflow')
+
+
+def shard_cores(num_shards, cores=None):
+    """Split the cores into num_shards contiguous groups of cores, one per shard.
+
+    Args:
+        num_shards (int): The number of shards.
+        cores (list, optional): The cores to split, defaults to the cores this process
+                                can run on.
+
+    Returns:
+        list: The list of cores of each shard, the shards share cores if there are fewer
+              cores than shards.
+    """
+    if cores is None:
+        cores = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') \
+            else range(os.cpu_count() or 1)
+    cores = sorted(cores)
+    if len(cores) < num_shards:
+        return [[cores[i % len(cores)]] for i in range(num_shards)]
+    return [cores[i * len(cores) // num_shards:(i + 1) * len(cores) // num_shards]
+            for i in range(num_shards)]
+
+
+def _evaluate_shard(payload, num_shards, shard_id, cores, traced, conn):
+    """The worker process evaluating a shard and sending back the metric state, and the
+       trace events of the shard when the parent process is tracing.
+    """
+    if traced:
+        trace.enable('lpot shard {}'.format(shard_id))
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        os.environ['OMP_NUM_THREADS'] = str(len(cores))
+
+        from ..adaptor import FRAMEWORKS
+        from ..data import DataLoader
+        from ..data.dataloaders.sampler import ShardSampler
+        from .create_obj_from_config import create_metric, create_postprocess
+        framework, adaptor_info, model, dataset, batch_size, collate_fn, last_batch, \
+            metric_cfg, postprocess_cfg = pickle.loads(payload)
+        if framework == 'pytorch':
+            import torch
+            torch.set_num_threads(len(cores))
+
+        adaptor = FRAMEWORKS[framework](adaptor_info)
+        sampler = ShardSampler(dataset, num_shards, shard_id, batch_size)
+        dataloader = DataLoader(framework, dataset, batch_size=batch_size,
+                                collate_fn=collate_fn, last_batch=last_batch, sampler=sampler)
+        metric = create_metric(framework, metric_cfg)
+        if len(sampler) > 0:
+            with trace.span('sharding.evaluate_shard', shard=shard_id):
+                adaptor.evaluate(model, dataloader,
+                                 create_postprocess(framework, postprocess_cfg), metric)
+        conn.send((True, pickle.dumps(metric.state()), trace.events()))
+    except Exception:
+        conn.send((False, traceback.format_exc(), trace.events()))
+    finally:
+        conn.close()
+
+
+class ShardedEvaluation(object):
+    """Evaluate a model on the contiguous shards of an indexable evaluation dataset in
+       parallel worker processes, each pinned to its own group of cores.
+
+       The workers are spawned for each evaluation, as the frameworks don't support
+       forking a process that already ran a model. They create the adaptor, metric and
+       postprocess from the same configs and evaluate the pickled model on their shard.
+       The metric states of the shards are merged in the dataset order, the shards being
+       aligned to the batches, so the metric sees the same batches as when evaluating in
+       one process. Metrics counting samples give identical results, metrics summing
+       float values may differ in the last bits as the sums are grouped by shard.
+
+    Args:
+        framework (string): The framework name.
+        adaptor (Adaptor): The adaptor evaluating the model.
+        dataloader (object): The evaluation dataloader, only its dataset, batch_size and
+                             collate_fn are used by the workers.
+        metric_cfg (dict): The metric config.
+        postprocess_cfg (dict, optional): The postprocess config.
+        num_shards (int, optional): The number of shards and worker processes.
+    """
+
+    def __init__(self, framework, adaptor, dataloader, metric_cfg, postprocess_cfg=None,
+                 num_shards=2):
+        assert num_shards > 0, 'num_shards should be positive'
+        self.framework = framework
+        self.adaptor = adaptor
+        self.dataloader = dataloader
+        self.metric_cfg = metric_cfg
+        self.postprocess_cfg = postprocess_cfg
+        self.num_shards = num_shards
+
+    def _payload(self, model):
+        dataset = getattr(self.dataloader, 'dataset', None)
+        if not hasattr(dataset, '__getitem__') or \
+                not hasattr(self.adaptor, 'framework_specific_info'):
+            return None
+        if self.framework == 'tensorflow' and isinstance(model, tf.Graph):
+            model = model.as_graph_def()
+        # the calibration dataloader isn't needed to evaluate
+        adaptor_info = dict(self.adaptor.framework_specific_info, q_dataloader=None)
+        try:
+            len(dataset)
+            return pickle.dumps((self.framework, adaptor_info, model, dataset,
+                                 getattr(self.dataloader, 'batch_size', 1),
+                                 getattr(self.dataloader, 'collate_fn', None),
+                                 getattr(self.dataloader, 'last_batch', 'rollover'),
+                                 self.metric_cfg, self.postprocess_cfg))
+        except Exception as e:
+            logger.debug('Sharded evaluation payload error: {}'.format(e))
+            return None
+
+    def __call__(self, model, metric):
+        """Evaluate the model on the shards.
+
+        Args:
+            model (object): The model to evaluate.
+            metric (Metric): The metric the shard states are merged into, it should not
+                             be updated yet.
+
+        Returns:
+            object: The metric result, None if the evaluation can't be sharded and should
+                    run in this process.
+        """
+        try:
+            metric.state()
+        except NotImplementedError:
+            logger.warning('The metric state can not be merged, evaluate in one process.')
+            return None
+        payload = self._payload(model)
+        if payload is None:
+            logger.warning('The model or the indexable evaluation dataset can not be sent '
+                           'to the worker processes, evaluate in one process.')
+            return None
+
+        logger.info('Start to evaluate model in {} shards...'.format(self.num_shards))
+        context = multiprocessing.get_context('spawn')
+        workers = []
+        for shard_id, cores in enumerate(shard_cores(self.num_shards)):
+            parent_conn, child_conn = context.Pipe(duplex=False)
+            process = context.Process(target=_evaluate_shard,
+                                      args=(payload, self.num_shards, shard_id, cores,
+                                            trace.is_enabled(), child_conn))
+            process.start()
+            child_conn.close()
+            workers.append((process, parent_conn))
+
+        results = []
+        for process, conn in workers:
+            try:
+                result = conn.recv()
+            except EOFError:
+                result = None
+            process.join()
+            results.append(result or
+                           (False, 'The worker exited with code {}'.format(process.exitcode),
+                            []))
+
+        for _, _, shard_events in results:
+            trace.add_events(shard_events)
+        for shard_id, (succeeded, result, _) in enumerate(results):
+            if not succeeded:
+                raise RuntimeError('Evaluating shard {} failed:\n{}'.format(shard_id, result))
+            metric.merge(pickle.loads(result))
+        return metric.result()
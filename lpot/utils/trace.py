@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Hierarchical timing spans of a tuning run, saved as a trace event file viewable in
+   chrome://tracing or Perfetto and summarized per span name at the end of the run.
+
+   The spans are only recorded once tracing is enabled, a disabled span is a shared no-op
+   context manager. The spans repeated for every batch of a loop are summed into one
+   aggregate span per loop, so the events don't grow with the number of batches. The events of worker processes are sent back with their results and
+   merged with add_events, the timestamps being wall clock microseconds.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+
+_enabled = False
+_events = []
+_lock = threading.Lock()
+# the perf_counter origin on the wall clock, so the processes share the timeline
+_origin = time.time() - time.perf_counter()
+
+
+def _now_us():
+    return (time.perf_counter() + _origin) * 1e6
+
+
+class _NullSpan(object):
+    """The span returned while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def item(self):
+        return self
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    """A complete trace event recorded from its enter to its exit."""
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = _now_us()
+        event = {'name': self.name, 'cat': self.category, 'ph': 'X', 'ts': self.start,
+                 'dur': end - self.start, 'pid': os.getpid(),
+                 'tid': threading.get_ident()}
+        if self.args:
+            event['args'] = self.args
+        if exc_type is not None:
+            event.setdefault('args', {})['error'] = exc_type.__name__
+        with _lock:
+            _events.append(event)
+        return False
+
+
+class _AggregateItem(object):
+    """One repetition of an aggregate span."""
+
+    def __init__(self, aggregate):
+        self.aggregate = aggregate
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.aggregate._add(self.start, _now_us())
+        return False
+
+
+class _Aggregate(object):
+    """A span repeated in a loop, recorded as one event from the start of the first
+       repetition to the end of the last one, with the number of repetitions and their
+       total duration in its args.
+    """
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.calls = 0
+        self.total = 0.
+        self.start = None
+        self.end = None
+        self.tid = None
+
+    def __enter__(self):
+        return self
+
+    def item(self):
+        """The context manager timing one repetition."""
+        return _AggregateItem(self)
+
+    def _add(self, start, end):
+        if self.start is None:
+            self.start = start
+        self.end = end
+        # the thread of the repetitions, which may not be the one of the loop
+        self.tid = threading.get_ident()
+        self.calls += 1
+        self.total += end - start
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.calls:
+            return False
+        args = dict(self.args)
+        args.update({'calls': self.calls, 'total_us': self.total})
+        event = {'name': self.name, 'cat': self.category, 'ph': 'X', 'ts': self.start,
+                 'dur': self.end - self.start, 'pid': os.getpid(),
+                 'tid': self.tid, 'args': args}
+        with _lock:
+            _events.append(event)
+        return False
+
+
+def span(name, category=None, **args):
+    """The context manager timing a span of the tuning run.
+
+    Args:
+        name (string): The span name, the spans are summarized by name.
+        category (string, optional): The span category, defaults to the name prefix
+                                     before the first dot, e.g. adaptor or strategy.
+        args (optional): The values shown with the span in the trace viewer.
+
+    Returns:
+        context manager: The span, a no-op one when tracing is disabled.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category or name.split('.')[0], args)
+
+
+def aggregate(name, category=None, **args):
+    """The context manager of a loop, summing the spans timed by its item() into one
+       event, e.g. the loading of the batches of an evaluation.
+
+    Args:
+        name (string): The span name.
+        category (string, optional): The span category, defaults to the name prefix.
+        args (optional): The values shown with the span in the trace viewer.
+
+    Returns:
+        context manager: The aggregate span, a no-op one when tracing is disabled.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Aggregate(name, category or name.split('.')[0], args)
+
+
+def traced(name=None, category=None):
+    """The decorator timing each call of a function as a span.
+
+    Args:
+        name (string, optional): The span name, defaults to the function qualified name.
+        category (string, optional): The span category, defaults to the name prefix.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+        span_category = category or span_name.split('.')[0]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, span_category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(process_name=None):
+    """Start recording the spans, dropping the ones already recorded.
+
+    Args:
+        process_name (string, optional): The name of this process in the trace viewer.
+    """
+    global _enabled
+    with _lock:
+        del _events[:]
+        if process_name:
+            _events.append({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                            'tid': 0, 'args': {'name': process_name}})
+    _enabled = True
+
+
+def disable():
+    """Stop recording the spans, the recorded ones are kept until the next enable."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def events():
+    """The recorded trace events, including the ones merged from worker processes."""
+    with _lock:
+        return list(_events)
+
+
+def add_events(worker_events):
+    """Merge the trace events recorded by a worker process."""
+    with _lock:
+        _events.extend(worker_events)
+
+
+def save(path):
+    """Write the recorded trace events to a trace event json file.
+
+    Args:
+        path (string): The file path.
+    """
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events(), 'displayTimeUnit': 'ms'}, f)
+
+
+def summary(trace_events=None):
+    """Aggregate the spans by name. The self time of a span is its duration minus the one
+       of the spans nested in it in the same thread. An aggregate span counts for its
+       calls and total duration, and no span is nested in it.
+
+    Args:
+        trace_events (list, optional): The trace events, defaults to the recorded ones.
+
+    Returns:
+        list: The (name, calls, total seconds, self seconds) of each span name, by
+              decreasing self time.
+    """
+    trace_events = events() if trace_events is None else trace_events
+    spans = sorted((e for e in trace_events if e.get('ph') == 'X'),
+                   key=lambda e: (e['pid'], e['tid'], e['ts'], -e['dur']))
+    calls = [e.get('args', {}).get('calls', 1) for e in spans]
+    durations = [e.get('args', {}).get('total_us', e['dur']) for e in spans]
+    self_times = list(durations)
+    # the (thread, end, index) of the spans enclosing the current one
+    stack = []
+    for index, event in enumerate(spans):
+        thread = (event['pid'], event['tid'])
+        while stack and (stack[-1][0] != thread or event['ts'] >= stack[-1][1]):
+            stack.pop()
+        if stack:
+            self_times[stack[-1][2]] -= durations[index]
+        if 'total_us' not in event.get('args', {}):
+            stack.append((thread, event['ts'] + event['dur'], index))
+
+    stats = {}
+    for event, count, duration, self_time in zip(spans, calls, durations, self_times):
+        row = stats.setdefault(event['name'], [0, 0., 0.])
+        row[0] += count
+        row[1] += duration / 1e6
+        row[2] += self_time / 1e6
+    return sorted(((name,) + tuple(row) for name, row in stats.items()),
+                  key=lambda row: row[3], reverse=True)
+
+
+def format_summary(rows):
+    """The summary rows as a table, with the share of each name in the sum of the self
+       times, which exceeds the wall time when threads or processes overlap.
+    """
+    total = sum(row[3] for row in rows) or 1.
+    width = max([len(row[0]) for row in rows] + [4])
+    lines = ['{:<{}} {:>8} {:>12} {:>12} {:>7}'.format('Span', width, 'Calls', 'Total (s)',
+                                                         'Self (s)', 'Self %')]
+    for name, calls, total_time, self_time in rows:
+        lines.append('{:<{}} {:>8} {:>12.3f} {:>12.3f} {:>6.1f}%'.format(
+            name, width, calls, total_time, self_time, 100. * self_time / total))
+    return '\n'.join(lines)
@@ -29,9 +29,11 @@ import inspect
 import time
 import sys
 import numpy as np
-import cpuinfo
+import importlib.util
+import pkgutil
 from contextlib import contextmanager
 from tempfile import NamedTemporaryFile
+from . import logger
 
 
 def print_info():
@@ -71,11 +73,95 @@ class LazyImport(object):
 
     def __getattr__(self, name):
         if self.module is None:
-            self.module = __import__(self.module_name)
+            self.module = importlib.import_module(self.module_name)
 
         return getattr(self.module, name)
 
 
+class LazyRegistry(dict):
+    """Registry dict whose entries are provided by the modules of a package and
+       imported on first lookup instead of at package import time.
+
+       A lookup of name first imports the module of the same name in the package,
+       e.g. FRAMEWORKS['pytorch'] imports lpot.adaptor.pytorch. If that does not
+       register name, or the registry is enumerated, all modules of the package
+       are imported.
+
+       Args:
+           package (string): The package whose modules register into this registry.
+    """
+
+    def __init__(self, package):
+        super(LazyRegistry, self).__init__()
+        self.package = package
+        self._loaded = False
+        self._loading = False
+
+    def is_registered(self, name):
+        """Check the registered entries only, without importing any module.
+           Registration decorators use this to detect duplicated names.
+        """
+        return dict.__contains__(self, name)
+
+    def _load(self, name=None):
+        if self._loaded or self._loading or (name is not None and self.is_registered(name)):
+            return
+
+        self._loading = True
+        try:
+            # the package directory may get new modules after lpot is imported
+            importlib.invalidate_caches()
+            if isinstance(name, str) and name.isidentifier() and \
+               importlib.util.find_spec(self.package + '.' + name) is not None:
+                importlib.import_module(self.package + '.' + name)
+                if self.is_registered(name):
+                    return
+
+            package = importlib.import_module(self.package)
+            for _, module, is_pkg in pkgutil.iter_modules(package.__path__):
+                if is_pkg or module.startswith('_'):
+                    continue
+                try:
+                    importlib.import_module(self.package + '.' + module)
+                except ImportError as e:
+                    logger.debug("Skip {}.{}: {}".format(self.package, module, e))
+            self._loaded = True
+        finally:
+            self._loading = False
+
+    def __contains__(self, name):
+        self._load(name)
+        return dict.__contains__(self, name)
+
+    def __getitem__(self, name):
+        self._load(name)
+        return dict.__getitem__(self, name)
+
+    def get(self, name, default=None):
+        self._load(name)
+        return dict.get(self, name, default)
+
+    def __iter__(self):
+        self._load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._load()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._load()
+        return dict.keys(self)
+
+    def values(self):
+        self._load()
+        return dict.values(self)
+
+    def items(self):
+        self._load()
+        return dict.items(self)
+
+
 class AverageMeter(object):
     """Computes the average value
 
@@ -181,6 +267,7 @@ def equal_dicts(d1, d2, compare_keys=None, ignore_keys=None):
 @singleton
 class CpuInfo(object):
     def __init__(self):
+        import cpuinfo
         self._bf16 = False
         self._vnni = False
         cpuid = cpuinfo.CPUID()
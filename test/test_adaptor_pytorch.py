@@ -4,9 +4,78 @@ import torch
 import torchvision
 import unittest
 import os
+import shutil
 from lpot.adaptor import FRAMEWORKS
 
 
+class M(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.quant = torch.quantization.QuantStub()
+        self.conv = torch.nn.Conv2d(3, 4, 3)
+        self.relu = torch.nn.ReLU()
+        self.conv2 = torch.nn.Conv2d(4, 4, 3)
+        self.dequant = torch.quantization.DeQuantStub()
+
+    def forward(self, x):
+        return self.dequant(self.conv2(self.relu(self.conv(self.quant(x)))))
+
+
+class FusionModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.quant = torch.quantization.QuantStub()
+        self.conv = torch.nn.Conv2d(3, 3, 3, padding=1)
+        self.bn = torch.nn.BatchNorm2d(3)
+        self.relu = torch.nn.ReLU()
+        self.conv2 = torch.nn.Conv2d(3, 3, 3, padding=1)
+        self.bn2 = torch.nn.BatchNorm2d(3)
+        self.relu2 = torch.nn.ReLU()
+        self.dequant = torch.quantization.DeQuantStub()
+
+    def forward(self, x):
+        x = self.relu(self.bn(self.conv(self.quant(x))))
+        # the output of bn2 is also used by dequant, relu2 can't be fused
+        x = self.bn2(self.conv2(x))
+        return self.dequant(x), self.dequant(self.relu2(x))
+
+
+class CountingDataLoader(object):
+    def __init__(self, data):
+        self.data = data
+        self.iterations = 0
+
+    def __iter__(self):
+        for item in self.data:
+            self.iterations += 1
+            yield item
+
+
+class RecordingMetric(object):
+    def __init__(self):
+        self.outputs = []
+
+    def update(self, output, label):
+        self.outputs.append(output)
+
+    def result(self):
+        return 0
+
+
+def build_tune_cfg(op_list, fp32_ops=[], algorithm='minmax'):
+    tune_cfg = {'calib_iteration': 2, 'op': {}}
+    for op in op_list:
+        if op[0] in fp32_ops:
+            tune_cfg['op'][op] = {'activation': {'dtype': 'fp32'}, 'weight': {'dtype': 'fp32'}}
+        else:
+            tune_cfg['op'][op] = {
+                'activation': {'dtype': 'uint8', 'scheme': 'asym',
+                               'granularity': 'per_tensor', 'algorithm': algorithm},
+                'weight': {'dtype': 'int8', 'scheme': 'sym',
+                           'granularity': 'per_channel', 'algorithm': 'minmax'}}
+    return tune_cfg
+
+
 class TestAdaptorPytorch(unittest.TestCase):
     framework_specific_info = {'device': "cpu",
                                'approach': "post_training_static_quant",
@@ -36,6 +105,175 @@ class TestAdaptorPytorch(unittest.TestCase):
         model = self.adaptor.update_weights(self.model, "fc.bias", torch.zeros([1000]))
         assert int(torch.sum(self.adaptor.get_weight(model, "fc.bias"))) == 0
 
+    def test_inspect_tensor(self):
+        model = M().eval()
+        dataloader = [(torch.randn(2, 3, 8, 8), 0) for _ in range(4)]
+        op_list = list(self.adaptor.query_fw_capability(model)['opwise'].keys())
+        q_model = self.adaptor.quantize(build_tune_cfg(op_list), model, dataloader)
+
+        fp32_tensor_dict = self.adaptor.inspect_tensor(model, dataloader, op_list, [1])
+        int8_tensor_dict = self.adaptor.inspect_tensor(q_model, dataloader, op_list, [1])
+        self.assertEqual(list(fp32_tensor_dict.keys()), op_list)
+        self.assertEqual(list(int8_tensor_dict.keys()), op_list)
+        for op in op_list:
+            self.assertEqual(fp32_tensor_dict[op].shape, int8_tensor_dict[op].shape)
+            self.assertAlmostEqual(fp32_tensor_dict[op].sum(), 1.)
+            self.assertAlmostEqual(int8_tensor_dict[op].sum(), 1.)
+            # the int8 histogram covers the fp32 range, even when its values go beyond
+            self.assertEqual(self.adaptor.inspected_statistics[op].bound,
+                             self.adaptor.fp32_statistics[op[0]].bound)
+
+        # statistics streamed over all batches match the ones of the whole output
+        self.adaptor.inspect_tensor(model, dataloader, ['relu'])
+        stats = self.adaptor.inspected_statistics['relu']
+        with torch.no_grad():
+            output = torch.cat([model.relu(model.conv(input)) for input, _ in dataloader])
+        self.assertEqual(stats.count, output.numel())
+        self.assertAlmostEqual(stats.max, output.max().item(), places=5)
+        self.assertAlmostEqual(stats.mean, output.mean().item(), places=5)
+        self.assertAlmostEqual(stats.std, output.std(unbiased=False).item(), places=5)
+        self.assertAlmostEqual(stats.histogram().sum(), 1.)
+
+        # the values beyond a fixed bound are counted in the edge bins
+        from lpot.adaptor.pytorch import _TensorStatistics
+        stats = _TensorStatistics(bins=4, bound=1.)
+        stats.update(torch.tensor([-3., -0.7, 0.2, 0.6]))
+        self.assertEqual(stats.bound, 1.)
+        self.assertEqual(stats.hist.tolist(), [2., 0., 1., 1.])
+        self.assertEqual(stats.min, -3.)
+
+    def test_quantize_share_weights(self):
+        adaptor = FRAMEWORKS[self.framework](self.framework_specific_info)
+        model = M().eval()
+        dataloader = CountingDataLoader([(torch.randn(2, 3, 8, 8), 0) for _ in range(4)])
+        op_list = list(adaptor.query_fw_capability(model)['opwise'].keys())
+        input = torch.randn(2, 3, 8, 8)
+
+        q_model = adaptor.quantize(build_tune_cfg(op_list), model, dataloader)
+        # the fp32 model is left untouched
+        self.assertFalse(any(hasattr(m, 'qconfig') or m._forward_hooks for m in model.modules()))
+        self.assertIsInstance(model.conv2, torch.nn.Conv2d)
+
+        iterations = dataloader.iterations
+        fallback_model = adaptor.quantize(build_tune_cfg(op_list, ['conv2']), model, dataloader)
+        # unchanged ops are not converted again, the fp32 weights are shared
+        self.assertIs(fallback_model.conv._packed_params, q_model.conv._packed_params)
+        self.assertIs(fallback_model.conv2.module.weight, model.conv2.weight)
+        self.assertGreater(dataloader.iterations, iterations)
+
+        reference = FRAMEWORKS[self.framework](self.framework_specific_info).quantize(
+            build_tune_cfg(op_list, ['conv2']), model, dataloader)
+        self.assertTrue(torch.allclose(fallback_model(input), reference(input)))
+
+        # all ops are unchanged, calibration is skipped
+        iterations = dataloader.iterations
+        int8_model = adaptor.quantize(build_tune_cfg(op_list), model, dataloader)
+        self.assertEqual(dataloader.iterations, iterations)
+        self.assertTrue(torch.allclose(int8_model(input), q_model(input)))
+
+    def test_kl_observer(self):
+        from lpot.adaptor.pytorch import _observer
+        observer = _observer('kl', 'sym', 'per_tensor', 'uint8')()
+        self.assertNotIsInstance(observer, torch.quantization.HistogramObserver)
+        data = [torch.relu(torch.randn(1000)) * (i + 1) for i in range(3)]
+        for x in data:
+            observer(x)
+        # the power-of-two range only widens, the histogram keeps every value
+        abs_max = max(x.max().item() for x in data)
+        self.assertEqual(observer.statistics.bound, 2 ** np.ceil(np.log2(abs_max)))
+        self.assertEqual(observer.statistics.hist.sum(), 3000)
+        threshold = observer.statistics.kl_threshold('uint8')
+        self.assertGreater(threshold, abs_max * 0.5)
+        self.assertLessEqual(threshold, abs_max)
+        scale, zero_point = observer.calculate_qparams()
+        self.assertAlmostEqual(scale.item(), threshold / 127.5, places=5)
+        self.assertEqual(zero_point.item(), 128)
+
+        model = M().eval()
+        dataloader = [(torch.randn(2, 3, 8, 8), 0) for _ in range(2)]
+        op_list = list(self.adaptor.query_fw_capability(model)['opwise'].keys())
+        q_model = self.adaptor.quantize(build_tune_cfg(op_list, algorithm='kl'), model,
+                                        dataloader)
+        self.assertIsInstance(q_model.conv, torch.nn.quantized.Conv2d)
+
+    def test_calibration_convergence(self):
+        framework_specific_info = dict(self.framework_specific_info)
+        framework_specific_info['calib_convergence'] = {'tolerance': 0.05, 'patience': 3}
+        adaptor = FRAMEWORKS[self.framework](framework_specific_info)
+        model = M().eval()
+        torch.manual_seed(0)
+        op_list = list(adaptor.query_fw_capability(model)['opwise'].keys())
+        for algorithm in ['minmax', 'kl']:
+            dataloader = CountingDataLoader(
+                [(torch.randn(4, 3, 8, 8), 0) for _ in range(200)])
+            tune_cfg = build_tune_cfg(op_list, algorithm=algorithm)
+            tune_cfg['calib_iteration'] = 200
+            adaptor.quantize(tune_cfg, model, dataloader)
+            # the sampling size is only an upper bound
+            self.assertLess(dataloader.iterations, 100)
+            self.assertGreater(dataloader.iterations, 3)
+            self.assertEqual(adaptor.calib_samples, dataloader.iterations)
+
+        # without convergence detection all the sampling size is used
+        dataloader = CountingDataLoader([(torch.randn(4, 3, 8, 8), 0) for _ in range(20)])
+        tune_cfg = build_tune_cfg(op_list)
+        tune_cfg['calib_iteration'] = 20
+        self.adaptor.quantize(tune_cfg, model, dataloader)
+        self.assertEqual(self.adaptor.calib_samples, 20)
+
+    def test_torchscript_execution(self):
+        framework_specific_info = dict(self.framework_specific_info)
+        framework_specific_info['execution'] = {'mode': 'torchscript', 'export': True}
+        adaptor = FRAMEWORKS[self.framework](framework_specific_info)
+        eager_adaptor = FRAMEWORKS[self.framework](self.framework_specific_info)
+        model = M().eval()
+        dataloader = [(torch.randn(2, 3, 8, 8), 0) for _ in range(3)]
+        op_list = list(adaptor.query_fw_capability(model)['opwise'].keys())
+        q_model = adaptor.quantize(build_tune_cfg(op_list), model, dataloader)
+
+        for m in [model, q_model]:
+            scripted_metric, eager_metric = RecordingMetric(), RecordingMetric()
+            adaptor.evaluate(m, dataloader, metric=scripted_metric)
+            eager_adaptor.evaluate(m, dataloader, metric=eager_metric)
+            for scripted, eager in zip(scripted_metric.outputs, eager_metric.outputs):
+                self.assertTrue(torch.equal(scripted, eager))
+
+        adaptor.save(q_model, './saved_torchscript')
+        loaded_model = torch.jit.load('./saved_torchscript/best_model.pt')
+        self.assertTrue(torch.equal(loaded_model(dataloader[0][0]), q_model(dataloader[0][0])))
+        shutil.rmtree('./saved_torchscript', ignore_errors=True)
+
+    def test_fuse_modules(self):
+        dataloader = [(torch.randn(2, 3, 8, 8), 0) for _ in range(2)]
+        framework_specific_info = dict(self.framework_specific_info)
+        framework_specific_info['q_dataloader'] = dataloader
+        adaptor = FRAMEWORKS[self.framework](framework_specific_info)
+        model = FusionModel().eval()
+
+        self.assertEqual(adaptor.query_fused_patterns(model),
+                         [['conv', 'bn', 'relu'], ['conv2', 'bn2']])
+        op_list = list(adaptor.query_fw_capability(model)['opwise'].keys())
+        self.assertEqual([op[0] for op in op_list], ['quant', 'conv', 'conv2', 'relu2'])
+        q_model = adaptor.quantize(build_tune_cfg(op_list), model, dataloader)
+        self.assertIsInstance(q_model.conv, torch.nn.intrinsic.quantized.ConvReLU2d)
+        self.assertIsInstance(q_model.bn, torch.nn.Identity)
+        self.assertIsInstance(model.bn, torch.nn.BatchNorm2d)
+
+        fused_model = adaptor.fused['fused_model']
+        input = dataloader[0][0]
+        for fused, output in zip(fused_model(input), model(input)):
+            self.assertTrue(torch.allclose(fused, output, atol=1e-5))
+
+        # the saved weights of the fused model are loaded into the fused fp32 model
+        from lpot.utils.pytorch import load
+        adaptor.save(q_model, './saved_fusion')
+        loaded_model = load('./saved_fusion/best_configure.yaml',
+                            './saved_fusion/best_model_weights.pt', FusionModel().eval())
+        self.assertIsInstance(loaded_model.conv, torch.nn.intrinsic.quantized.ConvReLU2d)
+        for loaded, output in zip(loaded_model(input), q_model(input)):
+            self.assertTrue(torch.equal(loaded, output))
+        shutil.rmtree('./saved_fusion', ignore_errors=True)
+
 
 if __name__ == "__main__":
     unittest.main()
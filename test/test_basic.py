@@ -89,6 +89,20 @@ def build_fake_model():
             tf.import_graph_def(graph_def, name='')
     return graph
 
+class StubAdaptor(object):
+    """Adaptor reporting the capability of many ops, nothing is quantized."""
+    ops = [('op%d' % i, 'conv2d' if i % 3 else 'matmul') for i in range(64)]
+
+    def __init__(self, framework_specific_info):
+        pass
+
+    def query_fw_capability(self, model):
+        capability = {'activation': {'dtype': ['uint8', 'fp32'], 'algorithm': ['minmax'],
+                                     'scheme': ['asym'], 'granularity': ['per_tensor']},
+                      'weight': {'dtype': ['int8', 'fp32'], 'algorithm': ['minmax'],
+                                 'scheme': ['sym'], 'granularity': ['per_tensor']}}
+        return {'modelwise': capability, 'opwise': {op: capability for op in self.ops}}
+
 class TestQuantization(unittest.TestCase):
 
     @classmethod
@@ -149,5 +163,49 @@ class TestQuantization(unittest.TestCase):
         tmp_val2 = testObject.calculate_loss(0.03, 2, testObject.loss_function_config)
         self.assertTrue(True if int(tmp_val2 - tmp_val) == 10 else False)
 
+    def test_group_fallback(self):
+        from lpot import Quantization
+        from lpot.adaptor import FRAMEWORKS
+        from lpot.strategy.basic import BasicTuneStrategy
+
+        quantizer = Quantization('fake_yaml.yaml')
+        tf_adaptor = FRAMEWORKS['tensorflow']
+        FRAMEWORKS['tensorflow'] = StubAdaptor
+        try:
+            strategy = BasicTuneStrategy(None, quantizer.conf, None)
+        finally:
+            FRAMEWORKS['tensorflow'] = tf_adaptor
+        ops = list(strategy.opwise_tune_cfgs.keys())
+        self.assertEqual(ops, StubAdaptor.ops)
+        harmful = {('op5', 'conv2d'): 0.05, ('op40', 'conv2d'): 0.02}
+
+        fallbacks, probes = [], []
+        for op_cfgs in strategy.next_tune_cfg():
+            fallback = [op for op in ops if op_cfgs['op'][op]['activation']['dtype'] == 'fp32']
+            fallbacks.append(fallback)
+            probes.append(strategy._probe)
+            strategy.last_tune_result = (0.5 + sum(harmful.get(op, 0) for op in fallback), 1.0)
+
+        # the model-wise config, the group tests, then one incremental fallback per op
+        # and one cumulative fallback per op
+        group_trials = len(fallbacks) - 1 - 2 * len(ops)
+        # about 2 * log2(64) trials per harmful op instead of one trial per op
+        self.assertLess(group_trials, len(ops) // 2)
+        self.assertEqual(fallbacks[0], [])
+        # only the fallback of a group of ops is a probe
+        self.assertEqual(probes, [len(fallback) > 1 for fallback in
+                                  fallbacks[:1 + group_trials]] + [False] * (2 * len(ops)))
+        # the harmful ops fall back first, the most harmful first
+        incremental = fallbacks[1 + group_trials:]
+        self.assertEqual(incremental[0], [('op5', 'conv2d')])
+        self.assertEqual(incremental[1], [('op5', 'conv2d'), ('op40', 'conv2d')])
+        self.assertEqual(fallbacks[-1], ops)
+
+        # no ops to fall back, no trial
+        search = strategy._group_fallback({}, 0.5, 'fp32', [])
+        with self.assertRaises(StopIteration) as stop:
+            next(search)
+        self.assertEqual(stop.exception.value, {})
+
 if __name__ == "__main__":
     unittest.main()
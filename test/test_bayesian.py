@@ -60,6 +60,34 @@ def build_fake_yaml2():
         yaml.dump(y,f)
     f.close()
 
+def build_fake_yaml3():
+    fake_yaml = '''
+        model:
+          name: fake_yaml
+          framework: tensorflow
+          inputs: x
+          outputs: op_to_store
+        device: cpu
+        evaluation:
+          accuracy:
+            metric:
+              topk: 1
+        tuning:
+          strategy:
+            name: bayesian
+            search_space: discrete
+          exit_policy:
+            max_trials: 5
+          accuracy_criterion:
+            relative: -0.01
+          workspace:
+            path: saved
+        '''
+    y = yaml.load(fake_yaml, Loader=yaml.SafeLoader)
+    with open('fake_yaml3.yaml',"w",encoding="utf-8") as f:
+        yaml.dump(y,f)
+    f.close()
+
 def build_fake_model():
     try:
         graph = tf.Graph()
@@ -98,11 +126,13 @@ class TestQuantization(unittest.TestCase):
         self.constant_graph = build_fake_model()
         build_fake_yaml()
         build_fake_yaml2()
+        build_fake_yaml3()
 
     @classmethod
     def tearDownClass(self):
         os.remove('fake_yaml.yaml')
         os.remove('fake_yaml2.yaml')
+        os.remove('fake_yaml3.yaml')
         os.remove('saved/history.snapshot')
         os.remove('saved/deploy.yaml')
         os.rmdir('saved')
@@ -133,6 +163,39 @@ class TestQuantization(unittest.TestCase):
             eval_dataloader=dataloader
         )
 
+    def test_run_bayesian_discrete(self):
+        from lpot import Quantization
+
+        quantizer = Quantization('fake_yaml3.yaml')
+        dataset = quantizer.dataset('dummy', (100, 3, 3, 1), label=True)
+        dataloader = quantizer.dataloader(dataset)
+        quantizer(
+            self.constant_graph,
+            q_dataloader=dataloader,
+            eval_dataloader=dataloader
+        )
+
+    def test_discrete_bayesian_optimization(self):
+        from lpot.strategy.bayesian import DiscreteBayesianOptimization
+
+        pbounds = {'op{}'.format(i): (0, 3) for i in range(20)}
+        weights = np.random.RandomState(0).rand(20, 3)
+        target = lambda params: sum(weights[i][params['op{}'.format(i)]] for i in range(20))
+        bayes_opt = DiscreteBayesianOptimization(pbounds, random_seed=1)
+        seen = set()
+        for _ in range(30):
+            params = bayes_opt.gen_next_params()
+            self.assertTrue(all(0 <= params[key] < 3 for key in pbounds))
+            self.assertNotIn(tuple(sorted(params.items())), seen)
+            seen.add(tuple(sorted(params.items())))
+            bayes_opt.register(params, target(params))
+        self.assertRaises(KeyError, bayes_opt.register, params, 0.)
+
+        # the incrementally updated Cholesky factor matches the full decomposition
+        kernel = bayes_opt._kernel_from_matches(bayes_opt._encoded.dot(bayes_opt._encoded.T))
+        kernel += bayes_opt.noise * np.eye(len(kernel))
+        np.testing.assert_allclose(bayes_opt._chol, np.linalg.cholesky(kernel), atol=1e-8)
+
     def test_loss_calculation(self):
         from lpot.strategy.tpe import TpeTuneStrategy
         from lpot import Quantization
@@ -0,0 +1,152 @@
+"""Tests for the on-disk cache of preprocessed samples"""
+import unittest
+import os
+import shutil
+import numpy as np
+from lpot.data import Dataset, dataset_registry
+from lpot.data.datasets.cached_dataset import DatasetCache, CachedDataset, \
+    cache_key, is_random_transform
+from lpot.utils.create_obj_from_config import create_dataloader
+
+@dataset_registry(dataset_type="CountingFiles", framework="tensorflow", dataset_format='')
+class CountingDataset(Dataset):
+    """Samples are the lines of root/data.txt, counts the samples generated"""
+    loaded = 0
+
+    def __init__(self, root, transform=None):
+        with open(os.path.join(root, 'data.txt')) as f:
+            self.values = [float(line) for line in f]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        CountingDataset.loaded += 1
+        value = self.values[index]
+        return np.full((2, 3), value, dtype=np.float32), int(value)
+
+class TestCachedDataset(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        os.makedirs('cache_data', exist_ok=True)
+        with open('cache_data/data.txt', 'w') as f:
+            f.write('\n'.join(str(i) for i in range(10)))
+
+    @classmethod
+    def tearDownClass(self):
+        shutil.rmtree('cache_data', ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree('cache_saved', ignore_errors=True)
+        CountingDataset.loaded = 0
+
+    def tearDown(self):
+        shutil.rmtree('cache_saved', ignore_errors=True)
+
+    def test_cache_hit(self):
+        dataset = CountingDataset('cache_data')
+        cache = DatasetCache('cache_saved', shard_size=4)
+        cached = cache.get('key', dataset)
+        self.assertIsInstance(cached, CachedDataset)
+        self.assertEqual(CountingDataset.loaded, 10)
+        self.assertEqual(len(cached), 10)
+        for i in range(10):
+            image, label = cached[i]
+            self.assertTrue(np.array_equal(image, dataset[i][0]))
+            self.assertEqual(label, i)
+        self.assertIsInstance(cached[9][0], np.memmap)
+
+        # another run reads the shards without generating any sample
+        CountingDataset.loaded = 0
+        cached = DatasetCache('cache_saved', shard_size=4).get('key', dataset)
+        self.assertEqual(CountingDataset.loaded, 0)
+        self.assertEqual(cached[-1][1], 9)
+
+    def test_uncacheable(self):
+        dataset = [np.zeros(i + 1) for i in range(4)]
+        self.assertIs(DatasetCache('cache_saved').get('key', dataset), dataset)
+        self.assertFalse(os.path.exists('cache_saved/key'))
+
+    def test_lru_eviction(self):
+        dataset = CountingDataset('cache_data')
+        DatasetCache('cache_saved', shard_size=4).get('old', dataset)
+        sizes = [sum(os.path.getsize(os.path.join('cache_saved/old', shard, f))
+                     for f in os.listdir(os.path.join('cache_saved/old', shard)))
+                 for shard in ('shard_00000', 'shard_00002')]
+        # room for one entry of 3 shards plus one full and one partial shard
+        cache = DatasetCache('cache_saved', size_budget=3 * sizes[0] + 2 * sizes[1],
+                             shard_size=4)
+        cache.get('new', dataset)
+        # shards of the least recently used entry are evicted first
+        self.assertEqual(len(os.listdir('cache_saved/new')), 4)
+        self.assertEqual(len([s for s in os.listdir('cache_saved/old') if s.startswith('shard_')]), 2)
+
+        # evicted shards are generated again on the next use, only those samples
+        CountingDataset.loaded = 0
+        cached = cache.get('old', dataset)
+        self.assertEqual(CountingDataset.loaded, 4)
+        self.assertEqual([cached[i][1] for i in range(10)], list(range(10)))
+
+        # a budget smaller than one entry falls back to the dataset
+        small = DatasetCache('cache_saved', size_budget=1, shard_size=4)
+        self.assertIs(small.get('small', dataset), dataset)
+
+    def test_open_entries_not_evicted(self):
+        dataset = CountingDataset('cache_data')
+        DatasetCache('cache_saved', shard_size=5).get('size', dataset)
+        shard_size = sum(os.path.getsize(os.path.join('cache_saved/size/shard_00000', f))
+                         for f in os.listdir('cache_saved/size/shard_00000'))
+        shutil.rmtree('cache_saved')
+        # the calib and eval entries of 2 shards share a budget of 3 shards
+        cache = DatasetCache('cache_saved', size_budget=3 * shard_size, shard_size=5)
+        calib = cache.get('calib', dataset)
+        evaluation = cache.get('eval', dataset)
+        self.assertIs(evaluation, dataset)
+        self.assertEqual([calib[i][1] for i in range(10)], list(range(10)))
+
+        # a shard evicted by another process is generated again when it is read
+        calib = cache.get('calib', dataset)
+        shutil.rmtree('cache_saved/calib/shard_00001')
+        CountingDataset.loaded = 0
+        self.assertEqual([calib[i][1] for i in range(10)], list(range(10)))
+        self.assertEqual(CountingDataset.loaded, 5)
+
+    def test_cache_key(self):
+        dataset_cfg = {'CountingFiles': {'root': 'cache_data'}}
+        transform_cfg = {'Resize': {'size': 256}, 'CenterCrop': {'size': 224}}
+        key = cache_key('tensorflow', dataset_cfg, transform_cfg)
+        self.assertEqual(key, cache_key('tensorflow', dataset_cfg, transform_cfg))
+        self.assertNotEqual(key, cache_key('tensorflow', dataset_cfg,
+            {'CenterCrop': {'size': 224}, 'Resize': {'size': 256}}))
+        self.assertNotEqual(key, cache_key('pytorch', dataset_cfg, transform_cfg))
+
+        stat = os.stat('cache_data/data.txt')
+        os.utime('cache_data/data.txt', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertNotEqual(key, cache_key('tensorflow', dataset_cfg, transform_cfg))
+
+    def test_random_transform(self):
+        self.assertTrue(is_random_transform({'RandomResizedCrop': {'size': 224}}))
+        self.assertTrue(is_random_transform(
+            {'ResizeCropImagenet': {'height': 224, 'width': 224, 'random_crop': True}}))
+        self.assertFalse(is_random_transform(
+            {'ResizeCropImagenet': {'height': 224, 'width': 224, 'random_crop': False}}))
+        self.assertFalse(is_random_transform({'Resize': {'size': 256}}))
+        self.assertFalse(is_random_transform(None))
+
+    def test_create_dataloader(self):
+        cfg = {'batch_size': 4,
+               'dataset': {'CountingFiles': {'root': 'cache_data'}},
+               'transform': None,
+               'cache': {'path': 'cache_saved'}}
+        batches = [list(labels) for _, labels in create_dataloader('tensorflow', cfg)]
+        self.assertEqual(batches, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+        self.assertEqual(len(os.listdir('cache_saved')), 1)
+
+        CountingDataset.loaded = 0
+        dataloader = create_dataloader('tensorflow', cfg)
+        self.assertIsInstance(dataloader.dataset, CachedDataset)
+        self.assertEqual([list(labels) for _, labels in dataloader], batches)
+        self.assertEqual(CountingDataset.loaded, 0)
+
+if __name__ == "__main__":
+    unittest.main()
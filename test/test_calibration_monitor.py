@@ -0,0 +1,51 @@
+"""Tests for the calibration convergence monitor"""
+import unittest
+import numpy as np
+from lpot.utils.calibration import CalibrationMonitor, create_calibration_monitor
+
+class TestCalibrationMonitor(unittest.TestCase):
+    def test_stable_ranges(self):
+        monitor = CalibrationMonitor(tolerance=0.01, patience=3)
+        ranges = {'conv1': (-1.0, 2.0), 'conv2': np.array([0.0, 0.0, 1.0, 3.0])}
+        results = [monitor.update(ranges) for _ in range(4)]
+        # the first batch has no previous ranges to compare with
+        self.assertEqual(results, [False, False, False, True])
+        self.assertTrue(monitor.converged)
+        self.assertEqual(monitor.iterations, 4)
+
+    def test_moving_ranges(self):
+        monitor = CalibrationMonitor(tolerance=0.01, patience=2)
+        self.assertFalse(monitor.update({'conv1': (-1.0, 1.0)}))
+        self.assertFalse(monitor.update({'conv1': (-1.0, 1.005)}))
+        # a change larger than the tolerance resets the patience
+        self.assertFalse(monitor.update({'conv1': (-1.0, 1.5)}))
+        self.assertFalse(monitor.update({'conv1': (-1.0, 1.5)}))
+        self.assertTrue(monitor.update({'conv1': (-1.0, 1.5)}))
+
+        # new tensors or non finite values are not stable
+        monitor = CalibrationMonitor(tolerance=0.01, patience=1)
+        monitor.update({'conv1': (-1.0, 1.0)})
+        self.assertFalse(monitor.update({'conv1': (-1.0, 1.0), 'conv2': (0.0, 1.0)}))
+        self.assertFalse(monitor.update({'conv1': (-1.0, np.inf), 'conv2': (0.0, 1.0)}))
+
+    def test_thresholds(self):
+        monitor = CalibrationMonitor(tolerance=0.01, patience=2)
+        thresholds = iter([{'conv1': 1.0}, {'conv1': 0.5}, {'conv1': 0.501}])
+        calls = []
+
+        def kl_thresholds():
+            calls.append(monitor.iterations)
+            return next(thresholds)
+
+        results = [monitor.update({'conv1': (0.0, 1.0)}, kl_thresholds) for _ in range(7)]
+        # thresholds are computed every patience stable batches until two checks agree
+        self.assertEqual(calls, [3, 5, 7])
+        self.assertEqual(results, [False] * 6 + [True])
+
+    def test_create(self):
+        self.assertIsNone(create_calibration_monitor(None))
+        monitor = create_calibration_monitor({'tolerance': 0.05, 'patience': 2})
+        self.assertEqual((monitor.tolerance, monitor.patience), (0.05, 2))
+
+if __name__ == "__main__":
+    unittest.main()
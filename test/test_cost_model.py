@@ -0,0 +1,169 @@
+"""Tests for the cost model"""
+import numpy as np
+import unittest
+import os
+import shutil
+import yaml
+import tensorflow as tf
+from collections import OrderedDict
+from types import SimpleNamespace
+from lpot.utils.cost_model import CostModel, op_dtypes
+from lpot.utils.op_profile import OpProfile
+
+def build_fake_yaml():
+    fake_yaml = '''
+        model:
+          name: fake_yaml
+          framework: tensorflow
+          inputs: x
+          outputs: op_to_store
+        device: cpu
+        evaluation:
+          accuracy:
+            metric:
+              topk: 1
+        tuning:
+            strategy:
+              name: random
+            exit_policy:
+              timeout: 600
+              max_trials: 4
+            accuracy_criterion:
+              relative: -0.01
+            cost_model:
+              prune_margin: 0.2
+            workspace:
+              path: saved
+        '''
+    y = yaml.load(fake_yaml, Loader=yaml.SafeLoader)
+    with open('fake_yaml.yaml',"w",encoding="utf-8") as f:
+        yaml.dump(y,f)
+    f.close()
+
+def build_fake_model():
+    graph = tf.Graph()
+    graph_def = tf.compat.v1.GraphDef()
+    with tf.compat.v1.Session() as sess:
+        x = tf.compat.v1.placeholder(tf.float32, shape=(None,16), name='x')
+        for i in range(2):
+            w = tf.compat.v1.constant(np.random.random((16,16)).astype(np.float32))
+            b = tf.compat.v1.constant(np.random.random(16).astype(np.float32))
+            x = tf.nn.relu(tf.nn.bias_add(tf.matmul(x, w), b))
+        op = tf.identity(x, name='op_to_store')
+
+        sess.run(tf.compat.v1.global_variables_initializer())
+        constant_graph = tf.compat.v1.graph_util.convert_variables_to_constants(sess, sess.graph_def, ['op_to_store'])
+
+    graph_def.ParseFromString(constant_graph.SerializeToString())
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    return graph
+
+def build_profile(latencies, iterations=2):
+    profile = OpProfile(iterations)
+    for op, (compute, boundary) in latencies.items():
+        profile.add(op, compute * iterations)
+        profile.add(op, boundary * iterations, boundary=True)
+    profile.add('output', 0.5 * iterations, attributed=False)
+    return profile
+
+class TestCostModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        build_fake_yaml()
+
+    @classmethod
+    def tearDownClass(self):
+        os.remove('fake_yaml.yaml')
+        shutil.rmtree('saved', ignore_errors=True)
+
+    def test_op_dtypes(self):
+        tune_cfg = {'op': OrderedDict([
+            (('conv', 'conv2d'), {'activation': {'dtype': 'uint8'}}),
+            (('fc', 'matmul'), {'activation': {'dtype': 'fp32'}})])}
+        self.assertEqual(op_dtypes(tune_cfg), OrderedDict([('conv', 'int8'), ('fc', 'fp32')]))
+
+    def test_predict_latency(self):
+        model = CostModel()
+        fp32 = OrderedDict([('a', 'fp32'), ('b', 'fp32'), ('c', 'fp32')])
+        int8 = OrderedDict([('a', 'int8'), ('b', 'int8'), ('c', 'int8')])
+        model.add_profile(fp32, build_profile({'a': (4., 0.), 'b': (2., 0.), 'c': (8., 0.)}))
+        # no measured value to map the predictions to yet
+        self.assertIsNone(model.predict(int8))
+        model.update(fp32, 2 * 14.5 + 1)
+        # the int8 latency of the ops isn't known yet
+        self.assertIsNone(model.predict(OrderedDict([('a', 'int8'), ('b', 'fp32'),
+                                                     ('c', 'fp32')])))
+
+        # a and c quantize and dequantize at the model input and output
+        model.add_profile(int8, build_profile({'a': (1., 0.5), 'b': (1., 0.), 'c': (4., 1.)}))
+        self.assertAlmostEqual(model.raw_latency(int8), 8.)
+        # b and c are at an island edge, c is never profiled at an edge only at the end
+        mixed = OrderedDict([('a', 'fp32'), ('b', 'int8'), ('c', 'int8')])
+        self.assertAlmostEqual(model.raw_latency(mixed), 4. + 1. + 0.75 + 4. + 1. + 0.5)
+        model.update(int8, 2 * 8. + 1)
+        self.assertAlmostEqual(model.predict(mixed), 2 * 11.25 + 1)
+
+        # the int8 latency of an op only profiled in fp32 is scaled by the mean ratio
+        model.add_profile(OrderedDict([('d', 'fp32')]), build_profile({'d': (10., 0.)}))
+        self.assertAlmostEqual(model._latency('d', 'int8'), 10. * (1. / 4 + 1. / 2 + 4. / 8) / 3)
+
+    def test_self_correction(self):
+        model = CostModel()
+        for i, latency in enumerate([2., 4., 6.]):
+            dtypes = OrderedDict([('op{}'.format(i), 'fp32')])
+            model.add_profile(dtypes, build_profile({'op{}'.format(i): (latency, 0.)}))
+            predicted = model.predict(dtypes)
+            model.update(dtypes, 3 * (latency + 0.5) + 2, predicted)
+        # the first prediction is a ratio, then the line fits the measurements
+        self.assertEqual(len(model.history), 2)
+        self.assertGreater(abs(model.history[0][0] - model.history[0][1]), 0.1)
+        self.assertAlmostEqual(model.history[1][0], model.history[1][1])
+        self.assertGreater(model.mean_error(), 0)
+
+    def test_predict_size(self):
+        model = CostModel('modelsize', {'a': 100, 'b': 50})
+        fp32 = OrderedDict([('a', 'fp32'), ('b', 'fp32')])
+        mixed = OrderedDict([('a', 'int8'), ('b', 'fp32')])
+        self.assertEqual(model.raw_size(fp32), 600)
+        self.assertEqual(model.raw_size(mixed), 300)
+        model.update(fp32, 1200.)
+        self.assertAlmostEqual(model.predict(mixed), 600.)
+        self.assertIsNone(CostModel('modelsize').predict(mixed))
+
+    def test_cost_pruned(self):
+        from lpot.strategy.strategy import TuneStrategy
+        strategy = SimpleNamespace(best_tune_result=(0.9, 1.0), prune_margin=0.1)
+        self.assertTrue(TuneStrategy._cost_pruned(strategy, 1.2))
+        self.assertFalse(TuneStrategy._cost_pruned(strategy, 1.05))
+        self.assertFalse(TuneStrategy._cost_pruned(strategy, None))
+        strategy.best_tune_result = None
+        self.assertFalse(TuneStrategy._cost_pruned(strategy, 1.2))
+
+    def test_tuning_cost_model(self):
+        from lpot import Quantization
+        from lpot.strategy.random import RandomTuneStrategy
+
+        quantizer = Quantization('fake_yaml.yaml')
+        dataset = quantizer.dataset('dummy', (12, 16), label=True)
+        dataloader = quantizer.dataloader(dataset, batch_size=4)
+        model = build_fake_model()
+        strategy = RandomTuneStrategy(model, quantizer.conf, dataloader,
+                                      eval_dataloader=dataloader)
+        ops = [op[0] for op in strategy.opwise_tune_cfgs]
+        # the weights and bias of each matmul
+        self.assertEqual(dict(strategy.cost_model.op_weights), {op: 16 * 16 + 16 for op in ops})
+        strategy.traverse()
+        self.assertTrue(os.path.exists('saved/profile/fp32.json'))
+        self.assertIn((ops[0], 'fp32'), strategy.cost_model.latencies)
+        # the baseline and the trials not pruned are measured
+        history = strategy.tuning_history[0]['history']
+        self.assertGreater(len(history), 1)
+        self.assertEqual(len(strategy.cost_model.points), len(history) + 1)
+        self.assertIsNotNone(history[-1]['predicted'])
+        self.assertEqual(len(strategy.cost_model.history),
+                         len([h for h in history if h['predicted'] is not None]))
+
+if __name__ == "__main__":
+    unittest.main()
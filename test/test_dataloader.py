@@ -54,6 +54,42 @@ class TestMetrics(unittest.TestCase):
     #     data = next(iterator)
     #     self.assertEqual(data[0][1], 2)
  
+    def test_tensorflow_dataset_reuse_graph(self):
+        import tensorflow as tf
+        graph = tf.Graph()
+        with graph.as_default():
+            dataset = tf.data.Dataset.from_tensor_slices(
+                (np.arange(10, dtype=np.float32), np.arange(10)))
+            data_loader = DataLoader('tensorflow', dataset, batch_size=3)
+            first = [data[0].tolist() for data in data_loader]
+            num_ops = len(graph.get_operations())
+            sess = data_loader.dataloader._sess
+            second = [data[0].tolist() for data in data_loader]
+        self.assertEqual(first, [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]])
+        self.assertEqual(first, second)
+        # iterating again only reinitializes the iterator
+        self.assertEqual(len(graph.get_operations()), num_ops)
+        self.assertIs(data_loader.dataloader._sess, sess)
+
+        data_loader.batch(batch_size=4, last_batch='no_rollover')
+        with graph.as_default():
+            self.assertEqual([data[1].tolist() for data in data_loader],
+                             [[0, 1, 2, 3], [4, 5, 6, 7]])
+
+    def test_shard_sampler(self):
+        from lpot.data.dataloaders.sampler import ShardSampler
+        dataset = list(range(10))
+        shards = [list(ShardSampler(dataset, 3, i, batch_size=3)) for i in range(3)]
+        # the shards are contiguous and start on a batch boundary
+        self.assertEqual(shards, [[0, 1, 2], [3, 4, 5], [6, 7, 8, 9]])
+        self.assertEqual(sum(len(ShardSampler(dataset, 3, i, 3)) for i in range(3)), 10)
+        # more shards than batches leaves some shards empty
+        self.assertEqual([len(ShardSampler(dataset, 4, i, 5)) for i in range(4)], [0, 5, 0, 5])
+
+        data_loader = DataLoader('tensorflow', dataset, batch_size=2,
+                                 sampler=ShardSampler(dataset, 2, 1, batch_size=2))
+        self.assertEqual(list(data_loader), [[4, 5], [6, 7], [8, 9]])
+
     def test_pytorch_dummy(self):
         datasets = DATASETS('pytorch')
         dataset = datasets['dummy'](shape=(4, 256, 256, 3))
@@ -0,0 +1,118 @@
+"""Tests for the successive halving strategy"""
+import numpy as np
+import unittest
+import os
+import shutil
+import yaml
+import tensorflow as tf
+from types import SimpleNamespace
+
+def build_fake_yaml():
+    fake_yaml = '''
+        model:
+          name: fake_yaml
+          framework: tensorflow
+          inputs: x
+          outputs: op_to_store
+        device: cpu
+        evaluation:
+          accuracy:
+            metric:
+              topk: 1
+        tuning:
+            strategy:
+              name: halving
+              halving:
+                candidates: 4
+                eta: 2
+                min_samples: 10
+            exit_policy:
+              max_trials: 4
+            accuracy_criterion:
+              relative: 0.01
+            workspace:
+              path: saved
+        '''
+    y = yaml.load(fake_yaml, Loader=yaml.SafeLoader)
+    with open('fake_yaml.yaml',"w",encoding="utf-8") as f:
+        yaml.dump(y,f)
+    f.close()
+
+def build_fake_model():
+    graph = tf.Graph()
+    graph_def = tf.compat.v1.GraphDef()
+    with tf.compat.v1.Session() as sess:
+        x = tf.compat.v1.placeholder(tf.float32, shape=(1,3,3,1), name='x')
+        y = tf.compat.v1.constant(np.random.random((2,2,1,1)).astype(np.float32), name='y')
+        op = tf.nn.conv2d(input=x, filters=y, strides=[1,1,1,1], padding='VALID', name='op_to_store')
+
+        sess.run(tf.compat.v1.global_variables_initializer())
+        constant_graph = tf.compat.v1.graph_util.convert_variables_to_constants(sess, sess.graph_def, ['op_to_store'])
+
+    graph_def.ParseFromString(constant_graph.SerializeToString())
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    return graph
+
+class TestHalving(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.constant_graph = build_fake_model()
+        build_fake_yaml()
+
+    @classmethod
+    def tearDownClass(self):
+        os.remove('fake_yaml.yaml')
+        shutil.rmtree('saved', ignore_errors=True)
+
+    def test_stratified_indices(self):
+        from lpot.strategy.halving import stratified_indices
+        indices = stratified_indices(1000, 100, 1978)
+        self.assertEqual(indices, stratified_indices(1000, 100, 1978))
+        self.assertEqual(len(set(indices)), 100)
+        # one index out of each block of 10 samples
+        self.assertEqual([i // 10 for i in indices], list(range(100)))
+        self.assertEqual(stratified_indices(7, 7, 0), list(range(7)))
+
+    def test_promote(self):
+        from lpot.strategy.halving import HalvingTuneStrategy
+        strategy = SimpleNamespace(eta=3, confidence=0.95)
+        # the best third is kept, the candidates sure to miss the target are dropped
+        accuracies = [0.70, 0.90, 0.80, 0.30, 0.85, 0.20]
+        self.assertEqual(HalvingTuneStrategy._promote(strategy, accuracies, 1000, 0.75), [1, 4])
+        self.assertEqual(HalvingTuneStrategy._promote(strategy, accuracies, 1000, 0.88), [1])
+        # the interval is wider on a small subset
+        self.assertEqual(HalvingTuneStrategy._promote(strategy, accuracies, 20, 0.88), [1, 4])
+        self.assertEqual(HalvingTuneStrategy._promote(strategy, accuracies, 20, 0.99), [])
+        # the interval is only used for proportions
+        promoted = HalvingTuneStrategy._promote(strategy, [3.0, 5.0, 4.0], 20, 10.0)
+        self.assertEqual(promoted, [1])
+
+    def test_run_halving(self):
+        from lpot import Quantization
+        from lpot.strategy.halving import HalvingTuneStrategy
+
+        quantizer = Quantization('fake_yaml.yaml')
+        dataset = quantizer.dataset('dummy', (100, 3, 3, 1), label=True)
+        dataloader = quantizer.dataloader(dataset)
+        strategy = HalvingTuneStrategy(self.constant_graph, quantizer.conf, dataloader,
+                                       eval_dataloader=dataloader)
+        strategy.traverse()
+        self.assertIsNotNone(strategy.best_qmodel)
+        self.assertGreater(strategy.evaluated_samples, 0)
+        self.assertLess(strategy.evaluated_samples, strategy.full_evaluation_samples)
+        self.assertTrue(os.path.exists('saved/history.snapshot'))
+
+        # the candidates dropped on a subset are trials of the history too
+        history = strategy.tuning_history[0]['history']
+        dropped = [h for h in history if 'subset_samples' in h]
+        self.assertGreater(len(dropped), 0)
+        self.assertLessEqual(len(history), 4)
+        for h in dropped:
+            self.assertIsNone(h['tune_result'])
+            self.assertIsNotNone(h['subset_accuracy'])
+            self.assertIsNotNone(strategy._find_tuning_history(h['tune_cfg']))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Tests for lazy import of lpot components"""
+import unittest
+import subprocess
+import sys
+import os
+import json
+
+HEAVY_MODULES = ['pandas', 'sklearn', 'hyperopt', 'scipy', 'torch', 'tensorflow', 'mxnet', 'cpuinfo']
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_script(script):
+    # import lpot from this checkout, whether or not it is installed
+    pythonpath = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')]))
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=REPO_ROOT,
+                                     env=dict(os.environ, PYTHONPATH=pythonpath))
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+class TestImport(unittest.TestCase):
+    def test_import_lpot_is_lightweight(self):
+        loaded = run_script(
+            "import sys, json\n"
+            "import lpot\n"
+            "print(json.dumps([m for m in {} if m in sys.modules]))\n".format(HEAVY_MODULES))
+        self.assertEqual(loaded, [])
+
+    def test_import_time(self):
+        # best of several runs to reduce noise, the budget is loose on purpose
+        elapsed = min(run_script(
+            "import time, json\n"
+            "start = time.time()\n"
+            "import lpot\n"
+            "print(json.dumps(time.time() - start))\n") for _ in range(3))
+        self.assertLess(elapsed, 1.0)
+
+    def test_lazy_registry(self):
+        loaded = run_script(
+            "import sys, json\n"
+            "from lpot.strategy import STRATEGIES\n"
+            "from lpot.adaptor import FRAMEWORKS\n"
+            "assert 'basic' in STRATEGIES\n"
+            "assert 'tensorflow' in FRAMEWORKS\n"
+            "print(json.dumps(sorted(m for m in sys.modules "
+            "if m.split('.')[:2] in (['lpot', 'strategy'], ['lpot', 'adaptor']))))\n")
+        self.assertIn('lpot.strategy.basic', loaded)
+        self.assertIn('lpot.adaptor.tensorflow', loaded)
+        self.assertNotIn('lpot.strategy.tpe', loaded)
+        self.assertNotIn('lpot.strategy.bayesian', loaded)
+        self.assertNotIn('lpot.adaptor.pytorch', loaded)
+
+        from lpot.strategy import STRATEGIES
+        self.assertTrue(set(['basic', 'bayesian', 'exhaustive', 'mse', 'random', 'tpe'])
+                        <= set(STRATEGIES.keys()))
+        self.assertNotIn('not_exist', STRATEGIES)
+
+if __name__ == "__main__":
+    unittest.main()
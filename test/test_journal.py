@@ -0,0 +1,218 @@
+"""Tests for the tuning history journal"""
+import unittest
+import os
+import pickle
+import shutil
+import yaml
+import numpy as np
+from lpot.utils.journal import TuningJournal
+from lpot.strategy.strategy import load_tuning_state
+
+def build_fake_yaml(strategy='bayesian'):
+    fake_yaml = '''
+        model:
+          name: fake_yaml
+          framework: tensorflow
+          inputs: x
+          outputs: op_to_store
+        device: cpu
+        quantization:
+          calibration:
+            sampling_size: 2, 5, 10
+        evaluation:
+          accuracy:
+            metric:
+              topk: 1
+        tuning:
+          strategy:
+            name: {}
+          exit_policy:
+            timeout: 600
+            max_trials: 10
+          accuracy_criterion:
+            relative: -0.01
+          workspace:
+            path: journal_saved/workspace
+        '''.format(strategy)
+    y = yaml.load(fake_yaml, Loader=yaml.SafeLoader)
+    with open('journal_saved/fake_yaml.yaml', "w", encoding="utf-8") as f:
+        yaml.dump(y, f)
+
+def build_fake_model():
+    import tensorflow as tf
+    graph = tf.Graph()
+    graph_def = tf.compat.v1.GraphDef()
+    with tf.compat.v1.Session() as sess:
+        x = tf.compat.v1.placeholder(tf.float32, shape=(None,16), name='x')
+        for i in range(2):
+            w = tf.compat.v1.constant(np.random.random((16,16)).astype(np.float32))
+            b = tf.compat.v1.constant(np.random.random(16).astype(np.float32))
+            x = tf.nn.relu(tf.nn.bias_add(tf.matmul(x, w), b))
+        op = tf.identity(x, name='op_to_store')
+        constant_graph = tf.compat.v1.graph_util.convert_variables_to_constants(sess, sess.graph_def, ['op_to_store'])
+
+    graph_def.ParseFromString(constant_graph.SerializeToString())
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    return graph
+
+class Interrupted(Exception):
+    pass
+
+class FakeStrategy(object):
+    def __init__(self, tuning_history):
+        self.tuning_history = tuning_history
+
+class TestJournal(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        os.makedirs('journal_saved', exist_ok=True)
+        self.path = 'journal_saved/history.snapshot'
+
+    @classmethod
+    def tearDownClass(self):
+        shutil.rmtree('journal_saved', ignore_errors=True)
+
+    def test_append_and_load(self):
+        journal = TuningJournal(self.path)
+        journal.snapshot({'tuning_history': []})
+        for i in range(5):
+            journal.append({'id': i})
+        state, records = TuningJournal(self.path).load()
+        self.assertEqual(state, {'tuning_history': []})
+        self.assertEqual([r['id'] for r in records], list(range(5)))
+
+    def test_append_cost_is_constant(self):
+        journal = TuningJournal(self.path)
+        journal.snapshot({'tuning_history': []})
+        sizes = []
+        for i in range(20):
+            before = os.path.getsize(self.path)
+            journal.append({'tune_cfg': {'op': i}, 'tune_result': (0.5, 1.0)})
+            sizes.append(os.path.getsize(self.path) - before)
+        self.assertLessEqual(max(sizes) - min(sizes), 2)
+
+    def test_torn_tail(self):
+        journal = TuningJournal(self.path)
+        journal.snapshot({'tuning_history': []})
+        journal.append({'id': 0})
+        journal.append({'id': 1})
+        with open(self.path, 'rb+') as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        _, records = TuningJournal(self.path).load()
+        self.assertEqual(records, [{'id': 0}])
+
+    def test_need_compact(self):
+        journal = TuningJournal(self.path, compact_min_bytes=0)
+        journal.snapshot({'tuning_history': [0] * 100})
+        self.assertFalse(journal.need_compact())
+        while not journal.need_compact():
+            journal.append({'id': 0})
+        self.assertGreater(journal.tail_size, journal.snapshot_size)
+        journal.snapshot({'tuning_history': [0] * 100})
+        self.assertFalse(journal.need_compact())
+        _, records = TuningJournal(self.path).load()
+        self.assertEqual(records, [])
+
+    def test_load_tuning_state(self):
+        journal = TuningJournal(self.path)
+        journal.snapshot({'tuning_history': []})
+        journal.append({'type': 'tuning_history',
+                        'tuning_history': {'cfg': None, 'history': [],
+                                           'last_tune_result': None,
+                                           'best_tune_result': None}})
+        journal.append({'type': 'history', 'index': 0,
+                        'history': {'tune_cfg': {'op': 1}, 'tune_result': (0.9, 1.0)},
+                        'last_tune_result': (0.9, 1.0), 'best_tune_result': (0.9, 1.0)})
+        state = load_tuning_state(self.path)
+        self.assertEqual(len(state['tuning_history']), 1)
+        self.assertEqual(state['tuning_history'][0]['history'][0]['tune_cfg'], {'op': 1})
+        self.assertEqual(state['tuning_history'][0]['best_tune_result'], (0.9, 1.0))
+
+    def test_legacy_snapshot(self):
+        with open(self.path, 'wb') as f:
+            pickle.dump(FakeStrategy([{'history': []}]), f)
+        state = load_tuning_state(self.path)
+        self.assertEqual(state['tuning_history'], [{'history': []}])
+
+    def test_resume_interrupted_strategy(self):
+        from lpot import Quantization
+        from lpot.strategy.bayesian import BayesianTuneStrategy
+        build_fake_yaml()
+        quantizer = Quantization('journal_saved/fake_yaml.yaml')
+        dataset = quantizer.dataset('dummy', (10, 16), label=True)
+        dataloader = quantizer.dataloader(dataset)
+        model = build_fake_model()
+        evaluated = []
+
+        def eval_func(model):
+            # the baseline and two trials, then the process is killed
+            if len(evaluated) == 3:
+                raise Interrupted()
+            evaluated.append(model)
+            return 0.5 + 0.01 * len(evaluated)
+
+        strategy = BayesianTuneStrategy(model, quantizer.conf, dataloader,
+                                        eval_func=eval_func)
+        with self.assertRaises(Interrupted):
+            strategy.traverse()
+
+        # the records only append the (params, target) pair of each trial, the snapshot
+        # written after the baseline has no optimizer yet
+        _, records = TuningJournal(strategy.history_path).load()
+        self.assertEqual([record['delta']['target'] for record in records], [0.52, 0.53])
+        state = load_tuning_state(strategy.history_path)
+        history = state['tuning_history'][0]
+        self.assertEqual(len(history['history']), 2)
+        self.assertIsNone(history['bayes_opt'])
+        self.assertEqual(strategy.params_to_tune_configs(history['deltas'][-1]['params']),
+                         history['history'][-1]['tune_cfg'])
+        self.assertEqual(history['last_tune_result'][0], 0.53)
+
+        # the optimizer is rebuilt by replaying the pairs
+        resumed = BayesianTuneStrategy(model, quantizer.conf, dataloader,
+                                       eval_func=eval_func, dicts=state)
+        self.assertEqual(len(resumed.bayes_opt._space), 2)
+        self.assertEqual(sorted(resumed.bayes_opt._space.target), [0.52, 0.53])
+        next(resumed.next_tune_cfg())
+        self.assertEqual(len(resumed.bayes_opt._space), 2)
+
+        # the snapshot holds the whole optimizer and no delta
+        resumed._save()
+        history = load_tuning_state(strategy.history_path)['tuning_history'][0]
+        self.assertNotIn('deltas', history)
+        self.assertEqual(len(history['bayes_opt']._space), 2)
+
+    def test_resume_interrupted_tpe(self):
+        from lpot import Quantization
+        from lpot.strategy.tpe import TpeTuneStrategy
+        build_fake_yaml('tpe')
+        quantizer = Quantization('journal_saved/fake_yaml.yaml')
+        dataset = quantizer.dataset('dummy', (10, 16), label=True)
+        dataloader = quantizer.dataloader(dataset)
+        model = build_fake_model()
+        evaluated = []
+
+        def eval_func(model):
+            # the baseline and two trials, then the process is killed
+            if len(evaluated) == 3:
+                raise Interrupted()
+            evaluated.append(model)
+            return 0.5 + 0.01 * len(evaluated)
+
+        strategy = TpeTuneStrategy(model, quantizer.conf, dataloader, eval_func=eval_func)
+        with self.assertRaises(Interrupted):
+            strategy.traverse()
+
+        # the records only append the new hyperopt trials
+        _, records = TuningJournal(strategy.history_path).load()
+        self.assertEqual([[trial['tid'] for trial in record['delta']['trials']]
+                          for record in records if record['delta']], [[0], [1]])
+        state = load_tuning_state(strategy.history_path)
+        resumed = TpeTuneStrategy(model, quantizer.conf, dataloader,
+                                  eval_func=eval_func, dicts=state)
+        self.assertEqual(len(resumed.hpopt_trials.trials), 2)
+        self.assertEqual(resumed.hpopt_trials.new_trial_ids(1), [2])
+
+if __name__ == "__main__":
+    unittest.main()
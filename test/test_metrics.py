@@ -2,8 +2,39 @@
 import numpy as np
 import unittest
 import os
+import pickle
 from lpot.metric import METRICS
 
+try:
+    from pycocotools.coco import COCO
+    from pycocotools.cocoeval import COCOeval
+except ImportError:
+    COCO = None
+
+def build_fake_detections(num_images, num_classes, seed):
+    rng = np.random.RandomState(seed)
+    batches = []
+    for _ in range(num_images):
+        num_gts = rng.randint(0, 6)
+        corners = rng.uniform(0, 300, (num_gts, 2))
+        gt_boxes = np.concatenate([corners, corners + rng.uniform(5, 150, (num_gts, 2))], 1)
+        gt_classes = rng.randint(1, num_classes + 1, num_gts)
+        iscrowd = (rng.rand(num_gts) < 0.1).astype(np.int64)
+        # noisy ground truths and random boxes, the scores have ties
+        source = rng.randint(0, max(num_gts, 1), 10)
+        corners = rng.uniform(0, 300, (10, 2))
+        boxes = np.concatenate([corners, corners + rng.uniform(5, 150, (10, 2))], 1)
+        if num_gts:
+            noisy = rng.rand(10) < 0.7
+            boxes[noisy] = gt_boxes[source[noisy]] + rng.normal(0, 6, (noisy.sum(), 4))
+            boxes[:, 2:] = np.maximum(boxes[:, 2:], boxes[:, :2] + 1)
+        classes = np.where(rng.rand(10) < 0.8, gt_classes[source] if num_gts else 1,
+                           rng.randint(1, num_classes + 1, 10))
+        scores = np.round(rng.rand(10), 2)
+        batches.append(((np.array([10]), boxes[None], scores[None], classes[None]),
+                        ([gt_boxes], [gt_classes], [iscrowd])))
+    return batches
+
 class TestMetrics(unittest.TestCase):
     def setUp(self):
         pass
@@ -73,5 +104,198 @@ class TestMetrics(unittest.TestCase):
         acc_result = acc.result()
         self.assertEqual(acc_result, 0.5)
 
+    def _check_merge(self, metric_fn, batches):
+        whole = metric_fn()
+        for predicts, labels in batches:
+            whole.update(predicts, labels)
+        # the batches split in shards, merged in order into a metric never updated
+        merged = metric_fn()
+        for shard in (batches[:1], batches[1:]):
+            metric = metric_fn()
+            for predicts, labels in shard:
+                metric.update(predicts, labels)
+            merged.merge(pickle.loads(pickle.dumps(metric.state())))
+        np.testing.assert_array_equal(np.array(merged.result()), np.array(whole.result()))
+
+    def test_tensorflow_merge(self):
+        metrics = METRICS('tensorflow', native=True)
+        batches = [([1, 0, 1, 1], [0, 1, 1, 1]), ([1, 1], [1, 1]), ([0], [1])]
+        self._check_merge(metrics['Accuracy'], batches)
+        scores = [([[0, 0.2, 0.9, 0.3], [0, 0.9, 0.8, 0]], [2, 2]), ([[0.5, 0.1, 0, 0]], [0])]
+        self._check_merge(lambda: METRICS('tensorflow')['topk'](k=2), scores)
+
+    def test_pytorch_merge(self):
+        metrics = METRICS('pytorch', native=True)
+        batches = [([1, 0, 1, 1], [0, 1, 1, 1]), ([1, 1], [1, 1]), ([0], [1])]
+        self._check_merge(metrics['Accuracy'], batches)
+        scores = [([[0.1, 0.9], [0.8, 0.2]], [1, 1]), ([[0.3, 0.7]], [0])]
+        self._check_merge(lambda: metrics['ConfusionMatrix'](num_classes=2), scores)
+        self._check_merge(metrics['Precision'], scores)
+        with self.assertRaises(NotImplementedError):
+            metrics['VariableAccumulation'](op=lambda a, b: a + b).state()
+
+    def test_mxnet_merge(self):
+        metrics = METRICS('mxnet', native=True)
+        batches = [([1, 0, 1, 1], [0, 1, 1, 1]), ([1, 1], [1, 1]), ([0], [1])]
+        self._check_merge(metrics['Accuracy'], batches)
+        scores = [([[0.1, 0.9], [0.8, 0.2]], [1, 1]), ([[0.3, 0.7], [0.6, 0.4]], [0, 0])]
+        self._check_merge(metrics['F1'], scores)
+        self._check_merge(lambda: metrics['F1'](average='micro'), scores)
+        # the confusion matrix of the first shard has to grow to the classes of the second
+        self._check_merge(metrics['PCC'], [([0, 1, 1], [0, 1, 0]), ([2, 1, 0], [2, 2, 0])])
+        with self.assertRaises(NotImplementedError):
+            metrics['PearsonCorrelation'](average='micro').state()
+
+    def test_numpy_merge(self):
+        metrics = METRICS('pytorch')
+        rng = np.random.RandomState(1)
+        batches = [(rng.rand(7), rng.randint(2, size=7)) for _ in range(5)]
+        # the float sums are exact, so the merged result is the same to the last bit
+        for name in ('Loss', 'MAE', 'MSE', 'RMSE', 'F1', 'AUC'):
+            self._check_merge(metrics[name], batches)
+        self._check_merge(metrics['Accuracy'], [(rng.rand(7, 3), rng.randint(3, size=7))])
+
+    def test_map(self):
+        mAP = METRICS('tensorflow')['mAP']
+        metric = mAP()
+        boxes = np.array([[[10, 10, 50, 50], [60, 60, 90, 90], [0, 0, 5, 5]]])
+        # num_detections drops the last box
+        metric.update((np.array([2]), boxes, np.array([[0.9, 0.8, 0.7]]), np.array([[1, 1, 1]])),
+                      ([np.array([[10, 10, 50, 50]])], [np.array([1])]))
+        self.assertAlmostEqual(metric.result(), 1.)
+        # a missed ground truth halves the recall, the precision is 1 up to recall 0.5
+        metric.update((boxes[:, :0], np.zeros((1, 0)), np.zeros((1, 0))),
+                      ([np.array([[10, 10, 50, 50]])], [np.array([1])]))
+        self.assertAlmostEqual(metric.result(), 51 / 101)
+
+        # the crowd ground truth and the boxes out of the area range are ignored
+        metric = mAP(area_range='large')
+        metric.update((boxes, np.array([[0.9, 0.8, 0.7]]), np.array([[1, 1, 1]])),
+                      ([np.array([[0, 0, 100, 100], [60, 60, 90, 90]])], [np.array([1, 1])],
+                       [np.array([1, 0])]))
+        self.assertEqual(metric.result(), 0.)
+        metric = mAP(iou_thresholds=[0.5])
+        metric.update((boxes[:, :1] + 4, np.array([[0.9]]), np.array([[2]])),
+                      ([np.array([[10, 10, 50, 50]])], [np.array([2])]))
+        self.assertAlmostEqual(metric.result(), 1.)
+
+        self._check_merge(mAP, build_fake_detections(8, 3, 1))
+
+    @unittest.skipIf(COCO is None, 'pycocotools is not installed')
+    def test_map_pycocotools_parity(self):
+        num_classes = 4
+        batches = build_fake_detections(50, num_classes, 2)
+        annotations, results = [], []
+        for image, ((_, boxes, scores, classes), labels) in enumerate(batches):
+            for box, cls, iscrowd in zip(labels[0][0], labels[1][0], labels[2][0]):
+                height, width = box[2] - box[0], box[3] - box[1]
+                annotations.append({'id': len(annotations) + 1, 'image_id': image,
+                                    'category_id': int(cls), 'iscrowd': int(iscrowd),
+                                    'bbox': [box[1], box[0], width, height],
+                                    'area': width * height})
+            for box, score, cls in zip(boxes[0], scores[0], classes[0]):
+                results.append({'image_id': image, 'category_id': int(cls),
+                                'score': float(score),
+                                'bbox': [box[1], box[0], box[3] - box[1], box[2] - box[0]]})
+        coco = COCO()
+        coco.dataset = {'images': [{'id': i} for i in range(len(batches))],
+                        'annotations': annotations,
+                        'categories': [{'id': i + 1} for i in range(num_classes)]}
+        coco.createIndex()
+        coco_eval = COCOeval(coco, coco.loadRes(results), 'bbox')
+        coco_eval.params.maxDets = [1, 5, 100]
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+
+        for area_index, area_range in enumerate(('all', 'small', 'medium', 'large')):
+            for max_index, max_detections in enumerate((5, 100)):
+                precision = coco_eval.eval['precision'][:, :, :, area_index, max_index + 1]
+                metric = METRICS('pytorch')['mAP'](area_range=area_range,
+                                                   max_detections=max_detections)
+                for preds, labels in batches:
+                    metric.update(preds, labels)
+                self.assertAlmostEqual(metric.result(), np.mean(precision[precision > -1]),
+                                       places=6)
+
+    def test_tensorflow_numpy_parity(self):
+        native = METRICS('tensorflow', native=True)
+        metrics = METRICS('tensorflow')
+        self.assertIsNot(metrics['Accuracy'], native['Accuracy'])
+        rng = np.random.RandomState(2)
+        batches = [(rng.rand(16).astype(np.float32), rng.randint(2, size=16)) for _ in range(4)]
+        pairs = [('MAE', 'MeanAbsoluteError'), ('MSE', 'MeanSquaredError'),
+                 ('RMSE', 'RootMeanSquaredError'), ('AUC', 'AUC')]
+        for name, native_name in pairs:
+            metric, native_metric = metrics[name](), native[native_name]()
+            for preds, labels in batches:
+                metric.update(preds, labels)
+                native_metric.update(preds, labels)
+            self.assertAlmostEqual(metric.result(), float(native_metric.result()), places=5)
+
+        metric, native_metric = metrics['Accuracy'](), native['Accuracy']()
+        for preds, labels in batches:
+            metric.update(np.round(preds), labels)
+            native_metric.update(np.round(preds), labels)
+        self.assertAlmostEqual(metric.result(), float(native_metric.result()), places=6)
+
+    def test_pytorch_numpy_parity(self):
+        import torch
+        native = METRICS('pytorch', native=True)
+        metrics = METRICS('pytorch')
+        rng = np.random.RandomState(3)
+        batches = [(torch.tensor(rng.rand(16, 5)), torch.tensor(rng.randint(5, size=16)))
+                   for _ in range(4)]
+        metric, native_metric = metrics['Accuracy'](), native['Accuracy']()
+        for preds, labels in batches:
+            metric.update(preds, labels)
+            native_metric.update(preds, labels)
+        self.assertAlmostEqual(metric.result(), native_metric.result(), places=6)
+
+        batches = [(torch.tensor(rng.rand(16)), torch.tensor(rng.rand(16))) for _ in range(4)]
+        pairs = [('MAE', 'MeanAbsoluteError'), ('MSE', 'MeanSquaredError'),
+                 ('RMSE', 'RootMeanSquaredError')]
+        for name, native_name in pairs:
+            metric, native_metric = metrics[name](), native[native_name]()
+            for preds, labels in batches:
+                metric.update(preds, labels)
+                native_metric.update(preds, labels)
+            self.assertAlmostEqual(metric.result(), native_metric.result(), places=6)
+
+    def test_mxnet_numpy_parity(self):
+        native = METRICS('mxnet', native=True)
+        metrics = METRICS('mxnet')
+        rng = np.random.RandomState(4)
+        batches = [(rng.rand(n, 2), rng.randint(2, size=n)) for n in (32, 32, 7)]
+        for name, kwargs in (('Accuracy', {}), ('F1', {}), ('F1', {'average': 'micro'}),
+                             ('F1', {'average': 'macro'})):
+            metric, native_metric = metrics[name](**kwargs), native[name](**kwargs)
+            for preds, labels in batches:
+                metric.update(preds, labels)
+                native_metric.update(preds, labels)
+            self.assertAlmostEqual(metric.result(), native_metric.result(), places=6)
+
+        # the mxnet errors are averaged per batch
+        batches = [(rng.rand(n, 1), rng.rand(n, 1)) for n in (32, 32, 7)]
+        for name in ('MAE', 'MSE', 'RMSE'):
+            metric, native_metric = metrics[name](name=name), native[name](name=name)
+            for preds, labels in batches:
+                metric.update(preds, labels)
+                native_metric.update(preds, labels)
+            self.assertAlmostEqual(metric.result(), native_metric.result(), places=6)
+        preds = batches[0][0]
+        loss = metrics['Loss']()
+        loss.update(preds)
+        self.assertAlmostEqual(loss.result(), np.mean(preds), places=10)
+
+    def test_unsupported_arguments(self):
+        metrics = METRICS('pytorch')
+        with self.assertRaises(AssertionError):
+            metrics['Loss'](loss_fn=None)
+        with self.assertRaises(AssertionError):
+            metrics['F1'](average='weighted')
+        with self.assertRaises(AssertionError):
+            metrics['AUC'](curve='PR')
+        metrics['Accuracy'](device='cpu')
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,186 @@
+"""Tests for the op latency profiling"""
+import numpy as np
+import unittest
+import os
+import shutil
+import yaml
+import torch
+import tensorflow as tf
+from collections import OrderedDict
+from lpot.utils.op_profile import OpProfile
+
+def build_fake_yaml():
+    fake_yaml = '''
+        model:
+          name: fake_yaml
+          framework: tensorflow
+          inputs: x
+          outputs: op_to_store
+        device: cpu
+        evaluation:
+          accuracy:
+            metric:
+              topk: 1
+        tuning:
+            exit_policy:
+              max_trials: 2
+            accuracy_criterion:
+              relative: 0.01
+            profile:
+              iteration: 2
+            workspace:
+              path: saved
+        '''
+    y = yaml.load(fake_yaml, Loader=yaml.SafeLoader)
+    with open('fake_yaml.yaml',"w",encoding="utf-8") as f:
+        yaml.dump(y,f)
+    f.close()
+
+def build_fake_model():
+    graph = tf.Graph()
+    graph_def = tf.compat.v1.GraphDef()
+    with tf.compat.v1.Session() as sess:
+        x = tf.compat.v1.placeholder(tf.float32, shape=(None,16), name='x')
+        for i in range(2):
+            w = tf.compat.v1.constant(np.random.random((16,16)).astype(np.float32))
+            b = tf.compat.v1.constant(np.random.random(16).astype(np.float32))
+            x = tf.nn.relu(tf.nn.bias_add(tf.matmul(x, w), b))
+        op = tf.identity(x, name='op_to_store')
+
+        sess.run(tf.compat.v1.global_variables_initializer())
+        constant_graph = tf.compat.v1.graph_util.convert_variables_to_constants(sess, sess.graph_def, ['op_to_store'])
+
+    graph_def.ParseFromString(constant_graph.SerializeToString())
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    return graph
+
+class FakeNet(torch.nn.Module):
+    def __init__(self):
+        super(FakeNet, self).__init__()
+        self.quant = torch.quantization.QuantStub()
+        self.conv = torch.nn.Conv2d(3, 8, 3)
+        self.relu = torch.nn.ReLU()
+        self.fc = torch.nn.Linear(8 * 6 * 6, 4)
+        self.dequant = torch.quantization.DeQuantStub()
+
+    def forward(self, x):
+        x = self.relu(self.conv(self.quant(x)))
+        return self.dequant(self.fc(x.reshape(x.shape[0], -1)))
+
+def int8_tune_cfg(capability, fallback_ops=()):
+    tune_cfg = {'calib_iteration': 1, 'op': OrderedDict()}
+    for op, op_cap in capability['opwise'].items():
+        if op[0] in fallback_ops:
+            tune_cfg['op'][op] = {'activation': {'dtype': 'fp32'}, 'weight': {'dtype': 'fp32'}}
+            continue
+        tune_cfg['op'][op] = {'activation': {'dtype': 'uint8', 'algorithm': 'minmax',
+                                             'scheme': 'asym', 'granularity': 'per_tensor'},
+                              'weight': {'dtype': 'int8', 'algorithm': 'minmax',
+                                         'scheme': 'sym', 'granularity': 'per_tensor'}}
+    return tune_cfg
+
+class TestOpProfile(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        build_fake_yaml()
+
+    @classmethod
+    def tearDownClass(self):
+        os.remove('fake_yaml.yaml')
+        shutil.rmtree('saved', ignore_errors=True)
+
+    def test_op_profile(self):
+        baseline = OpProfile(2)
+        baseline.add('conv', 0.004)
+        baseline.add('fc', 0.002)
+        profile = OpProfile(2)
+        profile.add('conv', 0.001)
+        profile.add('conv', 0.001, boundary=True)
+        profile.add('fc', 0.004)
+        profile.add('quant', 0.002, boundary=True, attributed=False)
+        self.assertAlmostEqual(profile.latency('conv'), 0.001)
+        self.assertAlmostEqual(profile.boundary_latency('conv'), 0.0005)
+        self.assertAlmostEqual(profile.total(), 0.004)
+        self.assertIsNone(profile.latency('relu'))
+        speedups = {op: speedup for op, (_, _, speedup) in profile.compare(baseline).items()}
+        self.assertAlmostEqual(speedups['conv'], 2.)
+        self.assertAlmostEqual(speedups['fc'], 0.5)
+        self.assertIn('Speedup', profile.format(baseline))
+
+        profile.save('op_profile.json')
+        loaded = OpProfile.load('op_profile.json')
+        os.remove('op_profile.json')
+        self.assertEqual(loaded.to_dict(), profile.to_dict())
+        self.assertEqual(list(loaded.ops), ['conv', 'fc'])
+
+    def test_tensorflow_profile(self):
+        from lpot.adaptor import FRAMEWORKS
+        from lpot.data import DATASETS, DataLoader
+        adaptor = FRAMEWORKS['tensorflow']({'device': 'cpu',
+                                            'approach': 'post_training_static_quant',
+                                            'random_seed': 1978,
+                                            'inputs': ['x'],
+                                            'outputs': ['op_to_store']})
+        dataset = DATASETS('tensorflow')['dummy'](shape=(12, 16), label=True)
+        dataloader = DataLoader('tensorflow', dataset, batch_size=4)
+        model = build_fake_model()
+        capability = adaptor.query_fw_capability(model)
+        q_model = adaptor.quantize(int8_tune_cfg(capability), model, dataloader)
+
+        fp32_profile = adaptor.profile(model, dataloader)
+        int8_profile = adaptor.profile(q_model, dataloader, iteration=2)
+        self.assertEqual((fp32_profile.iterations, int8_profile.iterations), (3, 2))
+        ops = [op[0] for op in capability['opwise']]
+        self.assertEqual(sorted(fp32_profile.ops), sorted(ops))
+        self.assertEqual(sorted(int8_profile.ops), sorted(ops))
+        # the fused bias and relu and the input quantize are attributed to the ops
+        self.assertNotIn('Relu', fp32_profile.unattributed)
+        self.assertGreater(int8_profile.boundary_latency(ops[0]), 0)
+        self.assertEqual(list(int8_profile.compare(fp32_profile)), list(int8_profile.ops))
+
+    def test_pytorch_profile(self):
+        from lpot.adaptor import FRAMEWORKS
+        from lpot.data import DATASETS, DataLoader
+        dataset = DATASETS('pytorch')['dummy'](shape=(8, 3, 8, 8), label=True)
+        dataloader = DataLoader('pytorch', dataset, batch_size=4)
+        adaptor = FRAMEWORKS['pytorch']({'device': 'cpu',
+                                         'approach': 'post_training_static_quant',
+                                         'random_seed': 1978,
+                                         'q_dataloader': dataloader})
+        model = FakeNet().eval()
+        capability = adaptor.query_fw_capability(model)
+        q_model = adaptor.quantize(int8_tune_cfg(capability, ['fc']), model, dataloader)
+
+        fp32_profile = adaptor.profile(model, dataloader)
+        int8_profile = adaptor.profile(q_model, dataloader)
+        self.assertEqual(list(fp32_profile.ops), ['quant', 'conv', 'fc'])
+        self.assertEqual(list(int8_profile.ops), ['quant', 'conv', 'fc'])
+        # the relu is fused into the conv, the quant and dequant wrapping the fallback fc
+        # are attributed to it
+        self.assertNotIn('relu', fp32_profile.unattributed)
+        self.assertEqual(fp32_profile.boundary_latency('fc'), 0)
+        self.assertGreater(int8_profile.boundary_latency('fc'), 0)
+        self.assertGreater(int8_profile.boundary_latency('quant'), 0)
+        self.assertIn('dequant', int8_profile.unattributed)
+
+    def test_tuning_profile(self):
+        from lpot import Quantization
+        from lpot.strategy.basic import BasicTuneStrategy
+
+        quantizer = Quantization('fake_yaml.yaml')
+        dataset = quantizer.dataset('dummy', (12, 16), label=True)
+        dataloader = quantizer.dataloader(dataset, batch_size=4)
+        strategy = BasicTuneStrategy(build_fake_model(), quantizer.conf, dataloader,
+                                     eval_dataloader=dataloader)
+        strategy.traverse()
+        fp32_profile = OpProfile.load('saved/profile/fp32.json')
+        trial_profile = OpProfile.load('saved/profile/trial_1.json')
+        self.assertEqual(fp32_profile.iterations, 2)
+        self.assertEqual(list(trial_profile.ops), list(fp32_profile.ops))
+        self.assertEqual(sorted(op[0] for op in strategy.op_speedups),
+                         sorted(fp32_profile.ops))
+
+if __name__ == "__main__":
+    unittest.main()
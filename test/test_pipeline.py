@@ -0,0 +1,63 @@
+"""Tests for the metric pipeline overlapping the metric update with the inference"""
+import threading
+import time
+import unittest
+import numpy as np
+from lpot.metric import METRICS
+from lpot.utils.pipeline import MetricPipeline
+
+class TestMetricPipeline(unittest.TestCase):
+    def test_same_result(self):
+        rng = np.random.RandomState(1)
+        batches = [(rng.rand(8, 5), rng.randint(5, size=8)) for _ in range(20)]
+        results = []
+        for overlap in (False, True):
+            metric = METRICS('pytorch')['Accuracy']()
+            with MetricPipeline(metric.update, overlap=overlap) as pipeline:
+                for preds, labels in batches:
+                    pipeline.put(preds, labels)
+            results.append(metric.result())
+        self.assertEqual(results[0], results[1])
+
+    def test_back_pressure(self):
+        release = threading.Event()
+        updated = []
+
+        def update(preds, labels):
+            release.wait()
+            updated.append(preds)
+
+        pipeline = MetricPipeline(update, max_pending=2)
+        with pipeline:
+            # the worker holds one batch, the queue two, the fourth put blocks
+            thread = threading.Thread(target=lambda: [pipeline.put(i, None) for i in range(4)])
+            thread.start()
+            time.sleep(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(pipeline._queue.qsize(), 2)
+            release.set()
+            thread.join()
+        self.assertEqual(updated, [0, 1, 2, 3])
+
+    def test_exception(self):
+        def update(preds, labels):
+            if preds == 2:
+                raise ValueError('bad batch')
+
+        with self.assertRaises(ValueError):
+            with MetricPipeline(update) as pipeline:
+                for i in range(3):
+                    pipeline.put(i, None)
+        # raised by the next put
+        with self.assertRaises(ValueError):
+            with MetricPipeline(update) as pipeline:
+                pipeline.put(2, None)
+                time.sleep(0.1)
+                pipeline.put(3, None)
+                self.fail('put should raise the update error')
+        with self.assertRaises(ValueError):
+            with MetricPipeline(update, overlap=False) as pipeline:
+                pipeline.put(2, None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Tests for sequential evaluation with early termination"""
+import unittest
+import numpy as np
+from lpot.objective import OBJECTIVES, SequentialEvaluation, EvaluationRejected
+
+class RunningAccuracy(object):
+    def __init__(self):
+        self.correct = 0
+        self.total = 0
+
+    def update(self, preds, labels):
+        self.correct += int(np.sum(np.array(preds) == np.array(labels)))
+        self.total += len(labels)
+
+    def result(self):
+        return self.correct / self.total
+
+def evaluate(seq_eval, correct_ratio, batches, batch_size=10):
+    metric = RunningAccuracy()
+    rng = np.random.RandomState(0)
+    for _ in range(batches):
+        labels = np.zeros(batch_size)
+        preds = (rng.rand(batch_size) > correct_ratio).astype(np.float32)
+        metric.update(preds, labels)
+        if seq_eval is not None:
+            seq_eval.update(metric)
+    return metric.result()
+
+class TestSequentialEvaluation(unittest.TestCase):
+    def test_reject_hopeless(self):
+        seq_eval = SequentialEvaluation(0.75, batch_size=10, total=10000)
+        with self.assertRaises(EvaluationRejected) as cm:
+            evaluate(seq_eval, 0.5, 1000)
+        # rejected after a small fraction of the dataset
+        self.assertLess(cm.exception.samples, 1000)
+        self.assertAlmostEqual(cm.exception.accuracy, 0.5, delta=0.1)
+
+    def test_keep_promising(self):
+        seq_eval = SequentialEvaluation(0.75, batch_size=10, total=10000)
+        acc = evaluate(seq_eval, 0.76, 1000)
+        self.assertAlmostEqual(acc, 0.76, delta=0.02)
+
+    def test_upper_bound(self):
+        seq_eval = SequentialEvaluation(0.75, batch_size=10, total=1000, min_samples=0)
+        seq_eval.batches = 50
+        # half evaluated, the bound can't be lower than the running accuracy
+        self.assertGreater(seq_eval.upper_bound(0.5), 0.5)
+        self.assertLessEqual(seq_eval.upper_bound(1.0), 1.0)
+        seq_eval.batches = 100
+        self.assertAlmostEqual(seq_eval.upper_bound(0.5), 0.5)
+
+    def test_objective_rejected(self):
+        objective = OBJECTIVES['performance']({'relative': 0.01})
+
+        def eval_func(model):
+            raise EvaluationRejected(0.3, 500)
+
+        acc, _ = objective.evaluate(eval_func, None)
+        self.assertTrue(objective.rejected)
+        self.assertEqual(acc, 0.3)
+        self.assertFalse(objective.compare(None, (0.5, 1.0)))
+
+        acc, _ = objective.evaluate(lambda model: 0.5, None)
+        self.assertFalse(objective.rejected)
+        self.assertEqual(objective.accuracy_target((0.5, 1.0)), 0.5 * 0.99)
+
+if __name__ == "__main__":
+    unittest.main()
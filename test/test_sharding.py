@@ -0,0 +1,60 @@
+"""Tests for the sharded evaluation"""
+import numpy as np
+import unittest
+import tensorflow as tf
+from lpot.utils.sharding import shard_cores
+
+def build_fake_model():
+    graph = tf.Graph()
+    graph_def = tf.compat.v1.GraphDef()
+    with tf.compat.v1.Session() as sess:
+        x = tf.compat.v1.placeholder(tf.float32, shape=(None,3,3,1), name='x')
+        y = tf.compat.v1.constant(np.random.random((2,2,1,1)).astype(np.float32), name='y')
+        op = tf.nn.conv2d(input=x, filters=y, strides=[1,1,1,1], padding='VALID', name='op_to_store')
+
+        sess.run(tf.compat.v1.global_variables_initializer())
+        constant_graph = tf.compat.v1.graph_util.convert_variables_to_constants(sess, sess.graph_def, ['op_to_store'])
+
+    graph_def.ParseFromString(constant_graph.SerializeToString())
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    return graph
+
+class TestSharding(unittest.TestCase):
+
+    def test_shard_cores(self):
+        self.assertEqual(shard_cores(2, range(8)), [[0, 1, 2, 3], [4, 5, 6, 7]])
+        self.assertEqual(shard_cores(3, range(4)), [[0], [1], [2, 3]])
+        # the shards share the cores if there are fewer cores than shards
+        self.assertEqual(shard_cores(3, [5, 6]), [[5], [6], [5]])
+
+    def test_sharded_evaluation(self):
+        from lpot.adaptor import FRAMEWORKS
+        from lpot.data import DATASETS, DataLoader
+        from lpot.utils.create_obj_from_config import create_eval_func
+
+        adaptor = FRAMEWORKS['tensorflow']({'device': 'cpu',
+                                            'approach': 'post_training_static_quant',
+                                            'random_seed': 1978,
+                                            'inputs': ['x'],
+                                            'outputs': ['op_to_store']})
+        dataset = DATASETS('tensorflow')['dummy'](shape=(30, 3, 3, 1), label=True)
+        dataloader = DataLoader('tensorflow', dataset, batch_size=4)
+        model = build_fake_model()
+
+        expected = create_eval_func('tensorflow', dataloader, adaptor, {'topk': 1})(model)
+        sharded_eval = create_eval_func('tensorflow', dataloader, adaptor, {'topk': 1},
+                                        sharding={'num_shards': 3})
+        self.assertEqual(sharded_eval(model), expected)
+
+    def test_measured_objective(self):
+        from lpot.objective import OBJECTIVES
+        criterion = {'relative': 0.01}
+        # the objectives timing or tracing the whole evaluation disable the sharding
+        self.assertTrue(OBJECTIVES['performance'](criterion).measures_eval_func)
+        self.assertTrue(OBJECTIVES['footprint'](criterion).measures_eval_func)
+        self.assertFalse(OBJECTIVES['performance'](criterion, is_measure=True).measures_eval_func)
+        self.assertFalse(OBJECTIVES['modelsize'](criterion).measures_eval_func)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Tests for splicing the tf.data evaluation pipeline into the tensorflow model"""
+import numpy as np
+import unittest
+import tensorflow as tf
+from lpot.adaptor import FRAMEWORKS
+from lpot.data import DATASETS, DataLoader
+from lpot.metric import METRICS
+
+def build_fake_model():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.compat.v1.placeholder(tf.float32, shape=(None, 3, 3, 1), name='x')
+        y = tf.compat.v1.constant(np.random.random((2, 2, 1, 1)).astype(np.float32), name='y')
+        op = tf.nn.conv2d(input=x, filters=y, strides=[1, 1, 1, 1], padding='VALID')
+        tf.reshape(op, (-1, 4), name='op_to_store')
+    return graph.as_graph_def()
+
+class TestInputMap(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.graph_def = build_fake_model()
+        rng = np.random.RandomState(1)
+        self.images = rng.rand(10, 3, 3, 1).astype(np.float32)
+        self.labels = rng.randint(4, size=10)
+
+    def _adaptor(self, input_pipeline):
+        return FRAMEWORKS['tensorflow']({'device': 'cpu',
+                                         'approach': 'post_training_static_quant',
+                                         'random_seed': 1978,
+                                         'inputs': ['x'],
+                                         'outputs': ['op_to_store'],
+                                         'execution': {'input_pipeline': input_pipeline}})
+
+    def _evaluate(self, adaptor, dataloader):
+        metric = METRICS('tensorflow')['Accuracy']()
+        adaptor.evaluate(self.graph_def, dataloader, metric=metric)
+        return metric.result(), metric.num_sample
+
+    def test_tf_data(self):
+        graph = tf.Graph()
+        with graph.as_default():
+            dataset = tf.data.Dataset.from_tensor_slices((self.images, self.labels))
+            dataloader = DataLoader('tensorflow', dataset, batch_size=4)
+            expected = self._evaluate(self._adaptor('feed_dict'), dataloader)
+        adaptor = self._adaptor('input_map')
+        self.assertIsNotNone(adaptor._splice_input_pipeline(self.graph_def, dataloader))
+        self.assertEqual(self._evaluate(adaptor, dataloader), expected)
+        self.assertEqual(expected[1], 10)
+        # a dataset built eagerly is rebuilt in the evaluation graph too
+        dataset = tf.data.Dataset.from_tensor_slices((self.images, self.labels))
+        eager_dataloader = DataLoader('tensorflow', dataset, batch_size=4)
+        self.assertEqual(self._evaluate(adaptor, eager_dataloader), expected)
+        # the last incomplete batch is dropped like by the dataloader
+        dataloader.batch(batch_size=4, last_batch='no_rollover')
+        self.assertEqual(self._evaluate(adaptor, dataloader)[1], 8)
+
+    def test_fallback(self):
+        dataset = DATASETS('tensorflow')['dummy'](shape=(10, 3, 3, 1), label=True)
+        dataloader = DataLoader('tensorflow', dataset, batch_size=4)
+        adaptor = self._adaptor('input_map')
+        self.assertIsNone(adaptor._splice_input_pipeline(self.graph_def, dataloader))
+        self.assertEqual(self._evaluate(adaptor, dataloader),
+                         self._evaluate(self._adaptor('feed_dict'), dataloader))
+
+if __name__ == "__main__":
+    unittest.main()
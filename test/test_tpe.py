@@ -151,5 +151,24 @@ class TestQuantization(unittest.TestCase):
         tmp_val2 = testObject.calculate_loss(0.03, 2, testObject.loss_function_config)
         self.assertTrue(True if int(tmp_val2 - tmp_val) == 10 else False)
 
+    def test_best_result_tracker(self):
+        from lpot.strategy.tpe import TpeTuneStrategy
+        from lpot import Quantization
+
+        quantizer = Quantization('fake_yaml.yaml')
+        dataset = quantizer.dataset('dummy', (100, 3, 3, 1), label=True)
+        dataloader = quantizer.dataloader(dataset)
+        testObject = TpeTuneStrategy(self.constant_graph, quantizer.conf, dataloader)
+        acc_th = testObject.loss_function_config['acc_th']
+        missed = {'loss': 50, 'acc_loss': acc_th * 2, 'lat_diff': 3.0}
+        missed_lower_loss = {'loss': 40, 'acc_loss': acc_th * 3, 'lat_diff': 1.0}
+        reached = {'loss': 60, 'acc_loss': acc_th / 2, 'lat_diff': 1.5}
+        reached_faster = {'loss': 70, 'acc_loss': acc_th, 'lat_diff': 2.0}
+        self.assertTrue(testObject._is_better_result(missed, None))
+        self.assertTrue(testObject._is_better_result(missed_lower_loss, missed))
+        self.assertTrue(testObject._is_better_result(reached, missed_lower_loss))
+        self.assertFalse(testObject._is_better_result(missed_lower_loss, reached))
+        self.assertTrue(testObject._is_better_result(reached_faster, reached))
+
 if __name__ == "__main__":
     unittest.main()
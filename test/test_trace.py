@@ -0,0 +1,193 @@
+"""Tests for the tracing of tuning runs"""
+import numpy as np
+import unittest
+import os
+import json
+import shutil
+import yaml
+import tensorflow as tf
+from lpot.utils import trace
+
+def build_fake_yaml():
+    fake_yaml = '''
+        model:
+          name: fake_yaml
+          framework: tensorflow
+          inputs: x
+          outputs: op_to_store
+        device: cpu
+        evaluation:
+          accuracy:
+            metric:
+              topk: 1
+        tuning:
+            trace: True
+            exit_policy:
+              max_trials: 2
+            accuracy_criterion:
+              relative: 0.01
+            workspace:
+              path: saved
+        '''
+    y = yaml.load(fake_yaml, Loader=yaml.SafeLoader)
+    with open('fake_yaml.yaml',"w",encoding="utf-8") as f:
+        yaml.dump(y,f)
+    f.close()
+
+def build_fake_model():
+    graph = tf.Graph()
+    graph_def = tf.compat.v1.GraphDef()
+    with tf.compat.v1.Session() as sess:
+        x = tf.compat.v1.placeholder(tf.float32, shape=(None,3,3,1), name='x')
+        y = tf.compat.v1.constant(np.random.random((2,2,1,1)).astype(np.float32), name='y')
+        op = tf.nn.conv2d(input=x, filters=y, strides=[1,1,1,1], padding='VALID', name='op_to_store')
+
+        sess.run(tf.compat.v1.global_variables_initializer())
+        constant_graph = tf.compat.v1.graph_util.convert_variables_to_constants(sess, sess.graph_def, ['op_to_store'])
+
+    graph_def.ParseFromString(constant_graph.SerializeToString())
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    return graph
+
+class TestTrace(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.constant_graph = build_fake_model()
+        build_fake_yaml()
+
+    @classmethod
+    def tearDownClass(self):
+        os.remove('fake_yaml.yaml')
+        shutil.rmtree('saved', ignore_errors=True)
+
+    def tearDown(self):
+        trace.disable()
+
+    def test_disabled(self):
+        trace.enable()
+        trace.disable()
+        with trace.span('outer'):
+            pass
+        self.assertEqual(trace.events(), [])
+
+        @trace.traced('decorated')
+        def double(value):
+            return 2 * value
+        self.assertEqual(double(2), 4)
+        self.assertEqual(trace.events(), [])
+
+    def test_spans(self):
+        @trace.traced('adaptor.decorated')
+        def double(value):
+            return 2 * value
+
+        trace.enable('main')
+        with trace.span('strategy.outer', trial=1):
+            self.assertEqual(double(2), 4)
+            with self.assertRaises(ValueError):
+                with trace.span('strategy.inner'):
+                    raise ValueError
+        spans = {e['name']: e for e in trace.events() if e['ph'] == 'X'}
+        self.assertEqual(set(spans), {'strategy.outer', 'strategy.inner', 'adaptor.decorated'})
+        self.assertEqual(spans['strategy.outer']['args'], {'trial': 1})
+        self.assertEqual(spans['strategy.inner']['args'], {'error': 'ValueError'})
+        self.assertEqual(spans['adaptor.decorated']['cat'], 'adaptor')
+        outer = spans['strategy.outer']
+        for name in ['strategy.inner', 'adaptor.decorated']:
+            self.assertGreaterEqual(spans[name]['ts'], outer['ts'])
+            self.assertLessEqual(spans[name]['ts'] + spans[name]['dur'],
+                                 outer['ts'] + outer['dur'])
+
+    def test_aggregate(self):
+        trace.enable('main')
+        with trace.span('adaptor.evaluate'):
+            with trace.aggregate('dataloader.next') as batches:
+                for _ in range(100):
+                    with batches.item():
+                        pass
+        spans = [e for e in trace.events() if e['ph'] == 'X']
+        # the batches are one event with their count and total time
+        self.assertEqual([e['name'] for e in spans], ['dataloader.next', 'adaptor.evaluate'])
+        self.assertEqual(spans[0]['args']['calls'], 100)
+        self.assertLessEqual(spans[0]['args']['total_us'], spans[0]['dur'])
+        rows = {name: (calls, total) for name, calls, total, _ in trace.summary()}
+        self.assertEqual(rows['dataloader.next'], (100, spans[0]['args']['total_us'] / 1e6))
+
+        trace.disable()
+        with trace.aggregate('metric.update') as updates:
+            with updates.item():
+                pass
+        self.assertEqual(len([e for e in trace.events() if e['ph'] == 'X']), 2)
+
+    def test_summary(self):
+        events = [
+            {'name': 'a', 'ph': 'X', 'ts': 0, 'dur': 100, 'pid': 1, 'tid': 1},
+            {'name': 'b', 'ph': 'X', 'ts': 10, 'dur': 30, 'pid': 1, 'tid': 1},
+            {'name': 'c', 'ph': 'X', 'ts': 15, 'dur': 10, 'pid': 1, 'tid': 1},
+            {'name': 'b', 'ph': 'X', 'ts': 50, 'dur': 20, 'pid': 1, 'tid': 1},
+            # the spans of another thread or process are not nested in a
+            {'name': 'b', 'ph': 'X', 'ts': 20, 'dur': 40, 'pid': 1, 'tid': 2},
+            {'name': 'c', 'ph': 'X', 'ts': 20, 'dur': 5, 'pid': 2, 'tid': 1},
+            {'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'x'}},
+        ]
+        # the calls, total and self microseconds of each name
+        rows = {name: (calls, round(total * 1e6), round(self_time * 1e6))
+                for name, calls, total, self_time in trace.summary(events)}
+        self.assertEqual(rows, {'a': (1, 100, 50), 'b': (3, 90, 80), 'c': (2, 15, 15)})
+        self.assertEqual([row[0] for row in trace.summary(events)], ['b', 'a', 'c'])
+        self.assertIn('Self %', trace.format_summary(trace.summary(events)))
+
+        # an aggregate span counts for its calls and total time, nothing is nested in it
+        events.append({'name': 'd', 'ph': 'X', 'ts': 72, 'dur': 20, 'pid': 1, 'tid': 1,
+                       'args': {'calls': 4, 'total_us': 8}})
+        events.append({'name': 'c', 'ph': 'X', 'ts': 80, 'dur': 2, 'pid': 1, 'tid': 1})
+        rows = {name: (calls, round(total * 1e6), round(self_time * 1e6))
+                for name, calls, total, self_time in trace.summary(events)}
+        self.assertEqual(rows['d'], (4, 8, 8))
+        self.assertEqual(rows['a'], (1, 100, 40))
+        self.assertEqual(rows['c'], (3, 17, 17))
+
+    def test_tuning_trace(self):
+        from lpot import Quantization
+
+        quantizer = Quantization('fake_yaml.yaml')
+        dataset = quantizer.dataset('dummy', (100, 3, 3, 1), label=True)
+        dataloader = quantizer.dataloader(dataset)
+        quantizer(self.constant_graph, q_dataloader=dataloader, eval_dataloader=dataloader)
+        self.assertFalse(trace.is_enabled())
+
+        with open('saved/trace.json') as f:
+            events = json.load(f)['traceEvents']
+        names = set(e['name'] for e in events)
+        for name in ['tuning.create_strategy', 'tuning.traverse', 'strategy.trial',
+                     'adaptor.quantize', 'adaptor.evaluate', 'adaptor.query_fw_capability',
+                     'graph_converter.convert', 'dataloader.next', 'metric.update',
+                     'strategy.save_history']:
+            self.assertIn(name, names)
+
+    def test_sharded_evaluation(self):
+        from lpot.adaptor import FRAMEWORKS
+        from lpot.data import DATASETS, DataLoader
+        from lpot.utils.create_obj_from_config import create_eval_func
+
+        adaptor = FRAMEWORKS['tensorflow']({'device': 'cpu',
+                                            'approach': 'post_training_static_quant',
+                                            'random_seed': 1978,
+                                            'inputs': ['x'],
+                                            'outputs': ['op_to_store']})
+        dataset = DATASETS('tensorflow')['dummy'](shape=(30, 3, 3, 1), label=True)
+        dataloader = DataLoader('tensorflow', dataset, batch_size=4)
+        sharded_eval = create_eval_func('tensorflow', dataloader, adaptor, {'topk': 1},
+                                        sharding={'num_shards': 2})
+        trace.enable('main')
+        sharded_eval(self.constant_graph)
+        # the events of each worker process are merged
+        shard_pids = set(e['pid'] for e in trace.events()
+                         if e['name'] == 'sharding.evaluate_shard')
+        self.assertEqual(len(shard_pids), 2)
+        self.assertNotIn(os.getpid(), shard_pids)
+
+if __name__ == "__main__":
+    unittest.main()
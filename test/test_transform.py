@@ -2,6 +2,7 @@
 import numpy as np
 import unittest
 import os
+import time
 from lpot.data import TRANSFORMS
 class TestMetrics(unittest.TestCase):
     def setUp(self):
@@ -18,5 +19,66 @@ class TestMetrics(unittest.TestCase):
         image_result = compose(image)
         self.assertEqual(image_result.shape, (1, 128, 128, 1))
 
+    def test_tensorflow_compiled(self):
+        import tensorflow as tf
+        transforms = TRANSFORMS(framework="tensorflow", process="preprocess")
+        compose = transforms['Compose']([transforms['resize'](size=[8, 8]),
+                                         transforms['flip_left_right']()])
+        rng = np.random.RandomState(0)
+        images = [rng.rand(16, 12 + i % 3, 3).astype(np.float32) for i in range(4)]
+        expected = [compose._apply(tf.constant(image)).numpy() for image in images]
+
+        graph = tf.Graph()
+        with graph.as_default():
+            compose(images[0])
+            num_ops = len(graph.get_operations())
+            latency = []
+            for i in range(3000):
+                start = time.time()
+                result = compose(images[i % 4])
+                latency.append(time.time() - start)
+                if i < 4:
+                    self.assertTrue(np.allclose(result, expected[i]))
+            # the traced graph is reused, nothing is added to the default graph
+            self.assertEqual(len(graph.get_operations()), num_ops)
+            self.assertEqual(len(compose._compiled), 1)
+            self.assertLess(np.median(latency[-500:]), 2 * np.median(latency[:500]) + 1e-4)
+
+            batch = compose.batch(np.stack([images[0], images[3]]))
+            self.assertEqual(batch.shape, (2, 8, 8, 3))
+            self.assertTrue(np.allclose(batch[1], expected[3]))
+
+            # symbolic samples are transformed in the caller graph
+            dataset = tf.data.Dataset.from_tensor_slices(np.stack([images[0], images[3]])).map(compose)
+            self.assertEqual(tuple(dataset.element_spec.shape), (8, 8, 3))
+
+    def test_tensorflow_postprocess(self):
+        import tensorflow as tf
+        from lpot.utils.create_obj_from_config import get_postprocess
+        transforms = TRANSFORMS(framework="tensorflow", process="postprocess")
+        postprocess = get_postprocess(transforms, {'LabelShift': {'label_shift': 1}})
+        preds, labels = np.random.rand(2, 10), np.array([1, 5])
+        # numpy transforms are applied in place, in graph mode as in the adaptor
+        graph = tf.Graph()
+        with graph.as_default():
+            result_preds, result_labels = postprocess((preds, labels))
+            self.assertFalse(postprocess.traceable)
+            self.assertEqual(len(graph.get_operations()), 0)
+        self.assertTrue(np.array_equal(result_preds, preds))
+        self.assertTrue(np.array_equal(result_labels, [0, 4]))
+        result_preds, result_labels = postprocess((preds, labels))
+        self.assertTrue(np.array_equal(result_labels, [0, 4]))
+
+        # a transform failing to trace is applied in place
+        compose = transforms['Compose']([transforms['transpose']()])
+        with tf.Graph().as_default():
+            self.assertIsNone(compose._compile(np.ones([2]), False))
+            self.assertEqual(len(compose._compiled), 0)
+
+        # eager samples are transformed in place
+        image = compose(np.ones([4, 6, 1], dtype=np.float32))
+        self.assertTrue(tf.is_tensor(image))
+        self.assertEqual(tuple(image.shape), (6, 4, 1))
+
 if __name__ == "__main__":
     unittest.main()